@@ -0,0 +1,108 @@
+"""Calendario de actividad de cada cliente como mapa de bits.
+
+``calendario_actividad`` (migración 0007) guarda por cliente un ``bytea`` con
+un bit por día a partir de ``inicio``: el bit ``n`` (byte ``n // 8``, bit
+``n % 8`` empezando por el menos significativo, como ``get_bit``/``set_bit``
+de PostgreSQL) indica si el día ``inicio + n`` tuvo actividad, es decir,
+algún entrenamiento realizado o alguna clase completada. Lo mantienen los
+triggers del resumen de actividad diaria (migración 0006), así que cambia con
+``registrar_actividad`` y ``registrar_asistencia_clase``; ``activity_rollup.py``
+lo reconstruye junto con el resumen. Un año de historial ocupa 46 bytes.
+
+``Calendar`` lo carga como un entero de Python (``int.from_bytes`` en
+little-endian deja el día ``n`` en el bit ``n``) y responde con operaciones
+sobre palabras completas en lugar de recorrer fechas una a una::
+
+    cal = Calendar.from_row(inicio, dias)
+    cal.current_streak(hoy)               # días seguidos con actividad hasta hoy
+    cal.longest_streak()
+    cal.active_days(desde, hasta)         # días con actividad en el rango
+    cal.heatmap(2026)                     # "0110..." con un carácter por día del año
+"""
+
+from datetime import date
+
+
+class Calendar:
+    """Días con actividad de un cliente a partir de ``start``."""
+
+    __slots__ = ("start", "bits")
+
+    def __init__(self, start: date | None = None, bits: int = 0):
+        self.start = start
+        self.bits = bits
+
+    @classmethod
+    def from_row(cls, start: date | None, data: bytes | None) -> "Calendar":
+        """Calendario a partir de ``(inicio, dias)`` de ``calendario_actividad`` (o vacío)."""
+        if start is None or not data:
+            return cls()
+        return cls(start, int.from_bytes(data, "little"))
+
+    @classmethod
+    def from_dates(cls, dates) -> "Calendar":
+        dates = sorted(set(dates))
+        if not dates:
+            return cls()
+        start = dates[0]
+        bits = 0
+        for day in dates:
+            bits |= 1 << (day - start).days
+        return cls(start, bits)
+
+    def _index(self, day: date) -> int:
+        return (day - self.start).days
+
+    def _slice(self, first: int, last: int) -> int:
+        """Bits de los días ``first``..``last`` (índices, ambos incluidos), desplazados al bit 0."""
+        first = max(first, 0)
+        last = min(last, self.bits.bit_length() - 1)
+        if last < first:
+            return 0
+        return (self.bits >> first) & ((1 << (last - first + 1)) - 1)
+
+    def is_active(self, day: date) -> bool:
+        if self.start is None:
+            return False
+        index = self._index(day)
+        return index >= 0 and bool(self.bits >> index & 1)
+
+    def total_days(self) -> int:
+        return self.bits.bit_count()
+
+    def active_days(self, first: date, last: date) -> int:
+        """Días con actividad entre ``first`` y ``last``, ambos incluidos."""
+        if self.start is None:
+            return 0
+        return self._slice(self._index(first), self._index(last)).bit_count()
+
+    def current_streak(self, today: date) -> int:
+        """Días consecutivos con actividad que terminan en ``today`` (0 si hoy no hubo)."""
+        if not self.is_active(today):
+            return 0
+        index = self._index(today)
+        # Los huecos hasta hoy son los bits a 0: la racha empieza justo encima del último.
+        gaps = ~self.bits & ((1 << (index + 1)) - 1)
+        return index + 1 if not gaps else index + 1 - gaps.bit_length()
+
+    def longest_streak(self) -> int:
+        """Racha más larga: cada ``x & (x >> 1)`` acorta en un día todas las rachas a la vez."""
+        bits, streak = self.bits, 0
+        while bits:
+            bits &= bits >> 1
+            streak += 1
+        return streak
+
+    def heatmap(self, year: int) -> str:
+        """Un carácter por día del año (``"1"`` con actividad), empezando el 1 de enero."""
+        first = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - first).days
+        if self.start is None:
+            return "0" * days
+        index = self._index(first)
+        if index >= 0:
+            window = self._slice(index, index + days - 1)
+        else:
+            window = self._slice(0, index + days - 1) << -index
+        # format() escribe el bit más significativo primero: invertir para empezar el 1 de enero
+        return format(window, f"0{days}b")[::-1]
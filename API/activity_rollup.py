@@ -0,0 +1,185 @@
+"""Reconciliación del resumen de actividad diaria por cliente.
+
+``actividad_diaria_ejercicios`` y ``actividad_diaria_clases`` (migración 0006)
+resumen por cliente y día los entrenamientos realizados (registros, volumen y
+peso máximo por ejercicio) y las asistencias a clase (reservas completadas por
+tipo de clase), que es lo que agrega ``/cliente/{id}/estadisticas``. Las
+mantienen los triggers de ``entrenamientos_realizados``, ``reservas`` y
+``clases_programadas``, pero pueden desviarse si se cambian los datos sin
+pasar por ellos: ``TRUNCATE``, triggers desactivados en cargas masivas
+(``bench/generate_data.py``) o restauraciones parciales. Este módulo compara
+el resumen con el que resulta de las tablas de origen y recalcula los clientes
+que no coinciden. También cubre ``calendario_actividad`` (migración 0007, ver
+``activity_calendar.py``), el mapa de bits de días activos que se deriva del
+resumen: se comprueba contra él y se reconstruye con los mismos clientes.
+
+La corrección bloquea las dos tablas del resumen en modo SHARE ROW EXCLUSIVE:
+espera a las transacciones que ya están escribiendo en ellas (a través de los
+triggers), frena las nuevas hasta el commit y, ya con el bloqueo, vuelve a
+comparar en una sentencia nueva, así que no pisa registros simultáneos. Los
+registros de actividad solo esperan lo que tarda recalcular esos clientes.
+
+Desde API/ (cron o tras restaurar datos)::
+
+    python activity_rollup.py            # detecta y corrige
+    python activity_rollup.py --check    # solo informa; sale con 1 si hay desajustes
+    python activity_rollup.py --rebuild  # recalcula el resumen completo
+"""
+
+import logging
+
+logger = logging.getLogger("gym-infosys.reconcile")
+
+TABLES = ("actividad_diaria_ejercicios", "actividad_diaria_clases")
+CALENDAR_TABLE = "calendario_actividad"
+
+# Resumen calculado desde las tablas de origen; {where} filtra por clientes.
+EJERCICIOS_SQL = """
+    SELECT id_cliente, fecha_realizacion AS fecha, id_ejercicio, COUNT(*) AS registros,
+           SUM(volumen_entrenamiento(peso_kg, series_realizadas, repeticiones)) AS volumen,
+           MAX(NULLIF(peso_kg, 0)) AS peso_maximo
+    FROM entrenamientos_realizados
+    WHERE {where}
+    GROUP BY id_cliente, fecha_realizacion, id_ejercicio
+"""
+
+CLASES_SQL = """
+    SELECT r.id_cliente, cp.fecha, cp.id_clase, COUNT(*) AS asistencias
+    FROM reservas r
+    JOIN clases_programadas cp ON cp.id = r.id_clase_programada
+    WHERE r.estado = 'completada' AND {where}
+    GROUP BY r.id_cliente, cp.fecha, cp.id_clase
+"""
+
+DRIFT_SQL = f"""
+    SELECT id_cliente
+    FROM actividad_diaria_ejercicios a
+    FULL JOIN ({EJERCICIOS_SQL.format(where="TRUE")}) o USING (id_cliente, fecha, id_ejercicio)
+    WHERE (a.registros, a.volumen, a.peso_maximo) IS DISTINCT FROM (o.registros, o.volumen, o.peso_maximo)
+    UNION
+    SELECT id_cliente
+    FROM actividad_diaria_clases a
+    FULL JOIN ({CLASES_SQL.format(where="TRUE")}) o USING (id_cliente, fecha, id_clase)
+    WHERE a.asistencias IS DISTINCT FROM o.asistencias
+    UNION
+    SELECT id_cliente
+    FROM (
+        SELECT c.id_cliente, c.inicio + n AS fecha
+        FROM {CALENDAR_TABLE} c
+        CROSS JOIN LATERAL generate_series(0, length(c.dias) * 8 - 1) AS n
+        WHERE get_bit(c.dias, n) = 1
+    ) a
+    FULL JOIN (
+        SELECT id_cliente, fecha FROM actividad_diaria_ejercicios
+        UNION
+        SELECT id_cliente, fecha FROM actividad_diaria_clases
+    ) o USING (id_cliente, fecha)
+    WHERE a.id_cliente IS NULL OR o.id_cliente IS NULL
+    ORDER BY id_cliente
+"""
+
+
+def find_drift(cursor) -> list[int]:
+    """Clientes cuyo resumen diario (o su calendario) no coincide con sus registros."""
+    cursor.execute(DRIFT_SQL)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild(cursor, clientes: list[int] | None = None) -> None:
+    """Recalcula el resumen y el calendario de ``clientes`` (de todos si es None).
+
+    Trabaja en la transacción del cursor y no hace commit: lo decide quien llama.
+    """
+    cursor.execute(f"LOCK TABLE {', '.join(TABLES)} IN SHARE ROW EXCLUSIVE MODE")
+    if clientes is None:
+        where, params = "TRUE", {}
+    else:
+        where, params = "id_cliente = ANY(%(ids)s)", {"ids": clientes}
+    # Los triggers del calendario no marcan día a día: se reconstruye al final.
+    cursor.execute("SELECT set_config('gym.reconstruyendo_actividad', 'on', true)")
+    for table in TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE {where}", params)
+    cursor.execute(
+        "INSERT INTO actividad_diaria_ejercicios (id_cliente, fecha, id_ejercicio, registros, volumen, peso_maximo) "
+        + EJERCICIOS_SQL.format(where=where),
+        params,
+    )
+    cursor.execute(
+        "INSERT INTO actividad_diaria_clases (id_cliente, fecha, id_clase, asistencias) "
+        + CLASES_SQL.format(where=where),
+        params,
+    )
+    cursor.execute("SELECT reconstruir_calendario_actividad(%s)", (clientes,))
+    cursor.execute("SELECT set_config('gym.reconstruyendo_actividad', 'off', true)")
+
+
+def reconcile(cursor, fix: bool = True) -> list[int]:
+    """Detecta (y con ``fix`` corrige) los desajustes en la transacción del cursor.
+
+    Devuelve los clientes desajustados; con ``fix`` solo los que seguían así
+    tras bloquear el resumen. No hace commit: lo decide quien llama.
+    """
+    drift = find_drift(cursor)
+    if not drift or not fix:
+        return drift
+    cursor.execute(f"LOCK TABLE {', '.join(TABLES)} IN SHARE ROW EXCLUSIVE MODE")
+    drift = find_drift(cursor)
+    if drift:
+        rebuild(cursor, drift)
+    for cliente in drift[:20]:
+        logger.warning("Resumen de actividad diaria recalculado para el cliente %s", cliente)
+    if len(drift) > 20:
+        logger.warning("... y %s clientes más", len(drift) - 20)
+    return drift
+
+
+def run(conn, fix: bool = True) -> list[int]:
+    """``reconcile()`` en su propia transacción sobre una conexión psycopg2."""
+    try:
+        with conn.cursor() as cursor:
+            drift = reconcile(cursor, fix=fix)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info("Actividad diaria: %s clientes desajustados%s", len(drift), " corregidos" if fix and drift else "")
+    return drift
+
+
+def main(argv=None) -> int:
+    import argparse
+    import json
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+
+    import db
+
+    parser = argparse.ArgumentParser(description="Reconciliación del resumen de actividad diaria por cliente")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--check", action="store_true", help="Solo informar, sin corregir")
+    group.add_argument("--rebuild", action="store_true", help="Recalcular el resumen de todos los clientes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env.local")
+    conn = db.connect()
+    try:
+        if args.rebuild:
+            try:
+                with conn.cursor() as cursor:
+                    rebuild(cursor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return 0
+        drift = run(conn, fix=not args.check)
+    finally:
+        conn.close()
+    print(json.dumps(drift))
+    return 1 if args.check and drift else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
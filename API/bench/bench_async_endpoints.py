@@ -0,0 +1,144 @@
+"""Benchmark de concurrencia de los endpoints ``async def``.
+
+Arranca la API con uvicorn (un worker) desde el directorio indicado y lanza
+peticiones concurrentes contra endpoints ``async def`` de lectura, midiendo a la
+vez la latencia de ``/health`` para ver si el event loop queda bloqueado.
+Permite comparar dos versiones del código, p. ej. con un ``git worktree``::
+
+    git worktree add /tmp/gym-prev HEAD~1
+    python bench/bench_async_endpoints.py --api-dir /tmp/gym-prev/API
+    python bench/bench_async_endpoints.py --api-dir API
+
+Con ``--workers N`` se arranca la API con ``serve.py`` (N procesos) en lugar de
+``uvicorn main:app``, para comparar un proceso frente a varios.
+
+Usa las mismas variables DB_* / DATABASE_URL que la API.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/gym-clases",
+    "/entrenadores",
+    "/clases-programadas?filter_future=false",
+    "/ejercicios",
+    "/asignaciones-entrenador",
+    "/cliente/1/estadisticas",
+    "/entrenador/17/estadisticas",
+]
+
+
+def _pct(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _wait_ready(client, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("La API no respondió a /health a tiempo")
+
+
+async def _run(base_url, paths, concurrency, duration):
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await _wait_ready(client)
+        for path in paths:  # calentamiento
+            await client.get(path)
+
+        latencies, errors, probe = [], 0, []
+        stop = time.monotonic() + duration
+
+        async def worker(i):
+            nonlocal errors
+            n = i
+            while time.monotonic() < stop:
+                path = paths[n % len(paths)]
+                n += 1
+                t0 = time.perf_counter()
+                r = await client.get(path)
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors += 1
+
+        async def prober():
+            while time.monotonic() < stop:
+                t0 = time.perf_counter()
+                await client.get("/health")
+                probe.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.05)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(prober(), *(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _pct(latencies, 0.50) * 1000,
+        "p95_ms": _pct(latencies, 0.95) * 1000,
+        "p99_ms": _pct(latencies, 0.99) * 1000,
+        "health_p50_ms": _pct(probe, 0.50) * 1000,
+        "health_max_ms": max(probe, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api-dir", default=str(Path(__file__).resolve().parents[1]),
+                        help="Directorio que contiene main.py (por defecto, este API/)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por nivel")
+    parser.add_argument("--concurrency", default="1,8,32,64",
+                        help="Niveles de concurrencia separados por comas")
+    parser.add_argument("--workers", type=int,
+                        help="Arrancar con serve.py y este número de workers")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="Endpoint a medir (repetible); por defecto los async de lectura")
+    args = parser.parse_args()
+
+    if args.workers:
+        cmd = [sys.executable, "serve.py", "--port", str(args.port), "--workers", str(args.workers),
+               "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+               "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(
+        cmd,
+        cwd=args.api_dir,
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,  # los endpoints imprimen trazas [DEBUG]
+    )
+    try:
+        print(f"{'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'errores':>8} {'/health p50':>12} {'/health max':>12}")
+        for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+            res = asyncio.run(_run(f"http://127.0.0.1:{args.port}", args.paths or DEFAULT_PATHS,
+                                   level, args.duration))
+            print(f"{level:>5} {res['rps']:>9.1f} {res['p50_ms']:>8.1f} {res['p95_ms']:>8.1f} "
+                  f"{res['p99_ms']:>8.1f} {res['errors']:>8} {res['health_p50_ms']:>12.1f} "
+                  f"{res['health_max_ms']:>12.1f}")
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+
+
+if __name__ == "__main__":
+    main()
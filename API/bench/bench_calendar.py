@@ -0,0 +1,171 @@
+"""Micro-benchmark del calendario de actividad en bits frente al cálculo con conjuntos.
+
+Compara, sobre historiales sintéticos de ``--years`` años con distintas
+densidades de actividad, lo que hacía ``/cliente/{id}/estadisticas`` antes del
+resumen diario (un ``set`` de fechas en texto que se parsea y se recorre día a
+día) con ``activity_calendar.Calendar`` cargado desde el ``bytea`` de
+``calendario_actividad``. Cada operación incluye la carga desde lo que
+devuelve la BD (lista de fechas o bytes), como en una petición:
+
+- ``racha_actual``: días seguidos con actividad hasta hoy
+- ``racha_maxima``: racha más larga del historial
+- ``dias_rango``: días con actividad en los últimos 90 días
+- ``mapa_anual``: cadena de 0/1 con un carácter por día del año actual
+
+Antes de medir comprueba que ambas versiones dan el mismo resultado. No
+necesita BD ni la API::
+
+    python bench/bench_calendar.py --output /tmp/calendario.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+API_DIR = BENCH_DIR.parent
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+
+from activity_calendar import Calendar  # noqa: E402
+
+# Nombre -> probabilidad de que un día tenga actividad.
+DENSITIES = {"esporadico": 0.15, "habitual": 0.45, "diario": 0.9}
+
+
+# --- Versión con conjuntos (la del endpoint antes de la migración 0006) ---
+
+def _set_from_rows(fechas) -> set:
+    fechas_set = {str(f) for f in fechas if f}
+    return {datetime.strptime(f, "%Y-%m-%d").date() for f in fechas_set}
+
+
+def set_current_streak(fechas, hoy: date) -> int:
+    dias = _set_from_rows(fechas)
+    racha, dia = 0, hoy
+    while dia in dias:
+        racha += 1
+        dia -= timedelta(days=1)
+    return racha
+
+
+def set_longest_streak(fechas) -> int:
+    dias = _set_from_rows(fechas)
+    mejor = 0
+    for dia in dias:
+        if dia - timedelta(days=1) in dias:
+            continue
+        n = 1
+        while dia + timedelta(days=n) in dias:
+            n += 1
+        mejor = max(mejor, n)
+    return mejor
+
+
+def set_active_days(fechas, desde: date, hasta: date) -> int:
+    return sum(1 for dia in _set_from_rows(fechas) if desde <= dia <= hasta)
+
+
+def set_heatmap(fechas, anio: int) -> str:
+    dias = _set_from_rows(fechas)
+    primero = date(anio, 1, 1)
+    total = (date(anio + 1, 1, 1) - primero).days
+    return "".join("1" if primero + timedelta(days=i) in dias else "0" for i in range(total))
+
+
+# --- Versión con bits (activity_calendar.py) ---
+
+def _to_row(fechas) -> tuple[date, bytes]:
+    """Lo que guarda calendario_actividad: (inicio, dias) con bit n = día inicio + n."""
+    cal = Calendar.from_dates(fechas)
+    return cal.start, cal.bits.to_bytes((cal.bits.bit_length() + 7) // 8, "little")
+
+
+def _history(years: int, density: float, hoy: date, rng: random.Random) -> list[date]:
+    # Termina con una racha de una semana hasta hoy para que racha_actual no sea trivial
+    total = years * 365
+    fechas = [hoy - timedelta(days=i) for i in range(total) if i < 7 or rng.random() < density]
+    fechas.reverse()
+    return fechas
+
+
+def _time(fn, repeat: int) -> float:
+    """Mejor tiempo por llamada en microsegundos."""
+    number = 20
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark del calendario de actividad en bits")
+    parser.add_argument("--years", default="1,5,10", help="Años de historial, separados por comas")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por medida (se toma la mejor)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichero JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    hoy = date.today()
+    desde = hoy - timedelta(days=89)
+    results = []
+    for years in [int(y) for y in args.years.split(",")]:
+        for nombre, density in DENSITIES.items():
+            fechas = _history(years, density, hoy, rng)
+            inicio, dias = _to_row(fechas)
+            ops = {
+                "racha_actual": (
+                    lambda: set_current_streak(fechas, hoy),
+                    lambda: Calendar.from_row(inicio, dias).current_streak(hoy),
+                ),
+                "racha_maxima": (
+                    lambda: set_longest_streak(fechas),
+                    lambda: Calendar.from_row(inicio, dias).longest_streak(),
+                ),
+                "dias_rango": (
+                    lambda: set_active_days(fechas, desde, hoy),
+                    lambda: Calendar.from_row(inicio, dias).active_days(desde, hoy),
+                ),
+                "mapa_anual": (
+                    lambda: set_heatmap(fechas, hoy.year),
+                    lambda: Calendar.from_row(inicio, dias).heatmap(hoy.year),
+                ),
+            }
+            for op, (con_conjuntos, con_bits) in ops.items():
+                if con_conjuntos() != con_bits():
+                    print(f"Resultado distinto en {op} ({years} años, {nombre})", file=sys.stderr)
+                    return 1
+                antes = _time(con_conjuntos, args.repeat)
+                despues = _time(con_bits, args.repeat)
+                results.append({
+                    "anios": years,
+                    "densidad": nombre,
+                    "dias_activos": len(fechas),
+                    "bytes": len(dias),
+                    "operacion": op,
+                    "conjuntos_us": round(antes, 2),
+                    "bits_us": round(despues, 2),
+                    "aceleracion": round(antes / despues, 1),
+                })
+                print(f"{years:>2} años {nombre:<10} {op:<13} {antes:>10.1f} µs -> {despues:>7.1f} µs "
+                      f"(x{antes / despues:.1f})", file=sys.stderr)
+
+    report = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "resultados": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
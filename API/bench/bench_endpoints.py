@@ -0,0 +1,369 @@
+"""Benchmark reproducible de los endpoints más usados, con salida JSON.
+
+Prepara (opcionalmente) una base de datos a escala con ``generate_data.py``,
+arranca la API desde ``--api-dir`` y mide por separado cada endpoint durante
+``--duration`` segundos en cada nivel de ``--concurrency``:
+
+- ``POST /login``
+- ``GET /clases-programadas``
+- ``GET /user/{id}/reservas``
+- ``GET /cliente/{id}/estadisticas`` (completo y con ``summary_only=true``)
+- ``GET /entrenador/{id}/estadisticas``
+- ``GET /admin/users``
+- ``GET /admin/estadisticas``
+- ``POST /reservas`` (al final, porque modifica los datos)
+
+Para cada uno informa de throughput, latencia p50/p95/p99, códigos de estado
+y consultas SQL y tiempo en BD por petición (a partir de ``/metrics``; en
+versiones sin ese endpoint quedan a ``null``). El resultado es un JSON con el
+commit, el volumen de datos y la configuración, para comparar ejecuciones::
+
+    python bench/bench_endpoints.py --scale 1 --output /tmp/antes.json
+    git worktree add /tmp/gym-nuevo mi-rama
+    python bench/bench_endpoints.py --api-dir /tmp/gym-nuevo/API --scale 1 \\
+        --output /tmp/despues.json --compare /tmp/antes.json
+
+Sin ``--scale`` se usan los datos que ya haya en la base de datos. Los ids de
+clientes y clases se eligen con ``--seed``, así que dos ejecuciones sobre el
+mismo volumen piden exactamente lo mismo. Usa las mismas variables DB_* /
+DATABASE_URL que la API.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+BENCH_DIR = Path(__file__).resolve().parent
+API_DIR = BENCH_DIR.parent
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+
+from dotenv import load_dotenv  # noqa: E402
+
+import db  # noqa: E402
+from bench_async_endpoints import _pct, _wait_ready  # noqa: E402
+
+# Nombre -> método HTTP, en el orden en que se miden.
+ENDPOINTS = {
+    "login": "POST",
+    "clases_programadas": "GET",
+    "user_reservas": "GET",
+    "cliente_estadisticas": "GET",
+    "cliente_estadisticas_resumen": "GET",
+    "entrenador_estadisticas": "GET",
+    "admin_users": "GET",
+    "admin_estadisticas": "GET",
+    "crear_reserva": "POST",
+}
+
+COUNTED_TABLES = [
+    "users", "clientes", "clases_programadas", "reservas",
+    "entrenamientos_asignados", "entrenamientos_realizados",
+]
+
+
+class Workload:
+    """Construye las peticiones de cada endpoint a partir de ids reales de la BD."""
+
+    def __init__(self, conn, seed: int, password: str, sample: int = 2000):
+        self.password = password
+        self.rng = random.Random(seed)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.id, c.id_usuario, u.email
+                FROM clientes c JOIN users u ON u.id = c.id_usuario
+                ORDER BY c.id
+                LIMIT %s
+                """,
+                (sample,),
+            )
+            self.clientes = cursor.fetchall()
+            cursor.execute(
+                """
+                SELECT id FROM clases_programadas
+                WHERE fecha >= CURRENT_DATE AND estado IN ('activa', 'programada')
+                ORDER BY id
+                """
+            )
+            self.clases_futuras = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT id FROM users WHERE role = 'entrenador' ORDER BY id")
+            self.entrenadores = [row[0] for row in cursor.fetchall()]
+        conn.rollback()
+        if not self.clientes:
+            raise SystemExit("No hay clientes en la base de datos; usa --scale para generar datos")
+
+    def request(self, endpoint: str):
+        """(método, ruta, cuerpo JSON) de la siguiente petición de ``endpoint``."""
+        cliente_id, user_id, email = self.rng.choice(self.clientes)
+        if endpoint == "login":
+            return "POST", "/login", {"email": email, "password": self.password}
+        if endpoint == "clases_programadas":
+            return "GET", "/clases-programadas", None
+        if endpoint == "user_reservas":
+            return "GET", f"/user/{user_id}/reservas", None
+        if endpoint == "cliente_estadisticas":
+            return "GET", f"/cliente/{user_id}/estadisticas", None
+        if endpoint == "cliente_estadisticas_resumen":
+            return "GET", f"/cliente/{user_id}/estadisticas?summary_only=true", None
+        if endpoint == "entrenador_estadisticas":
+            entrenador = self.rng.choice(self.entrenadores) if self.entrenadores else 0
+            return "GET", f"/entrenador/{entrenador}/estadisticas", None
+        if endpoint == "admin_users":
+            return "GET", "/admin/users", None
+        if endpoint == "admin_estadisticas":
+            return "GET", "/admin/estadisticas", None
+        if endpoint == "crear_reserva":
+            clase = self.rng.choice(self.clases_futuras) if self.clases_futuras else 0
+            return "POST", "/reservas", {"id_cliente": cliente_id, "id_clase_programada": clase}
+        raise ValueError(endpoint)
+
+
+def _scrape_db_metrics(text: str) -> dict:
+    """{(método, ruta): [consultas, segundos en BD, peticiones]} a partir de /metrics."""
+    totals = {}
+    for family in text_string_to_metric_families(text):
+        if family.name not in ("http_request_db_queries", "http_request_db_seconds"):
+            continue
+        for sample in family.samples:
+            key = (sample.labels.get("method"), sample.labels.get("route"))
+            entry = totals.setdefault(key, [0.0, 0.0, 0.0])
+            if sample.name == "http_request_db_queries_sum":
+                entry[0] = sample.value
+            elif sample.name == "http_request_db_seconds_sum":
+                entry[1] = sample.value
+            elif sample.name == "http_request_db_queries_count":
+                entry[2] = sample.value
+    return totals
+
+
+async def _db_metrics(client) -> dict | None:
+    try:
+        r = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    if r.status_code != 200:
+        return None
+    return _scrape_db_metrics(r.text)
+
+
+def _db_delta(before, after, method: str) -> dict:
+    """Consultas y ms en BD por petición entre dos lecturas de /metrics."""
+    if before is None or after is None:
+        return {"db_queries_per_req": None, "db_ms_per_req": None, "route": None}
+    # La ruta con más peticiones nuevas de ese método es la del endpoint medido.
+    best, best_n = None, 0.0
+    for key, (queries, seconds, count) in after.items():
+        if key[0] != method:
+            continue
+        prev = before.get(key, [0.0, 0.0, 0.0])
+        n = count - prev[2]
+        if n > best_n:
+            best, best_n = (key, queries - prev[0], seconds - prev[1]), n
+    if best is None:
+        return {"db_queries_per_req": None, "db_ms_per_req": None, "route": None}
+    key, queries, seconds = best
+    return {
+        "route": key[1],
+        "db_queries_per_req": round(queries / best_n, 2),
+        "db_ms_per_req": round(seconds / best_n * 1000, 3),
+    }
+
+
+async def _run_endpoint(base_url, workload: Workload, endpoint: str, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await _wait_ready(client)
+        for _ in range(min(concurrency, 4)):  # calentamiento
+            method, path, body = workload.request(endpoint)
+            await client.request(method, path, json=body)
+        before = await _db_metrics(client)
+
+        latencies, statuses, failures = [], {}, 0
+        stop = time.monotonic() + duration
+
+        async def worker():
+            nonlocal failures
+            while time.monotonic() < stop:
+                method, path, body = workload.request(endpoint)
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, json=body)
+                except httpx.HTTPError:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+                statuses[str(r.status_code)] = statuses.get(str(r.status_code), 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        after = await _db_metrics(client)
+
+    method = ENDPOINTS[endpoint]
+    ok = sum(n for code, n in statuses.items() if code.startswith("2"))
+    result = {
+        "endpoint": endpoint,
+        "method": method,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "ok": ok,
+        "rps": round(len(latencies) / elapsed, 2),
+        "ok_rps": round(ok / elapsed, 2),
+        "p50_ms": round(_pct(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_pct(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_pct(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+        "status": dict(sorted(statuses.items())),
+        "connection_errors": failures,
+    }
+    result.update(_db_delta(before, after, method))
+    return result
+
+
+def _git_info(api_dir: Path) -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=api_dir, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def _dataset(conn) -> dict:
+    counts = {}
+    with conn.cursor() as cursor:
+        for table in COUNTED_TABLES:
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+    conn.rollback()
+    return counts
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Líneas con la variación de rps y p95 respecto a otra ejecución."""
+    base = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    lines = [f"{'endpoint':<22} {'conc':>4} {'rps':>16} {'p95 ms':>18} {'consultas':>12}"]
+    for r in current["results"]:
+        b = base.get((r["endpoint"], r["concurrency"]))
+        if b is None:
+            continue
+
+        def delta(new, old):
+            if not old:
+                return "   n/a"
+            return f"{(new - old) / old * 100:+6.1f}%"
+
+        queries = f"{b['db_queries_per_req']}->{r['db_queries_per_req']}"
+        lines.append(
+            f"{r['endpoint']:<22} {r['concurrency']:>4} {r['rps']:>8.1f} {delta(r['rps'], b['rps'])} "
+            f"{r['p95_ms']:>9.1f} {delta(r['p95_ms'], b['p95_ms'])} {queries:>12}"
+        )
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de los endpoints principales con salida JSON")
+    parser.add_argument("--api-dir", default=str(API_DIR), help="Directorio que contiene main.py (por defecto, este API/)")
+    parser.add_argument("--scale", type=float, help="Regenerar los datos con generate_data.py a esta escala")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de los datos y de las peticiones")
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today(),
+                        help="Fecha de referencia de generate_data.py")
+    parser.add_argument("--password", default="gym12345", help="Contraseña de los usuarios (la de generate_data.py)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, help="Arrancar con serve.py y este número de workers")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por endpoint y nivel")
+    parser.add_argument("--concurrency", default="1,16", help="Niveles de concurrencia separados por comas")
+    parser.add_argument("--endpoint", action="append", dest="endpoints", choices=list(ENDPOINTS),
+                        help="Endpoint a medir (repetible); por defecto todos")
+    parser.add_argument("--output", help="Fichero JSON de resultados (por defecto, stdout)")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args(argv)
+
+    load_dotenv(API_DIR.parent / ".env.local")
+    if args.scale is not None:
+        import generate_data
+
+        generate_data.main(["--scale", str(args.scale), "--seed", str(args.seed),
+                            "--today", args.today.isoformat(), "--password", args.password, "--reset"])
+
+    conn = db.connect()
+    try:
+        workload = Workload(conn, args.seed, args.password)
+        dataset = _dataset(conn)
+    finally:
+        conn.close()
+
+    api_dir = Path(args.api_dir).resolve()
+    if args.workers:
+        cmd = [sys.executable, "serve.py", "--port", str(args.port), "--workers", str(args.workers),
+               "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+               "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(
+        cmd,
+        cwd=api_dir,
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,  # los endpoints imprimen trazas [DEBUG]
+        stderr=subprocess.DEVNULL,
+    )
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = []
+    try:
+        print(f"{'endpoint':<22} {'conc':>4} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'consultas':>9} {'estados'}", file=sys.stderr)
+        for endpoint in args.endpoints or ENDPOINTS:
+            for level in levels:
+                res = asyncio.run(_run_endpoint(f"http://127.0.0.1:{args.port}", workload, endpoint,
+                                                level, args.duration))
+                results.append(res)
+                queries = "-" if res["db_queries_per_req"] is None else f"{res['db_queries_per_req']:.1f}"
+                print(f"{endpoint:<22} {level:>4} {res['rps']:>9.1f} {res['p50_ms']:>8.1f} {res['p95_ms']:>8.1f} "
+                      f"{res['p99_ms']:>8.1f} {queries:>9} {res['status']}", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            **_git_info(api_dir),
+            "api_dir": str(api_dir),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers or 1,
+            "duration_s": args.duration,
+            "concurrency": levels,
+            "seed": args.seed,
+            "scale": args.scale,
+            "dataset": dataset,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print("\n".join(compare(report, baseline)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
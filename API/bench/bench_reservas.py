@@ -0,0 +1,197 @@
+"""Benchmark de contención de ``POST /reservas``: cientos de reservas a la vez sobre una clase.
+
+Crea una clase programada de prueba con ``--capacity`` plazas, arranca la API
+desde ``--api-dir`` y lanza ``--bookers`` reservas simultáneas (una por
+cliente distinto) contra esa misma clase, liberadas todas a la vez. En cada una
+de las ``--rounds`` rondas comprueba que:
+
+- se aceptan exactamente ``min(capacidad, reservas)`` peticiones,
+- las reservas activas de la clase en la BD coinciden con las aceptadas y no
+  superan la capacidad,
+
+e informa del throughput de la ráfaga, la latencia p50/p95/p99 y los códigos
+de estado. Las clases de prueba se borran al terminar (con sus reservas, por el
+``ON DELETE CASCADE``). Sirve para comparar con una versión anterior::
+
+    git worktree add /tmp/gym-prev HEAD~1
+    python bench/bench_reservas.py --api-dir /tmp/gym-prev/API
+    python bench/bench_reservas.py
+
+Necesita al menos ``--bookers`` clientes en la BD (``generate_data.py`` crea
+miles). Sale con código 1 si alguna ronda sobrerreserva la clase o acepta un
+número de reservas distinto del esperado. Usa las mismas variables DB_* /
+DATABASE_URL que la API.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+API_DIR = BENCH_DIR.parent
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+
+from dotenv import load_dotenv  # noqa: E402
+
+import db  # noqa: E402
+from bench_async_endpoints import _pct, _wait_ready  # noqa: E402
+
+
+def _crear_clase(conn, capacidad: int, rng: random.Random) -> int:
+    """Clase programada de prueba en una fecha lejana que no choca con los datos reales."""
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM gym_clases ORDER BY id LIMIT 1")
+    id_clase = cur.fetchone()[0]
+    cur.execute("SELECT id FROM users WHERE role = 'entrenador' ORDER BY id LIMIT 1")
+    row = cur.fetchone()
+    if row is None:
+        cur.execute("SELECT id FROM users ORDER BY id LIMIT 1")
+        row = cur.fetchone()
+    fecha = date.today() + timedelta(days=3650 + rng.randrange(3650))
+    hora = dtime(rng.randrange(24), rng.randrange(60), rng.randrange(60))
+    cur.execute("""
+        INSERT INTO clases_programadas (id_clase, id_instructor, fecha, hora, capacidad_maxima, estado, ubicacion)
+        VALUES (%s, %s, %s, %s, %s, 'programada', 'bench_reservas')
+        RETURNING id
+    """, (id_clase, row[0], fecha, hora, capacidad))
+    clase_id = cur.fetchone()[0]
+    conn.commit()
+    return clase_id
+
+
+def _reservas_activas(conn, clase_id: int) -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM reservas WHERE id_clase_programada = %s AND estado = 'activa'", (clase_id,))
+    n = cur.fetchone()[0]
+    conn.commit()
+    return n
+
+
+async def _rafaga(base_url: str, clase_id: int, clientes: list[int]) -> dict:
+    """Lanza una reserva por cliente, todas a la vez, y recoge estados y latencias."""
+    limits = httpx.Limits(max_connections=len(clientes) + 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await _wait_ready(client)
+        salida = asyncio.Event()
+        latencies, status = [], {}
+
+        async def reservar(id_cliente):
+            await salida.wait()
+            t0 = time.perf_counter()
+            try:
+                r = await client.post("/reservas", json={"id_cliente": id_cliente, "id_clase_programada": clase_id})
+                code = str(r.status_code)
+            except httpx.HTTPError as e:
+                code = type(e).__name__
+            latencies.append(time.perf_counter() - t0)
+            status[code] = status.get(code, 0) + 1
+
+        tasks = [asyncio.create_task(reservar(c)) for c in clientes]
+        await asyncio.sleep(0.2)  # que todas estén esperando la salida
+        t0 = time.perf_counter()
+        salida.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(clientes) / elapsed, 1),
+        "p50_ms": round(_pct(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_pct(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_pct(latencies, 0.99) * 1000, 1),
+        "status": dict(sorted(status.items())),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de contención de POST /reservas sobre una única clase")
+    parser.add_argument("--api-dir", default=str(API_DIR), help="Directorio que contiene main.py (por defecto, este API/)")
+    parser.add_argument("--bookers", type=int, default=300, help="Reservas simultáneas por ronda (clientes distintos)")
+    parser.add_argument("--capacity", type=int, default=20, help="Plazas de la clase de prueba")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--workers", type=int, help="Arrancar con serve.py y este número de workers")
+    parser.add_argument("--output", help="Fichero JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    load_dotenv(API_DIR.parent / ".env.local")
+    rng = random.Random(args.seed)
+    conn = db.connect()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM clientes ORDER BY id")
+    todos = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    if len(todos) < args.bookers:
+        print(f"Solo hay {len(todos)} clientes y se piden {args.bookers} reservas; "
+              "genera más datos con bench/generate_data.py", file=sys.stderr)
+        conn.close()
+        return 2
+
+    api_dir = Path(args.api_dir).resolve()
+    if args.workers:
+        cmd = [sys.executable, "serve.py", "--port", str(args.port), "--workers", str(args.workers),
+               "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+               "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(cmd, cwd=api_dir, env=os.environ.copy(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    clases, rondas, ok = [], [], True
+    esperadas = min(args.capacity, args.bookers)
+    try:
+        print(f"{'ronda':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'aceptadas':>9} "
+              f"{'en BD':>6} {'estados'}", file=sys.stderr)
+        for n in range(1, args.rounds + 1):
+            clase_id = _crear_clase(conn, args.capacity, rng)
+            clases.append(clase_id)
+            res = asyncio.run(_rafaga(f"http://127.0.0.1:{args.port}", clase_id, rng.sample(todos, args.bookers)))
+            aceptadas = res["status"].get("200", 0)
+            en_bd = _reservas_activas(conn, clase_id)
+            correcta = aceptadas == esperadas and en_bd == aceptadas
+            ok = ok and correcta
+            res.update(round=n, clase_id=clase_id, accepted=aceptadas, active_in_db=en_bd,
+                       overbooked=en_bd > args.capacity, correct=correcta)
+            rondas.append(res)
+            print(f"{n:>5} {res['rps']:>9.1f} {res['p50_ms']:>8.1f} {res['p95_ms']:>8.1f} {res['p99_ms']:>8.1f} "
+                  f"{aceptadas:>9} {en_bd:>6} {res['status']}{'' if correcta else '  <-- INCORRECTA'}",
+                  file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        if clases:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM clases_programadas WHERE id = ANY(%s)", (clases,))
+            conn.commit()
+        conn.close()
+
+    report = {
+        "meta": {
+            "api_dir": str(api_dir),
+            "workers": args.workers or 1,
+            "bookers": args.bookers,
+            "capacity": args.capacity,
+            "seed": args.seed,
+        },
+        "rounds": rondas,
+        "correct": ok,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,673 @@
+"""Generador de datos a escala para pruebas de rendimiento.
+
+``seed_postgres.sql`` solo crea unas pocas filas. Este script rellena las 12
+tablas de ``migrations.REQUIRED_TABLES`` con un volumen configurable y datos
+coherentes entre sí (claves ajenas, restricciones UNIQUE y CHECK de
+``ddl_postgres.sql``, aforo de las clases, planes con entrenador...), cargando
+con ``COPY`` para que decenas de millones de filas tarden minutos.
+
+Volumen con ``--scale 1`` (aprox. 2,5 M filas):
+
+- 50.000 usuarios (85 % clientes, 1 entrenador por cada 500 usuarios).
+- 40 clases programadas al día durante ``--days`` días de histórico más 14 futuros.
+- 200.000 reservas.
+- ~2.000.000 de entrenamientos realizados, repartidos de forma desigual
+  (unos pocos clientes muy activos y muchos ocasionales).
+
+Todo escala linealmente con ``--scale``; ``--users``, ``--reservas`` y
+``--realizados`` fijan un valor concreto. La misma ``--seed`` produce siempre
+los mismos datos.
+
+El catálogo (planes, tipos de clase y ejercicios) se toma de
+``seed_postgres.sql``. Todos los usuarios comparten la contraseña
+``--password``; el administrador es ``admin@example.com``, los entrenadores
+tienen los ids 2 a 1 + N y a continuación van los clientes.
+
+Uso (desde API/, con las mismas variables DB_* / DATABASE_URL que la API)::
+
+    python bench/generate_data.py --scale 1 --reset
+    python bench/generate_data.py --scale 4 --reset   # ~10 M filas
+
+Sin ``--reset`` el script se niega a cargar sobre tablas con datos. Si la base
+de datos está vacía aplica antes las migraciones (sin el seed).
+"""
+
+import argparse
+import logging
+import math
+import random
+import re
+import sys
+import time
+import unicodedata
+from datetime import date, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+API_DIR = Path(__file__).resolve().parents[1]
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+
+import bcrypt  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+import activity_rollup  # noqa: E402
+import cohorts  # noqa: E402
+import dashboard_summary  # noqa: E402
+import db  # noqa: E402
+import migrations  # noqa: E402
+import reconcile  # noqa: E402
+import trainer_rollup  # noqa: E402
+
+# Orden de carga (respeta las claves ajenas).
+TABLES = [
+    "planes",
+    "gym_clases",
+    "ejercicios",
+    "users",
+    "email_verifications",
+    "reset_tokens",
+    "clientes",
+    "clases_programadas",
+    "reservas",
+    "entrenador_cliente_asignaciones",
+    "entrenamientos_asignados",
+    "entrenamientos_realizados",
+]
+CATALOG_TABLES = ("planes", "gym_clases", "ejercicios")
+
+NOMBRES = [
+    "Lucía", "Pedro", "Ana", "Juan", "María", "Isabel", "Antonio", "Carmen", "Miguel", "Laura",
+    "Carlos", "David", "Sara", "Javier", "Elena", "Pablo", "Marta", "Sergio", "Paula", "Daniel",
+    "Alba", "Jorge", "Nerea", "Raúl", "Irene", "Álvaro", "Cristina", "Rubén", "Beatriz", "Hugo",
+]
+APELLIDOS = [
+    "Fernández", "Martín", "Rodríguez", "Pérez", "García", "Moreno", "Jiménez", "Ruiz", "González",
+    "Sánchez", "López", "Martínez", "Gómez", "Díaz", "Hernández", "Muñoz", "Álvarez", "Romero",
+    "Navarro", "Torres", "Domínguez", "Vázquez", "Ramos", "Gil", "Serrano", "Blanco", "Molina",
+]
+NOTAS = ["", "", "", "Buena sesión", "Me costó terminar", "Subir peso la próxima", "Molestia leve en el hombro"]
+UBICACIONES = ["Sala 1", "Sala 2", "Sala 3", "Sala de ciclo", "Piscina", None]
+DNI_LETRAS = "TRWAGMYFPDXBNJZSQVHLCKE"
+NULL = "\\N"
+
+# Horas de inicio de clase: de 07:00 a 21:30 cada media hora.
+HORAS = [f"{h:02d}:{m:02d}:00" for h in range(7, 22) for m in (0, 30)]
+
+
+def _ascii(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+NOMBRES_EMAIL = [_ascii(n) for n in NOMBRES]
+APELLIDOS_EMAIL = [_ascii(a) for a in APELLIDOS]
+
+
+class _Rng(random.Random):
+    """``random.Random`` con ``randrange``/``randint``/``choice`` basados en ``random()``.
+
+    Las versiones de la librería estándar son exactas pero varias veces más
+    lentas; aquí el sesgo de redondeo es irrelevante y son la mayor parte del
+    tiempo de generación.
+    """
+
+    def _randbelow(self, n):
+        return int(self.random() * n)
+
+    def randrange(self, start, stop=None):
+        if stop is None:
+            return int(self.random() * start)
+        return start + int(self.random() * (stop - start))
+
+    def randint(self, a, b):
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+
+class Sizes(NamedTuple):
+    users: int
+    entrenadores: int
+    clientes: int
+    clases_por_dia: int
+    reservas: int
+    realizados: int
+
+
+def plan_sizes(args) -> Sizes:
+    users = args.users or max(10, round(50_000 * args.scale))
+    entrenadores = max(2, users // 500)
+    clientes = min(users - 1 - entrenadores, max(1, int(users * 0.85)))
+    return Sizes(
+        users=users,
+        entrenadores=entrenadores,
+        clientes=clientes,
+        clases_por_dia=min(len(HORAS) * 12, max(4, round(40 * args.scale))),
+        reservas=args.reservas if args.reservas is not None else round(200_000 * args.scale),
+        realizados=args.realizados if args.realizados is not None else round(2_000_000 * args.scale),
+    )
+
+
+class Perfil(NamedTuple):
+    """Datos de un cliente que necesitan varias tablas (se recalculan, no se guardan)."""
+
+    plan_id: int
+    genero: str
+    nacimiento: str
+    inscripcion: int  # días antes de hoy
+    estado: str
+    entrenador: int | None  # users.id del entrenador asignado
+    entrenador_anterior: int | None
+    asignado_desde: int  # días antes de hoy
+    actividad: float  # peso relativo en entrenamientos_realizados
+    fuerza: float
+
+
+class Generator:
+    """Produce las filas de cada tabla en formato texto de ``COPY``.
+
+    Las filas se generan al vuelo, sin guardarlas en memoria. Lo que una tabla
+    necesita de otra (perfil de cada cliente, plan de entrenamientos) se
+    recalcula con un ``random.Random`` propio sembrado por id, así que es
+    idéntico en cada pasada.
+    """
+
+    def __init__(self, sizes: Sizes, seed: int, days: int, today: date, password_hash: str, catalog: dict):
+        self.sizes = sizes
+        self.seed = seed
+        self.days = days
+        self.future_days = 14
+        self.today = today
+        self.password_hash = password_hash
+        self.planes = catalog["planes"]  # id -> acceso_entrenador
+        self.clases = catalog["gym_clases"]  # [(id, max_participantes, duracion_minutos)]
+        self.ejercicios = catalog["ejercicios"]  # [(id, categoria)]
+        self.cardio = {eid for eid, categoria in self.ejercicios if categoria == "Cardio"}
+        # Con más de len(HORAS) clases al día se repiten horas con otro tipo de clase.
+        self.clases_por_dia = min(sizes.clases_por_dia, len(HORAS) * len(self.clases))
+        self.first_trainer = 2
+        self.first_cliente_user = self.first_trainer + sizes.entrenadores
+        # Fechas ISO precalculadas, indexadas por días antes de hoy (negativo = futuro).
+        span = max(days, 3 * 365) + 400
+        self._dates = {d: (today - timedelta(days=d)).isoformat() for d in range(-self.future_days - 1, span)}
+        self._oldest = span - 1
+        self._mean_activity = math.exp(0.9 ** 2 / 2)  # media de lognormvariate(0, 0.9)
+        self.realizados_por_cliente = sizes.realizados / max(1, sizes.clientes)
+
+    def _seed(self, stream: int, key: int) -> int:
+        return (self.seed * 1_000_003 + stream) * 100_000_007 + key
+
+    def _date(self, days_ago: int) -> str:
+        return self._dates[days_ago]
+
+    def _ts(self, days_ago: int, rng: random.Random) -> str:
+        """Marca de tiempo de ese día entre las 07:00 y las 22:00."""
+        secs = int(rng.random() * 54_000)
+        return f"{self._dates[days_ago]} {7 + secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d}"
+
+    # --- perfiles -------------------------------------------------------
+
+    def cliente_user_id(self, cid: int) -> int:
+        return self.first_cliente_user + cid - 1
+
+    def perfil(self, cid: int) -> Perfil:
+        rng = _Rng(self._seed(1, cid))
+        # Premium / Estándar / Básico en el orden del seed.
+        plan_id = rng.choices(list(self.planes), weights=(25, 40, 35) if len(self.planes) == 3 else None)[0]
+        estado = rng.choices(("activo", "inactivo", "suspendido"), weights=(90, 7, 3))[0]
+        inscripcion = int(rng.triangular(0, 3 * 365, 120))
+        entrenador = anterior = None
+        desde = 0
+        if self.planes[plan_id] and estado == "activo" and rng.random() < 0.9:
+            entrenador = self.first_trainer + rng.randrange(self.sizes.entrenadores)
+            desde = min(inscripcion, rng.randrange(30, 366))
+            if self.sizes.entrenadores > 1 and rng.random() < 0.1:
+                anterior = self.first_trainer + (entrenador - self.first_trainer + 1 + rng.randrange(self.sizes.entrenadores - 1)) % self.sizes.entrenadores
+        nacimiento = date(1960, 1, 1) + timedelta(days=rng.randrange(47 * 365))
+        return Perfil(
+            plan_id=plan_id,
+            genero=rng.choices(("masculino", "femenino", "otro"), weights=(48, 48, 4))[0],
+            nacimiento=nacimiento.isoformat(),
+            inscripcion=inscripcion,
+            estado=estado,
+            entrenador=entrenador,
+            entrenador_anterior=anterior,
+            asignado_desde=desde,
+            actividad=rng.lognormvariate(0, 0.9) / self._mean_activity,
+            fuerza=rng.uniform(0.5, 1.6),
+        )
+
+    # --- tablas ---------------------------------------------------------
+
+    def users(self):
+        s = self.sizes
+        rng = _Rng(self._seed(2, 0))
+        for uid in range(1, s.users + 1):
+            if uid == 1:
+                role, days_ago = "admin", 3 * 365 + 30
+            elif uid < self.first_cliente_user:
+                role, days_ago = "entrenador", rng.randrange(365, 3 * 365)
+            elif uid < self.first_cliente_user + s.clientes:
+                role = "cliente"
+                days_ago = self.perfil(uid - self.first_cliente_user + 1).inscripcion
+            else:
+                role, days_ago = "usuario", rng.randrange(3 * 365)
+            n, a1, a2 = rng.randrange(len(NOMBRES)), rng.randrange(len(APELLIDOS)), rng.randrange(len(APELLIDOS))
+            created = self._ts(days_ago, rng)
+            yield (
+                uid,
+                f"{NOMBRES[n]} {APELLIDOS[a1]} {APELLIDOS[a2]}",
+                "admin@example.com" if uid == 1 else f"{NOMBRES_EMAIL[n]}.{APELLIDOS_EMAIL[a1]}.{uid}@example.com",
+                self.password_hash,
+                0 if self._unverified(uid) else 1,
+                role,
+                created,
+                created,
+            )
+
+    def _unverified(self, uid: int) -> bool:
+        # 5 % de los usuarios sin rol de cliente no han verificado el email.
+        return uid >= self.first_cliente_user + self.sizes.clientes and uid % 20 == 0
+
+    def email_verifications(self):
+        rng = _Rng(self._seed(3, 0))
+        vid = 0
+        for uid in range(self.first_cliente_user + self.sizes.clientes, self.sizes.users + 1):
+            if self._unverified(uid):
+                vid += 1
+                days_ago = rng.randrange(0, 30)
+                yield (vid, uid, f"{rng.getrandbits(128):032x}", self._date(days_ago - 1) + " 00:00:00",
+                       self._date(days_ago) + " 00:00:00", self._date(days_ago) + " 00:00:00")
+
+    def reset_tokens(self):
+        rng = _Rng(self._seed(4, 0))
+        tid = 0
+        for uid in range(2, self.sizes.users + 1, 97):
+            tid += 1
+            days_ago = rng.randrange(0, 90)
+            created = self._ts(days_ago, rng)
+            yield (tid, uid, f"{rng.getrandbits(128):032x}", self._date(days_ago - 1) + " 00:00:00", created, created)
+
+    def clientes(self):
+        for cid in range(1, self.sizes.clientes + 1):
+            p = self.perfil(cid)
+            rng = _Rng(self._seed(6, cid))
+            uid = self.cliente_user_id(cid)
+            created = f"{self._date(p.inscripcion)} 10:00:00"
+            yield (
+                cid, uid,
+                f"{uid:08d}{DNI_LETRAS[uid % 23]}",
+                f"6{uid:08d}",
+                p.plan_id, p.nacimiento, p.genero,
+                f"4532{rng.randrange(10**12):012d}",
+                f"{self.today.year + rng.randrange(1, 5)}-{rng.randrange(1, 13):02d}-01",
+                f"{rng.randrange(1000):03d}",
+                self._date(p.inscripcion), p.estado, created, created,
+            )
+
+    def _clases_dia(self, days_ago: int):
+        """Clases de un día: (hora, id_clase, id_instructor, capacidad, duración, cancelada)."""
+        rng = _Rng(self._seed(7, days_ago + self.future_days + 1))
+        n_clases = len(self.clases)
+        for i in range(self.clases_por_dia):
+            hora_idx, ronda = i % len(HORAS), i // len(HORAS)
+            # Misma hora: tipos de clase distintos, de modo que (clase, instructor, fecha, hora) es único.
+            clase_id, capacidad, duracion = self.clases[(hora_idx + ronda + days_ago) % n_clases]
+            instructor = self.first_trainer + rng.randrange(self.sizes.entrenadores)
+            yield HORAS[hora_idx], clase_id, instructor, capacidad, duracion, rng.random() < 0.03
+
+    def clases_programadas(self):
+        cpid = 0
+        for days_ago in range(self.days, -self.future_days - 1, -1):
+            rng = _Rng(self._seed(8, days_ago + self.future_days + 1))
+            for hora, clase_id, instructor, capacidad, duracion, cancelada in self._clases_dia(days_ago):
+                cpid += 1
+                created = self._ts(min(days_ago + rng.randrange(7, 30), self._oldest), rng)
+                yield (
+                    cpid, clase_id, instructor, self._date(days_ago), hora, capacidad,
+                    "cancelada" if cancelada else "activa",
+                    rng.choice(UBICACIONES), duracion, created, created,
+                )
+
+    def reservas(self):
+        s = self.sizes
+        # Ocupación media necesaria para llegar a s.reservas; se reparte en
+        # proporción al aforo y, si no cabe, las clases se llenan.
+        total_clases = (self.days + self.future_days + 1) * self.clases_por_dia
+        aforo_medio = sum(c[1] for c in self.clases) / max(1, len(self.clases))
+        ocupacion = s.reservas / max(1.0, total_clases * 0.97 * aforo_medio)
+        rid = cpid = 0
+        for days_ago in range(self.days, -self.future_days - 1, -1):
+            rng = _Rng(self._seed(9, days_ago + self.future_days + 1))
+            for _, _, _, capacidad, _, cancelada in self._clases_dia(days_ago):
+                cpid += 1
+                if cancelada:
+                    continue
+                n = min(capacidad, s.clientes, int(capacidad * ocupacion * rng.uniform(0.5, 1.5) + rng.random()))
+                for cid in rng.sample(range(1, s.clientes + 1), n):
+                    rid += 1
+                    if days_ago > 0:
+                        estado = "completada" if rng.random() < 0.8 else "activa"
+                    else:
+                        estado = "activa"
+                    created = self._ts(min(days_ago + rng.randrange(0, 15), self._oldest), rng)
+                    updated = self._ts(max(days_ago, 0), rng) if estado == "completada" else created
+                    yield (rid, cid, cpid, estado, created, updated)
+
+    def entrenador_cliente_asignaciones(self):
+        aid = 0
+        for cid in range(1, self.sizes.clientes + 1):
+            p = self.perfil(cid)
+            if p.entrenador is None:
+                continue
+            if p.entrenador_anterior is not None:
+                aid += 1
+                desde = min(p.inscripcion, p.asignado_desde + 60)
+                yield (aid, p.entrenador_anterior, cid, "completada", self._date(desde), None,
+                       f"{self._date(desde)} 09:00:00", f"{self._date(p.asignado_desde)} 09:00:00")
+            aid += 1
+            yield (aid, p.entrenador, cid, "activa", self._date(p.asignado_desde), None,
+                   f"{self._date(p.asignado_desde)} 09:00:00", f"{self._date(p.asignado_desde)} 09:00:00")
+
+    def _plan(self, cid: int, p: Perfil):
+        """Plan semanal de un cliente con entrenador: (días_antes, id_ejercicio, series, estado)."""
+        if p.entrenador is None:
+            return []
+        rng = _Rng(self._seed(10, cid))
+        plan = []
+        semanas = min(12, p.asignado_desde // 7)
+        for semana in range(-2, semanas + 1):
+            days_ago = semana * 7 + rng.randrange(7)
+            if days_ago < -self.future_days:
+                continue
+            for ejercicio, _ in rng.sample(self.ejercicios, rng.randint(3, 5)):
+                if days_ago > 0:
+                    estado = rng.choices(("completado", "pendiente", "cancelado"), weights=(75, 20, 5))[0]
+                else:
+                    estado = "pendiente"
+                plan.append((days_ago, ejercicio, rng.randint(2, 5), estado))
+        return plan
+
+    def entrenamientos_asignados(self):
+        eid = 0
+        for cid in range(1, self.sizes.clientes + 1):
+            p = self.perfil(cid)
+            for days_ago, ejercicio, series, estado in self._plan(cid, p):
+                eid += 1
+                created = f"{self._date(max(days_ago + 3, 0))} 12:00:00"
+                yield (eid, p.entrenador, cid, ejercicio, self._date(days_ago), series, estado, created, created)
+
+    def _serie(self, rng, p: Perfil, ejercicio: int):
+        """(repeticiones, peso_kg, tiempo_segundos, distancia_metros) de un ejercicio."""
+        if ejercicio in self.cardio:
+            minutos = rng.randint(10, 60)
+            return None, None, minutos * 60, round(minutos * rng.uniform(80, 200), 2)
+        return rng.randint(5, 15), round(min(999.0, rng.uniform(5, 120) * p.fuerza), 2), None, None
+
+    def entrenamientos_realizados(self):
+        eid = asignado_id = 0
+        for cid in range(1, self.sizes.clientes + 1):
+            p = self.perfil(cid)
+            rng = _Rng(self._seed(11, cid))
+            objetivo = int(self.realizados_por_cliente * p.actividad + rng.random())
+            for days_ago, ejercicio, series, estado in self._plan(cid, p):
+                asignado_id += 1
+                if estado != "completado":
+                    continue
+                eid += 1
+                objetivo -= 1
+                reps, peso, tiempo, distancia = self._serie(rng, p, ejercicio)
+                created = self._ts(days_ago, rng)
+                yield (eid, cid, ejercicio, asignado_id, self._date(days_ago), series, reps, peso,
+                       tiempo, distancia, rng.choice(NOTAS), rng.randint(1, 5), "planificado", created, created)
+            # Sesiones libres de 3 a 6 ejercicios en días al azar desde la inscripción.
+            ventana = max(1, min(p.inscripcion, self.days))
+            while objetivo > 0:
+                days_ago = rng.randrange(1, ventana + 1)
+                created = self._ts(days_ago, rng)
+                for ejercicio, _ in rng.sample(self.ejercicios, min(objetivo, rng.randint(3, 6))):
+                    eid += 1
+                    objetivo -= 1
+                    reps, peso, tiempo, distancia = self._serie(rng, p, ejercicio)
+                    yield (eid, cid, ejercicio, None, self._date(days_ago), rng.randint(1, 5), reps, peso,
+                           tiempo, distancia, rng.choice(NOTAS), rng.choice((None, 3, 4, 5)), "libre",
+                           created, created)
+
+
+COLUMNS = {
+    "users": "id, name, email, password, email_verified, role, created_at, updated_at",
+    "email_verifications": "id, user_id, token, expires_at, created_at, updated_at",
+    "reset_tokens": "id, user_id, token, expires_at, created_at, updated_at",
+    "clientes": "id, id_usuario, dni, numero_telefono, plan_id, fecha_nacimiento, genero, num_tarjeta, "
+                "fecha_tarjeta, cvv, fecha_inscripcion, estado, created_at, updated_at",
+    "clases_programadas": "id, id_clase, id_instructor, fecha, hora, capacidad_maxima, estado, ubicacion, "
+                          "duracion_minutos, created_at, updated_at",
+    "reservas": "id, id_cliente, id_clase_programada, estado, created_at, updated_at",
+    "entrenador_cliente_asignaciones": "id, id_entrenador, id_cliente, estado, fecha_asignacion, notas, "
+                                       "created_at, updated_at",
+    "entrenamientos_asignados": "id, id_entrenador, id_cliente, id_ejercicio, fecha_entrenamiento, series, "
+                                "estado, created_at, updated_at",
+    "entrenamientos_realizados": "id, id_cliente, id_ejercicio, id_entrenamiento_asignado, fecha_realizacion, "
+                                 "series_realizadas, repeticiones, peso_kg, tiempo_segundos, distancia_metros, "
+                                 "notas, valoracion, tipo_registro, created_at, updated_at",
+}
+
+
+class CopyStream:
+    """Adaptador fichero -> generador de filas para ``cursor.copy_expert``.
+
+    Los textos generados no contienen tabuladores, saltos de línea ni barras
+    invertidas, así que no hace falta escaparlos para el formato de ``COPY``.
+    """
+
+    def __init__(self, rows, batch: int = 5000):
+        self._rows = iter(rows)
+        self._batch = batch
+        self.count = 0
+
+    def read(self, size=-1):
+        lines = []
+        for row in self._rows:
+            lines.append("\t".join([NULL if v is None else v if v.__class__ is str else str(v) for v in row]))
+            if len(lines) >= self._batch:
+                break
+        self.count += len(lines)
+        if not lines:
+            return ""
+        return "\n".join(lines) + "\n"
+
+
+def _load_catalog(cursor, seed_script: Path) -> dict:
+    """Inserta planes, tipos de clase y ejercicios tal como están en el seed."""
+    text = seed_script.read_text(encoding="utf-8")
+    for statement in re.split(r";\s*\n", text):
+        match = re.search(r"INSERT INTO (\w+)", statement)
+        if match and match.group(1) in CATALOG_TABLES:
+            cursor.execute(statement)
+    cursor.execute("SELECT id, acceso_entrenador FROM planes ORDER BY id")
+    planes = {pid: bool(acceso) for pid, acceso in cursor.fetchall()}
+    cursor.execute("SELECT id, max_participantes, duracion_minutos FROM gym_clases ORDER BY id")
+    clases = cursor.fetchall()
+    cursor.execute("SELECT id, categoria FROM ejercicios ORDER BY id")
+    ejercicios = cursor.fetchall()
+    return {"planes": planes, "gym_clases": clases, "ejercicios": ejercicios}
+
+
+def _secondary_indexes(cursor) -> list[tuple[str, str]]:
+    """Índices de las tablas que no respaldan una restricción (PK/UNIQUE)."""
+    cursor.execute(
+        """
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        WHERE t.relnamespace = 'public'::regnamespace
+          AND t.relname = ANY(%s)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        """,
+        (TABLES,),
+    )
+    return cursor.fetchall()
+
+
+def _load_plan_history(cursor) -> int:
+    """Historial de planes de los clientes cargados (su trigger no se dispara en el COPY).
+
+    Uno de cada cuatro clientes con un plan por encima del más barato empezó en
+    el plan inmediatamente inferior y subió en algún momento tras inscribirse,
+    para que el embudo de mejoras de ``cohorts.py`` tenga datos.
+    """
+    cursor.execute(f"""
+        WITH orden AS (
+            SELECT id, LAG(id) OVER (ORDER BY orden_display, precio_mensual, id) AS inferior FROM planes
+        ), altas AS (
+            SELECT c.id, c.plan_id, COALESCE(c.fecha_inscripcion, c.created_at::date) AS alta,
+                   CASE WHEN c.id % 4 = 0 THEN o.inferior END AS inicial
+            FROM clientes c
+            JOIN orden o ON o.id = c.plan_id
+        ), ultima AS (
+            SELECT MAX(alta) AS fecha FROM altas
+        )
+        INSERT INTO {cohorts.PLAN_HISTORY_TABLE} (id_cliente, plan_anterior, plan_nuevo, fecha)
+        SELECT id, NULL, COALESCE(inicial, plan_id), alta FROM altas
+        UNION ALL
+        SELECT a.id, a.inicial, a.plan_id, a.alta + (a.id * 7919) % GREATEST(u.fecha - a.alta, 1) + time '12:00'
+        FROM altas a, ultima u
+        WHERE a.inicial IS NOT NULL
+    """)
+    return cursor.rowcount
+
+
+def load(conn, make_generator, reset: bool, defer_indexes: bool) -> list[tuple[str, int, float]]:
+    """Carga todas las tablas en una transacción y devuelve (tabla, filas, segundos)."""
+    results = []
+    with conn.cursor() as cursor:
+        if not reset:
+            for table in TABLES:
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+                if cursor.fetchone()[0]:
+                    raise SystemExit(f"La tabla {table} tiene datos; usa --reset para vaciar las tablas antes de cargar")
+        cursor.execute("SET LOCAL maintenance_work_mem = '512MB'")
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        # TRUNCATE en la misma transacción permite COPY ... FREEZE (las filas
+        # quedan congeladas y el primer VACUUM no tiene que reescribirlas).
+        cursor.execute(f"TRUNCATE {', '.join(TABLES + list(activity_rollup.TABLES) + [activity_rollup.CALENDAR_TABLE, cohorts.PLAN_HISTORY_TABLE] + list(trainer_rollup.TABLES))} RESTART IDENTITY CASCADE")
+        t0 = time.perf_counter()
+        catalog = _load_catalog(cursor, migrations.SEED_SCRIPT_PATH)
+        results.append(("catálogo", sum(len(v) for v in catalog.values()), time.perf_counter() - t0))
+        gen = make_generator(catalog)
+
+        indexes = _secondary_indexes(cursor) if defer_indexes else []
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {name}")
+        # Los registros se generan ya con el estado final de sus entrenamientos
+        # asignados; el trigger haría un UPDATE por fila. Igual con el contador
+        # de reservas activas, el resumen de actividad diaria, el historial
+        # de planes y el resumen semanal por entrenador, que se recalculan de
+        # una vez al final.
+        cursor.execute("ALTER TABLE entrenamientos_realizados DISABLE TRIGGER update_entrenamiento_asignado_completado")
+        cursor.execute("ALTER TABLE entrenamientos_realizados DISABLE TRIGGER actualizar_actividad_diaria_ejercicios")
+        cursor.execute("ALTER TABLE reservas DISABLE TRIGGER actualizar_reservas_activas")
+        cursor.execute("ALTER TABLE reservas DISABLE TRIGGER actualizar_actividad_diaria_clases")
+        cursor.execute("ALTER TABLE clientes DISABLE TRIGGER registrar_cambio_plan")
+        cursor.execute("ALTER TABLE entrenamientos_asignados DISABLE TRIGGER actualizar_actividad_entrenador")
+        cursor.execute("ALTER TABLE entrenamientos_realizados DISABLE TRIGGER actualizar_actividad_entrenador")
+
+        for table in TABLES:
+            if table in CATALOG_TABLES:
+                continue
+            t0 = time.perf_counter()
+            stream = CopyStream(getattr(gen, table)())
+            cursor.copy_expert(f"COPY {table} ({COLUMNS[table]}) FROM STDIN WITH (FREEZE)", stream, size=1 << 20)
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST(max(id), 1)) FROM {table}")
+            results.append((table, stream.count, time.perf_counter() - t0))
+            print(f"  {table:<34} {stream.count:>11,} filas {results[-1][2]:>8.1f} s", flush=True)
+
+        cursor.execute("ALTER TABLE entrenamientos_realizados ENABLE TRIGGER update_entrenamiento_asignado_completado")
+        cursor.execute("ALTER TABLE entrenamientos_realizados ENABLE TRIGGER actualizar_actividad_diaria_ejercicios")
+        cursor.execute("ALTER TABLE reservas ENABLE TRIGGER actualizar_reservas_activas")
+        cursor.execute("ALTER TABLE reservas ENABLE TRIGGER actualizar_actividad_diaria_clases")
+        cursor.execute("ALTER TABLE clientes ENABLE TRIGGER registrar_cambio_plan")
+        cursor.execute("ALTER TABLE entrenamientos_asignados ENABLE TRIGGER actualizar_actividad_entrenador")
+        cursor.execute("ALTER TABLE entrenamientos_realizados ENABLE TRIGGER actualizar_actividad_entrenador")
+        t0 = time.perf_counter()
+        drift = reconcile.reconcile(cursor)
+        print(f"  {len(drift):>,} contadores de reservas activas en {time.perf_counter() - t0:.1f} s", flush=True)
+        t0 = time.perf_counter()
+        activity_rollup.rebuild(cursor)
+        print(f"  Resumen de actividad diaria en {time.perf_counter() - t0:.1f} s", flush=True)
+        t0 = time.perf_counter()
+        trainer_rollup.rebuild(cursor)
+        print(f"  Resumen de actividad semanal por entrenador en {time.perf_counter() - t0:.1f} s", flush=True)
+        t0 = time.perf_counter()
+        cambios = _load_plan_history(cursor)
+        print(f"  {cambios:>,} filas de historial de planes en {time.perf_counter() - t0:.1f} s", flush=True)
+        if indexes:
+            t0 = time.perf_counter()
+            for _, definition in indexes:
+                cursor.execute(definition)
+            print(f"  {len(indexes)} índices secundarios recreados en {time.perf_counter() - t0:.1f} s", flush=True)
+    conn.commit()
+
+    t0 = time.perf_counter()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    finally:
+        conn.autocommit = False
+    print(f"  ANALYZE en {time.perf_counter() - t0:.1f} s", flush=True)
+
+    t0 = time.perf_counter()
+    dashboard_summary.refresh_sync(conn)
+    print(f"  Resumen del panel de administración en {time.perf_counter() - t0:.1f} s", flush=True)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Carga datos sintéticos a escala con COPY")
+    parser.add_argument("--scale", type=float, default=1.0, help="Factor de escala (1 = 50k usuarios, ~2,5 M filas)")
+    parser.add_argument("--users", type=int, help="Número de usuarios (por defecto 50.000 × scale)")
+    parser.add_argument("--reservas", type=int, help="Reservas aproximadas (por defecto 200.000 × scale)")
+    parser.add_argument("--realizados", type=int,
+                        help="Entrenamientos realizados aproximados (por defecto 2.000.000 × scale)")
+    parser.add_argument("--days", type=int, default=365, help="Días de histórico")
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today(),
+                        help="Fecha de referencia (AAAA-MM-DD) para datos reproducibles")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="gym12345", help="Contraseña común de todos los usuarios")
+    parser.add_argument("--reset", action="store_true", help="Vaciar las 12 tablas antes de cargar")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="No borrar y recrear los índices secundarios alrededor de la carga")
+    args = parser.parse_args(argv)
+
+    load_dotenv(API_DIR.parent / ".env.local")
+    # Los CREATE INDEX y el ANALYZE de la carga superan siempre DB_SLOW_QUERY_MS.
+    logging.getLogger("gym-infosys.sql").setLevel(logging.ERROR)
+    # Tras la carga todos los contadores de reservas están "desajustados" (a 0).
+    logging.getLogger("gym-infosys.reconcile").setLevel(logging.ERROR)
+    sizes = plan_sizes(args)
+    print(f"Tamaños: {sizes._asdict()}")
+    password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    conn = db.connect()
+    try:
+        # Base de datos vacía: crear el esquema, pero sin el seed.
+        migrations.migrate(conn, seed_script=None)
+        t0 = time.perf_counter()
+        results = load(
+            conn,
+            lambda catalog: Generator(sizes, args.seed, args.days, args.today, password_hash, catalog),
+            reset=args.reset,
+            defer_indexes=not args.keep_indexes,
+        )
+        elapsed = time.perf_counter() - t0
+    finally:
+        conn.close()
+
+    rows = sum(n for _, n, _ in results)
+    print(f"Total: {rows:,} filas en {elapsed:.1f} s ({rows / elapsed:,.0f} filas/s)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+"""Caché en proceso de los datos de catálogo.
+
+Planes, tipos de clase, ejercicios y entrenadores cambian unas pocas veces al
+mes, pero las páginas de inicio y de reservas los piden en cada visita. Este
+módulo guarda el objeto de respuesta ya construido (filas formateadas,
+``caracteristicas`` parseadas, campos de compatibilidad...) de cada catálogo,
+de modo que un acierto no toca la BD ni vuelve a formatear nada::
+
+    planes = await catalog_cache.get("planes", _cargar_planes)
+
+- Caducidad: ``CATALOG_CACHE_TTL`` segundos (300 por defecto; 0 desactiva la
+  caché y cada petición llama al cargador).
+- Invalidación explícita: ``invalidate("entrenadores")`` (o sin argumentos,
+  todos) tras un commit que cambie el catálogo. Una carga en curso que empezó
+  antes de invalidar no guarda su resultado.
+- Una sola carga a la vez por catálogo: las peticiones que llegan con la
+  entrada caducada esperan a la carga en curso en lugar de repetir la consulta.
+- ETag del contenido, calculado una vez por carga (``get_with_etag``), para
+  responder 304 a los GET condicionales sin serializar nada (``conditional.py``).
+- Aciertos y fallos por catálogo en ``stats()`` (``/health/cache``) y en la
+  métrica ``catalog_cache_requests_total`` de ``/metrics``.
+
+La caché es de cada proceso. Con varios workers (``serve.py``) los cambios
+llegan a todos por LISTEN/NOTIFY (``change_listener.py``); el TTL queda como
+red de seguridad.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import conditional
+import metrics
+
+logger = logging.getLogger("gym-infosys.cache")
+
+CATALOGS = ("planes", "gym_clases", "ejercicios", "entrenadores")
+
+
+def _env_ttl() -> float:
+    try:
+        return max(0.0, float(os.getenv("CATALOG_CACHE_TTL", 300)))
+    except (TypeError, ValueError):
+        return 300.0
+
+
+TTL = _env_ttl()
+
+# catálogo -> (valor, ETag del contenido, instante de caducidad)
+_entries: dict[str, tuple[object, str, float]] = {}
+# catálogo -> generación; invalidate() la incrementa
+_generation: dict[str, int] = {name: 0 for name in CATALOGS}
+_locks: dict[str, asyncio.Lock] = {}
+_stats: dict[str, dict[str, int]] = {
+    name: {"hits": 0, "misses": 0, "invalidations": 0} for name in CATALOGS
+}
+
+
+# Contador de stats() -> valor de la etiqueta ``result`` de la métrica
+_RESULTS = {"hits": "hit", "misses": "miss", "invalidations": "invalidation"}
+
+
+def _count(name: str, key: str) -> None:
+    _stats[name][key] += 1
+    metrics.CATALOG_CACHE.labels(name, _RESULTS[key]).inc()
+
+
+def _fresh(name: str):
+    entry = _entries.get(name)
+    if entry is not None and entry[2] > time.monotonic():
+        return entry
+    return None
+
+
+async def get(name: str, loader):
+    """Valor del catálogo ``name``; si no está o ha caducado, ``await loader()``."""
+    return (await get_with_etag(name, loader))[0]
+
+
+async def get_with_etag(name: str, loader) -> tuple[object, str]:
+    """Valor del catálogo y su ETag (``conditional.content_etag``), calculado una vez por carga.
+
+    El ETag depende solo del contenido, así que todos los workers dan el mismo
+    para los mismos datos.
+    """
+    if name not in _generation:
+        raise KeyError(f"Catálogo desconocido: {name}")
+    entry = _fresh(name)
+    if entry is not None:
+        _count(name, "hits")
+        return entry[0], entry[1]
+
+    lock = _locks.get(name)
+    if lock is None:
+        lock = _locks[name] = asyncio.Lock()
+    async with lock:
+        # Otra petición puede haberlo cargado mientras esperábamos el lock.
+        entry = _fresh(name)
+        if entry is not None:
+            _count(name, "hits")
+            return entry[0], entry[1]
+        _count(name, "misses")
+        generation = _generation[name]
+        value = await loader()
+        etag = conditional.content_etag(value)
+        if TTL > 0 and _generation[name] == generation:
+            _entries[name] = (value, etag, time.monotonic() + TTL)
+        return value, etag
+
+
+def invalidate(*names: str) -> None:
+    """Descarta los catálogos indicados (todos si no se indica ninguno)."""
+    for name in names or CATALOGS:
+        if name not in _generation:
+            raise KeyError(f"Catálogo desconocido: {name}")
+        _generation[name] += 1
+        _entries.pop(name, None)
+        _count(name, "invalidations")
+    logger.debug("Caché de catálogo invalidada: %s", ", ".join(names or CATALOGS))
+
+
+def stats() -> dict:
+    now = time.monotonic()
+    data = {}
+    for name in CATALOGS:
+        entry = _entries.get(name)
+        data[name] = dict(
+            _stats[name],
+            cached=entry is not None and entry[2] > now,
+            expires_in=round(entry[2] - now, 1) if entry is not None and entry[2] > now else None,
+        )
+    return {"ttl_seconds": TTL, "catalogs": data}
@@ -0,0 +1,135 @@
+"""Invalidación de la caché de catálogo entre workers con LISTEN/NOTIFY.
+
+La caché de ``catalog_cache.py`` es de cada proceso: un cambio hecho a través
+de un worker (o directamente en la BD) dejaría datos viejos en los demás hasta
+que caducaran. Los triggers de la migración 0003 publican cada cambio en
+planes, gym_clases, ejercicios y en los usuarios entrenadores en el canal
+``gym_cambios`` como ``{"tabla": ..., "op": ..., "id": ...}``, y cada worker
+mantiene una tarea en segundo plano que escucha ese canal e invalida solo los
+catálogos afectados por la tabla del evento.
+
+La escucha usa una conexión propia en autocommit (fuera de los pools). Si se
+cae, se reconecta con espera exponencial (1 s a 30 s) y, al volver a escuchar,
+se vacía toda la caché: los eventos publicados mientras no había conexión se
+han perdido. Las conexiones llevan keepalives TCP para detectar también una
+caída de red sin cierre explícito.
+
+Configuración:
+
+- ``CACHE_LISTEN=0`` desactiva la escucha (queda solo la caducidad por TTL).
+- ``DB_LISTEN_URL``: conexión para la escucha si la habitual no la admite,
+  p. ej. con PgBouncer en modo ``transaction``, que no soporta LISTEN.
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+import psycopg
+
+import catalog_cache
+import db_async
+
+logger = logging.getLogger("gym-infosys.cache")
+
+CHANNEL = "gym_cambios"
+
+# tabla del evento -> catálogos de catalog_cache que dependen de ella
+TABLE_CATALOGS = {
+    "planes": ("planes",),
+    "gym_clases": ("gym_clases",),
+    "ejercicios": ("ejercicios",),
+    "users": ("entrenadores",),
+}
+
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 30.0
+
+_task: asyncio.Task | None = None
+_stats = {"enabled": False, "connected": False, "events": 0, "reconnects": 0, "last_error": None}
+
+
+def handle(payload: str) -> tuple[str, ...]:
+    """Invalida los catálogos afectados por un evento y los devuelve."""
+    try:
+        event = json.loads(payload)
+        table = event["tabla"]
+    except (ValueError, TypeError, KeyError):
+        logger.warning("Evento de cambio ilegible en %s, vaciando la caché: %r", CHANNEL, payload)
+        catalog_cache.invalidate()
+        return catalog_cache.CATALOGS
+    _stats["events"] += 1
+    catalogs = TABLE_CATALOGS.get(table, ())
+    if catalogs:
+        logger.debug("Cambio en %s (%s id=%s): invalidando %s", table, event.get("op"), event.get("id"), catalogs)
+        catalog_cache.invalidate(*catalogs)
+    return catalogs
+
+
+def _conninfo() -> str:
+    return os.getenv("DB_LISTEN_URL") or db_async._conninfo()
+
+
+async def _listen_once() -> None:
+    conn = await psycopg.AsyncConnection.connect(
+        _conninfo(),
+        autocommit=True,
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+    )
+    async with conn:
+        await conn.execute(f"LISTEN {CHANNEL}")
+        _stats["connected"] = True
+        # Lo que cambiara antes de escuchar (o durante una desconexión) no llegará.
+        catalog_cache.invalidate()
+        logger.info("Escuchando cambios de catálogo en el canal %s", CHANNEL)
+        async for notify in conn.notifies():
+            handle(notify.payload)
+
+
+async def run() -> None:
+    """Escucha el canal indefinidamente, reconectando si la conexión se pierde."""
+    delay = RECONNECT_MIN
+    while True:
+        try:
+            await _listen_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _stats["last_error"] = str(e)
+            if _stats["connected"]:
+                delay = RECONNECT_MIN
+            logger.warning("Escucha de cambios de catálogo interrumpida (%s); reintento en %.0f s", e, delay)
+        finally:
+            _stats["connected"] = False
+        _stats["reconnects"] += 1
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, RECONNECT_MAX)
+
+
+def start() -> None:
+    """Lanza la tarea de escucha en el event loop actual (idempotente)."""
+    global _task
+    if os.getenv("CACHE_LISTEN", "1") == "0" or catalog_cache.TTL <= 0:
+        return
+    if _task is None or _task.done():
+        _stats["enabled"] = True
+        _task = asyncio.get_running_loop().create_task(run(), name="catalog-change-listener")
+
+
+async def stop() -> None:
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def stats() -> dict:
+    return dict(_stats)
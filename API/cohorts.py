@@ -0,0 +1,419 @@
+"""Analítica de cohortes, retención y abandono para el panel de administración.
+
+``/admin/estadisticas`` da recuentos; este módulo calcula los informes que
+necesitan todo el historial de actividad de todos los clientes:
+
+- ``retencion``: cohortes por mes de ``fecha_inscripcion`` y, para cada mes
+  desde la inscripción, qué parte de la cohorte tuvo actividad.
+- ``activos_semanales``: clientes con actividad en cada semana (lunes a
+  domingo) frente a los inscritos hasta entonces.
+- ``riesgo_abandono``: para los clientes activos, días desde su última
+  actividad comparados con su separación habitual entre días de actividad.
+- ``embudo_planes``: desde cada plan inicial, cuántos clientes llegaron a
+  cada plan superior, según ``historial_planes`` (migración 0009).
+
+Actividad es un entrenamiento realizado o una reserva completada (en la
+fecha de la clase). Las columnas necesarias de ``clientes``,
+``entrenamientos_realizados``, ``reservas`` e ``historial_planes`` se leen
+con ``COPY ... TO STDOUT (FORMAT BINARY)`` en una sola instantánea
+(REPEATABLE READ) y se convierten directamente en arrays de NumPy:
+todas las columnas son de ancho fijo y NOT NULL, así que cada fila del COPY
+es un registro de tamaño constante y ``np.frombuffer`` las lee sin recorrerlas
+en Python. Los informes se calculan con operaciones vectorizadas
+(``bincount``, ``reduceat``, ordenaciones). La carga y el cálculo van en un
+hilo aparte, para no bloquear el event loop.
+
+El resultado se guarda en memoria del proceso hasta que cambia el día:
+``report()`` calcula como mucho una vez al día por worker (las peticiones que
+llegan durante el cálculo esperan al mismo) y ``report(force=True)``
+(``POST /admin/analitica/refrescar``) lo recalcula en el momento.
+"""
+
+import asyncio
+import io
+import logging
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+import db
+import querylog
+
+logger = logging.getLogger("gym-infosys.analytics")
+
+PLAN_HISTORY_TABLE = "historial_planes"
+
+# Días entre la época de numpy (1970-01-01) y la de las fechas del COPY binario (2000-01-01)
+PG_EPOCH_DAYS = 10957
+# 1970-01-05 fue lunes: (día - 4) // 7 numera las semanas de lunes a domingo
+MONDAY_OFFSET = 4
+
+# Riesgo de abandono: días sin actividad y veces su separación habitual
+RIESGO_MEDIO_DIAS = 14
+RIESGO_ALTO_DIAS = 30
+RIESGO_MEDIO_RATIO = 2.0
+RIESGO_ALTO_RATIO = 4.0
+# Por debajo de estos días sin actividad la separación habitual no cuenta
+RIESGO_MIN_DIAS = 7
+NIVELES = ("bajo", "medio", "alto")
+# Tramos de días sin actividad (límite superior incluido)
+TRAMOS = ((7, "0-7"), (14, "8-14"), (30, "15-30"), (60, "31-60"), (90, "61-90"))
+MAX_CLIENTES_RIESGO = 500
+
+# Consulta -> columnas (nombre, tipo numpy big-endian como llegan en el COPY binario).
+# parse_binary_copy() no admite NULL: las columnas que pueden serlo van con COALESCE.
+CLIENTES = (
+    """
+    SELECT id, id_usuario, COALESCE(fecha_inscripcion, created_at::date, CURRENT_DATE), plan_id,
+           COALESCE(estado = 'activo', false)
+    FROM clientes
+    """,
+    (("id", ">i4"), ("id_usuario", ">i4"), ("alta", ">i4"), ("plan_id", ">i4"), ("activo", "?")),
+)
+ENTRENAMIENTOS = (
+    "SELECT id_cliente, fecha_realizacion FROM entrenamientos_realizados",
+    (("id_cliente", ">i4"), ("fecha", ">i4")),
+)
+RESERVAS = (
+    """
+    SELECT r.id_cliente, cp.fecha
+    FROM reservas r
+    JOIN clases_programadas cp ON cp.id = r.id_clase_programada
+    WHERE r.estado = 'completada'
+    """,
+    (("id_cliente", ">i4"), ("fecha", ">i4")),
+)
+HISTORIAL = (
+    f"""
+    SELECT id_cliente, COALESCE(plan_anterior, 0), plan_nuevo, COALESCE(fecha::date, '-infinity')
+    FROM {PLAN_HISTORY_TABLE}
+    ORDER BY id_cliente, fecha NULLS FIRST, id
+    """,
+    (("id_cliente", ">i4"), ("plan_anterior", ">i4"), ("plan_nuevo", ">i4"), ("fecha", ">i4")),
+)
+PLANES_SQL = "SELECT id, nombre FROM planes ORDER BY orden_display, precio_mensual, id"
+
+_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+
+_lock = asyncio.Lock()
+_cache: dict = {"dia": None, "informe": None}
+_stats = {"calculos": 0, "aciertos": 0, "ultimo_calculo_segundos": None, "ultima_carga_segundos": None,
+          "filas": None, "ultimo_error": None}
+
+
+def parse_binary_copy(data, fields) -> dict[str, np.ndarray]:
+    """Columnas de un ``COPY ... (FORMAT BINARY)`` con campos de ancho fijo y sin NULL."""
+    data = memoryview(data)
+    if bytes(data[:11]) != _COPY_SIGNATURE:
+        raise ValueError("El COPY no está en formato binario")
+    extension = int.from_bytes(data[15:19], "big")
+    body = data[19 + extension:]
+    if bytes(body[-2:]) != b"\xff\xff":
+        raise ValueError("COPY binario incompleto")
+    body = body[:-2]
+
+    layout = [("campos", ">i2")]
+    for name, kind in fields:
+        layout += [(f"{name}__len", ">i4"), (name, kind)]
+    dtype = np.dtype(layout)
+    if len(body) % dtype.itemsize:
+        raise ValueError("Filas de tamaño variable en el COPY (¿columnas NULL?)")
+    rows = np.frombuffer(body, dtype)
+    columns = {}
+    for name, kind in fields:
+        kind = np.dtype(kind)
+        if not (rows[f"{name}__len"] == kind.itemsize).all():
+            raise ValueError(f"Columna {name} con NULL o de otro tipo en el COPY")
+        columns[name] = rows[name].astype(kind.newbyteorder("="))
+    return columns
+
+
+def _copy(cursor, query) -> dict[str, np.ndarray]:
+    sql, fields = query
+    t0 = time.perf_counter()
+    buffer = io.BytesIO()
+    cursor.copy_expert(f"COPY ({sql}) TO STDOUT (FORMAT BINARY)", buffer, size=1 << 20)
+    columns = parse_binary_copy(buffer.getbuffer(), fields)
+    querylog.record(sql, "-", time.perf_counter() - t0, len(columns[fields[0][0]]))
+    return columns
+
+
+def load() -> dict:
+    """Lee de una vez (misma instantánea) todo lo que necesitan los informes.
+
+    Usa una conexión psycopg2 del pool síncrono: ``copy_expert`` recibe el COPY
+    en C, mientras que el COPY de psycopg 3 entrega cada fila como un bloque
+    aparte y es varias veces más lento para un millón de filas.
+    """
+    conn = db.get_pool().getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            data = {
+                "clientes": _copy(cursor, CLIENTES),
+                "entrenamientos": _copy(cursor, ENTRENAMIENTOS),
+                "reservas": _copy(cursor, RESERVAS),
+                "historial": _copy(cursor, HISTORIAL),
+            }
+            cursor.execute(PLANES_SQL)
+            data["planes"] = cursor.fetchall()
+        conn.rollback()
+    finally:
+        conn.close()
+    return data
+
+
+def _day(value: date) -> int:
+    """Fecha -> días desde 1970-01-01, la escala de los arrays de ``compute()``."""
+    return (value - date(1970, 1, 1)).days
+
+
+def _iso(days) -> str:
+    return str(np.datetime64(int(days), "D"))
+
+
+def _months(days: np.ndarray) -> np.ndarray:
+    """Días desde 1970 -> meses desde 1970-01."""
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _first_per_group(keys: np.ndarray, *others: np.ndarray) -> np.ndarray:
+    """Máscara de las filas que abren un grupo de valores iguales consecutivos (arrays ya ordenados)."""
+    mask = np.ones(len(keys), dtype=bool)
+    if len(keys) > 1:
+        change = keys[1:] != keys[:-1]
+        for other in others:
+            change |= other[1:] != other[:-1]
+        mask[1:] = change
+    return mask
+
+
+def _pct(part, total) -> np.ndarray:
+    part = np.asarray(part, dtype=np.float64)
+    total = np.asarray(total, dtype=np.float64)
+    return np.round(np.divide(part * 100, total, out=np.zeros_like(part), where=total > 0), 1)
+
+
+def retention(cohort_month: np.ndarray, client: np.ndarray, day: np.ndarray, current_month: int) -> list[dict]:
+    """Cohortes por mes de inscripción y clientes activos en cada mes desde ella."""
+    if not len(cohort_month):
+        return []
+    # Una inscripción con fecha futura cuenta en la cohorte del mes actual
+    cohort_month = np.minimum(cohort_month, current_month)
+    first = int(cohort_month.min())
+    cohorts = current_month - first + 1
+    offset = _months(day) - cohort_month[client]
+    valid = (offset >= 0) & (offset < cohorts)
+    client, offset = client[valid], offset[valid]
+    # (cliente, día) viene ordenado, así que cada cliente recorre sus meses en orden
+    keep = _first_per_group(client, offset)
+    cells = (cohort_month[client[keep]] - first) * cohorts + offset[keep]
+    active = np.bincount(cells, minlength=cohorts * cohorts).reshape(cohorts, cohorts)
+    sizes = np.bincount(cohort_month - first, minlength=cohorts)
+
+    result = []
+    for index in np.flatnonzero(sizes):
+        months = cohorts - index  # meses observables, incluido el actual
+        result.append({
+            "mes": str(np.datetime64(int(first + index), "M")),
+            "clientes": int(sizes[index]),
+            "activos": active[index, :months].tolist(),
+            "retencion": _pct(active[index, :months], sizes[index]).tolist(),
+        })
+    return result
+
+
+def weekly_active(signup: np.ndarray, client: np.ndarray, day: np.ndarray, today: int) -> list[dict]:
+    """Clientes con actividad en cada semana frente a los inscritos al acabar la semana."""
+    if not len(day):
+        return []
+    week = (day - MONDAY_OFFSET) // 7
+    keep = _first_per_group(client, week)
+    first, last = int(week.min()), (today - MONDAY_OFFSET) // 7
+    active = np.bincount(week[keep] - first, minlength=last - first + 1)
+    mondays = np.arange(first, last + 1) * 7 + MONDAY_OFFSET
+    members = np.searchsorted(np.sort(signup), mondays + 6, side="right")
+    pct = _pct(active, members)
+    return [
+        {"semana": _iso(monday), "activos": int(a), "inscritos": int(m), "porcentaje": float(p)}
+        for monday, a, m, p in zip(mondays, active, members, pct)
+    ]
+
+
+def churn_risk(clientes: dict, client: np.ndarray, day: np.ndarray, today: int, limit: int) -> dict:
+    """Nivel de riesgo de abandono de los clientes en estado activo."""
+    n = len(clientes["id"])
+    last = np.full(n, -1, dtype=np.int64)
+    first = np.full(n, -1, dtype=np.int64)
+    days = np.zeros(n, dtype=np.int64)
+    if len(client):
+        starts = np.flatnonzero(_first_per_group(client))
+        ends = np.append(starts[1:], len(client)) - 1
+        owners = client[starts]
+        first[owners] = day[starts]
+        last[owners] = day[ends]
+        days[owners] = ends - starts + 1
+
+    never = days == 0
+    idle = np.where(never, today - clientes["alta"], today - last)
+    # Separación media entre días con actividad; sin ella (0 o 1 días) no se compara
+    gap = np.divide(last - first, days - 1, out=np.zeros(n), where=days > 1)
+    ratio = np.divide(idle, np.maximum(gap, 1.0), out=np.zeros(n), where=days > 1)
+    compare = (days > 1) & (idle > RIESGO_MIN_DIAS)
+    level = np.zeros(n, dtype=np.int8)
+    level[(idle > RIESGO_MEDIO_DIAS) | (compare & (ratio >= RIESGO_MEDIO_RATIO))] = 1
+    level[(idle > RIESGO_ALTO_DIAS) | (compare & (ratio >= RIESGO_ALTO_RATIO))] = 2
+    # Sin ninguna actividad: riesgo según el tiempo desde la inscripción
+    level[never] = np.where(idle[never] > RIESGO_MEDIO_DIAS, 2, np.where(idle[never] > RIESGO_MIN_DIAS, 1, 0))
+
+    activos = np.flatnonzero(clientes["activo"])
+    counts = np.bincount(level[activos], minlength=len(NIVELES))
+    bounds = np.array([limit for limit, _ in TRAMOS])
+    tramo = np.searchsorted(bounds, idle[activos], side="left")
+    tramo_counts = np.bincount(tramo[~never[activos]], minlength=len(TRAMOS) + 1)
+    tramos = {label: int(c) for (_, label), c in zip(TRAMOS, tramo_counts)}
+    tramos[f"{TRAMOS[-1][0] + 1}+"] = int(tramo_counts[len(TRAMOS)])
+    tramos["sin_actividad"] = int(never[activos].sum())
+
+    # Más riesgo primero; a igual nivel, más días sin actividad
+    order = activos[np.lexsort((-idle[activos], -level[activos]))][:limit]
+    return {
+        "clientes_activos": int(len(activos)),
+        "niveles": {name: int(c) for name, c in zip(NIVELES, counts)},
+        "dias_sin_actividad": tramos,
+        "clientes": [
+            {
+                "id_cliente": int(clientes["id"][i]),
+                "id_usuario": int(clientes["id_usuario"][i]),
+                "plan_id": int(clientes["plan_id"][i]),
+                "nivel": NIVELES[level[i]],
+                "dias_sin_actividad": int(idle[i]),
+                "ultima_actividad": _iso(last[i]) if not never[i] else None,
+                "dias_activos": int(days[i]),
+                "separacion_media_dias": round(float(gap[i]), 1) if days[i] > 1 else None,
+            }
+            for i in order
+        ],
+    }
+
+
+def plan_funnel(clientes: dict, historial: dict, index: np.ndarray, planes: list, today: int) -> dict:
+    """Desde cada plan inicial, clientes que llegaron a cada plan (de los del mismo nivel o superiores)."""
+    tiers = len(planes)
+    rank = np.full(max([plan_id for plan_id, _ in planes] + [int(clientes["plan_id"].max(initial=0))]) + 1, -1)
+    for position, (plan_id, _) in enumerate(planes):
+        rank[plan_id] = position
+
+    # Sin historial, un cliente empieza y se queda en su plan actual
+    start = rank[clientes["plan_id"]]
+    best = start.copy()
+    owner = index[historial["id_cliente"]] if len(historial["id_cliente"]) else historial["id_cliente"]
+    known = owner >= 0
+    owner, nuevo = owner[known], rank[historial["plan_nuevo"][known]]
+    if len(owner):
+        starts = np.flatnonzero(_first_per_group(owner))
+        start[owner[starts]] = nuevo[starts]
+        best[owner[starts]] = np.maximum(np.maximum.reduceat(nuevo, starts), rank[clientes["plan_id"][owner[starts]]])
+
+    valid = (start >= 0) & (best >= 0)
+    matrix = np.bincount(start[valid] * tiers + best[valid], minlength=tiers * tiers).reshape(tiers, tiers)
+    # Llegaron al menos al plan t: los que acabaron en t o por encima
+    reached = np.cumsum(matrix[:, ::-1], axis=1)[:, ::-1]
+    embudo = []
+    for s, (_, nombre) in enumerate(planes):
+        total = int(matrix[s].sum())
+        embudo.append({
+            "plan_inicial": nombre,
+            "clientes": total,
+            "etapas": [
+                {"plan": planes[t][1], "clientes": int(reached[s, t]), "porcentaje": float(_pct(reached[s, t], total))}
+                for t in range(s, tiers)
+            ],
+        })
+
+    anterior = rank[historial["plan_anterior"]]
+    nuevo = rank[historial["plan_nuevo"]]
+    cambio = anterior >= 0
+    recientes = historial["fecha"] > today - 90
+    return {
+        "planes": [nombre for _, nombre in planes],
+        "embudo": embudo,
+        "cambios": {
+            "mejoras": int((cambio & (nuevo > anterior)).sum()),
+            "bajadas": int((cambio & (nuevo < anterior)).sum()),
+            "mejoras_90_dias": int((cambio & recientes & (nuevo > anterior)).sum()),
+            "bajadas_90_dias": int((cambio & recientes & (nuevo < anterior)).sum()),
+        },
+    }
+
+
+def compute(data: dict, today: date) -> dict:
+    """Todos los informes a partir de los arrays de ``load()``."""
+    clientes = {k: v.astype(np.int64) if v.dtype != bool else v for k, v in data["clientes"].items()}
+    clientes["alta"] += PG_EPOCH_DAYS
+    historial = {k: v.astype(np.int64) for k, v in data["historial"].items()}
+    historial["fecha"] += PG_EPOCH_DAYS
+    hoy = _day(today)
+
+    # id de cliente -> posición en los arrays de clientes
+    ids = clientes["id"]
+    max_id = int(max(ids.max(initial=0), data["entrenamientos"]["id_cliente"].max(initial=0),
+                     data["reservas"]["id_cliente"].max(initial=0), historial["id_cliente"].max(initial=0)))
+    index = np.full(max_id + 1, -1, dtype=np.int64)
+    index[ids] = np.arange(len(ids))
+
+    # Días distintos con actividad por cliente, ordenados por (cliente, día); sin fechas futuras
+    client = index[np.concatenate([data["entrenamientos"]["id_cliente"], data["reservas"]["id_cliente"]])]
+    day = np.concatenate([data["entrenamientos"]["fecha"], data["reservas"]["fecha"]]).astype(np.int64) + PG_EPOCH_DAYS
+    valid = (client >= 0) & (day <= hoy)
+    client, day = client[valid], day[valid]
+    if len(day):
+        base = int(day.min())
+        keys = np.unique(client * (hoy - base + 1) + (day - base))
+        client, day = keys // (hoy - base + 1), keys % (hoy - base + 1) + base
+
+    return {
+        "fecha": today.isoformat(),
+        "retencion": retention(_months(clientes["alta"]), client, day, int(_months(np.array([hoy]))[0])),
+        "activos_semanales": weekly_active(clientes["alta"], client, day, hoy),
+        "riesgo_abandono": churn_risk(clientes, client, day, hoy, MAX_CLIENTES_RIESGO),
+        "embudo_planes": plan_funnel(clientes, historial, index, data["planes"], hoy),
+    }
+
+
+async def report(force: bool = False) -> dict:
+    """Informes del día (calculados una vez por día y proceso; ``force`` los recalcula)."""
+    hoy = date.today()
+    if not force and _cache["dia"] == hoy:
+        _stats["aciertos"] += 1
+        return _cache["informe"]
+    async with _lock:
+        # Quien esperaba al cálculo en curso se queda con su resultado
+        if not force and _cache["dia"] == hoy:
+            _stats["aciertos"] += 1
+            return _cache["informe"]
+        try:
+            t0 = time.perf_counter()
+            data = await asyncio.to_thread(load)
+            t1 = time.perf_counter()
+            informe = await asyncio.to_thread(compute, data, hoy)
+            t2 = time.perf_counter()
+        except Exception as e:
+            _stats["ultimo_error"] = str(e)
+            raise
+        informe["calculado_en"] = datetime.now().isoformat(timespec="seconds")
+        _cache.update(dia=hoy, informe=informe)
+        _stats.update(
+            calculos=_stats["calculos"] + 1,
+            ultima_carga_segundos=round(t1 - t0, 3),
+            ultimo_calculo_segundos=round(t2 - t1, 3),
+            filas={name: len(next(iter(v.values()))) for name, v in data.items() if isinstance(v, dict)},
+            ultimo_error=None,
+        )
+        logger.info("Analítica de administración: carga %.2f s, cálculo %.2f s", t1 - t0, t2 - t1)
+        return informe
+
+
+def stats() -> dict:
+    return dict(_stats, dia=_cache["dia"].isoformat() if _cache["dia"] else None)
@@ -0,0 +1,109 @@
+"""GET condicional (``ETag`` / ``Last-Modified``) para listados y detalles.
+
+Un endpoint calcula un validador barato de lo que devolvería (un hash del
+contenido ya cacheado, o un agregado indexado como ``max(updated_at)`` y el
+número de filas) y, si coincide con lo que envía el cliente, responde 304 sin
+ejecutar la consulta principal ni construir o serializar la respuesta::
+
+    etag = conditional.make_etag(total, ultima_modificacion)
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag, cache_control=conditional.REVALIDATE)
+    ...
+    conditional.set_validators(response, etag, cache_control=conditional.REVALIDATE)
+
+Los ETag son débiles (``W/"..."``): identifican el contenido JSON, no los bytes
+exactos. ``If-None-Match`` tiene prioridad sobre ``If-Modified-Since``, que
+solo se usa si el endpoint pasa ``last_modified`` (en detalles de una fila, donde
+``updated_at`` es exacto; en listados un borrado no cambia ``max(updated_at)``).
+
+- ``REVALIDATE`` (``no-cache``): se puede guardar pero hay que revalidar
+  siempre; para datos que cambian a menudo (clases programadas, aforo).
+- ``public_cache()`` (``public, max-age=N``): catálogos públicos; navegador y
+  proxies pueden servirlos ``CATALOG_HTTP_MAX_AGE`` segundos (60 por defecto)
+  sin preguntar y después revalidan con el ETag.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+REVALIDATE = "no-cache"
+
+
+def _env_max_age() -> int:
+    try:
+        return max(0, int(os.getenv("CATALOG_HTTP_MAX_AGE", 60)))
+    except (TypeError, ValueError):
+        return 60
+
+
+CATALOG_MAX_AGE = _env_max_age()
+
+
+def public_cache(max_age: int | None = None) -> str:
+    return f"public, max-age={CATALOG_MAX_AGE if max_age is None else max_age}"
+
+
+def make_etag(*parts) -> str:
+    """ETag débil a partir de valores simples (contadores, fechas, ids...)."""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def content_etag(value) -> str:
+    """ETag débil del contenido JSON de una respuesta ya construida."""
+    data = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return make_etag(data)
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    """True si la copia del cliente sigue vigente (comparación débil de ETag)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = _opaque(etag)
+        return any(_opaque(tag) == current for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return _to_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def _to_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _headers(etag: str, last_modified: datetime | None, cache_control: str) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_to_utc(last_modified), usegmt=True)
+    return headers
+
+
+def set_validators(response: Response, etag: str, last_modified: datetime | None = None,
+                   cache_control: str = REVALIDATE) -> None:
+    """Añade ETag, Last-Modified y Cache-Control a la respuesta 200."""
+    response.headers.update(_headers(etag, last_modified, cache_control))
+
+
+def not_modified(etag: str, last_modified: datetime | None = None, cache_control: str = REVALIDATE) -> Response:
+    """Respuesta 304 sin cuerpo con los mismos validadores."""
+    return Response(status_code=304, headers=_headers(etag, last_modified, cache_control))
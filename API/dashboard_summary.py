@@ -0,0 +1,170 @@
+"""Refresco del resumen precalculado del panel de administración.
+
+``GET /admin/estadisticas`` lee una sola fila de la vista materializada
+``resumen_panel_admin`` (migración 0005) en lugar de ejecutar en cada visita
+los recuentos y agregados sobre usuarios, clientes, reservas y entrenamientos.
+Este módulo la mantiene al día con ``REFRESH MATERIALIZED VIEW CONCURRENTLY``,
+que recalcula el resumen sin bloquear a quien lo está leyendo:
+
+- Cada worker lanza una tarea que cada ``ADMIN_SUMMARY_REFRESH`` segundos (60
+  por defecto; 0 la desactiva) refresca el resumen si ha caducado. Un advisory
+  lock de transacción evita que varios workers (o instancias) lo recalculen a
+  la vez, y la comprobación de ``actualizado_en`` hace que solo lo recalcule
+  el primero que lo encuentra caducado.
+- ``POST /admin/estadisticas/refrescar`` lo recalcula en el momento (p. ej.
+  tras una carga masiva o un cambio que el panel deba mostrar ya).
+- Si la vista no tiene datos (``WITH NO DATA`` tras una restauración), el
+  primer refresco la rellena sin ``CONCURRENTLY``; hasta entonces el endpoint
+  responde 503.
+- Desde API/ (cron, scripts de carga)::
+
+      python dashboard_summary.py
+
+La respuesta del endpoint incluye ``actualizado_en`` para que el panel muestre
+la antigüedad de los datos.
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+import db
+import db_async
+
+logger = logging.getLogger("gym-infosys.dashboard")
+
+VIEW = "resumen_panel_admin"
+REFRESH_SQL = f"REFRESH MATERIALIZED VIEW CONCURRENTLY {VIEW}"
+# CONCURRENTLY no admite una vista sin datos (creada o restaurada WITH NO DATA)
+POPULATE_SQL = f"REFRESH MATERIALIZED VIEW {VIEW}"
+POPULATED_SQL = "SELECT ispopulated FROM pg_matviews WHERE schemaname = current_schema() AND matviewname = %s"
+# Clave del advisory lock que serializa los refrescos
+LOCK_SQL = f"SELECT pg_try_advisory_xact_lock(hashtext('{VIEW}'))"
+WAIT_LOCK_SQL = f"SELECT pg_advisory_xact_lock(hashtext('{VIEW}'))"
+FRESH_SQL = f"SELECT now() - actualizado_en < make_interval(secs => %s) FROM {VIEW}"
+
+INTERVAL = max(0.0, db._env_float("ADMIN_SUMMARY_REFRESH", 60.0))
+
+_task: asyncio.Task | None = None
+_stats = {"enabled": False, "refreshes": 0, "skipped": 0, "last_refresh_seconds": None, "last_error": None}
+
+
+def _record(seconds: float) -> None:
+    _stats["refreshes"] += 1
+    _stats["last_refresh_seconds"] = round(seconds, 3)
+    logger.info("Resumen del panel de administración refrescado en %.2f s", seconds)
+
+
+async def refresh(conn, force: bool = False) -> bool:
+    """Refresca el resumen en la transacción de ``conn`` (conexión de ``db_async``).
+
+    Sin ``force`` no hace nada si otro proceso lo está refrescando o si aún no
+    ha caducado. Con ``force`` espera al refresco en curso y lo repite.
+    Devuelve si se ha refrescado.
+    """
+    cursor = conn.cursor()
+    try:
+        if force:
+            await cursor.execute(WAIT_LOCK_SQL)
+        else:
+            await cursor.execute(LOCK_SQL)
+            if not (await cursor.fetchone())[0]:
+                await conn.rollback()
+                return False
+        await cursor.execute(POPULATED_SQL, (VIEW,))
+        populated = (await cursor.fetchone())[0]
+        if not force and populated:
+            await cursor.execute(FRESH_SQL, (INTERVAL,))
+            row = await cursor.fetchone()
+            if row is not None and row[0]:
+                await conn.rollback()
+                return False
+        t0 = time.perf_counter()
+        await cursor.execute(REFRESH_SQL if populated else POPULATE_SQL)
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+    _record(time.perf_counter() - t0)
+    return True
+
+
+def refresh_sync(conn) -> None:
+    """Refresca el resumen sobre una conexión psycopg2 (scripts y ``main``)."""
+    t0 = time.perf_counter()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(WAIT_LOCK_SQL)
+            cursor.execute(POPULATED_SQL, (VIEW,))
+            cursor.execute(REFRESH_SQL if cursor.fetchone()[0] else POPULATE_SQL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _record(time.perf_counter() - t0)
+
+
+async def run() -> None:
+    """Comprueba el resumen periódicamente y lo refresca si ha caducado."""
+    while True:
+        conn = None
+        try:
+            conn = await db_async.getconn()
+            if not await refresh(conn):
+                _stats["skipped"] += 1
+            _stats["last_error"] = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _stats["last_error"] = str(e)
+            logger.warning("No se pudo refrescar el resumen del panel de administración: %s", e)
+        finally:
+            if conn is not None:
+                await conn.close()
+        # Desfase aleatorio para que los workers no comprueben todos a la vez
+        await asyncio.sleep(INTERVAL * random.uniform(0.5, 1.0))
+
+
+def start() -> None:
+    """Lanza la tarea de refresco en el event loop actual (idempotente)."""
+    global _task
+    if INTERVAL <= 0:
+        return
+    if _task is None or _task.done():
+        _stats["enabled"] = True
+        _task = asyncio.get_running_loop().create_task(run(), name="dashboard-summary-refresh")
+
+
+async def stop() -> None:
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def stats() -> dict:
+    return dict(_stats, interval_seconds=INTERVAL)
+
+
+def main() -> int:
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env.local")
+    conn = db.connect()
+    try:
+        refresh_sync(conn)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,531 @@
+"""Pool de conexiones PostgreSQL compartido por los endpoints de la API.
+
+Sustituye al ``psycopg2.connect`` por petición que hacía ``get_db_connection()``.
+Los endpoints siguen llamando a ``get_db_connection()`` y a ``conn.close()``;
+la diferencia es que ``close()`` devuelve la conexión al pool en lugar de
+cerrar el socket.
+
+Configuración (variables de entorno):
+
+- ``DB_POOL_MIN`` / ``DB_POOL_MAX``: conexiones abiertas al arrancar y máximo
+  simultáneo por proceso (por defecto 1 y 10).
+- ``DB_POOL_TIMEOUT``: segundos que una petición espera por una conexión libre
+  antes de fallar con ``PoolTimeout`` (por defecto 10).
+- ``DB_POOL_CHECK_IDLE``: si una conexión lleva más de estos segundos ociosa se
+  comprueba con ``SELECT 1`` antes de entregarla (por defecto 30; 0 = siempre).
+- ``DB_POOL_LEAK_SECONDS``: tiempo a partir del cual una conexión prestada se
+  considera fugada y se registra un aviso (por defecto 30; 0 = desactivado).
+- ``DB_POOL_MODE``: ``session`` (por defecto) o ``transaction``. En modo
+  ``transaction`` la API asume que hay un PgBouncer con ``pool_mode=transaction``
+  delante de Postgres: no se usa estado de sesión (``SET``, sentencias
+  preparadas, locks de sesión, ``LISTEN``) y cada conexión se devuelve limpia
+  tras cada transacción.
+
+Todas las conexiones (del pool y de ``connect()``) usan ``TimingCursor``, que
+registra cada sentencia en ``querylog.py`` (log de consultas lentas, detección
+de N+1 y consultas por petición para las métricas de ``metrics.py``).
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+import traceback
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from fastapi import Request
+
+import querylog
+
+logger = logging.getLogger("gym-infosys.db")
+
+POOL_MODES = ("session", "transaction")
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    """No quedó ninguna conexión libre dentro de ``DB_POOL_TIMEOUT``."""
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Valor no numérico en %s=%r; usando %s", name, value, default)
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning("Valor no numérico en %s=%r; usando %s", name, value, default)
+        return default
+
+
+def connect_kwargs() -> dict:
+    """Parámetros de conexión a partir del entorno.
+
+    Prefiere ``DATABASE_URL`` (forma estándar en contenedores) y si no existe
+    exige las variables ``DB_HOST``, ``DB_PORT``, ``DB_NAME``, ``DB_USER`` y
+    ``DB_PASS``.
+    """
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        return {"dsn": database_url}
+
+    params = {}
+    for env_name, key in (
+        ("DB_HOST", "host"),
+        ("DB_PORT", "port"),
+        ("DB_NAME", "database"),
+        ("DB_USER", "user"),
+        ("DB_PASS", "password"),
+    ):
+        value = os.getenv(env_name)
+        if not value:
+            raise RuntimeError(f"Debe establecer la variable de entorno {env_name}")
+        params[key] = value
+    return params
+
+
+def describe_target(params: dict) -> str:
+    """Descripción de la conexión apta para logs (sin contraseña)."""
+    if "dsn" in params:
+        return "DATABASE_URL"
+    return f"{params['host']}:{params['port']} db={params['database']} user={params['user']}"
+
+
+class TimingCursor(psycopg2.extensions.cursor):
+    """Cursor psycopg2 que anota cada sentencia en ``querylog`` (SQL, parámetros, tiempo y filas)."""
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            querylog.record(
+                querylog.query_text(query, self), querylog.param_shape(vars),
+                time.perf_counter() - t0, self.rowcount,
+            )
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            querylog.record(
+                querylog.query_text(query, self), querylog.many_shape(vars_list),
+                time.perf_counter() - t0, self.rowcount,
+            )
+
+
+def connect(**overrides):
+    """Abre una conexión psycopg2 nueva fuera del pool.
+
+    Se usa para tareas que necesitan una conexión dedicada (scripts, listeners)
+    y como fábrica del propio pool.
+    """
+    params = connect_kwargs()
+    params.setdefault("cursor_factory", TimingCursor)
+    params.update(overrides)
+    try:
+        return psycopg2.connect(**params)
+    except Exception as e:
+        logger.error("[ERROR] Failed to connect to Postgres (%s): %s", describe_target(params), e)
+        raise
+
+
+# Conexiones prestadas durante la petición HTTP en curso. Lo rellena
+# ``request_scope`` y lo consulta ``ConnectionPool.getconn``.
+_request_conns: contextvars.ContextVar = contextvars.ContextVar("db_request_conns", default=None)
+_request_label: contextvars.ContextVar = contextvars.ContextVar("db_request_label", default=None)
+
+
+def current_request_label():
+    """``"MÉTODO /ruta"`` de la petición en curso, o ``None`` fuera de una petición."""
+    return _request_label.get()
+
+
+def track_connection(pooled):
+    """Anota una conexión prestada en la petición en curso para poder reclamarla."""
+    scope = _request_conns.get()
+    if scope is not None:
+        scope.append(pooled)
+
+
+class PooledConnection:
+    """Envoltorio de una conexión psycopg2 prestada por el pool.
+
+    Delega todo en la conexión real salvo ``close()``, que la devuelve al pool.
+    ``close()`` es idempotente y, tras llamarlo, cualquier uso posterior falla
+    igual que con una conexión cerrada de psycopg2 en lugar de operar sobre una
+    conexión que ya pertenece a otra petición.
+    """
+
+    __slots__ = ("_pool", "_conn", "_cursors", "checked_out_at", "owner", "stack", "leak_reported")
+
+    def __init__(self, pool, conn, owner=None, stack=None):
+        self._pool = pool
+        self._conn = conn
+        self._cursors = []
+        self.checked_out_at = time.monotonic()
+        self.owner = owner
+        self.stack = stack
+        self.leak_reported = False
+
+    @property
+    def raw(self):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return self._conn
+
+    @property
+    def released(self) -> bool:
+        return self._conn is None
+
+    def cursor(self, *args, **kwargs):
+        cur = self.raw.cursor(*args, **kwargs)
+        self._cursors.append(cur)
+        return cur
+
+    def close(self):
+        if self._conn is None:
+            return
+        for cur in self._cursors:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self._cursors = []
+        conn, self._conn = self._conn, None
+        self._pool._putconn(self, conn)
+
+    def reclaim(self):
+        """Devuelve al pool la conexión si el endpoint olvidó cerrarla."""
+        self._pool.reclaim(self)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Pool de conexiones psycopg2 con espera acotada, health check y estadísticas.
+
+    A diferencia de ``psycopg2.pool.ThreadedConnectionPool``, cuando el pool está
+    agotado la petición espera hasta ``timeout`` segundos en lugar de fallar de
+    inmediato, que es lo que permite dimensionarlo con las estadísticas de espera.
+    """
+
+    def __init__(
+        self,
+        minconn: int = 1,
+        maxconn: int = 10,
+        timeout: float = 10.0,
+        check_idle: float = 30.0,
+        leak_seconds: float = 30.0,
+        mode: str = "session",
+        connect_params: dict | None = None,
+    ):
+        if mode not in POOL_MODES:
+            raise ValueError(f"DB_POOL_MODE debe ser uno de {POOL_MODES}, no {mode!r}")
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.leak_seconds = leak_seconds
+        self.mode = mode
+        self._connect_params = connect_params
+        self._cond = threading.Condition()
+        self._idle: list[tuple] = []  # (conexión, instante en que quedó libre)
+        self._in_use: set[PooledConnection] = set()
+        self._opening = 0
+        self._closed = False
+        self._stats = {
+            "connections_opened": 0,
+            "connections_discarded": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "leaks_detected": 0,
+        }
+
+    @classmethod
+    def from_env(cls, **overrides):
+        kwargs = dict(
+            minconn=_env_int("DB_POOL_MIN", 1),
+            maxconn=_env_int("DB_POOL_MAX", 10),
+            timeout=_env_float("DB_POOL_TIMEOUT", 10.0),
+            check_idle=_env_float("DB_POOL_CHECK_IDLE", 30.0),
+            leak_seconds=_env_float("DB_POOL_LEAK_SECONDS", 30.0),
+            mode=(os.getenv("DB_POOL_MODE") or "session").strip().lower(),
+        )
+        kwargs.update(overrides)
+        return cls(**kwargs)
+
+    @property
+    def transaction_mode(self) -> bool:
+        return self.mode == "transaction"
+
+    def _open(self):
+        params = dict(self._connect_params) if self._connect_params else connect_kwargs()
+        params.setdefault("cursor_factory", TimingCursor)
+        logger.debug("[DEBUG] Opening pooled Postgres connection (%s)", describe_target(params))
+        try:
+            conn = psycopg2.connect(**params)
+        except Exception as e:
+            logger.error("[ERROR] Failed to connect to Postgres (%s): %s", describe_target(params), e)
+            raise
+        with self._cond:
+            self._stats["connections_opened"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._stats["connections_discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        status = conn.get_transaction_status()
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if self.check_idle and time.monotonic() - idle_since < self.check_idle:
+            return True
+        try:
+            # El ping no es trabajo de la petición que pide la conexión
+            with querylog.suspended(), conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning("Conexión del pool descartada tras fallar el health check: %s", e)
+            return False
+
+    def open(self):
+        """Abre ``minconn`` conexiones. Un fallo se registra pero no aborta el arranque."""
+        for _ in range(self.minconn - len(self._idle)):
+            try:
+                conn = self._open()
+            except Exception:
+                return
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+
+    def getconn(self) -> PooledConnection:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        self.report_leaks()
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                candidate = None
+                must_open = False
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif len(self._in_use) + self._opening < self.maxconn:
+                    self._opening += 1
+                    must_open = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Sin conexiones libres tras {self.timeout:.1f}s "
+                            f"({len(self._in_use)}/{self.maxconn} en uso)"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if candidate is not None:
+                conn, idle_since = candidate
+                if not self._healthy(conn, idle_since):
+                    with self._cond:
+                        self._stats["health_check_failures"] += 1
+                    self._discard(conn)
+                    continue
+            else:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+
+            return self._lend(conn, started, waited, opened=must_open)
+
+    def _lend(self, conn, started: float, waited: bool, opened: bool) -> PooledConnection:
+        owner = current_request_label()
+        stack = None
+        if self.leak_seconds:
+            # Solo se extraen los marcos; se formatean si llega a reportarse la fuga.
+            stack = traceback.extract_stack(limit=5)[:-2]
+        pooled = PooledConnection(self, conn, owner=owner, stack=stack)
+        elapsed = time.monotonic() - started
+        with self._cond:
+            if opened:
+                self._opening -= 1
+            self._in_use.add(pooled)
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += elapsed
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], elapsed)
+        track_connection(pooled)
+        return pooled
+
+    def _putconn(self, pooled: PooledConnection, conn):
+        keep = not conn.closed
+        if keep:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                keep = False
+        with self._cond:
+            self._in_use.discard(pooled)
+            if keep and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+            self._cond.notify()
+        self._discard(conn)
+
+    def report_leaks(self):
+        """Registra (una sola vez por conexión) las que superan ``leak_seconds`` prestadas."""
+        if not self.leak_seconds:
+            return
+        now = time.monotonic()
+        with self._cond:
+            leaked = [
+                p for p in self._in_use
+                if not p.leak_reported and now - p.checked_out_at > self.leak_seconds
+            ]
+            for p in leaked:
+                p.leak_reported = True
+            self._stats["leaks_detected"] += len(leaked)
+        for p in leaked:
+            logger.warning(
+                "Posible fuga de conexión: prestada hace %.1fs a %s\n%s",
+                now - p.checked_out_at, p.owner or "(fuera de petición)",
+                "".join(traceback.format_list(p.stack)) if p.stack else "",
+            )
+
+    def reclaim(self, pooled: PooledConnection):
+        """Devuelve al pool una conexión que su dueño olvidó cerrar."""
+        if pooled.released:
+            return
+        logger.warning(
+            "Conexión no devuelta al terminar %s; devolviéndola al pool",
+            pooled.owner or "la petición",
+        )
+        with self._cond:
+            self._stats["leaks_detected"] += 1
+        pooled.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            data = dict(self._stats)
+            data.update(
+                mode=self.mode,
+                min=self.minconn,
+                max=self.maxconn,
+                size=len(self._in_use) + len(self._idle),
+                checked_out=len(self._in_use),
+                idle=len(self._idle),
+                timeout=self.timeout,
+            )
+        data["wait_time_avg"] = data["wait_time_total"] / data["waits"] if data["waits"] else 0.0
+        return data
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(**overrides) -> ConnectionPool:
+    """Crea el pool del proceso (idempotente) y abre las conexiones mínimas."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool.from_env(**overrides)
+            logger.info(
+                "Pool de BD: min=%s max=%s timeout=%ss modo=%s",
+                _pool.minconn, _pool.maxconn, _pool.timeout, _pool.mode,
+            )
+        pool = _pool
+    pool.open()
+    return pool
+
+
+def get_pool() -> ConnectionPool:
+    return _pool if _pool is not None else init_pool()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.closeall()
+
+
+async def request_scope(request: Request):
+    """Dependencia FastAPI que acota las conexiones a la petición.
+
+    Se registra como dependencia global de la app. Todas las conexiones que se
+    pidan durante la petición (al pool síncrono o al asíncrono de
+    ``db_async``) quedan anotadas y, al terminar, las que el endpoint no haya
+    devuelto (p. ej. porque una excepción saltó antes de ``conn.close()``) se
+    devuelven a su pool y se registran como fuga.
+    """
+    conns: list[PooledConnection] = []
+    _request_conns.set(conns)
+    _request_label.set(f"{request.method} {request.url.path}")
+    try:
+        yield
+    finally:
+        for pooled in conns:
+            pending = pooled.reclaim()
+            if pending is not None:
+                await pending
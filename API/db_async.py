@@ -0,0 +1,213 @@
+"""Acceso asíncrono a PostgreSQL para los endpoints ``async def``.
+
+Los endpoints declarados con ``async def`` se ejecutan en el event loop de
+uvicorn, así que una consulta psycopg2 (bloqueante) dentro de ellos congela el
+resto de peticiones del worker hasta que termina. Este módulo ofrece el
+equivalente asíncrono de ``get_db_connection()`` sobre psycopg 3 y su pool
+``AsyncConnectionPool``::
+
+    conn = await db_async.getconn()
+    cursor = conn.cursor()
+    await cursor.execute("SELECT nombre FROM planes WHERE id = %s", (plan_id,))
+    row = await cursor.fetchone()
+    await conn.close()  # devuelve la conexión al pool
+
+psycopg 3 usa los mismos marcadores ``%s`` y devuelve los mismos tipos Python
+que psycopg2 (``Decimal``, ``date``, JSON ya decodificado...), así que el SQL y
+el formateo de respuestas de los endpoints no cambian.
+
+Configuración: ``DB_ASYNC_POOL_MIN`` / ``DB_ASYNC_POOL_MAX`` (por defecto 1 y
+10) y, compartidas con el pool síncrono de ``db.py``, ``DB_POOL_TIMEOUT``,
+``DB_POOL_CHECK_IDLE`` y ``DB_POOL_MODE``. En modo ``transaction`` se
+desactivan las sentencias preparadas, que PgBouncer no admite en ese modo.
+"""
+
+import logging
+import os
+import time
+import weakref
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool
+
+import db
+import querylog
+
+logger = logging.getLogger("gym-infosys.db")
+
+_pool: AsyncConnectionPool | None = None
+_mode = "session"
+_check_idle = 30.0
+# Instante en que cada conexión volvió al pool, para decidir si hay que
+# comprobarla antes de volver a prestarla (mismo criterio que db.py). Con
+# claves débiles, las conexiones que el pool cierra (max_lifetime, max_idle,
+# check fallido) desaparecen solas, y una conexión nueva no puede heredar la
+# marca de otra que ocupara antes su mismo id().
+_returned_at: "weakref.WeakKeyDictionary[psycopg.AsyncConnection, float]" = weakref.WeakKeyDictionary()
+_leaks = 0
+
+
+def _conninfo() -> str:
+    params = db.connect_kwargs()
+    if "dsn" in params:
+        return params["dsn"]
+    params["dbname"] = params.pop("database")
+    return make_conninfo(**params)
+
+
+async def _check(conn: psycopg.AsyncConnection) -> None:
+    # La marca solo vale para el préstamo siguiente a la devolución
+    returned = _returned_at.pop(conn, None)
+    if _check_idle and returned is not None and time.monotonic() - returned < _check_idle:
+        return
+    # El ping no es trabajo de la petición que pide la conexión
+    with querylog.suspended():
+        await conn.execute("SELECT 1")
+    await conn.rollback()
+
+
+class TimingAsyncCursor(psycopg.AsyncCursor):
+    """Equivalente asíncrono de ``db.TimingCursor``."""
+
+    async def execute(self, query, params=None, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            querylog.record(
+                querylog.query_text(query, self), querylog.param_shape(params),
+                time.perf_counter() - t0, self.rowcount,
+            )
+
+    async def executemany(self, query, params_seq, **kwargs):
+        params_seq = list(params_seq)
+        t0 = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            querylog.record(
+                querylog.query_text(query, self), querylog.many_shape(params_seq),
+                time.perf_counter() - t0, self.rowcount,
+            )
+
+
+class AsyncPooledConnection:
+    """Conexión psycopg 3 prestada por el pool asíncrono.
+
+    Igual que ``db.PooledConnection``: delega en la conexión real salvo
+    ``close()``, que la devuelve al pool, es idempotente e invalida los cursores
+    abiertos para que nadie siga usando una conexión ajena.
+    """
+
+    __slots__ = ("_conn", "_cursors", "owner")
+
+    def __init__(self, conn, owner=None):
+        self._conn = conn
+        self._cursors = []
+        self.owner = owner
+
+    @property
+    def raw(self):
+        if self._conn is None:
+            raise psycopg.InterfaceError("the connection is closed")
+        return self._conn
+
+    @property
+    def released(self) -> bool:
+        return self._conn is None
+
+    def cursor(self, *args, **kwargs):
+        cur = self.raw.cursor(*args, **kwargs)
+        self._cursors.append(cur)
+        return cur
+
+    async def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        for cur in self._cursors:
+            try:
+                await cur.close()
+            except Exception:
+                pass
+        self._cursors = []
+        try:
+            if conn.info.transaction_status != TransactionStatus.IDLE:
+                await conn.rollback()
+        except Exception:
+            # El pool descarta por su cuenta las conexiones rotas al recibirlas.
+            pass
+        _returned_at[conn] = time.monotonic()
+        await _pool.putconn(conn)
+
+    async def reclaim(self):
+        """Devuelve al pool la conexión si el endpoint olvidó cerrarla."""
+        global _leaks
+        if self.released:
+            return
+        logger.warning(
+            "Conexión asíncrona no devuelta al terminar %s; devolviéndola al pool",
+            self.owner or "la petición",
+        )
+        _leaks += 1
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+async def init_pool() -> AsyncConnectionPool:
+    """Crea y abre el pool asíncrono del proceso (idempotente)."""
+    global _pool, _mode, _check_idle
+    if _pool is not None:
+        return _pool
+    _mode = (os.getenv("DB_POOL_MODE") or "session").strip().lower()
+    _check_idle = db._env_float("DB_POOL_CHECK_IDLE", 30.0)
+    min_size = db._env_int("DB_ASYNC_POOL_MIN", 1)
+    max_size = max(min_size, db._env_int("DB_ASYNC_POOL_MAX", 10), 1)
+    pool = AsyncConnectionPool(
+        _conninfo(),
+        min_size=min_size,
+        max_size=max_size,
+        timeout=db._env_float("DB_POOL_TIMEOUT", 10.0),
+        kwargs={
+            "prepare_threshold": None if _mode == "transaction" else 5,
+            "cursor_factory": TimingAsyncCursor,
+        },
+        check=_check,
+        name="gym-infosys-async",
+        open=False,
+    )
+    # No esperar a las conexiones mínimas: si la BD no está disponible al
+    # arrancar, el proceso debe levantar igualmente (como con el pool síncrono).
+    await pool.open(wait=False)
+    _pool = pool
+    logger.info("Pool asíncrono de BD: min=%s max=%s modo=%s", min_size, max_size, _mode)
+    return pool
+
+
+async def close_pool():
+    global _pool
+    pool, _pool = _pool, None
+    _returned_at.clear()
+    if pool is not None:
+        await pool.close()
+
+
+async def getconn() -> AsyncPooledConnection:
+    """Presta una conexión del pool asíncrono, anotándola en la petición en curso."""
+    pool = _pool if _pool is not None else await init_pool()
+    conn = await pool.getconn()
+    pooled = AsyncPooledConnection(conn, owner=db.current_request_label())
+    db.track_connection(pooled)
+    return pooled
+
+
+def stats() -> dict:
+    if _pool is None:
+        return {"mode": _mode, "open": False}
+    data = _pool.get_stats()
+    data.update(mode=_mode, open=True, leaks_detected=_leaks)
+    return data
@@ -0,0 +1,233 @@
+"""Exportación masiva en streaming (NDJSON o CSV) para administración.
+
+``GET /admin/export/{dataset}`` devuelve un conjunto de datos completo sin
+cargarlo en memoria: la consulta se abre como cursor con nombre en el servidor
+(``DECLARE ... CURSOR``) y se leen lotes de ``EXPORT_BATCH_SIZE`` filas (2000
+por defecto), que se codifican y se envían antes de pedir el siguiente. La
+memoria del worker depende del tamaño del lote, no del de la exportación.
+
+Conjuntos (``DATASETS``), cada uno ordenado por id y filtrable por fechas con
+``desde`` / ``hasta`` (inclusivas):
+
+- ``usuarios``: usuarios con sus datos de cliente y plan (sin contraseña ni
+  datos de tarjeta); fechas de alta del usuario.
+- ``reservas``: reservas con la clase, el cliente y el instructor; fecha de la
+  clase.
+- ``entrenamientos``: entrenamientos realizados con el ejercicio y el
+  cliente; fecha de realización.
+
+Formatos: ``ndjson`` (un objeto JSON por línea, codificado como en
+``serialization.py``) o ``csv`` (con cabecera; fechas en ISO 8601).
+
+La exportación ocupa una conexión del pool asíncrono mientras dura, así que
+cada worker admite como mucho ``EXPORT_MAX_CONCURRENT`` a la vez (2 por
+defecto); las demás reciben 503 con ``Retry-After``.
+"""
+
+import csv
+import io
+import logging
+import time
+from datetime import date
+from typing import NamedTuple
+
+import anyio
+from fastapi import HTTPException
+from psycopg.postgres import types as postgres_types
+from psycopg.rows import dict_row, tuple_row
+
+import db
+import serialization
+
+logger = logging.getLogger("gym-infosys.export")
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+BATCH_SIZE = max(1, db._env_int("EXPORT_BATCH_SIZE", 2000))
+MAX_CONCURRENT = max(1, db._env_int("EXPORT_MAX_CONCURRENT", 2))
+
+_active = 0
+
+
+class Dataset(NamedTuple):
+    sql: str
+    # Expresión de fecha a la que se aplican desde/hasta
+    fecha: str
+
+
+DATASETS = {
+    "usuarios": Dataset(
+        sql="""
+            SELECT u.id, u.name, u.email, u.role, COALESCE(u.email_verified, 0) <> 0 AS email_verified,
+                   u.created_at, c.id AS cliente_id, c.dni, c.numero_telefono, c.plan_id,
+                   p.nombre AS plan_nombre, c.fecha_nacimiento, c.genero, c.fecha_inscripcion,
+                   c.estado AS cliente_estado
+            FROM users u
+            LEFT JOIN clientes c ON c.id_usuario = u.id AND u.role = 'cliente'
+            LEFT JOIN planes p ON p.id = c.plan_id
+            WHERE {where}
+            ORDER BY u.id
+        """,
+        fecha="u.created_at::date",
+    ),
+    "reservas": Dataset(
+        sql="""
+            SELECT r.id, r.estado, r.created_at, r.id_cliente, cu.name AS cliente_nombre,
+                   cu.email AS cliente_email, cp.id AS id_clase_programada, cp.fecha, cp.hora,
+                   gc.nombre AS clase_nombre, cp.id_instructor, i.name AS instructor_nombre,
+                   cp.estado AS clase_estado
+            FROM reservas r
+            JOIN clases_programadas cp ON cp.id = r.id_clase_programada
+            JOIN gym_clases gc ON gc.id = cp.id_clase
+            JOIN users i ON i.id = cp.id_instructor
+            JOIN clientes c ON c.id = r.id_cliente
+            JOIN users cu ON cu.id = c.id_usuario
+            WHERE {where}
+            ORDER BY r.id
+        """,
+        fecha="cp.fecha",
+    ),
+    "entrenamientos": Dataset(
+        sql="""
+            SELECT er.id, er.id_cliente, cu.name AS cliente_nombre, er.fecha_realizacion,
+                   er.id_ejercicio, e.nombre AS ejercicio_nombre, e.categoria AS ejercicio_categoria,
+                   er.series_realizadas, er.repeticiones, er.peso_kg, er.tiempo_segundos,
+                   er.distancia_metros, er.valoracion, er.tipo_registro,
+                   er.id_entrenamiento_asignado, er.notas
+            FROM entrenamientos_realizados er
+            JOIN ejercicios e ON e.id = er.id_ejercicio
+            JOIN clientes c ON c.id = er.id_cliente
+            JOIN users cu ON cu.id = c.id_usuario
+            WHERE {where}
+            ORDER BY er.id
+        """,
+        fecha="er.fecha_realizacion",
+    ),
+}
+
+
+def build_query(dataset: Dataset, desde: date | None, hasta: date | None) -> tuple[str, list]:
+    conditions, params = [], []
+    if desde is not None:
+        conditions.append(f"{dataset.fecha} >= %s")
+        params.append(desde)
+    if hasta is not None:
+        conditions.append(f"{dataset.fecha} <= %s")
+        params.append(hasta)
+    return dataset.sql.format(where=" AND ".join(conditions) or "TRUE"), params
+
+
+def filename(name: str, formato: str, desde: date | None, hasta: date | None) -> str:
+    parts = [name]
+    if desde is not None or hasta is not None:
+        parts.append(f"{desde or ''}_{hasta or ''}")
+    return f"{'-'.join(parts)}.{formato}"
+
+
+class Slot:
+    """Hueco de ``acquire_slot()``; ``release()`` se puede llamar varias veces."""
+
+    __slots__ = ("released",)
+
+    def __init__(self):
+        self.released = False
+
+    def release(self) -> None:
+        global _active
+        if self.released:
+            return
+        self.released = True
+        _active = max(0, _active - 1)
+
+
+def acquire_slot() -> Slot:
+    """Reserva una de las exportaciones simultáneas del worker (503 si no quedan)."""
+    global _active
+    if _active >= MAX_CONCURRENT:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiadas exportaciones en curso, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": "10"},
+        )
+    _active += 1
+    return Slot()
+
+
+async def finish(conn, slot: Slot) -> None:
+    """Libera el hueco y devuelve la conexión de una exportación (idempotente).
+
+    Va como tarea de fondo de la respuesta: si el cliente se desconecta antes
+    de que empiece a leerse, el generador de ``stream()`` no llega a arrancar
+    y su ``finally`` no se ejecuta.
+    """
+    slot.release()
+    with anyio.CancelScope(shield=True):
+        await conn.close()
+
+
+# csv escribe None como "" y las fechas con str(), que ya es ISO 8601; solo hay
+# que convertir las columnas con hora (str() usa espacio en vez de "T") y los booleanos.
+_CSV_CONVERT = {
+    postgres_types.get("timestamptz").oid: lambda v: v.isoformat(),
+    postgres_types.get("timestamp").oid: lambda v: v.isoformat(),
+    postgres_types.get("time").oid: lambda v: v.isoformat(),
+    postgres_types.get("bool").oid: lambda v: "true" if v else "false",
+}
+
+
+def _csv_converters(description) -> list[tuple[int, object]]:
+    return [(i, _CSV_CONVERT[col.type_code]) for i, col in enumerate(description) if col.type_code in _CSV_CONVERT]
+
+
+def _encode_csv(rows, converters=(), header=None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header is not None:
+        writer.writerow(header)
+    if converters:
+        rows = [list(row) for row in rows]
+        for row in rows:
+            for i, convert in converters:
+                if row[i] is not None:
+                    row[i] = convert(row[i])
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def stream(conn, slot: Slot, name: str, formato: str, desde: date | None = None, hasta: date | None = None):
+    """Genera los bloques de la exportación; cierra la conexión y libera el hueco al acabar.
+
+    ``conn`` es una conexión de ``db_async.getconn()`` y ``slot`` el hueco ya
+    reservado con ``acquire_slot()``. Si el generador no llega a arrancar los
+    libera ``finish()``, que la respuesta ejecuta además como tarea de fondo.
+    """
+    sql, params = build_query(DATASETS[name], desde, hasta)
+    cursor = conn.cursor(name=f"export_{name}", row_factory=dict_row if formato == "ndjson" else tuple_row)
+    t0 = time.perf_counter()
+    total = 0
+    try:
+        await cursor.execute(sql, params)
+        if formato == "csv":
+            converters = _csv_converters(cursor.description)
+            yield _encode_csv([], header=[column.name for column in cursor.description])
+        while True:
+            rows = await cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            total += len(rows)
+            if formato == "ndjson":
+                yield b"\n".join(map(serialization.dumps_json, rows)) + b"\n"
+            else:
+                yield _encode_csv(rows, converters)
+        logger.info("Exportación %s (%s): %s filas en %.1f s", name, formato, total, time.perf_counter() - t0)
+    except Exception:
+        # Las cabeceras ya se enviaron: el cliente recibe la exportación cortada
+        logger.exception("Exportación %s interrumpida tras %s filas", name, total)
+        raise
+    finally:
+        # Si el cliente se desconecta la tarea se cancela: devolver la conexión
+        # al pool igualmente.
+        await finish(conn, slot)
@@ -0,0 +1,215 @@
+"""Consultas de lectura independientes en paralelo (fan-out).
+
+Los endpoints que componen su respuesta con varias consultas que no dependen
+unas de otras (estadísticas de cliente y de entrenador, asignaciones...) las
+ejecutaban una tras otra en la misma conexión, de modo que su latencia era la
+suma de todas. Con este módulo se lanzan a la vez y la latencia se acerca a la
+de la más lenta::
+
+    resultados = await fanout.run({
+        "cliente": fanout.Query("SELECT ... WHERE u.id = %s", (user_id,), fetch="one"),
+        "reservas": fanout.Query("SELECT ...", (user_id,)),
+        "realizados": fanout.Query("SELECT ...", (user_id,), row_factory=class_row(Fila)),
+    })
+    resultados["reservas"]  # lo que devolvería fetchall()
+
+Dos modos de ejecución:
+
+- ``parallel``: cada consulta va por su propia conexión del pool asíncrono
+  (``db_async``), con como mucho ``DB_FANOUT_MAX`` conexiones por llamada (4
+  por defecto); si hay más consultas, las conexiones se reutilizan.
+- ``pipeline``: todas las consultas por una sola conexión en modo pipeline de
+  psycopg 3, es decir, en un único viaje de ida y vuelta. El servidor las
+  ejecuta en serie, pero se ahorra la latencia de red entre una y otra.
+
+``DB_FANOUT_MODE`` fija el modo (``parallel`` por defecto). Para que el
+fan-out no agote el pool, el worker no presta más de ``DB_FANOUT_MAX_TOTAL``
+conexiones a la vez a este módulo (la mitad de ``DB_ASYNC_POOL_MAX`` por
+defecto); cuando no quedan, la llamada pasa a ``pipeline`` en lugar de esperar.
+
+Cada consulta tiene un tiempo máximo (``Query.timeout`` o ``DB_FANOUT_TIMEOUT``,
+10 s por defecto). Al superarlo se cancela en el servidor y ``run`` lanza
+``FanoutTimeout``; si una consulta falla, se cancelan las demás y se propaga
+su excepción.
+
+Cada consulta cuenta una vez en el ``max_queries`` de la ruta, con
+independencia de cuántas conexiones se presten: el ``SELECT 1`` con que el
+pool comprueba cada una no se atribuye a la petición (``querylog.suspended``).
+
+Solo para lecturas: cada conexión trabaja en su propia transacción, que se
+descarta al devolverla al pool. El endpoint no debe tener otra conexión
+prestada mientras espera a ``run`` (podría quedarse esperando al pool que él
+mismo ocupa).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import NamedTuple
+
+import anyio
+
+import db
+import db_async
+
+logger = logging.getLogger("gym-infosys.db")
+
+MODES = ("parallel", "pipeline")
+
+
+def _env_mode() -> str:
+    mode = (os.getenv("DB_FANOUT_MODE") or "parallel").strip().lower()
+    return mode if mode in MODES else "parallel"
+
+
+MODE = _env_mode()
+MAX_PARALLEL = max(1, db._env_int("DB_FANOUT_MAX", 4))
+MAX_TOTAL = max(1, db._env_int("DB_FANOUT_MAX_TOTAL", db._env_int("DB_ASYNC_POOL_MAX", 10) // 2))
+TIMEOUT = max(0.1, db._env_float("DB_FANOUT_TIMEOUT", 10.0))
+
+# Conexiones prestadas ahora mismo a llamadas en modo parallel
+_in_use = 0
+_stats = {"parallel": 0, "pipeline": 0, "degraded": 0, "timeouts": 0, "errors": 0}
+
+
+class FanoutTimeout(TimeoutError):
+    """Una consulta del fan-out superó su tiempo máximo."""
+
+
+class Query(NamedTuple):
+    sql: str
+    params: tuple | list | dict | None = None
+    # "all" (fetchall) u "one" (fetchone)
+    fetch: str = "all"
+    row_factory: object = None
+    timeout: float | None = None
+
+
+def _cursor(conn, query: Query):
+    if query.row_factory is not None:
+        return conn.cursor(row_factory=query.row_factory)
+    return conn.cursor()
+
+
+async def _fetch(cursor, query: Query):
+    if query.fetch == "one":
+        return await cursor.fetchone()
+    return await cursor.fetchall()
+
+
+async def _execute(conn, query: Query):
+    cursor = _cursor(conn, query)
+    await cursor.execute(query.sql, query.params)
+    return await _fetch(cursor, query)
+
+
+async def _close(conn) -> None:
+    # También si la petición se cancela: la conexión tiene que volver al pool.
+    with anyio.CancelScope(shield=True):
+        await conn.close()
+
+
+async def _with_timeout(name: str, coro, seconds: float):
+    try:
+        return await asyncio.wait_for(coro, seconds)
+    except asyncio.TimeoutError:
+        _stats["timeouts"] += 1
+        raise FanoutTimeout(f"La consulta '{name}' superó el tiempo máximo ({seconds:g} s)") from None
+
+
+async def _worker(pending: deque, results: dict) -> None:
+    conn = await db_async.getconn()
+    try:
+        while pending:
+            name, query = pending.popleft()
+            results[name] = await _with_timeout(name, _execute(conn, query), query.timeout or TIMEOUT)
+    finally:
+        await _close(conn)
+
+
+async def _run_parallel(queries: dict[str, Query], connections: int) -> dict:
+    pending = deque(queries.items())
+    results: dict = {}
+    tasks = [asyncio.ensure_future(_worker(pending, results)) for _ in range(connections)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return results
+
+
+async def _run_pipeline(queries: dict[str, Query]) -> dict:
+    async def execute_all(conn):
+        cursors = []
+        async with conn.pipeline():
+            for query in queries.values():
+                cursor = _cursor(conn, query)
+                await cursor.execute(query.sql, query.params)
+                cursors.append(cursor)
+        return {
+            name: await _fetch(cursor, query)
+            for (name, query), cursor in zip(queries.items(), cursors)
+        }
+
+    seconds = max(query.timeout or TIMEOUT for query in queries.values())
+    conn = await db_async.getconn()
+    try:
+        return await _with_timeout(", ".join(queries), execute_all(conn), seconds)
+    finally:
+        await _close(conn)
+
+
+def _reserve(wanted: int) -> int:
+    """Reserva hasta ``wanted`` conexiones del cupo del worker; devuelve cuántas."""
+    global _in_use
+    granted = max(0, min(wanted, MAX_TOTAL - _in_use))
+    _in_use += granted
+    return granted
+
+
+def _release(count: int) -> None:
+    global _in_use
+    _in_use = max(0, _in_use - count)
+
+
+async def run(queries: dict[str, Query], mode: str | None = None) -> dict:
+    """Ejecuta las consultas a la vez y devuelve sus resultados con las mismas claves."""
+    if not queries:
+        return {}
+    mode = mode or MODE
+    if mode not in MODES:
+        raise ValueError(f"Modo de fan-out desconocido: {mode}")
+    t0 = time.perf_counter()
+    try:
+        if mode == "parallel" and len(queries) > 1:
+            connections = _reserve(min(len(queries), MAX_PARALLEL))
+            if connections >= 2:
+                try:
+                    _stats["parallel"] += 1
+                    return await _run_parallel(queries, connections)
+                finally:
+                    _release(connections)
+            # Sin cupo para repartir: mejor un viaje por una conexión que esperar
+            _release(connections)
+            _stats["degraded"] += 1
+        _stats["pipeline"] += 1
+        return await _run_pipeline(queries)
+    except FanoutTimeout:
+        raise
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    finally:
+        logger.debug("Fan-out de %s consultas en %.1f ms", len(queries), (time.perf_counter() - t0) * 1000)
+
+
+def stats() -> dict:
+    return dict(
+        _stats, mode=MODE, max_parallel=MAX_PARALLEL, max_total=MAX_TOTAL,
+        in_use=_in_use, timeout_seconds=TIMEOUT,
+    )
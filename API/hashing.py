@@ -0,0 +1,263 @@
+"""Hashing de contraseñas (bcrypt) en un pool de procesos acotado.
+
+bcrypt consume decenas o cientos de ms de CPU por llamada. Ejecutado dentro
+del proceso de la API, un pico de logins ocupa el worker (y el GIL) y dispara
+la latencia del resto de rutas. Aquí cada operación se envía a un
+``ProcessPoolExecutor`` dedicado, que reparte el trabajo entre núcleos, con
+control de admisión: si ya hay demasiadas operaciones pendientes, se rechaza
+la nueva con un 503 y ``Retry-After`` en vez de encolarla sin límite.
+
+Configuración por entorno:
+
+    HASH_WORKERS      Procesos de hashing (por defecto min(4, núcleos)). 0 = en línea,
+                      sin pool (útil para depurar o en entornos sin multiprocessing).
+    HASH_QUEUE_MAX    Operaciones que pueden esperar además de las que se ejecutan (32).
+    HASH_TIMEOUT      Segundos máximos de espera por una operación (30).
+
+Las funciones ``hash_password`` y ``verify_password`` son síncronas (los
+endpoints de autenticación son ``def`` y corren en el threadpool): bloquean el
+hilo que las llama, pero no el event loop ni el GIL.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from fastapi import HTTPException
+
+logger = logging.getLogger("gym-infosys.hashing")
+
+
+class HashingOverloaded(HTTPException):
+    """503 con ``Retry-After`` cuando el pool de hashing no admite más trabajo."""
+
+    def __init__(self, retry_after: int, detail: str = "Servicio de autenticación saturado, inténtalo de nuevo en unos segundos"):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+# Funciones que se ejecutan en los procesos del pool: devuelven también el
+# tiempo de CPU real de bcrypt para separarlo del tiempo en cola.
+def _hash(password: bytes) -> tuple[bytes, float]:
+    t0 = time.perf_counter()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt())
+    return hashed, time.perf_counter() - t0
+
+
+def _check(password: bytes, hashed: bytes) -> tuple[bool, float]:
+    t0 = time.perf_counter()
+    ok = bcrypt.checkpw(password, hashed)
+    return ok, time.perf_counter() - t0
+
+
+def _ping() -> None:
+    return None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class HashingPool:
+    """Pool de procesos para bcrypt con cola acotada y métricas."""
+
+    def __init__(self, workers: int, queue_max: int, timeout: float):
+        self.workers = max(0, workers)
+        self.queue_max = max(0, queue_max)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._stats = {
+            "pending_max": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "pool_restarts": 0,
+        }
+        self._ops = {
+            op: {"count": 0, "errors": 0, "latency_total": 0.0, "latency_max": 0.0, "cpu_total": 0.0}
+            for op in ("hash", "verify")
+        }
+
+    @classmethod
+    def from_env(cls) -> "HashingPool":
+        return cls(
+            workers=_env_int("HASH_WORKERS", min(4, os.cpu_count() or 1)),
+            queue_max=_env_int("HASH_QUEUE_MAX", 32),
+            timeout=float(_env_int("HASH_TIMEOUT", 30)),
+        )
+
+    @property
+    def capacity(self) -> int:
+        return max(1, self.workers) + self.queue_max
+
+    def start(self):
+        """Crea los procesos por adelantado para no pagar el arranque en el primer login."""
+        if self.workers == 0:
+            return
+        with self._lock:
+            executor = self._ensure_executor()
+        for f in [executor.submit(_ping) for _ in range(self.workers)]:
+            try:
+                f.result(timeout=self.timeout)
+            except Exception:
+                pass
+
+    def _ensure_executor(self):
+        # Se usa el método de arranque por defecto de la plataforma (fork en
+        # Linux, spawn en Windows/macOS). Con spawn, el módulo principal se
+        # reimporta en cada proceso hijo, lo que falla si la app se importa
+        # desde un script sin guarda ``if __name__ == "__main__"``.
+        if self.workers and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            # wait=True: con wait=False, si el proceso termina enseguida (un
+            # worker de uvicorn al parar), multiprocessing cierra la cola antes
+            # de que lleguen los avisos de parada y el proceso se queda
+            # esperando para siempre a sus procesos de hashing.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _retry_after(self) -> int:
+        op = self._ops["hash"]
+        samples = op["count"] + self._ops["verify"]["count"]
+        avg = (op["cpu_total"] + self._ops["verify"]["cpu_total"]) / samples if samples else 0.25
+        return max(1, math.ceil(self._pending * avg / max(1, self.workers)))
+
+    def _admit(self):
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._stats["rejected"] += 1
+                retry_after = self._retry_after()
+                logger.warning("Pool de hashing saturado (%s pendientes); rechazando con 503", self._pending)
+                raise HashingOverloaded(retry_after)
+            self._pending += 1
+            self._stats["pending_max"] = max(self._stats["pending_max"], self._pending)
+            return self._ensure_executor()
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, op: str, fn, *args):
+        executor = self._admit()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            if executor is None:
+                try:
+                    result, cpu = fn(*args)
+                finally:
+                    self._release()
+            else:
+                try:
+                    future = executor.submit(fn, *args)
+                except BaseException:
+                    self._release()
+                    raise
+                # El hueco se libera cuando el trabajo termina o se cancela, no
+                # cuando se deja de esperar: tras un timeout puede seguir en
+                # cola o ejecutándose en un proceso.
+                future.add_done_callback(self._release)
+                try:
+                    result, cpu = future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    future.cancel()
+                    raise
+            ok = True
+            return result
+        except FutureTimeout:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise HashingOverloaded(self._retry_after())
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. por el OOM killer): se recrea el pool en
+            # la siguiente petición y esta se reintenta desde el cliente.
+            logger.error("El pool de hashing se rompió; se recreará")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                    self._stats["pool_restarts"] += 1
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise HashingOverloaded(1)
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                stats = self._ops[op]
+                if ok:
+                    stats["count"] += 1
+                    stats["cpu_total"] += cpu
+                    stats["latency_total"] += elapsed
+                    stats["latency_max"] = max(stats["latency_max"], elapsed)
+                else:
+                    stats["errors"] += 1
+
+    def hash_password(self, password: str) -> str:
+        return self._run("hash", _hash, password.encode("utf-8")).decode("utf-8")
+
+    def verify_password(self, password: str, hashed: str) -> bool:
+        return self._run("verify", _check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            ops = {}
+            for op, s in self._ops.items():
+                ops[op] = dict(s)
+                ops[op]["latency_avg"] = s["latency_total"] / s["count"] if s["count"] else 0.0
+                ops[op]["cpu_avg"] = s["cpu_total"] / s["count"] if s["count"] else 0.0
+            return {
+                "workers": self.workers,
+                "queue_max": self.queue_max,
+                "pending": self._pending,
+                "queue_depth": max(0, self._pending - max(1, self.workers)),
+                **self._stats,
+                "operations": ops,
+            }
+
+
+_pool: HashingPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> HashingPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool.from_env()
+                logger.info(
+                    "Pool de hashing: workers=%s cola=%s timeout=%ss",
+                    _pool.workers, _pool.queue_max, _pool.timeout,
+                )
+    return _pool
+
+
+def start():
+    get_pool().start()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def hash_password(password: str) -> str:
+    return get_pool().hash_password(password)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return get_pool().verify_password(password, hashed)
@@ -1,17 +1,27 @@
-from fastapi import FastAPI, HTTPException, Request, Response
-from fastapi.responses import RedirectResponse
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 import sqlite3
-import bcrypt
 import uuid
 import smtplib
 from email.mime.text import MIMEText
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
 from urllib.parse import urlparse
 import socket
 import os
+import sys
+import time
+import asyncio
+import base64
+import json
+import random
+import psycopg
 import psycopg2
+from psycopg.rows import class_row
 from dotenv import load_dotenv
 from pathlib import Path
 import logging
@@ -23,13 +33,31 @@ import logging
 # existente en get_db_connection().
 API_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = API_DIR.parent
-POSTGRES_DIR = API_DIR / "postgres"
-DDL_SCRIPT_PATH = POSTGRES_DIR / "ddl_postgres.sql"
-SEED_SCRIPT_PATH = POSTGRES_DIR / "seed_postgres.sql"
 
 env_path = PROJECT_ROOT / ".env.local"
 load_dotenv(env_path)
 
+# Permitir importar los módulos hermanos (db.py, ...) tanto con `uvicorn main:app`
+# desde API/ como con `uvicorn API.main:app` desde la raíz del proyecto (run.cmd).
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+
+import activity_calendar
+import catalog_cache
+import cohorts
+import change_listener
+import conditional
+import dashboard_summary
+import db
+import db_async
+import export
+import fanout
+import hashing
+import metrics
+import migrations
+import querylog
+import serialization
+
 # Configurar logging básico para la aplicación. Preferir el logger de uvicorn
 # cuando la aplicación se ejecute bajo uvicorn para que los mensajes aparezcan
 # en la salida del servidor.
@@ -45,6 +73,12 @@ logger.setLevel(logging.INFO)
 # RESUMEN DE ENDPOINTS DISPONIBLES
 # ----------------------------------------------------
 # GET    /health                                      - Comprobación básica de estado del servicio.
+# GET    /health/schema                               - Versión del esquema y última ejecución de migraciones.
+# GET    /health/db-pool                              - Estadísticas del pool de conexiones a la BD.
+# GET    /health/hashing                              - Estadísticas del pool de hashing de contraseñas (bcrypt).
+# GET    /health/queries                              - Sentencias SQL más costosas del proceso (normalizadas).
+# GET    /health/cache                                - Aciertos y fallos de la caché de catálogo.
+# GET    /metrics                                     - Métricas Prometheus (latencia, peticiones y tiempo en BD por ruta).
 # POST   /login                                       - Autenticación de usuarios registrados.
 # POST   /register                                    - Alta de nuevos usuarios.
 # POST   /change-password                             - Cambio de contraseña autenticado por email.
@@ -57,9 +91,11 @@ logger.setLevel(logging.INFO)
 # GET    /planes                                      - Listado de planes disponibles.
 # GET    /planes/{plan_id}                            - Detalle de un plan específico.
 # POST   /contract-plan                               - Contratación de plan y creación de cliente.
-# GET    /admin/users                                 - Listado completo de usuarios (solo admin).
+# GET    /admin/users                                 - Listado de usuarios con filtros y paginación por clave (solo admin).
 # GET    /admin/users/{user_id}                       - Detalle de usuario individual (solo admin).
+# GET    /admin/export/{dataset}                      - Exportación en streaming (NDJSON/CSV) de usuarios, reservas o entrenamientos (solo admin).
 # PUT    /admin/users/{user_id}                       - Actualización de usuario (solo admin).
+# POST   /admin/cache/invalidar                       - Invalidación de la caché de catálogo (solo admin).
 # GET    /gym-clases                                  - Catálogo de tipos de clases activas.
 # GET    /entrenadores                                - Listado de entrenadores registrados.
 # POST   /clases-programadas                          - Alta masiva de clases programadas.
@@ -73,31 +109,24 @@ logger.setLevel(logging.INFO)
 # GET    /asignaciones-entrenador                     - Asignaciones activas entrenador-cliente.
 # POST   /asignar-entrenador                          - Crear asignación entrenador-cliente.
 # DELETE /desasignar-entrenador/{asignacion_id}       - Finalizar una asignación existente.
-# GET    /entrenador/{entrenador_id}/clientes         - Clientes asignados a un entrenador.
-# GET    /entrenador/{entrenador_id}/estadisticas     - Indicadores agregados por entrenador.
+# GET    /entrenador/{entrenador_id}/clientes         - Panel del entrenador: clientes asignados con su actividad, asignaciones y asistencia.
+# GET    /entrenador/{entrenador_id}/estadisticas     - Indicadores del entrenador (adherencia, completado, volumen semanal).
 # GET    /ejercicios                                  - Catálogo de ejercicios disponibles.
 # POST   /entrenador/{entrenador_id}/cliente/{id_cliente}/plan-entrenamiento - Asignación de plan a cliente.
 # GET    /cliente/{cliente_user_id}/entrenamientos-pendientes - Entrenamientos pendientes de un cliente.
 # POST   /cliente/{cliente_user_id}/registrar-actividad - Registro de actividad realizada por cliente.
 # GET    /cliente/{cliente_user_id}/entrenamientos-asignados - Todos los entrenamientos asignados a un cliente (pendiente/completado).
-# GET    /cliente/{cliente_user_id}/estadisticas - Estadísticas agregadas para un cliente (ejercicios realizados, clases, rachas, etc.).
+# GET    /cliente/{cliente_user_id}/estadisticas - Estadísticas agregadas para un cliente (ejercicios realizados, clases, rachas, etc.), opcionalmente en un rango de fechas.
 # GET    /entrenador/estadisticas/{cliente_user_id} - Alias para que la vista de entrenador obtenga las mismas estadísticas del cliente.
-# GET    /admin/estadisticas                         - Estadísticas globales para el panel de administración.
-
-REQUIRED_TABLES = {
-    "users",
-    "email_verifications",
-    "reset_tokens",
-    "planes",
-    "clientes",
-    "gym_clases",
-    "clases_programadas",
-    "reservas",
-    "entrenador_cliente_asignaciones",
-    "ejercicios",
-    "entrenamientos_asignados",
-    "entrenamientos_realizados",
-}
+# GET    /cliente/{cliente_user_id}/ejercicios-realizados - Detalle paginado (por clave) de los entrenamientos realizados por un cliente.
+# GET    /cliente/{cliente_user_id}/calendario   - Mapa de calor anual de días con actividad del cliente y sus rachas.
+# GET    /admin/estadisticas                         - Estadísticas globales para el panel de administración (resumen precalculado).
+# POST   /admin/estadisticas/refrescar               - Recalcula en el momento el resumen del panel de administración.
+# GET    /admin/analitica/retencion                  - Retención por cohortes mensuales de inscripción.
+# GET    /admin/analitica/activos-semanales          - Clientes con actividad por semana.
+# GET    /admin/analitica/riesgo-abandono            - Clientes activos con riesgo de abandono según su inactividad.
+# GET    /admin/analitica/embudo-planes              - Embudo de mejoras de plan desde cada plan inicial.
+# POST   /admin/analitica/refrescar                  - Recalcula en el momento los informes de analítica (se calculan una vez al día).
 
 
 def _infer_frontend_base_from_request(request: Request) -> str:
@@ -162,7 +191,9 @@ def _infer_frontend_base_from_request(request: Request) -> str:
     return "http://localhost:3000"
 
 
-app = FastAPI()
+# La dependencia global acota a cada petición las conexiones prestadas por el
+# pool y devuelve las que un endpoint no haya cerrado.
+app = FastAPI(dependencies=[Depends(db.request_scope)])
 
 # Configuración de CORS para desarrollo local y Docker
 app.add_middleware(
@@ -191,88 +222,31 @@ def print_server_ip():
     except Exception as e:
         logger.warning("No se pudo determinar la IP local: %s", e)
 
-print_server_ip()
-
-
-def _get_missing_tables(conn) -> list[str]:
-    """Devuelve las tablas públicas que faltan según el esquema esperado."""
-    with conn.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE table_schema = 'public'
-            """
-        )
-        existing = {row[0] for row in cursor.fetchall()}
-    return sorted(REQUIRED_TABLES - existing)
-
-
-def _run_sql_script(conn, script_path: Path) -> bool:
-    """Ejecuta las sentencias contenidas en el fichero SQL indicado."""
-    if not script_path.exists():
-        logger.warning("Archivo SQL no encontrado: %s", script_path)
-        return False
-    sql_text = script_path.read_text(encoding="utf-8").strip()
-    if not sql_text:
-        logger.info("Archivo SQL vacío, nada que ejecutar: %s", script_path)
-        return False
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql_text)
-        conn.commit()
-        return True
-    except Exception as exc:
-        conn.rollback()
-        logger.error("Error al ejecutar %s: %s", script_path, exc)
-        return False
-
-
-def _ensure_database_schema(conn) -> None:
-    """Crea el esquema esperado cuando faltan tablas."""
-    missing_tables = _get_missing_tables(conn)
-    if not missing_tables:
-        logger.info("Esquema detectado con tablas esperadas")
-        return
-    logger.warning(
-        "Faltan tablas en la BD (%s). Ejecutando ddl_postgres.sql para recrear el esquema.",
-        ", ".join(missing_tables),
-    )
-    if _run_sql_script(conn, DDL_SCRIPT_PATH):
-        logger.info("Script DDL ejecutado correctamente")
-    else:
-        logger.error("No se pudo ejecutar el script DDL en %s", DDL_SCRIPT_PATH)
-
 
-def _ensure_seed_data(conn) -> None:
-    """Carga los datos de ejemplo cuando las tablas principales están vacías."""
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
-    except Exception as exc:
-        conn.rollback()
-        logger.error("No se pudo comprobar la tabla users para el seed: %s", exc)
-        return
-    if user_count > 0:
-        logger.info("Datos de ejemplo ya presentes (usuarios=%s)", user_count)
-        return
-    logger.warning("No se encontraron usuarios. Ejecutando seed_postgres.sql")
-    if _run_sql_script(conn, SEED_SCRIPT_PATH):
-        logger.info("Script de seed ejecutado correctamente")
-    else:
-        logger.error("No se pudo ejecutar el script de seed en %s", SEED_SCRIPT_PATH)
+@app.on_event("startup")
+def announce_server_ip():
+    # Con serve.py (varios workers) lo anuncia una sola vez el proceso principal.
+    if os.getenv("API_SUPERVISED") != "1":
+        print_server_ip()
 
 
 @app.on_event("startup")
 def check_db_on_startup():
     """Intenta conectar con la base de datos al iniciar y registra el resultado."""
     try:
+        db.init_pool()
         # Attempt to get a connection; get_db_connection() will prefer DATABASE_URL
         conn = get_db_connection()
         try:
-            _ensure_database_schema(conn)
-            _ensure_seed_data(conn)
+            # Con el esquema al día solo se lee schema_version (ver migrations.py).
+            # serve.py migra antes de crear los workers y los arranca con DB_MIGRATE_ON_STARTUP=0.
+            if os.getenv("DB_MIGRATE_ON_STARTUP", "1") != "0":
+                migrations.migrate(conn)
+                try:
+                    # El resumen del panel pudo quedar vacío o viejo (seed, restauración...)
+                    dashboard_summary.refresh_sync(conn)
+                except Exception as e:
+                    logger.error("No se pudo refrescar el resumen del panel de administración: %s", e)
         finally:
             try:
                 conn.close()
@@ -291,12 +265,78 @@ def check_db_on_startup():
     except Exception as e:
         logger.error("DB connection FAILED at startup: %s", e)
 
+
+@app.on_event("startup")
+async def open_async_db_pool():
+    """Abre el pool asíncrono que usan los endpoints ``async def``."""
+    try:
+        await db_async.init_pool()
+    except Exception as e:
+        logger.error("No se pudo crear el pool asíncrono de BD: %s", e)
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    """Cierra las conexiones ociosas del pool al parar el proceso."""
+    db.close_pool()
+
+
+@app.on_event("shutdown")
+async def close_async_db_pool():
+    await db_async.close_pool()
+
+
+@app.on_event("startup")
+async def start_change_listener():
+    """Escucha los cambios de catálogo publicados por la BD (ver change_listener.py)."""
+    change_listener.start()
+
+
+@app.on_event("shutdown")
+async def stop_change_listener():
+    await change_listener.stop()
+
+
+@app.on_event("startup")
+async def start_dashboard_summary_refresh():
+    """Mantiene al día el resumen de /admin/estadisticas (ver dashboard_summary.py)."""
+    dashboard_summary.start()
+
+
+@app.on_event("shutdown")
+async def stop_dashboard_summary_refresh():
+    await dashboard_summary.stop()
+
+
+@app.on_event("startup")
+def start_hashing_pool():
+    """Arranca los procesos de bcrypt para que el primer login no pague su creación."""
+    try:
+        hashing.start()
+    except Exception as e:
+        logger.error("No se pudo arrancar el pool de hashing: %s", e)
+
+
+@app.on_event("shutdown")
+def stop_hashing_pool():
+    hashing.shutdown()
+
+
+@app.on_event("shutdown")
+def release_metrics():
+    metrics.mark_process_dead()
+
 @app.get("/health")
 def health_check(request: Request):
     """Comprobación simple de salud sin dependencia de la base de datos.
     Además registra una línea INFO corta con la IP cliente para facilitar el desarrollo.
     """
     host = request.client.host if request.client else "unknown"
+    # serve.py crea este fichero al recibir SIGTERM para que el balanceador deje de enviar tráfico
+    drain_file = os.getenv("API_DRAIN_FILE")
+    if drain_file and os.path.exists(drain_file):
+        logger.info('%s - "GET /health" -> %s', host, {"status": "draining"})
+        return JSONResponse(status_code=503, content={"status": "draining", "message": "API is shutting down"})
     logger.info('%s - "GET /health" -> %s', host, {"status": "ok"})
     return {"status": "ok", "message": "API is running"}
 def get_db_connection():
@@ -310,45 +350,81 @@ def get_db_connection():
     return sqlite3.connect(db_path)
     """
     
-    # Preferir DATABASE_URL si está presente (forma estándar para containers)
-    database_url = os.getenv("DATABASE_URL")
-    if database_url:
-        try:
-            logger.debug("[DEBUG] Connecting to Postgres using DATABASE_URL")
-            return psycopg2.connect(database_url)
-        except Exception as e:
-            logger.error("[ERROR] Failed to connect using DATABASE_URL: %s", e)
-
-    # Fallback: usar variables individuales o valores por defecto
-    host = os.getenv("DB_HOST")
-    if not host:
-        raise RuntimeError("Debe establecer la variable de entorno DB_HOST")
-    port = os.getenv("DB_PORT")
-    if not port:
-        raise RuntimeError("Debe establecer la variable de entorno DB_PORT")
-    database = os.getenv("DB_NAME")
-    if not database:
-        raise RuntimeError("Debe establecer la variable de entorno DB_NAME")
-    user = os.getenv("DB_USER")
-    if not user:
-        raise RuntimeError("Debe establecer la variable de entorno DB_USER")
-    password = os.getenv("DB_PASS")
-    if not password:
-        raise RuntimeError("Debe establecer la variable de entorno DB_PASS")
+    # Conexión prestada por el pool del proceso; conn.close() la devuelve al pool.
+    return db.get_pool().getconn()
+
+
+async def get_async_db_connection():
+    """Conexión asíncrona (psycopg 3) para los endpoints ``async def``.
+
+    Se usa igual que ``get_db_connection()`` pero con ``await`` en execute,
+    fetch*, commit, rollback y close, para no bloquear el event loop.
+    """
+    return await db_async.getconn()
+
+
+@app.get("/health/schema")
+def schema_status():
+    """Versión del esquema y resultado (y duración) de las migraciones al arrancar."""
+    if migrations.last_run:
+        return {"status": "ok", "schema": migrations.last_run}
+    # Worker arrancado por serve.py: migró el proceso principal, aquí solo se consulta.
+    conn = get_db_connection()
     try:
-        logger.debug("[DEBUG] Connecting to Postgres at %s:%s, db=%s, user=%s", host, port, database, user)
-        return psycopg2.connect(host=host, port=port, database=database, user=user, password=password)
-    except Exception as e:
-        logger.error("[ERROR] Failed to connect to Postgres at %s:%s db=%s user=%s: %s", host, port, database, user, e)
-        raise
+        return {"status": "ok", "schema": migrations.status(conn)}
+    finally:
+        conn.close()
+
+
+@app.get("/health/db-pool")
+def db_pool_stats():
+    """Estadísticas de los pools de conexiones (tamaño, prestadas, esperas y timeouts) y del fan-out."""
+    return {
+        "status": "ok", "pool": db.get_pool().stats(), "async_pool": db_async.stats(),
+        "fanout": fanout.stats(),
+    }
+
+@app.get("/health/hashing")
+def hashing_stats():
+    """Estadísticas del pool de bcrypt (pendientes, rechazos y latencia por operación)."""
+    return {"status": "ok", "hashing": hashing.get_pool().stats()}
+
+@app.get("/health/queries")
+def query_stats(limit: int = 20):
+    """Sentencias SQL del proceso ordenadas por tiempo total (ver querylog.py)."""
+    return {"status": "ok", "statements": querylog.statement_stats(limit)}
+
+@app.get("/health/cache")
+def catalog_cache_stats():
+    """Aciertos, fallos e invalidaciones de la caché de catálogo (ver catalog_cache.py)."""
+    return {
+        "status": "ok",
+        "cache": catalog_cache.stats(),
+        "listener": change_listener.stats(),
+        "analitica": cohorts.stats(),
+    }
 
+@app.post("/admin/cache/invalidar")
+def invalidar_cache_catalogo(catalogo: str | None = None):
+    """Descarta la caché de un catálogo (o de todos) tras cambiarlo fuera de la API."""
+    if catalogo is not None and catalogo not in catalog_cache.CATALOGS:
+        raise HTTPException(status_code=400, detail=f"Catálogo desconocido: {catalogo}")
+    catalog_cache.invalidate(*([catalogo] if catalogo else []))
+    return {"success": True, "invalidados": [catalogo] if catalogo else list(catalog_cache.CATALOGS)}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus (ver metrics.py)."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+# bcrypt se ejecuta en el pool de procesos de hashing.py. Ambas funciones pueden
+# lanzar hashing.HashingOverloaded (HTTP 503 con Retry-After) si el pool está saturado.
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
-    return hashed.decode("utf-8")
+    return hashing.hash_password(password)
 
 def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    return hashing.verify_password(password, hashed)
 
 
 
@@ -419,6 +495,66 @@ class CrearReservaRequest(BaseModel):
 class CancelarReservaRequest(BaseModel):
     id_reserva: int
 
+# Registros de respuesta de los listados grandes: las filas se leen directamente
+# en estas clases (mismo orden de campos que las claves del JSON) y se serializan
+# con serialization.render, sin dicts intermedios.
+
+@dataclass(slots=True)
+class ClaseProgramadaRow:
+    id: int
+    fecha: date
+    hora: dt_time
+    id_clase: int
+    tipo_clase: str
+    color: str | None
+    id_instructor: int
+    instructor_nombre: str
+    capacidad_maxima: int
+    participantes_actuales: int
+    plazas_libres: int
+    estado: str
+    created_at: datetime
+    updated_at: datetime
+    descripcion: str | None
+    duracion_minutos: int | None
+
+@dataclass(slots=True)
+class ClienteAdminRow:
+    id: int
+    dni: str | None
+    numero_telefono: str | None
+    plan_id: int | None
+    plan_name: str
+    fecha_nacimiento: str | None
+    genero: str | None
+    fecha_inscripcion: str | None
+    estado: str | None
+    created_at: str | None
+    updated_at: str | None
+
+@dataclass(slots=True)
+class UsuarioAdminRow:
+    id: int
+    name: str
+    email: str
+    role: str
+    email_verified: bool
+    created_at: str | None
+    updated_at: str | None
+    cliente: ClienteAdminRow | None = None
+
+@dataclass(slots=True)
+class EjercicioRealizadoRow:
+    fecha_realizacion: date
+    series_realizadas: int | None
+    repeticiones: int | None
+    peso_kg: Decimal | None
+    ejercicio_id: int | None
+    ejercicio_nombre: str | None
+    ejercicio_categoria: str | None
+    notas: str | None
+    valoracion: int | None
+
 def send_reset_email(to_email: str, reset_link: str):
     # Cargar configuración SMTP desde variables de entorno.
     SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -473,9 +609,25 @@ def send_verification_email(to_email: str, verify_link: str):
 
 @app.middleware("http")
 async def log_request_body(request: Request, call_next):
-    # Middleware mínimo: no registrar aquí las peticiones/respuestas; se delega en los endpoints.
-    response = await call_next(request)
-    return response
+    # Instrumentación de todas las rutas (ver metrics.py y querylog.py). El
+    # registro de las peticiones/respuestas se sigue delegando en los endpoints.
+    method = request.method
+    route = metrics.route_template(app, request.scope)
+    db_stats = querylog.begin(f"{method} {route}")
+    in_flight = metrics.IN_FLIGHT.labels(method, route)
+    in_flight.inc()
+    status = 500
+    repeated = []
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        # El router deja en el scope el endpoint que atendió la petición.
+        repeated = querylog.finish(db_stats, request.scope.get("endpoint"))
+        return response
+    finally:
+        in_flight.dec()
+        metrics.observe(method, route, status, time.perf_counter() - start, db_stats, repeated)
 
 ## Endpoint para iniciar sesión de usuario
 @app.post("/login")
@@ -496,7 +648,13 @@ def login(req: LoginRequest):
         conn.close()
         raise HTTPException(status_code=500, detail="Error interno al consultar usuario")
     
-    if user and verify_password(req.password, user[3]):
+    try:
+        password_ok = bool(user) and verify_password(req.password, user[3])
+    except hashing.HashingOverloaded:
+        conn.close()
+        raise
+
+    if password_ok:
         if not user[4]:
             print(f"[INFO] /login - user {user[2]} attempted login but email not verified")
             conn.close()
@@ -550,9 +708,10 @@ def login(req: LoginRequest):
 @app.post("/register")
 def register(req: RegisterRequest, request: Request):
     print(f"[DEBUG] Intentando registrar usuario: {req.email}")
+    # Hashear antes de pedir la conexión para no retenerla mientras bcrypt trabaja
+    hashed_pw = hash_password(req.password)
     conn = get_db_connection()
     cursor = conn.cursor()
-    hashed_pw = hash_password(req.password)
     try:
         # Insertar usuario y obtener el id creado de forma segura usando RETURNING
         cursor.execute(
@@ -631,10 +790,15 @@ def change_password(req: ChangePasswordRequest):
     cursor = conn.cursor()
     cursor.execute("SELECT id, password FROM users WHERE email=%s", (req.email,))
     user = cursor.fetchone()
-    if not user or not verify_password(req.current_password, user[1]):
+    try:
+        password_ok = bool(user) and verify_password(req.current_password, user[1])
+        hashed_new = hash_password(req.new_password) if password_ok else None
+    except hashing.HashingOverloaded:
+        conn.close()
+        raise
+    if not password_ok:
         conn.close()
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
-    hashed_new = hash_password(req.new_password)
     cursor.execute("UPDATE users SET password=%s WHERE id=%s", (hashed_new, user[0]))
     conn.commit()
     conn.close()
@@ -707,7 +871,11 @@ def reset_password(req: ResetPasswordRequest):
         conn.close()
         raise HTTPException(status_code=400, detail="Token expirado")
     # Actualizar contraseña
-    hashed_pw = hash_password(req.newPassword)
+    try:
+        hashed_pw = hash_password(req.newPassword)
+    except hashing.HashingOverloaded:
+        conn.close()
+        raise
     cursor.execute("UPDATE users SET password=%s WHERE id=%s", (hashed_pw, user_id))
     cursor.execute("DELETE FROM reset_tokens WHERE token=%s", (req.token,))
     conn.commit()
@@ -818,6 +986,7 @@ def verify_email_get(token: str, request: Request):
 
 ## Endpoint para obtener el número total de usuarios registrados
 @app.get("/count-members")
+@querylog.max_queries(1)
 def count_members(request: Request):
     """Devuelve el número total de clientes y registra la petición y el resultado."""
     client_host = request.client.host if request.client else "unknown"
@@ -831,6 +1000,7 @@ def count_members(request: Request):
     return result
 
 @app.get("/count-trainers")
+@querylog.max_queries(1)
 def count_trainers(request: Request):
     """Obtener el número total de entrenadores activos"""
     client_host = request.client.host if request.client else "unknown"
@@ -848,147 +1018,109 @@ def count_trainers(request: Request):
         raise HTTPException(status_code=500, detail=f"Error al obtener el conteo de entrenadores: {str(e)}")
 
 ## Endpoints para planes
-@app.get("/planes")
-def get_planes():
-    """Obtener todos los planes activos"""
+
+def _plan_from_row(row) -> dict:
+    """Respuesta de un plan a partir de su fila de ``planes``."""
+    # row mapping: 0:id,1:nombre,2:precio_mensual,3:caracteristicas_json,4:acceso_entrenador,5:activo,6:color_tema,7:orden_display,8:created_at,9:updated_at
+    # `caracteristicas` column is JSONB; depending on driver settings it may be
+    # returned as a Python list already or as a JSON string. Handle both.
+    import json
+    caracteristicas = []
+    raw_car = row[3]
+    try:
+        if raw_car is None:
+            caracteristicas = []
+        elif isinstance(raw_car, (list, tuple)):
+            caracteristicas = list(raw_car)
+        elif isinstance(raw_car, (str, bytes)):
+            try:
+                caracteristicas = json.loads(raw_car)
+            except Exception:
+                # Fallback: treat the string as single feature or empty
+                caracteristicas = [raw_car] if raw_car else []
+        else:
+            # Unexpected type; try to coerce to list
+            caracteristicas = list(raw_car)
+    except Exception:
+        caracteristicas = []
+
+    return {
+        "id": row[0],
+        "nombre": row[1],
+        "descripcion": "",
+        "precio_mensual": float(row[2]) if row[2] is not None else 0.0,
+        "caracteristicas": caracteristicas,
+        "acceso_entrenador": bool(row[4]),
+        "activo": bool(row[5]),
+        "color_tema": row[6] or "#000000",
+        "orden_display": int(row[7]) if row[7] is not None else 0,
+        "created_at": row[8],
+        "updated_at": row[9],
+        # Campos de compatibilidad con el frontend
+        "precio_anual": None,
+        "duracion_meses": 1,
+        "limite_clases": None,
+        "acceso_nutricionista": (row[1] or '').lower() in ['estándar', 'premium'],
+        "acceso_entrenador_personal": bool(row[4]),
+        "acceso_areas_premium": bool(row[4]),
+        "popular": (row[1] or '').lower() == 'estándar'
+    }
+
+
+async def _cargar_planes() -> dict:
+    """Planes activos ya formateados (cargador de la caché de catálogo)."""
+    print("[DEBUG] Iniciando consulta de planes")
+    conn = await get_async_db_connection()
     try:
-        print("[DEBUG] Iniciando consulta de planes")
-        conn = get_db_connection()
         cursor = conn.cursor()
-        
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, nombre, precio_mensual, caracteristicas, acceso_entrenador, activo, color_tema, orden_display, created_at, updated_at
             FROM planes 
             WHERE activo = 1 
             ORDER BY orden_display ASC, id ASC
         """)
+        rows = await cursor.fetchall()
+    finally:
+        await conn.close()
+    planes = [_plan_from_row(row) for row in rows]
+    print("[DEBUG] Planes encontrados:", planes)
+    return {"planes": planes, "por_id": {plan["id"]: plan for plan in planes}}
 
-        planes = []
-        import json
-        for row in cursor.fetchall():
-            # row mapping: 0:id,1:nombre,2:precio_mensual,3:caracteristicas_json,4:acceso_entrenador,5:activo,6:color_tema,7:orden_display,8:created_at,9:updated_at
-            # `caracteristicas` column is JSONB; depending on psycopg2 settings it may be
-            # returned as a Python list already or as a JSON string. Handle both.
-            caracteristicas = []
-            raw_car = row[3]
-            try:
-                if raw_car is None:
-                    caracteristicas = []
-                elif isinstance(raw_car, (list, tuple)):
-                    caracteristicas = list(raw_car)
-                elif isinstance(raw_car, (str, bytes)):
-                    try:
-                        caracteristicas = json.loads(raw_car)
-                    except Exception:
-                        # Fallback: treat the string as single feature or empty
-                        caracteristicas = [raw_car] if raw_car else []
-                else:
-                    # Unexpected type; try to coerce to list
-                    caracteristicas = list(raw_car)
-            except Exception:
-                caracteristicas = []
-
-            plan = {
-                "id": row[0],
-                "nombre": row[1],
-                "descripcion": "",
-                "precio_mensual": float(row[2]) if row[2] is not None else 0.0,
-                "caracteristicas": caracteristicas,
-                "acceso_entrenador": bool(row[4]),
-                "activo": bool(row[5]),
-                "color_tema": row[6] or "#000000",
-                "orden_display": int(row[7]) if row[7] is not None else 0,
-                "created_at": row[8],
-                "updated_at": row[9],
-                # Campos de compatibilidad con el frontend
-                "precio_anual": None,
-                "duracion_meses": 1,
-                "limite_clases": None,
-                "acceso_nutricionista": (row[1] or '').lower() in ['estándar', 'premium'],
-                "acceso_entrenador_personal": bool(row[4]),
-                "acceso_areas_premium": bool(row[4]),
-                "popular": (row[1] or '').lower() == 'estándar'
-            }
-            planes.append(plan)
-        
-        conn.close()
-        print("[DEBUG] Planes encontrados:", planes)
-        return {"planes": planes}
-        
+
+@app.get("/planes")
+@querylog.max_queries(1)
+async def get_planes(request: Request, response: Response):
+    """Obtener todos los planes activos (desde la caché de catálogo, con ETag)"""
+    try:
+        catalogo, etag = await catalog_cache.get_with_etag("planes", _cargar_planes)
     except Exception as e:
         print("[ERROR] Error al obtener planes:", str(e))
-        if 'conn' in locals():
-            conn.close()
         raise HTTPException(status_code=500, detail=f"Error al obtener planes: {str(e)}")
 
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag, cache_control=conditional.public_cache())
+    conditional.set_validators(response, etag, cache_control=conditional.public_cache())
+    return {"planes": catalogo["planes"]}
+
 @app.get("/planes/{plan_id}")
-def get_plan_by_id(plan_id: int):
-    """Obtener un plan específico por ID"""
+@querylog.max_queries(1)
+async def get_plan_by_id(plan_id: int, request: Request, response: Response):
+    """Obtener un plan específico por ID (desde la caché de catálogo, con ETag y Last-Modified)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, nombre, precio_mensual, caracteristicas, acceso_entrenador, activo, color_tema, orden_display, created_at, updated_at
-            FROM planes 
-            WHERE id =%s AND activo = 1
-        """, (plan_id,))
-
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Plan no encontrado")
-
-        # Parsear características JSON
-        import json
-        # Parsear características flexible (JSON string o estructura ya parseada)
-        caracteristicas = []
-        raw_car = row[3]
-        try:
-            if raw_car is None:
-                caracteristicas = []
-            elif isinstance(raw_car, (list, tuple)):
-                caracteristicas = list(raw_car)
-            elif isinstance(raw_car, (str, bytes)):
-                try:
-                    caracteristicas = json.loads(raw_car)
-                except Exception:
-                    caracteristicas = [raw_car] if raw_car else []
-            else:
-                caracteristicas = list(raw_car)
-        except Exception:
-            caracteristicas = []
-
-        plan = {
-            "id": row[0],
-            "nombre": row[1],
-            "descripcion": "",
-            "precio_mensual": float(row[2]) if row[2] is not None else 0.0,
-            "caracteristicas": caracteristicas,
-            "acceso_entrenador": bool(row[4]),
-            "activo": bool(row[5]),
-            "color_tema": row[6] or "#000000",
-            "orden_display": int(row[7]) if row[7] is not None else 0,
-            "created_at": row[8],
-            "updated_at": row[9],
-            "precio_anual": None,
-            "duracion_meses": 1,
-            "limite_clases": None,
-            "acceso_nutricionista": (row[1] or '').lower() in ['estándar', 'premium'],
-            "acceso_entrenador_personal": bool(row[4]),
-            "acceso_areas_premium": bool(row[4]),
-            "popular": (row[1] or '').lower() == 'estándar'
-        }
-
-        conn.close()
-        return plan
-        
-    except HTTPException:
-        raise
+        catalogo = await catalog_cache.get("planes", _cargar_planes)
     except Exception as e:
-        conn.close()
         raise HTTPException(status_code=500, detail=f"Error al obtener plan: {str(e)}")
 
+    plan = catalogo["por_id"].get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan no encontrado")
+
+    etag = conditional.content_etag(plan)
+    if conditional.is_not_modified(request, etag, plan["updated_at"]):
+        return conditional.not_modified(etag, plan["updated_at"], conditional.public_cache())
+    conditional.set_validators(response, etag, plan["updated_at"], conditional.public_cache())
+    return plan
+
 ## Endpoint para contratar un plan
 @app.post("/contract-plan")
 def contract_plan(req: ContractPlanRequest):
@@ -1117,101 +1249,222 @@ def contract_plan(req: ContractPlanRequest):
         raise HTTPException(status_code=500, detail=f"Error al contratar plan: {str(e)}")
 
 ## Endpoint para obtener todos los usuarios (solo para administradores)
+# Órdenes admitidos en GET /admin/users -> (expresión SQL de orden, tipo del valor en el cursor).
+# Cada uno tiene índice (valor, id) para paginar por clave (migración 0004).
+ADMIN_USERS_SORT = {
+    "id": ("u.id", "integer"),
+    "name": ("u.name", "text"),
+    "email": ("u.email", "text"),
+    "created_at": ("COALESCE(u.created_at, '-infinity'::timestamptz)", "timestamptz"),
+}
+ADMIN_USERS_MAX_LIMIT = 500
+
+def _encode_users_cursor(sort: str, order: str, key: str, user_id: int) -> str:
+    raw = json.dumps([sort, order, key, user_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_users_cursor(cursor_param: str, sort: str, order: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor_param + "=" * (-len(cursor_param) % 4))
+        cursor_sort, cursor_order, key, user_id = json.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginación no válido")
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(user_id, int):
+        raise HTTPException(status_code=400, detail="El cursor no corresponde a este orden")
+    return str(key), user_id
+
 @app.get("/admin/users")
-def get_all_users(response: Response):
+@querylog.max_queries(2)
+def get_all_users(
+    request: Request,
+    response: Response,
+    limit: int | None = None,
+    cursor: str | None = None,
+    role: str | None = None,
+    estado: str | None = None,
+    plan_id: int | None = None,
+    verified: bool | None = None,
+    sort: str = "id",
+    order: str = "asc",
+):
+    """
+    Listado de usuarios para administración, con sus datos de cliente y plan.
+
+    Query params:
+    - `role`, `estado` (del cliente), `plan_id`, `verified`: filtros opcionales.
+    - `sort` (`id`, `name`, `email`, `created_at`) y `order` (`asc`, `desc`).
+    - `limit`: tamaño de página (máximo 500). Sin él se devuelven todos los
+      usuarios, como antes. Con él la respuesta incluye `next_cursor` (null en
+      la última página) y `total_filtrados`; la página siguiente se pide con
+      `cursor=<next_cursor>` y los mismos filtros y orden.
+
+    `stats` cuenta siempre todos los usuarios, sin filtros ni paginación.
+    """
     print("[DEBUG] Obteniendo todos los usuarios para administración")
     
     # Agregar headers anti-cache
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
-    
+
+    if sort not in ADMIN_USERS_SORT:
+        raise HTTPException(status_code=400, detail=f"Orden no válido: {sort}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"Dirección de orden no válida: {order}")
+    if limit is not None and not 1 <= limit <= ADMIN_USERS_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {ADMIN_USERS_MAX_LIMIT}")
+    sort_expr, sort_type = ADMIN_USERS_SORT[sort]
+
+    # Filtros comunes al listado y al recuento filtrado
+    filters = []
+    params = []
+    if role is not None:
+        filters.append("u.role = %s")
+        params.append(role)
+    if verified is not None:
+        filters.append("(COALESCE(u.email_verified, 0) <> 0) = %s")
+        params.append(verified)
+    if estado is not None:
+        filters.append("c.estado = %s")
+        params.append(estado)
+    if plan_id is not None:
+        filters.append("c.plan_id = %s")
+        params.append(plan_id)
+    filter_sql = " AND ".join(filters) or "TRUE"
+
+    page_filters = list(filters)
+    page_params = list(params)
+    if cursor is not None:
+        key, last_id = _decode_users_cursor(cursor, sort, order)
+        page_filters.append(f"({sort_expr}, u.id) {'>' if order == 'asc' else '<'} (%s::{sort_type}, %s)")
+        page_params += [key, last_id]
+    page_sql = " AND ".join(page_filters) or "TRUE"
+    limit_sql = ""
+    if limit is not None:
+        # Una fila de más para saber si hay página siguiente
+        limit_sql = "LIMIT %s"
+        page_params.append(limit + 1)
+
     conn = get_db_connection()
-    cursor = conn.cursor()
+    db_cursor = conn.cursor()
     
     try:
-        # Obtener todos los usuarios con información básica
-        # Seleccionar los campos de fecha como texto para evitar que el driver
-        # intente parsear valores fuera de rango y lance excepciones.
-        cursor.execute("""
-            SELECT id, name, email, role, email_verified, created_at::text, updated_at::text
-            FROM users 
-            ORDER BY id ASC
-        """)
-        users_data = cursor.fetchall()
-        
-        users_list = []
-        
-        for user_row in users_data:
-            user_info = {
-                "id": user_row[0],
-                "name": user_row[1],
-                "email": user_row[2],
-                "role": user_row[3],
-                "email_verified": bool(user_row[4]),
-                "created_at": user_row[5],
-                "updated_at": user_row[6],
-                "cliente": None
-            }
-            
-            # Si es un cliente, obtener datos adicionales de la tabla clientes
-            if user_row[3] == "cliente":
-                cursor.execute("""
-                    SELECT id, dni, numero_telefono, plan_id, fecha_nacimiento::text, genero, 
-                           fecha_inscripcion::text, estado, created_at::text, updated_at::text
-                    FROM clientes 
-                    WHERE id_usuario = %s
-                """, (user_row[0],))
-                cliente_data = cursor.fetchone()
-                
-                if cliente_data:
-                    # Obtener nombre del plan
-                    cursor.execute("SELECT nombre FROM planes WHERE id = %s", (cliente_data[3],))
-                    plan_data = cursor.fetchone()
-                    plan_name = plan_data[0] if plan_data else "Sin plan"
-                    
-                    user_info["cliente"] = {
-                        "id": cliente_data[0],
-                        "dni": cliente_data[1],
-                        "numero_telefono": cliente_data[2],
-                        "plan_id": cliente_data[3],
-                        "plan_name": plan_name,
-                        "fecha_nacimiento": cliente_data[4],
-                        "genero": cliente_data[5],
-                        "fecha_inscripcion": cliente_data[6],
-                        "estado": cliente_data[7],
-                        "created_at": cliente_data[8],
-                        "updated_at": cliente_data[9]
-                    }
-            
-            users_list.append(user_info)
-        
-        # Calcular estadísticas
+        # Usuarios con su cliente y plan en una sola consulta. Las fechas se
+        # seleccionan como texto para evitar que el driver intente parsear
+        # valores fuera de rango y lance excepciones.
+        db_cursor.execute(f"""
+            SELECT u.id, u.name, u.email, u.role, COALESCE(u.email_verified, 0) <> 0,
+                   u.created_at::text, u.updated_at::text,
+                   c.id, c.dni, c.numero_telefono, c.plan_id, COALESCE(p.nombre, 'Sin plan'),
+                   c.fecha_nacimiento::text, c.genero, c.fecha_inscripcion::text, c.estado,
+                   c.created_at::text, c.updated_at::text,
+                   ({sort_expr})::text
+            FROM users u
+            LEFT JOIN clientes c ON c.id_usuario = u.id AND u.role = 'cliente'
+            LEFT JOIN planes p ON p.id = c.plan_id
+            WHERE {page_sql}
+            ORDER BY {sort_expr} {order}, u.id {order}
+            {limit_sql}
+        """, page_params)
+        rows = db_cursor.fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_users_cursor(sort, order, rows[-1][18], rows[-1][0])
+
+        users_list = [
+            UsuarioAdminRow(*row[:7], ClienteAdminRow(*row[7:18]) if row[7] is not None else None)
+            for row in rows
+        ]
+
+        # Estadísticas de todos los usuarios (y recuento con los filtros) en un solo agregado;
+        # clientes solo hace falta si se filtra por sus columnas
+        join_clientes = "LEFT JOIN clientes c ON c.id_usuario = u.id AND u.role = 'cliente'" if estado is not None or plan_id is not None else ""
+        db_cursor.execute(f"""
+            SELECT COUNT(*),
+                   COUNT(*) FILTER (WHERE u.role = 'admin'),
+                   COUNT(*) FILTER (WHERE u.role = 'entrenador'),
+                   COUNT(*) FILTER (WHERE u.role = 'cliente'),
+                   COUNT(*) FILTER (WHERE u.role = 'usuario'),
+                   COUNT(*) FILTER (WHERE COALESCE(u.email_verified, 0) <> 0),
+                   COUNT(*) FILTER (WHERE COALESCE(u.email_verified, 0) = 0),
+                   COUNT(*) FILTER (WHERE {filter_sql})
+            FROM users u
+            {join_clientes}
+        """, params)
+        total, admin, entrenador, cliente, usuario, verified_count, unverified, total_filtrados = db_cursor.fetchone()
         stats = {
-            "total": len(users_list),
-            "admin": len([u for u in users_list if u["role"] == "admin"]),
-            "entrenador": len([u for u in users_list if u["role"] == "entrenador"]),
-            "cliente": len([u for u in users_list if u["role"] == "cliente"]),
-            "usuario": len([u for u in users_list if u["role"] == "usuario"]),
-            "verified": len([u for u in users_list if u["email_verified"]]),
-            "unverified": len([u for u in users_list if not u["email_verified"]])
+            "total": total,
+            "admin": admin,
+            "entrenador": entrenador,
+            "cliente": cliente,
+            "usuario": usuario,
+            "verified": verified_count,
+            "unverified": unverified
         }
         
         conn.close()
         
-        return {
+        content = {
             "success": True,
             "users": users_list,
             "stats": stats
         }
+        if limit is not None:
+            content["total_filtrados"] = total_filtrados
+            content["next_cursor"] = next_cursor
+        return serialization.render(request, content, response)
         
     except Exception as e:
         conn.close()
         print(f"[ERROR] Error al obtener usuarios: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al obtener usuarios: {str(e)}")
 
+## Exportación masiva en streaming (solo para administradores)
+@app.get("/admin/export/{dataset}")
+async def exportar_datos(dataset: str, formato: str = "ndjson", desde: date | None = None, hasta: date | None = None):
+    """
+    Exporta `usuarios`, `reservas` o `entrenamientos` completos en NDJSON o CSV,
+    leyendo por lotes de un cursor en el servidor (ver export.py).
+
+    Query params:
+    - `formato`: `ndjson` (por defecto) o `csv`.
+    - `desde` / `hasta` (YYYY-MM-DD, inclusivas): alta del usuario, fecha de la
+      clase o fecha de realización, según el conjunto.
+    """
+    if dataset not in export.DATASETS:
+        raise HTTPException(status_code=404, detail=f"Exportación desconocida: {dataset}")
+    if formato not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no válido: {formato}")
+    if desde is not None and hasta is not None and desde > hasta:
+        raise HTTPException(status_code=400, detail="La fecha 'desde' es posterior a 'hasta'")
+
+    print(f"[DEBUG] Exportando {dataset} en {formato} (desde={desde}, hasta={hasta})")
+    slot = export.acquire_slot()
+    try:
+        conn = await get_async_db_connection()
+    except Exception as e:
+        slot.release()
+        print(f"[ERROR] Error al iniciar la exportación: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al iniciar la exportación: {str(e)}")
+
+    # A partir de aquí la conexión y el hueco son del generador, que los libera al
+    # terminar; la tarea de fondo los libera también si el generador no llega a
+    # arrancar (cliente desconectado antes de empezar a enviar).
+    return StreamingResponse(
+        export.stream(conn, slot, dataset, formato, desde, hasta),
+        background=BackgroundTask(export.finish, conn, slot),
+        media_type=export.FORMATS[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export.filename(dataset, formato, desde, hasta)}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
 ## Endpoint para obtener un usuario específico por ID (solo para administradores)
 @app.get("/admin/users/{user_id}")
+@querylog.max_queries(3)
 def get_user_by_id(user_id: int, response: Response):
     print(f"[DEBUG] Obteniendo usuario con ID: {user_id}")
     
@@ -1387,6 +1640,8 @@ def update_user(user_id: int, req: UpdateUserRequest, response: Response):
         try:
             conn.commit()
             print(f"[DEBUG] update_user: conn.commit() executed for user_id={user_id}")
+            # Nombre, email o rol pueden cambiar el listado de /entrenadores
+            catalog_cache.invalidate("entrenadores")
         except Exception as e:
             print(f"[ERROR] update_user: commit failed for user_id={user_id}: {e}")
             conn.rollback()
@@ -1656,24 +1911,16 @@ def update_user(user_id: int, req: UpdateUserRequest, response: Response):
 # ENDPOINTS DE TIPOS DE CLASES GIMNASIO
 # ----------------------------------------------------
 
-@app.get("/gym-clases")
-async def get_gym_clases(response: Response):
-    """
-    Obtener todos los tipos de clases activas del gimnasio
-    """
-    # Headers anti-cache
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache" 
-    response.headers["Expires"] = "0"
+async def _cargar_gym_clases() -> list:
+    """Tipos de clase activos ya formateados (cargador de la caché de catálogo)."""
+    print(f"[DEBUG] Obteniendo tipos de clases del gimnasio...")
     
+    conn = await get_async_db_connection()
     try:
-        print(f"[DEBUG] Obteniendo tipos de clases del gimnasio...")
-        
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Obtener todos los tipos de clases activas
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, nombre, descripcion, duracion_minutos, nivel, max_participantes, 
                    created_at, updated_at, color
             FROM gym_clases 
@@ -1681,79 +1928,99 @@ async def get_gym_clases(response: Response):
             ORDER BY nombre
         """)
         
-        clases = cursor.fetchall()
-        conn.close()
-        
-        # Formatear los datos
-        gym_clases = []
-        for clase in clases:
-            gym_clases.append({
-                "id": clase[0],
-                "nombre": clase[1], 
-                "descripcion": clase[2],
-                "duracion_minutos": clase[3],
-                "nivel": clase[4],
-                "max_participantes": clase[5],
-                "created_at": clase[6],
-                "updated_at": clase[7],
-                "color": clase[8]
-            })
-        
-        print(f"[DEBUG] Se encontraron {len(gym_clases)} tipos de clases activas")
-        
-        return gym_clases
-        
+        clases = await cursor.fetchall()
+    finally:
+        await conn.close()
+    
+    # Formatear los datos
+    gym_clases = []
+    for clase in clases:
+        gym_clases.append({
+            "id": clase[0],
+            "nombre": clase[1], 
+            "descripcion": clase[2],
+            "duracion_minutos": clase[3],
+            "nivel": clase[4],
+            "max_participantes": clase[5],
+            "created_at": clase[6],
+            "updated_at": clase[7],
+            "color": clase[8]
+        })
+    
+    print(f"[DEBUG] Se encontraron {len(gym_clases)} tipos de clases activas")
+    return gym_clases
+
+
+@app.get("/gym-clases")
+@querylog.max_queries(1)
+async def get_gym_clases(request: Request, response: Response):
+    """
+    Obtener todos los tipos de clases activas del gimnasio (desde la caché de catálogo, con ETag)
+    """
+    try:
+        valor, etag = await catalog_cache.get_with_etag("gym_clases", _cargar_gym_clases)
     except Exception as e:
         print(f"[ERROR] Error al obtener tipos de clases: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al obtener tipos de clases: {str(e)}")
 
-@app.get("/entrenadores")
-async def get_entrenadores(response: Response):
-    """
-    Obtener todos los usuarios con rol de entrenador
-    """
-    # Headers anti-cache
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache" 
-    response.headers["Expires"] = "0"
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag, cache_control=conditional.public_cache())
+    conditional.set_validators(response, etag, cache_control=conditional.public_cache())
+    return valor
+
+async def _cargar_entrenadores() -> list:
+    """Usuarios con rol entrenador ya formateados (cargador de la caché de catálogo)."""
+    print(f"[DEBUG] Obteniendo entrenadores...")
     
+    conn = await get_async_db_connection()
     try:
-        print(f"[DEBUG] Obteniendo entrenadores...")
-        
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Obtener todos los usuarios con rol entrenador
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, name, email, role, created_at, updated_at
             FROM users 
             WHERE role = 'entrenador' 
             ORDER BY name
         """)
         
-        entrenadores_data = cursor.fetchall()
-        conn.close()
-        
-        # Formatear los datos
-        entrenadores = []
-        for entrenador in entrenadores_data:
-            entrenadores.append({
-                "id": entrenador[0],
-                "name": entrenador[1], 
-                "email": entrenador[2],
-                "role": entrenador[3],
-                "created_at": entrenador[4],
-                "updated_at": entrenador[5]
-            })
-        
-        print(f"[DEBUG] Se encontraron {len(entrenadores)} entrenadores")
-        
-        return entrenadores
-        
+        entrenadores_data = await cursor.fetchall()
+    finally:
+        await conn.close()
+    
+    # Formatear los datos
+    entrenadores = []
+    for entrenador in entrenadores_data:
+        entrenadores.append({
+            "id": entrenador[0],
+            "name": entrenador[1], 
+            "email": entrenador[2],
+            "role": entrenador[3],
+            "created_at": entrenador[4],
+            "updated_at": entrenador[5]
+        })
+    
+    print(f"[DEBUG] Se encontraron {len(entrenadores)} entrenadores")
+    return entrenadores
+
+
+@app.get("/entrenadores")
+@querylog.max_queries(1)
+async def get_entrenadores(request: Request, response: Response):
+    """
+    Obtener todos los usuarios con rol de entrenador (desde la caché de catálogo, con ETag)
+    """
+    try:
+        valor, etag = await catalog_cache.get_with_etag("entrenadores", _cargar_entrenadores)
     except Exception as e:
         print(f"[ERROR] Error al obtener entrenadores: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al obtener entrenadores: {str(e)}")
 
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag, cache_control=conditional.public_cache())
+    conditional.set_validators(response, etag, cache_control=conditional.public_cache())
+    return valor
+
 @app.post("/clases-programadas")
 async def guardar_clases_programadas(request: GuardarClasesRequest, response: Response):
     """
@@ -1767,7 +2034,7 @@ async def guardar_clases_programadas(request: GuardarClasesRequest, response: Re
     try:
         print(f"[DEBUG] Guardando {len(request.clases)} clases programadas...")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         clases_guardadas = []
@@ -1784,8 +2051,8 @@ async def guardar_clases_programadas(request: GuardarClasesRequest, response: Re
                     continue
                 
                 # Buscar el ID del instructor por su nombre
-                cursor.execute("SELECT id FROM users WHERE name = %s AND role = 'entrenador'", (clase.instructor,))
-                instructor_result = cursor.fetchone()
+                await cursor.execute("SELECT id FROM users WHERE name = %s AND role = 'entrenador'", (clase.instructor,))
+                instructor_result = await cursor.fetchone()
                 
                 if not instructor_result:
                     clases_con_error.append({
@@ -1797,8 +2064,8 @@ async def guardar_clases_programadas(request: GuardarClasesRequest, response: Re
                 id_instructor = instructor_result[0]
                 
                 # Obtener información de capacidad desde gym_clases usando ID
-                cursor.execute("SELECT max_participantes, nombre FROM gym_clases WHERE id = %s", (clase.idClase,))
-                capacidad_result = cursor.fetchone()
+                await cursor.execute("SELECT max_participantes, nombre FROM gym_clases WHERE id = %s", (clase.idClase,))
+                capacidad_result = await cursor.fetchone()
                 if not capacidad_result:
                     clases_con_error.append({
                         "clase": f"{clase.fecha} {clase.hora} - ID:{clase.idClase}",
@@ -1813,12 +2080,12 @@ async def guardar_clases_programadas(request: GuardarClasesRequest, response: Re
                 nombre_clase = capacidad_result[1]
                 
                 # Verificar si ya existe una clase con el mismo instructor, fecha y hora
-                cursor.execute("""
+                await cursor.execute("""
                     SELECT id FROM clases_programadas 
                     WHERE fecha =%s AND hora =%s AND id_instructor =%s AND estado = 'programada'
                 """, (clase.fecha, clase.hora, id_instructor))
                 
-                if cursor.fetchone():
+                if await cursor.fetchone():
                     clases_con_error.append({
                         "clase": f"{clase.fecha} {clase.hora} - {nombre_clase}",
                         "error": f"El instructor {clase.instructor} ya tiene una clase programada a esta hora"
@@ -1826,13 +2093,13 @@ async def guardar_clases_programadas(request: GuardarClasesRequest, response: Re
                     continue
                 
                 # Insertar la clase con el nuevo esquema
-                cursor.execute("""
+                await cursor.execute("""
                     INSERT INTO clases_programadas 
                     (fecha, hora, id_clase, id_instructor, capacidad_maxima)
                     VALUES (%s, %s, %s, %s, %s)
                     RETURNING id
                 """, (clase.fecha, clase.hora, clase.idClase, id_instructor, capacidad_maxima))
-                clase_row = cursor.fetchone()
+                clase_row = await cursor.fetchone()
                 clase_id = clase_row[0] if clase_row else None
                 clases_guardadas.append({
                     "id": clase_id,
@@ -1850,8 +2117,8 @@ async def guardar_clases_programadas(request: GuardarClasesRequest, response: Re
                     "error": str(e)
                 })
         
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
         
         print(f"[DEBUG] Guardadas: {len(clases_guardadas)} clases, Errores: {len(clases_con_error)}")
         
@@ -1866,12 +2133,13 @@ async def guardar_clases_programadas(request: GuardarClasesRequest, response: Re
         
     except Exception as e:
         if 'conn' in locals():
-            conn.close()
+            await conn.close()
         print(f"[ERROR] Error al guardar clases programadas: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al guardar clases: {str(e)}")
 
 @app.get("/clases-programadas")
-async def get_clases_programadas(response: Response, filter_future: bool = True):
+@querylog.max_queries(2)
+async def get_clases_programadas(request: Request, response: Response, filter_future: bool = True):
     """
     Obtener las clases programadas.
 
@@ -1879,80 +2147,67 @@ async def get_clases_programadas(response: Response, filter_future: bool = True)
     - `filter_future` (bool, default True): si True devuelve sólo clases futuras
       (comportamiento por defecto, usado por el cliente). Si False devuelve
       todas las clases (útil para la vista de calendario del admin).
+
+    Admite GET condicional: con un `If-None-Match` vigente responde 304 tras
+    una única consulta agregada, sin leer ni formatear las filas.
     """
-    # Headers anti-cache
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache" 
-    response.headers["Expires"] = "0"
-    
     try:
         print(f"[DEBUG] Obteniendo clases programadas...")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
-        # Construir la consulta, incluyendo condicionalmente el filtro de fecha/hora
-        base_query = """
-            SELECT cp.id, cp.fecha, cp.hora, cp.id_clase, gc.nombre as tipo_clase, gc.color,
-                   cp.id_instructor, u.name as instructor_nombre,
-                   cp.capacidad_maxima, cp.estado, 
-                   cp.created_at, cp.updated_at, gc.descripcion, gc.duracion_minutos,
-                   COALESCE(r.reservas_activas, 0) as reservas_activas
+        # Tablas y filtros comunes al validador y a la consulta principal,
+        # incluyendo condicionalmente el filtro de fecha/hora
+        from_where = """
             FROM clases_programadas cp
             JOIN gym_clases gc ON cp.id_clase = gc.id
             JOIN users u ON cp.id_instructor = u.id
-            LEFT JOIN (
-                SELECT id_clase_programada, COUNT(*) as reservas_activas
-                FROM reservas 
-                WHERE estado = 'activa'
-                GROUP BY id_clase_programada
-            ) r ON cp.id = r.id_clase_programada
             WHERE cp.estado IN ('activa', 'programada')
         """
 
         if filter_future:
             # Filtrar sólo clases futuras (comportamiento usado por cliente)
-            base_query += """
+            from_where += """
                 AND (cp.fecha > CURRENT_DATE 
                      OR (cp.fecha = CURRENT_DATE AND cp.hora > CURRENT_TIME))
             """
 
+        # Validador del GET condicional: número de clases, última modificación de
+        # clase, tipo de clase o instructor, y suma de un hash de (clase,
+        # reservas_activas). Reservar no cambia updated_at (ver migración 0002);
+        # el hash incluye el id para que mover una reserva de una clase a otra
+        # también cambie la suma.
+        await cursor.execute("""
+            SELECT COUNT(*), MAX(GREATEST(cp.updated_at, gc.updated_at, u.updated_at)),
+                   COALESCE(SUM(hashtextextended(cp.id || ':' || cp.reservas_activas, 0)), 0)
+        """ + from_where)
+        total, ultima_modificacion, version = await cursor.fetchone()
+        etag = conditional.make_etag("clases-programadas", filter_future, total, ultima_modificacion, version)
+        if conditional.is_not_modified(request, etag):
+            await conn.close()
+            return conditional.not_modified(etag)
+        conditional.set_validators(response, etag)
 
         logger.debug("/clases-programadas -> filter_future=%s", filter_future)
-        cursor.execute(base_query)
-        
-        clases_data = cursor.fetchall()
-        conn.close()
+        # Capacidad por defecto 15 si no está definida; participantes_actuales es el
+        # contador mantenido por trigger (ver reconcile.py)
+        cursor = conn.cursor(row_factory=class_row(ClaseProgramadaRow))
+        await cursor.execute("""
+            SELECT cp.id, cp.fecha, cp.hora, cp.id_clase, gc.nombre as tipo_clase, gc.color,
+                   cp.id_instructor, u.name as instructor_nombre,
+                   COALESCE(NULLIF(cp.capacidad_maxima, 0), 15) as capacidad_maxima,
+                   cp.reservas_activas as participantes_actuales,
+                   COALESCE(NULLIF(cp.capacidad_maxima, 0), 15) - cp.reservas_activas as plazas_libres,
+                   cp.estado, cp.created_at, cp.updated_at, gc.descripcion, gc.duracion_minutos
+        """ + from_where)
         
-        # Formatear los datos
-        clases_programadas = []
-        for clase in clases_data:
-            capacidad_maxima = clase[8] or 15  # Default 15 si no está definida
-            reservas_activas = clase[14]  # Número real de reservas activas (índice actualizado)
-            plazas_libres = capacidad_maxima - reservas_activas
-            
-            clases_programadas.append({
-                "id": clase[0],
-                "fecha": clase[1],
-                "hora": clase[2],
-                "id_clase": clase[3],
-                "tipo_clase": clase[4],
-                "color": clase[5],
-                "id_instructor": clase[6],
-                "instructor_nombre": clase[7],
-                "capacidad_maxima": capacidad_maxima,
-                "participantes_actuales": reservas_activas,  # Calculado dinámicamente desde reservas
-                "plazas_libres": plazas_libres,
-                "estado": clase[9],  # índice actualizado
-                "created_at": clase[10],  # índice actualizado
-                "updated_at": clase[11],  # índice actualizado 
-                "descripcion": clase[12],  # índice actualizado
-                "duracion_minutos": clase[13]  # índice actualizado
-            })
+        clases_programadas = await cursor.fetchall()
+        await conn.close()
         
         print(f"[DEBUG] Se encontraron {len(clases_programadas)} clases programadas")
         
-        return clases_programadas
+        return serialization.render(request, clases_programadas, response)
         
     except Exception as e:
         print(f"[ERROR] Error al obtener clases programadas: {str(e)}")
@@ -1971,23 +2226,23 @@ async def eliminar_clase_programada(clase_id: int, response: Response):
     try:
         print(f"[DEBUG] Eliminando clase programada con ID: {clase_id}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Verificar que la clase existe antes de eliminarla
-        cursor.execute("SELECT id, fecha, hora, id_clase FROM clases_programadas WHERE id = %s", (clase_id,))
-        clase_existente = cursor.fetchone()
+        await cursor.execute("SELECT id, fecha, hora, id_clase FROM clases_programadas WHERE id = %s", (clase_id,))
+        clase_existente = await cursor.fetchone()
         
         if not clase_existente:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail=f"Clase programada con ID {clase_id} no encontrada")
         
         # Eliminar la clase programada
-        cursor.execute("DELETE FROM clases_programadas WHERE id = %s", (clase_id,))
+        await cursor.execute("DELETE FROM clases_programadas WHERE id = %s", (clase_id,))
         filas_afectadas = cursor.rowcount
         
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
         
         if filas_afectadas > 0:
             print(f"[DEBUG] Clase programada {clase_id} eliminada exitosamente")
@@ -2010,76 +2265,90 @@ async def eliminar_clase_programada(clase_id: int, response: Response):
 
 ## Endpoints para reservas de clases
 
+# Reintentos de la transacción de reserva ante conflictos de concurrencia antes
+# de devolver 409. La transacción corre en READ COMMITTED (el nivel por defecto
+# de las conexiones del pool): ahí FOR UPDATE espera al bloqueo y relee la fila
+# ya confirmada, así que no hay fallos de serialización y lo que se reintenta
+# en la práctica son los interbloqueos (p. ej. con una cancelación o un borrado
+# de la clase que toman los bloqueos en otro orden). SerializationFailure solo
+# se daría si el servidor tuviera un default_transaction_isolation más estricto.
+RESERVA_MAX_INTENTOS = 3
+_CONFLICTOS_RESERVA = (psycopg.errors.SerializationFailure, psycopg.errors.DeadlockDetected)
+
+
 @app.post("/reservas")
+@querylog.max_queries(3 * RESERVA_MAX_INTENTOS)
 async def crear_reserva(request: CrearReservaRequest, response: Response):
     """
     Crear nueva reserva de clase
+
+    La plaza se toma en una única transacción corta: se bloquea la fila de la
+    clase programada (SELECT ... FOR UPDATE), se compara su contador de
+    reservas activas con la capacidad y se inserta; el trigger de reservas
+    incrementa el contador antes del commit. Las reservas simultáneas de una
+    misma clase se atienden de una en una (quien espera el bloqueo lee el
+    contador ya actualizado) y nunca se supera la capacidad; las de clases
+    distintas no se esperan entre sí.
     """
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
     
+    conn = None
     try:
         print(f"[DEBUG] Creando reserva - Cliente: {request.id_cliente}, Clase: {request.id_clase_programada}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
-        # Verificar que el cliente existe
-        cursor.execute("SELECT id FROM clientes WHERE id =%s", (request.id_cliente,))
-        cliente_existente = cursor.fetchone()
-        if not cliente_existente:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        
-        # Verificar que la clase existe y obtener información
-        cursor.execute("""
-            SELECT cp.id, cp.capacidad_maxima, gc.nombre as tipo_clase, cp.fecha, cp.hora
-            FROM clases_programadas cp
-            JOIN gym_clases gc ON cp.id_clase = gc.id
-            WHERE cp.id =%s AND cp.estado IN ('activa', 'programada')
-        """, (request.id_clase_programada,))
-        clase_existente = cursor.fetchone()
-        
-        if not clase_existente:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Clase programada no encontrada")
-        
-        # Contar reservas actuales para esta clase
-        cursor.execute("""
-            SELECT COUNT(*) FROM reservas 
-            WHERE id_clase_programada =%s AND estado = 'activa'
-        """, (request.id_clase_programada,))
-        reservas_actuales = cursor.fetchone()[0]
-        
-        capacidad_maxima = clase_existente[1] or 15  # Default 15 si no está definida
-        
-        # Verificar si hay plazas disponibles
-        if reservas_actuales >= capacidad_maxima:
-            conn.close()
-            raise HTTPException(status_code=400, detail="No hay plazas disponibles para esta clase")
-        
-        # Verificar que el cliente no tenga ya una reserva para esta clase
-        cursor.execute("""
-            SELECT id FROM reservas 
-            WHERE id_cliente =%s AND id_clase_programada =%s AND estado = 'activa'
-        """, (request.id_cliente, request.id_clase_programada))
-        reserva_existente = cursor.fetchone()
-        
-        if reserva_existente:
-            conn.close()
-            raise HTTPException(status_code=400, detail="Ya tienes una reserva activa para esta clase")
-        
-        # Crear la reserva
-        cursor.execute("""
-            INSERT INTO reservas (id_cliente, id_clase_programada, estado)
-            VALUES (%s, %s, 'activa')
-            RETURNING id
-        """, (request.id_cliente, request.id_clase_programada))
-        reserva_row = cursor.fetchone()
-        reserva_id = reserva_row[0] if reserva_row else None
-        conn.commit()
-        conn.close()
+        for intento in range(1, RESERVA_MAX_INTENTOS + 1):
+            try:
+                # Verificar que el cliente existe
+                await cursor.execute("SELECT id FROM clientes WHERE id =%s", (request.id_cliente,))
+                if not await cursor.fetchone():
+                    raise HTTPException(status_code=404, detail="Cliente no encontrado")
+                
+                # Verificar que la clase existe y bloquear su fila hasta el commit
+                await cursor.execute("""
+                    SELECT cp.id, cp.capacidad_maxima, gc.nombre as tipo_clase, cp.fecha, cp.hora,
+                           cp.reservas_activas
+                    FROM clases_programadas cp
+                    JOIN gym_clases gc ON cp.id_clase = gc.id
+                    WHERE cp.id =%s AND cp.estado IN ('activa', 'programada')
+                    FOR UPDATE OF cp
+                """, (request.id_clase_programada,))
+                clase_existente = await cursor.fetchone()
+                
+                if not clase_existente:
+                    raise HTTPException(status_code=404, detail="Clase programada no encontrada")
+                
+                capacidad_maxima = clase_existente[1] or 15  # Default 15 si no está definida
+                
+                # Verificar si hay plazas disponibles
+                if clase_existente[5] >= capacidad_maxima:
+                    raise HTTPException(status_code=400, detail="No hay plazas disponibles para esta clase")
+                
+                # Crear la reserva. Si el cliente ya tiene una para esta clase la
+                # rechaza la restricción UNIQUE(id_cliente, id_clase_programada).
+                await cursor.execute("""
+                    INSERT INTO reservas (id_cliente, id_clase_programada, estado)
+                    VALUES (%s, %s, 'activa')
+                    RETURNING id
+                """, (request.id_cliente, request.id_clase_programada))
+                reserva_row = await cursor.fetchone()
+                reserva_id = reserva_row[0] if reserva_row else None
+                await conn.commit()
+                break
+            except _CONFLICTOS_RESERVA as e:
+                await conn.rollback()
+                if intento == RESERVA_MAX_INTENTOS:
+                    print(f"[ERROR] Conflicto persistente al reservar la clase {request.id_clase_programada}: {str(e)}")
+                    raise HTTPException(status_code=409, detail="La clase está muy solicitada, inténtalo de nuevo")
+                print(f"[DEBUG] Conflicto al reservar (intento {intento}), reintentando")
+                await asyncio.sleep(0.01 * intento * random.random())
+            except psycopg.errors.UniqueViolation:
+                await conn.rollback()
+                raise HTTPException(status_code=400, detail="Ya tienes una reserva activa para esta clase")
         
         print(f"[DEBUG] Reserva creada exitosamente - ID: {reserva_id}")
         
@@ -2099,8 +2368,14 @@ async def crear_reserva(request: CrearReservaRequest, response: Response):
     except Exception as e:
         print(f"[ERROR] Error al crear reserva: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al crear reserva: {str(e)}")
+    finally:
+        # Devuelve la conexión (deshaciendo la transacción si quedó abierta) en
+        # cualquier salida, incluidas las HTTPException lanzadas dentro del bucle.
+        if conn is not None:
+            await conn.close()
 
 @app.get("/reservas/{id_cliente}")
+@querylog.max_queries(1)
 async def get_reservas_cliente(id_cliente: int, response: Response):
     """
     Obtener todas las reservas de un cliente (usando id_cliente)
@@ -2112,11 +2387,11 @@ async def get_reservas_cliente(id_cliente: int, response: Response):
     try:
         print(f"[DEBUG] Obteniendo reservas del cliente {id_cliente}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Obtener reservas del cliente con información de la clase
-        cursor.execute("""
+        await cursor.execute("""
             SELECT r.id, r.id_clase_programada, r.estado,
                    cp.fecha, cp.hora, gc.nombre as tipo_clase, gc.color,
                    u.name as instructor_nombre
@@ -2128,8 +2403,8 @@ async def get_reservas_cliente(id_cliente: int, response: Response):
             ORDER BY cp.fecha, cp.hora
         """, (id_cliente,))
         
-        reservas_data = cursor.fetchall()
-        conn.close()
+        reservas_data = await cursor.fetchall()
+        await conn.close()
         
         # Formatear los datos
         reservas = []
@@ -2156,6 +2431,7 @@ async def get_reservas_cliente(id_cliente: int, response: Response):
         raise HTTPException(status_code=500, detail=f"Error al obtener reservas: {str(e)}")
 
 @app.get("/user/{user_id}/reservas")
+@querylog.max_queries(1)
 async def get_reservas_por_usuario(user_id: int, response: Response):
     """
     Obtener todas las reservas de un cliente (usando user_id)
@@ -2167,11 +2443,11 @@ async def get_reservas_por_usuario(user_id: int, response: Response):
     try:
         print(f"[DEBUG] Obteniendo reservas del usuario {user_id}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Obtener reservas del usuario con información de la clase (JOIN con clientes)
-        cursor.execute("""
+        await cursor.execute("""
             WITH reservas_usuario AS (
                 SELECT r.id, r.id_clase_programada, r.estado,
                        cp.fecha, cp.hora, gc.nombre as tipo_clase, gc.color,
@@ -2186,8 +2462,8 @@ async def get_reservas_por_usuario(user_id: int, response: Response):
             SELECT * FROM reservas_usuario ORDER BY fecha, hora
         """, (user_id,))
         
-        reservas_data = cursor.fetchall()
-        conn.close()
+        reservas_data = await cursor.fetchall()
+        await conn.close()
         
         # Formatear los datos
         reservas = []
@@ -2249,31 +2525,31 @@ async def cancelar_reserva(reserva_id: int, response: Response):
     try:
         print(f"[DEBUG] Cancelando reserva {reserva_id}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Verificar que la reserva existe y está activa
-        cursor.execute("""
+        await cursor.execute("""
             SELECT r.id, r.id_cliente, cp.fecha, cp.hora, gc.nombre as tipo_clase
             FROM reservas r
             JOIN clases_programadas cp ON r.id_clase_programada = cp.id
             JOIN gym_clases gc ON cp.id_clase = gc.id
             WHERE r.id =%s AND r.estado = 'activa'
         """, (reserva_id,))
-        reserva_existente = cursor.fetchone()
+        reserva_existente = await cursor.fetchone()
         
         if not reserva_existente:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail="Reserva no encontrada o ya cancelada")
         
         # Eliminar la reserva completamente
-        cursor.execute("""
+        await cursor.execute("""
             DELETE FROM reservas WHERE id =%s
         """, (reserva_id,))
         
         filas_afectadas = cursor.rowcount
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
         
         if filas_afectadas > 0:
             print(f"[DEBUG] Reserva {reserva_id} eliminada exitosamente")
@@ -2309,11 +2585,11 @@ async def registrar_asistencia_clase(reserva_id: int, response: Response):
     try:
         print(f"[DEBUG] Registrando asistencia para reserva {reserva_id}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Verificar que la reserva existe y está activa
-        cursor.execute("""
+        await cursor.execute("""
             SELECT r.id, r.id_cliente, r.id_clase_programada, cp.fecha, cp.hora, 
                    gc.nombre as tipo_clase, gc.duracion_minutos,
                    u.name as instructor_nombre
@@ -2323,24 +2599,24 @@ async def registrar_asistencia_clase(reserva_id: int, response: Response):
             JOIN users u ON cp.id_instructor = u.id
             WHERE r.id =%s AND r.estado = 'activa'
         """, (reserva_id,))
-        reserva_info = cursor.fetchone()
+        reserva_info = await cursor.fetchone()
         
         if not reserva_info:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail="Reserva no encontrada o ya cancelada")
         
         # Extraer información de la reserva
         reserva_id_db, id_cliente, clase_programada_id, fecha, hora, tipo_clase, duracion_minutos, instructor = reserva_info
         
         # Solo marcar la reserva como completada
-        cursor.execute("""
+        await cursor.execute("""
             UPDATE reservas 
             SET estado = 'completada'
             WHERE id =%s
         """, (reserva_id,))
         
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
         
         print(f"[DEBUG] Asistencia registrada exitosamente para reserva {reserva_id}")
         
@@ -2366,6 +2642,7 @@ async def registrar_asistencia_clase(reserva_id: int, response: Response):
 # ====== ENDPOINTS PARA ASIGNACIONES ENTRENADOR-CLIENTE ======
 
 @app.get("/asignaciones-entrenador")
+@querylog.max_queries(2)
 async def get_asignaciones_entrenador(response: Response):
     """
     Obtener todas las asignaciones entrenador-cliente y clientes sin asignar que tengan plan con entrenador
@@ -2378,11 +2655,10 @@ async def get_asignaciones_entrenador(response: Response):
     try:
         print(f"[DEBUG] Obteniendo asignaciones entrenador-cliente...")
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Obtener todos los entrenadores con sus clientes asignados
-        cursor.execute("""
+        # Las dos consultas son independientes: se lanzan a la vez (fanout.py)
+        resultados = await fanout.run({
+            # Todos los entrenadores con sus clientes asignados
+            "entrenadores": fanout.Query("""
             SELECT 
                 u.id as entrenador_id,
                 u.name as entrenador_nombre,
@@ -2413,12 +2689,9 @@ async def get_asignaciones_entrenador(response: Response):
             WHERE u.role = 'entrenador'
             GROUP BY u.id, u.name, u.email
             ORDER BY u.name
-        """)
-        
-        entrenadores_data = cursor.fetchall()
-        
-        # Obtener clientes sin asignar que tengan plan estándar o premium (incluyen entrenador)
-        cursor.execute("""
+        """),
+            # Clientes sin asignar que tengan plan estándar o premium (incluyen entrenador)
+            "clientes_sin_asignar": fanout.Query("""
             SELECT 
                 u.id as id_cliente,
                 u.name as cliente_nombre,
@@ -2434,10 +2707,10 @@ async def get_asignaciones_entrenador(response: Response):
                 AND p.acceso_entrenador = 1
                 AND eca.id IS NULL
             ORDER BY u.name
-        """)
-        
-        clientes_sin_asignar_data = cursor.fetchall()
-        conn.close()
+        """),
+        })
+        entrenadores_data = resultados["entrenadores"]
+        clientes_sin_asignar_data = resultados["clientes_sin_asignar"]
         
         # Formatear datos de entrenadores
         entrenadores = []
@@ -2490,55 +2763,55 @@ async def asignar_entrenador(request: dict):
         
         print(f"[DEBUG] Asignando entrenador {id_entrenador} a cliente {id_cliente}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Verificar que el entrenador existe y es entrenador
-        cursor.execute("SELECT id, name FROM users WHERE id = %s AND role = 'entrenador'", (id_entrenador,))
-        entrenador = cursor.fetchone()
+        await cursor.execute("SELECT id, name FROM users WHERE id = %s AND role = 'entrenador'", (id_entrenador,))
+        entrenador = await cursor.fetchone()
         if not entrenador:
             raise HTTPException(status_code=404, detail="Entrenador no encontrado")
         
         # Verificar que el cliente existe, es cliente y tiene plan con entrenador
-        cursor.execute("""
+        await cursor.execute("""
             SELECT u.id, u.name, p.nombre 
             FROM users u
             JOIN clientes cl ON u.id = cl.id_usuario AND cl.estado = 'activo'
             JOIN planes p ON cl.plan_id = p.id
             WHERE u.id = %s AND u.role = 'cliente' AND p.acceso_entrenador = 1
         """, (id_cliente,))
-        cliente = cursor.fetchone()
+        cliente = await cursor.fetchone()
         if not cliente:
             raise HTTPException(status_code=404, detail="Cliente no encontrado o no tiene plan con entrenador")
         
         # Obtener el ID de cliente de la tabla clientes
-        cursor.execute("SELECT id FROM clientes WHERE id_usuario = %s", (id_cliente,))
-        cliente_row = cursor.fetchone()
+        await cursor.execute("SELECT id FROM clientes WHERE id_usuario = %s", (id_cliente,))
+        cliente_row = await cursor.fetchone()
         if not cliente_row:
             raise HTTPException(status_code=404, detail="Registro de cliente no encontrado")
         
         cliente_table_id = cliente_row[0]
         
         # Verificar que no existe una asignación activa
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id FROM entrenador_cliente_asignaciones 
             WHERE id_cliente = %s AND estado = 'activa'
         """, (cliente_table_id,))
-        asignacion_existente = cursor.fetchone()
+        asignacion_existente = await cursor.fetchone()
         if asignacion_existente:
             raise HTTPException(status_code=400, detail="El cliente ya tiene un entrenador asignado")
         
         # Crear la nueva asignación
-        cursor.execute("""
+        await cursor.execute("""
             INSERT INTO entrenador_cliente_asignaciones 
             (id_entrenador, id_cliente, notas) 
             VALUES (%s, %s, %s)
             RETURNING id
         """, (id_entrenador, cliente_table_id, notas))
-        asignacion_row = cursor.fetchone()
+        asignacion_row = await cursor.fetchone()
         asignacion_id = asignacion_row[0] if asignacion_row else None
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
         
         return {
             "success": True,
@@ -2563,11 +2836,11 @@ async def desasignar_entrenador(asignacion_id: int):
     try:
         print(f"[DEBUG] Desasignando entrenador - asignación ID: {asignacion_id}")
 
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
 
         # Verificar que la asignación existe y obtener nombres para respuesta
-        cursor.execute("""
+        await cursor.execute("""
             SELECT eca.id, u1.name as entrenador_nombre, u2.name as cliente_nombre
             FROM entrenador_cliente_asignaciones eca
             JOIN users u1 ON eca.id_entrenador = u1.id
@@ -2576,32 +2849,32 @@ async def desasignar_entrenador(asignacion_id: int):
             WHERE eca.id = %s
         """, (asignacion_id,))
 
-        asignacion = cursor.fetchone()
+        asignacion = await cursor.fetchone()
         if not asignacion:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail="Asignación no encontrada")
 
         _, entrenador_nombre, cliente_nombre = asignacion
 
         # Eliminar la asignación definitivamente
         try:
-            cursor.execute("DELETE FROM entrenador_cliente_asignaciones WHERE id = %s", (asignacion_id,))
+            await cursor.execute("DELETE FROM entrenador_cliente_asignaciones WHERE id = %s", (asignacion_id,))
             filas = cursor.rowcount
             if filas == 0:
-                conn.rollback()
-                conn.close()
+                await conn.rollback()
+                await conn.close()
                 raise HTTPException(status_code=500, detail="No se pudo eliminar la asignación")
         except Exception as e:
             try:
-                conn.rollback()
+                await conn.rollback()
             except Exception:
                 pass
-            conn.close()
+            await conn.close()
             print(f"[ERROR] Error eliminando asignación {asignacion_id}: {e}")
             raise HTTPException(status_code=500, detail=f"Error al desasignar entrenador: {e}")
 
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
 
         return {
             "success": True,
@@ -2619,9 +2892,23 @@ async def desasignar_entrenador(asignacion_id: int):
 # ====== ENDPOINTS PARA PANEL DE ENTRENADOR ======
 
 @app.get("/entrenador/{entrenador_id}/clientes")
+@querylog.max_queries(1)
 async def get_clientes_entrenador(entrenador_id: int, response: Response):
     """
-    Obtener todos los clientes asignados a un entrenador específico
+    Panel del entrenador: todos sus clientes asignados con su actividad real.
+
+    Por cliente, además de sus datos y los de la asignación:
+    - `last_activity`: último día con entrenamientos o clases (None si ninguno)
+    - `total_workouts`, `workouts_this_week`, `workouts_this_month`: entrenamientos
+      realizados en total, desde el lunes y desde el día 1 del mes
+    - `assignments_pending` (de ellos `assignments_overdue`, con fecha ya pasada)
+      y `assignments_completed`: entrenamientos asignados por este entrenador
+    - `classes_attended` / `classes_booked` y `attendance_rate` (%, None sin
+      reservas): reservas completadas frente a las de clases ya pasadas
+      (sin contar las de clases canceladas a las que no asistió)
+
+    Todo sale de una sola consulta por conjuntos (resumen diario de la migración
+    0006 e índices de la migración 0010), sin una petición de estadísticas por cliente.
     """
     # Headers anti-cache
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -2631,19 +2918,15 @@ async def get_clientes_entrenador(entrenador_id: int, response: Response):
     try:
         print(f"[DEBUG] Obteniendo clientes del entrenador {entrenador_id}...")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
-        # Verificar que el entrenador existe
-        cursor.execute("SELECT id, name FROM users WHERE id =%s AND role = 'entrenador'", (entrenador_id,))
-        entrenador = cursor.fetchone()
-        if not entrenador:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Entrenador no encontrado")
-        
-        # Obtener clientes asignados al entrenador con información completa
-        cursor.execute("""
+        # Entrenador y clientes asignados a la vez: el LEFT JOIN deja una fila
+        # con el entrenador y sin cliente si no tiene ninguno, y ninguna si no existe.
+        await cursor.execute("""
             SELECT 
+                e.id as entrenador_id,
+                e.name as entrenador_nombre,
                 u.id as cliente_user_id,
                 u.name as cliente_nombre,
                 u.email as cliente_email,
@@ -2654,42 +2937,94 @@ async def get_clientes_entrenador(entrenador_id: int, response: Response):
                 p.color_tema as plan_color,
                 eca.fecha_asignacion,
                 eca.notas,
-                eca.id as asignacion_id
-            FROM entrenador_cliente_asignaciones eca
-            JOIN clientes cl ON eca.id_cliente = cl.id AND cl.estado = 'activo'
-            JOIN users u ON cl.id_usuario = u.id
-            JOIN planes p ON cl.plan_id = p.id
-            WHERE eca.id_entrenador =%s AND eca.estado = 'activa'
+                eca.id as asignacion_id,
+                act.ultima_actividad,
+                act.total,
+                act.semana,
+                act.mes,
+                asig.pendientes,
+                asig.vencidos,
+                asig.completados,
+                res.asistidas,
+                res.reservadas
+            FROM users e
+            LEFT JOIN (
+                entrenador_cliente_asignaciones eca
+                JOIN clientes cl ON eca.id_cliente = cl.id AND cl.estado = 'activo'
+                JOIN users u ON cl.id_usuario = u.id
+                JOIN planes p ON cl.plan_id = p.id
+                -- Entrenamientos realizados por día y ejercicio; último día también con clases
+                CROSS JOIN LATERAL (
+                    SELECT GREATEST(
+                               MAX(a.fecha),
+                               (SELECT MAX(ac.fecha) FROM actividad_diaria_clases ac WHERE ac.id_cliente = cl.id)
+                           ) AS ultima_actividad,
+                           COALESCE(SUM(a.registros), 0) AS total,
+                           COALESCE(SUM(a.registros) FILTER (WHERE a.fecha >= date_trunc('week', CURRENT_DATE)), 0) AS semana,
+                           COALESCE(SUM(a.registros) FILTER (WHERE a.fecha >= date_trunc('month', CURRENT_DATE)), 0) AS mes
+                    FROM actividad_diaria_ejercicios a
+                    WHERE a.id_cliente = cl.id
+                ) act
+                CROSS JOIN LATERAL (
+                    SELECT COUNT(*) FILTER (WHERE ea.estado = 'pendiente') AS pendientes,
+                           COUNT(*) FILTER (WHERE ea.estado = 'pendiente' AND ea.fecha_entrenamiento < CURRENT_DATE) AS vencidos,
+                           COUNT(*) FILTER (WHERE ea.estado = 'completado') AS completados
+                    FROM entrenamientos_asignados ea
+                    WHERE ea.id_entrenador = eca.id_entrenador AND ea.id_cliente = cl.id
+                ) asig
+                CROSS JOIN LATERAL (
+                    SELECT COUNT(*) FILTER (WHERE r.estado = 'completada') AS asistidas,
+                           COUNT(*) AS reservadas
+                    FROM reservas r
+                    JOIN clases_programadas cp ON cp.id = r.id_clase_programada
+                    WHERE r.id_cliente = cl.id
+                      AND (r.estado = 'completada'
+                           OR (r.estado = 'activa' AND cp.fecha < CURRENT_DATE AND cp.estado <> 'cancelada'))
+                ) res
+            ) ON eca.id_entrenador = e.id AND eca.estado = 'activa'
+            WHERE e.id =%s AND e.role = 'entrenador'
             ORDER BY u.name
         """, (entrenador_id,))
         
-        clientes_data = cursor.fetchall()
+        clientes_data = await cursor.fetchall()
+        await conn.close()
+
+        if not clientes_data:
+            raise HTTPException(status_code=404, detail="Entrenador no encontrado")
+        entrenador = clientes_data[0][:2]
         
         # Formatear datos de clientes
         clientes = []
         for cliente in clientes_data:
-            # Calcular estadísticas básicas del cliente (puedes expandir esto)
+            if cliente[2] is None:
+                continue
+            asistidas, reservadas = cliente[20], cliente[21]
             cliente_info = {
-                "id": cliente[0],  # user_id para compatibilidad con frontend
-                "id_cliente": cliente[3],  # id de tabla clientes
-                "name": cliente[1],
-                "email": cliente[2],
-                "fecha_inscripcion": cliente[4],
-                "estado": cliente[5],
-                "plan_nombre": cliente[6],
-                "plan_color": cliente[7],
-                "fecha_asignacion": cliente[8],
-                "notas": cliente[9],
-                "asignacion_id": cliente[10],
-                # Datos simulados por ahora - puedes agregar tablas de entrenamientos después
-                "last_activity": cliente[4],  # Por ahora usar fecha_inscripcion
-                "total_workouts": 0,  # Por ahora 0, expandir después
-                "status": "activo" if cliente[5] == "activo" else "inactivo"
+                "id": cliente[2],  # user_id para compatibilidad con frontend
+                "id_cliente": cliente[5],  # id de tabla clientes
+                "name": cliente[3],
+                "email": cliente[4],
+                "fecha_inscripcion": cliente[6],
+                "estado": cliente[7],
+                "plan_nombre": cliente[8],
+                "plan_color": cliente[9],
+                "fecha_asignacion": cliente[10],
+                "notas": cliente[11],
+                "asignacion_id": cliente[12],
+                "last_activity": cliente[13],
+                "total_workouts": int(cliente[14]),
+                "workouts_this_week": int(cliente[15]),
+                "workouts_this_month": int(cliente[16]),
+                "assignments_pending": cliente[17],
+                "assignments_overdue": cliente[18],
+                "assignments_completed": cliente[19],
+                "classes_attended": asistidas,
+                "classes_booked": reservadas,
+                "attendance_rate": round(asistidas / reservadas * 100, 1) if reservadas else None,
+                "status": "activo" if cliente[7] == "activo" else "inactivo"
             }
             clientes.append(cliente_info)
         
-        conn.close()
-        
         # Calcular estadísticas generales
         total_clientes = len(clientes)
         clientes_activos = len([c for c in clientes if c["status"] == "activo"])
@@ -2705,7 +3040,11 @@ async def get_clientes_entrenador(entrenador_id: int, response: Response):
             "estadisticas": {
                 "total_clientes": total_clientes,
                 "clientes_activos": clientes_activos,
-                "clientes_inactivos": clientes_inactivos
+                "clientes_inactivos": clientes_inactivos,
+                "entrenamientos_esta_semana": sum(c["workouts_this_week"] for c in clientes),
+                "entrenamientos_este_mes": sum(c["workouts_this_month"] for c in clientes),
+                "asignaciones_pendientes": sum(c["assignments_pending"] for c in clientes),
+                "asignaciones_completadas": sum(c["assignments_completed"] for c in clientes),
             }
         }
         
@@ -2716,10 +3055,26 @@ async def get_clientes_entrenador(entrenador_id: int, response: Response):
         raise HTTPException(status_code=500, detail=f"Error al obtener clientes del entrenador: {str(e)}")
 
 
+ENTRENADOR_SEMANAS = 12
+
 @app.get("/entrenador/{entrenador_id}/estadisticas")
-async def get_estadisticas_entrenador(entrenador_id: int, response: Response):
+@querylog.max_queries(4)
+async def get_estadisticas_entrenador(entrenador_id: int, request: Request, response: Response):
     """
     Obtener estadísticas generales del entrenador
+
+    Los indicadores de entrenamientos salen del resumen semanal por entrenador
+    (migración 0011, ver trainer_rollup.py), que mantienen los triggers al
+    asignar (guardar_plan_entrenamiento) y al registrar (registrar_actividad):
+    se leen el total, las semanas futuras ya planificadas y las últimas 12,
+    así que el coste no crece con el historial. Hasta la semana actual incluida:
+    - `tasa_completado`: % de asignaciones no canceladas ya completadas
+    - `adherencia_plan`: % de series asignadas (no canceladas) realizadas
+    - `volumen_semanal`: por semana (lunes), asignados, completados,
+      realizados y volumen de las últimas 12 semanas, la actual la última
+    `total_entrenamientos`, `entrenamientos_esta_semana` y
+    `promedio_entrenamientos` (media de las 12 semanas anteriores a la actual)
+    cuentan los entrenamientos realizados de sus planes.
     """
     # Headers anti-cache
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -2728,38 +3083,72 @@ async def get_estadisticas_entrenador(entrenador_id: int, response: Response):
     
     try:
         print(f"[DEBUG] Obteniendo estadísticas del entrenador {entrenador_id}...")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verificar que el entrenador existe
-        cursor.execute("SELECT id, name FROM users WHERE id =%s AND role = 'entrenador'", (entrenador_id,))
-        entrenador = cursor.fetchone()
-        if not entrenador:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Entrenador no encontrado")
-        
-        # Obtener estadísticas básicas
-        cursor.execute("""
-            SELECT COUNT(*) as total_clientes
-            FROM entrenador_cliente_asignaciones eca
-            JOIN clientes cl ON eca.id_cliente = cl.id AND cl.estado = 'activo'
-            WHERE eca.id_entrenador =%s AND eca.estado = 'activa'
-        """, (entrenador_id,))
-        total_clientes = cursor.fetchone()[0]
-        
-        # Obtener distribución por planes
-        cursor.execute("""
+
+        hoy = date.today()
+        semana_actual = hoy - timedelta(days=hoy.weekday())
+        semanas = [semana_actual - timedelta(weeks=n) for n in range(ENTRENADOR_SEMANAS, -1, -1)]
+        params = {"entrenador": entrenador_id, "semana": semana_actual, "desde": semanas[0]}
+        
+        # Comprobación del entrenador y estadísticas a la vez (fanout.py); las
+        # estadísticas de un id que no es entrenador se descartan.
+        resultados = await fanout.run({
+            "entrenador": fanout.Query(
+                "SELECT id, name FROM users WHERE id =%(entrenador)s AND role = 'entrenador'", params, fetch="one"
+            ),
+            # Distribución por planes (su suma es el total de clientes)
+            "distribucion_planes": fanout.Query("""
             SELECT p.nombre, COUNT(*) as cantidad
             FROM entrenador_cliente_asignaciones eca
             JOIN clientes cl ON eca.id_cliente = cl.id AND cl.estado = 'activo'
             JOIN planes p ON cl.plan_id = p.id
-            WHERE eca.id_entrenador =%s AND eca.estado = 'activa'
+            WHERE eca.id_entrenador =%(entrenador)s AND eca.estado = 'activa'
             GROUP BY p.nombre
-        """, (entrenador_id,))
-        distribucion_planes = cursor.fetchall()
-        
-        conn.close()
+        """, params),
+            # Totales hasta la semana actual: el total menos lo ya planificado para después
+            "totales": fanout.Query("""
+            SELECT COALESCE(t.asignados, 0) - f.asignados,
+                   COALESCE(t.completados, 0) - f.completados,
+                   COALESCE(t.cancelados, 0) - f.cancelados,
+                   COALESCE(t.series_asignadas, 0) - f.series_asignadas,
+                   COALESCE(t.realizados, 0) - f.realizados,
+                   COALESCE(t.series_realizadas, 0) - f.series_realizadas
+            FROM (SELECT %(entrenador)s::integer AS id_entrenador) e
+            LEFT JOIN actividad_total_entrenador t ON t.id_entrenador = e.id_entrenador
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(SUM(asignados), 0) AS asignados, COALESCE(SUM(completados), 0) AS completados,
+                       COALESCE(SUM(cancelados), 0) AS cancelados, COALESCE(SUM(series_asignadas), 0) AS series_asignadas,
+                       COALESCE(SUM(realizados), 0) AS realizados, COALESCE(SUM(series_realizadas), 0) AS series_realizadas
+                FROM actividad_semanal_entrenador
+                WHERE id_entrenador = e.id_entrenador AND semana > %(semana)s
+            ) f
+        """, params, fetch="one"),
+            "semanas": fanout.Query("""
+            SELECT semana, asignados, completados, cancelados, realizados, volumen
+            FROM actividad_semanal_entrenador
+            WHERE id_entrenador =%(entrenador)s AND semana BETWEEN %(desde)s AND %(semana)s
+        """, params),
+        })
+        entrenador = resultados["entrenador"]
+        if not entrenador:
+            raise HTTPException(status_code=404, detail="Entrenador no encontrado")
+        distribucion_planes = resultados["distribucion_planes"]
+        total_clientes = sum(plan[1] for plan in distribucion_planes)
+        asignados, completados, cancelados, series_asignadas, realizados, series_realizadas = resultados["totales"]
+        por_semana = {fila[0]: fila for fila in resultados["semanas"]}
+
+        volumen_semanal = []
+        for semana in semanas[1:]:
+            fila = por_semana.get(semana)
+            volumen_semanal.append({
+                "semana": semana,
+                "asignados": fila[1] - fila[3] if fila else 0,
+                "completados": fila[2] if fila else 0,
+                "realizados": fila[4] if fila else 0,
+                "volumen": float(fila[5]) if fila else 0.0,
+            })
+        # Semanas completas anteriores a la actual (la primera solo se usa aquí)
+        anteriores = [por_semana[s][4] if s in por_semana else 0 for s in semanas[:-1]]
+        vigentes = asignados - cancelados
         
         # Formatear estadísticas
         estadisticas = {
@@ -2770,20 +3159,24 @@ async def get_estadisticas_entrenador(entrenador_id: int, response: Response):
                 {"plan": plan[0], "cantidad": plan[1]} 
                 for plan in distribucion_planes
             ],
-            # Estadísticas expandibles para el futuro
-            "total_entrenamientos": 0,  # Expandir cuando tengas tabla de entrenamientos
-            "entrenamientos_esta_semana": 0,
-            "promedio_entrenamientos": 0.0
+            "total_entrenamientos": realizados,
+            "entrenamientos_esta_semana": volumen_semanal[-1]["realizados"],
+            "promedio_entrenamientos": round(sum(anteriores) / len(anteriores), 1),
+            "entrenamientos_asignados": vigentes,
+            "entrenamientos_completados": completados,
+            "tasa_completado": round(completados / vigentes * 100, 1) if vigentes else None,
+            "adherencia_plan": round(series_realizadas / series_asignadas * 100, 1) if series_asignadas else None,
+            "volumen_semanal": volumen_semanal,
         }
         
-        return {
+        return serialization.render(request, {
             "success": True,
             "entrenador": {
                 "id": entrenador[0],
                 "name": entrenador[1]
             },
             "estadisticas": estadisticas
-        }
+        }, response)
         
     except HTTPException:
         raise
@@ -2791,60 +3184,71 @@ async def get_estadisticas_entrenador(entrenador_id: int, response: Response):
         print(f"[ERROR] Error al obtener estadísticas del entrenador: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas del entrenador: {str(e)}")
 
-@app.get("/ejercicios")
-async def get_ejercicios(response: Response):
-    """
-    Obtener todos los ejercicios disponibles
-    """
-    # Headers anti-cache
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache" 
-    response.headers["Expires"] = "0"
+async def _cargar_ejercicios() -> dict:
+    """Ejercicios activos ya formateados (cargador de la caché de catálogo)."""
+    print("[DEBUG] Obteniendo ejercicios...")
     
+    conn = await get_async_db_connection()
     try:
-        print("[DEBUG] Obteniendo ejercicios...")
-        
-        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Obtener todos los ejercicios activos
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, nombre, categoria, descripcion
             FROM ejercicios 
             WHERE estado = 'activo'
             ORDER BY categoria, nombre
         """)
         
-        ejercicios_data = cursor.fetchall()
-        conn.close()
-        
-        # Formatear datos de ejercicios
-        ejercicios = []
-        for ejercicio in ejercicios_data:
-            ejercicio_info = {
-                "id": ejercicio[0],
-                "nombre": ejercicio[1],
-                "categoria": ejercicio[2],
-                "descripcion": ejercicio[3] or ""
-            }
-            ejercicios.append(ejercicio_info)
-        
-        return {
-            "success": True,
-            "ejercicios": ejercicios,
-            "total": len(ejercicios)
+        ejercicios_data = await cursor.fetchall()
+    finally:
+        await conn.close()
+    
+    # Formatear datos de ejercicios
+    ejercicios = []
+    for ejercicio in ejercicios_data:
+        ejercicio_info = {
+            "id": ejercicio[0],
+            "nombre": ejercicio[1],
+            "categoria": ejercicio[2],
+            "descripcion": ejercicio[3] or ""
         }
-        
+        ejercicios.append(ejercicio_info)
+    
+    return {
+        "success": True,
+        "ejercicios": ejercicios,
+        "total": len(ejercicios)
+    }
+
+
+@app.get("/ejercicios")
+@querylog.max_queries(1)
+async def get_ejercicios(request: Request, response: Response):
+    """
+    Obtener todos los ejercicios disponibles (desde la caché de catálogo, con ETag)
+    """
+    try:
+        valor, etag = await catalog_cache.get_with_etag("ejercicios", _cargar_ejercicios)
     except Exception as e:
         print(f"[ERROR] Error al obtener ejercicios: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al obtener ejercicios: {str(e)}")
 
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag, cache_control=conditional.public_cache())
+    conditional.set_validators(response, etag, cache_control=conditional.public_cache())
+    return valor
+
 
 @app.get("/admin/estadisticas")
+@querylog.max_queries(1)
 async def get_estadisticas_admin(response: Response):
     """
     Estadísticas agregadas para el panel de administración.
-    Devuelve totales globales, distribución por planes, top clases y top ejercicios.
+    Devuelve totales globales, distribución por planes, top clases y top ejercicios,
+    leídos del resumen precalculado, y `actualizado_en` con el momento en que se
+    calculó (se refresca cada ADMIN_SUMMARY_REFRESH segundos o con
+    POST /admin/estadisticas/refrescar).
     """
     # Anti-cache
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -2854,117 +3258,185 @@ async def get_estadisticas_admin(response: Response):
     try:
         print(f"[DEBUG] Obteniendo estadísticas globales para admin...")
 
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
 
-        # Totales básicos
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM clientes WHERE estado = 'activo'")
-        total_clientes = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'entrenador'")
-        total_entrenadores = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM planes WHERE activo = 1")
-        total_planes = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM reservas WHERE estado = 'activa'")
-        total_reservas_activas = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM reservas WHERE estado = 'completada'")
-        total_reservas_completadas = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM clases_programadas WHERE estado IN ('activa', 'programada')")
-        total_clases_programadas = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM entrenamientos_realizados")
-        total_entrenamientos_realizados = cursor.fetchone()[0]
-
-        # Distribución de clientes por plan
-        cursor.execute("""
-            SELECT p.id, p.nombre, COALESCE(COUNT(c.id), 0) as cantidad
-            FROM planes p
-            LEFT JOIN clientes c ON c.plan_id = p.id AND c.estado = 'activo'
-            GROUP BY p.id, p.nombre
-            ORDER BY cantidad DESC, p.nombre
-        """)
-        planes_data = cursor.fetchall()
-        planes = [{"id": row[0], "nombre": row[1], "clientes": row[2]} for row in planes_data]
-
-        # Top clases por reservas completadas
-        cursor.execute("""
-            SELECT gc.nombre, COUNT(*) as reservas
-            FROM reservas r
-            JOIN clases_programadas cp ON r.id_clase_programada = cp.id
-            JOIN gym_clases gc ON cp.id_clase = gc.id
-            WHERE r.estado = 'completada'
-            GROUP BY gc.nombre
-            ORDER BY reservas DESC
-            LIMIT 10
-        """)
-        top_clases_data = cursor.fetchall()
-        top_clases = [{"nombre": row[0], "reservas": row[1]} for row in top_clases_data]
-
-        # Top ejercicios por frecuencia en entrenamientos_realizados
-        cursor.execute("""
-            SELECT e.nombre, COUNT(*) as frecuencia
-            FROM entrenamientos_realizados er
-            LEFT JOIN ejercicios e ON er.id_ejercicio = e.id
-            WHERE e.nombre IS NOT NULL
-            GROUP BY e.nombre
-            ORDER BY frecuencia DESC
-            LIMIT 10
-        """)
-        top_ejercicios_data = cursor.fetchall()
-        top_ejercicios = [{"nombre": row[0], "frecuencia": row[1]} for row in top_ejercicios_data]
-
-        # Nuevas inscripciones por mes (últimos 12 meses)
-        cursor.execute("""
-            SELECT to_char(DATE_TRUNC('month', fecha_inscripcion), 'YYYY-MM') as mes, COUNT(*)
-            FROM clientes
-            WHERE fecha_inscripcion IS NOT NULL
-            GROUP BY mes
-            ORDER BY mes DESC
-            LIMIT 12
-        """)
-        mensualidades = cursor.fetchall()
-        nuevos_por_mes = [{"mes": row[0], "cantidad": row[1]} for row in mensualidades]
-
-        conn.close()
+        # Resumen precalculado (vista materializada de la migración 0005, ver dashboard_summary.py)
+        try:
+            await cursor.execute("""
+                SELECT total_users, total_clientes, total_entrenadores, total_planes,
+                       total_reservas_activas, total_reservas_completadas, total_clases_programadas,
+                       total_entrenamientos_realizados, planes, top_clases, top_ejercicios,
+                       nuevos_por_mes, actualizado_en
+                FROM resumen_panel_admin
+                WHERE id = 1
+            """)
+            resumen = await cursor.fetchone()
+        except psycopg.errors.ObjectNotInPrerequisiteState:
+            # Vista sin datos (WITH NO DATA): igual que si no tuviera la fila
+            resumen = None
+
+        await conn.close()
+
+        if resumen is None:
+            # La tarea de refresco de dashboard_summary.py la rellena en su próxima pasada
+            raise HTTPException(
+                status_code=503,
+                detail="El resumen del panel de administración aún no está calculado; "
+                       "inténtalo en unos segundos o refréscalo con POST /admin/estadisticas/refrescar",
+                headers={"Retry-After": "10"},
+            )
 
         respuesta = {
             "success": True,
             "totales": {
-                "total_users": total_users,
-                "total_clientes": total_clientes,
-                "total_entrenadores": total_entrenadores,
-                "total_planes": total_planes,
-                "total_reservas_activas": total_reservas_activas,
-                "total_reservas_completadas": total_reservas_completadas,
-                "total_clases_programadas": total_clases_programadas,
-                "total_entrenamientos_realizados": total_entrenamientos_realizados
+                "total_users": resumen[0],
+                "total_clientes": resumen[1],
+                "total_entrenadores": resumen[2],
+                "total_planes": resumen[3],
+                "total_reservas_activas": resumen[4],
+                "total_reservas_completadas": resumen[5],
+                "total_clases_programadas": resumen[6],
+                "total_entrenamientos_realizados": resumen[7]
             },
-            "planes": planes,
-            "top_clases": top_clases,
-            "top_ejercicios": top_ejercicios,
-            "nuevos_por_mes": nuevos_por_mes
+            "planes": resumen[8],
+            "top_clases": resumen[9],
+            "top_ejercicios": resumen[10],
+            "nuevos_por_mes": resumen[11],
+            # Momento en que se calculó el resumen
+            "actualizado_en": resumen[12]
         }
 
         print(f"[DEBUG] /admin/estadisticas response: {respuesta}")
 
         return respuesta
 
+    except HTTPException:
+        raise
     except Exception as e:
         if 'conn' in locals():
             try:
-                conn.close()
+                await conn.close()
             except Exception:
                 pass
         print(f"[ERROR] Error al obtener estadísticas admin: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas admin: {str(e)}")
 
+@app.post("/admin/estadisticas/refrescar")
+async def refrescar_estadisticas_admin():
+    """Recalcula ya el resumen de /admin/estadisticas (esperando a un refresco en curso)."""
+    try:
+        conn = await get_async_db_connection()
+        try:
+            await dashboard_summary.refresh(conn, force=True)
+        finally:
+            await conn.close()
+        return {"success": True, "resumen": dashboard_summary.stats()}
+    except Exception as e:
+        print(f"[ERROR] Error al refrescar estadísticas admin: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al refrescar estadísticas admin: {str(e)}")
+
+ANALITICA_MAX_MESES = 60
+ANALITICA_MAX_SEMANAS = 260
+
+async def _informe_analitica(response: Response) -> dict:
+    """Informes del día de cohorts.py, con las cabeceras anti-cache de los endpoints de administración."""
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
+    try:
+        return await cohorts.report()
+    except Exception as e:
+        print(f"[ERROR] Error al calcular la analítica de administración: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al calcular la analítica de administración: {str(e)}")
+
+@app.get("/admin/analitica/retencion")
+@querylog.max_queries(6)
+async def get_analitica_retencion(request: Request, response: Response, meses: int = 12):
+    """
+    Retención por cohortes de inscripción (ver cohorts.py): para cada una de las
+    últimas `meses` cohortes mensuales (máximo 60), clientes, activos en cada mes
+    desde la inscripción (el primero es el de inscripción) y su porcentaje.
+    """
+    if not 1 <= meses <= ANALITICA_MAX_MESES:
+        raise HTTPException(status_code=400, detail=f"meses debe estar entre 1 y {ANALITICA_MAX_MESES}")
+    informe = await _informe_analitica(response)
+    return serialization.render(request, {
+        "success": True,
+        "fecha": informe["fecha"],
+        "calculado_en": informe["calculado_en"],
+        "cohortes": informe["retencion"][-meses:],
+    }, response)
+
+@app.get("/admin/analitica/activos-semanales")
+@querylog.max_queries(6)
+async def get_analitica_activos_semanales(request: Request, response: Response, semanas: int = 26):
+    """
+    Clientes con actividad en cada una de las últimas `semanas` semanas (lunes a
+    domingo, la actual incompleta; máximo 260) frente a los inscritos hasta el
+    final de cada una.
+    """
+    if not 1 <= semanas <= ANALITICA_MAX_SEMANAS:
+        raise HTTPException(status_code=400, detail=f"semanas debe estar entre 1 y {ANALITICA_MAX_SEMANAS}")
+    informe = await _informe_analitica(response)
+    return serialization.render(request, {
+        "success": True,
+        "fecha": informe["fecha"],
+        "calculado_en": informe["calculado_en"],
+        "semanas": informe["activos_semanales"][-semanas:],
+    }, response)
+
+@app.get("/admin/analitica/riesgo-abandono")
+@querylog.max_queries(6)
+async def get_analitica_riesgo_abandono(
+    request: Request, response: Response, nivel: str | None = None, limit: int = 50
+):
+    """
+    Riesgo de abandono de los clientes en estado activo: recuento por nivel
+    (`bajo`, `medio`, `alto`), por días sin actividad y los `limit` clientes
+    (máximo 500) con más riesgo. `nivel` filtra la lista dentro de esos 500.
+    """
+    if nivel is not None and nivel not in cohorts.NIVELES:
+        raise HTTPException(status_code=400, detail=f"Nivel no válido: {nivel}")
+    if not 1 <= limit <= cohorts.MAX_CLIENTES_RIESGO:
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {cohorts.MAX_CLIENTES_RIESGO}")
+    informe = await _informe_analitica(response)
+    riesgo = informe["riesgo_abandono"]
+    clientes = [c for c in riesgo["clientes"] if nivel is None or c["nivel"] == nivel]
+    return serialization.render(request, {
+        "success": True,
+        "fecha": informe["fecha"],
+        "calculado_en": informe["calculado_en"],
+        **riesgo,
+        "clientes": clientes[:limit],
+    }, response)
+
+@app.get("/admin/analitica/embudo-planes")
+@querylog.max_queries(6)
+async def get_analitica_embudo_planes(request: Request, response: Response):
+    """
+    Embudo de mejoras de plan: desde cada plan inicial, cuántos clientes han
+    llegado a cada plan igual o superior, y mejoras y bajadas registradas en
+    historial_planes (total y últimos 90 días).
+    """
+    informe = await _informe_analitica(response)
+    return serialization.render(request, {
+        "success": True,
+        "fecha": informe["fecha"],
+        "calculado_en": informe["calculado_en"],
+        **informe["embudo_planes"],
+    }, response)
+
+@app.post("/admin/analitica/refrescar")
+async def refrescar_analitica_admin():
+    """Recalcula ya los informes de /admin/analitica (normalmente se calculan una vez al día)."""
+    try:
+        await cohorts.report(force=True)
+        return {"success": True, "analitica": cohorts.stats()}
+    except Exception as e:
+        print(f"[ERROR] Error al refrescar la analítica de administración: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al refrescar la analítica de administración: {str(e)}")
+
 @app.post("/entrenador/{entrenador_id}/cliente/{id_cliente}/plan-entrenamiento")
 async def guardar_plan_entrenamiento(
     entrenador_id: int, 
@@ -2990,31 +3462,31 @@ async def guardar_plan_entrenamiento(
         if not entrenamientos:
             raise HTTPException(status_code=400, detail="No se proporcionaron entrenamientos")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Verificar que el entrenador existe
-        cursor.execute("SELECT id FROM users WHERE id =%s AND role = 'entrenador'", (entrenador_id,))
-        if not cursor.fetchone():
-            conn.close()
+        await cursor.execute("SELECT id FROM users WHERE id =%s AND role = 'entrenador'", (entrenador_id,))
+        if not await cursor.fetchone():
+            await conn.close()
             raise HTTPException(status_code=404, detail="Entrenador no encontrado")
         
         # Verificar que el cliente existe y obtener su id_cliente
-        cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id =%s", (id_cliente,))
-        cliente_row = cursor.fetchone()
+        await cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id =%s", (id_cliente,))
+        cliente_row = await cursor.fetchone()
         if not cliente_row:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
         cliente_real_id = cliente_row[0]  # Este es el ID real en la tabla clientes
         
         # Verificar que el cliente está asignado al entrenador
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id FROM entrenador_cliente_asignaciones 
             WHERE id_entrenador =%s AND id_cliente =%s AND estado = 'activa'
         """, (entrenador_id, cliente_real_id))
-        if not cursor.fetchone():
-            conn.close()
+        if not await cursor.fetchone():
+            await conn.close()
             raise HTTPException(status_code=403, detail="Cliente no asignado a este entrenador")
         
         # Insertar entrenamientos
@@ -3029,8 +3501,8 @@ async def guardar_plan_entrenamiento(
                 continue
             
             # Buscar el ID del ejercicio por nombre
-            cursor.execute("SELECT id FROM ejercicios WHERE nombre = %s AND estado = 'activo'", (ejercicio_nombre,))
-            ejercicio_row = cursor.fetchone()
+            await cursor.execute("SELECT id FROM ejercicios WHERE nombre = %s AND estado = 'activo'", (ejercicio_nombre,))
+            ejercicio_row = await cursor.fetchone()
             if not ejercicio_row:
                 print(f"[WARNING] Ejercicio no encontrado: {ejercicio_nombre}")
                 continue
@@ -3038,7 +3510,7 @@ async def guardar_plan_entrenamiento(
             ejercicio_id = ejercicio_row[0]
             
             # Insertar o actualizar entrenamiento asignado
-            cursor.execute("""
+            await cursor.execute("""
                 INSERT INTO entrenamientos_asignados 
                 (id_entrenador, id_cliente, id_ejercicio, fecha_entrenamiento, series, estado)
                 VALUES (%s, %s, %s, %s, %s, 'pendiente')
@@ -3046,7 +3518,7 @@ async def guardar_plan_entrenamiento(
                 DO UPDATE SET series = EXCLUDED.series
                 RETURNING id
             """, (entrenador_id, cliente_real_id, ejercicio_id, fecha, series))
-            entrenamiento_row = cursor.fetchone()
+            entrenamiento_row = await cursor.fetchone()
             entrenamiento_id = entrenamiento_row[0] if entrenamiento_row else None
             entrenamientos_guardados.append({
                 "id": entrenamiento_id,
@@ -3056,8 +3528,8 @@ async def guardar_plan_entrenamiento(
                 "estado": "pendiente"
             })
         
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
         
         if not entrenamientos_guardados:
             raise HTTPException(status_code=400, detail="No se pudieron guardar los entrenamientos")
@@ -3088,20 +3560,20 @@ async def get_entrenamientos_pendientes(cliente_user_id: int, response: Response
     try:
         print(f"[DEBUG] Obteniendo entrenamientos pendientes del cliente {cliente_user_id}...")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Obtener id_cliente real desde user_id
-        cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
-        cliente_row = cursor.fetchone()
+        await cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
+        cliente_row = await cursor.fetchone()
         if not cliente_row:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
         id_cliente = cliente_row[0]
         
         # Obtener entrenamientos pendientes con información del ejercicio
-        cursor.execute("""
+        await cursor.execute("""
             SELECT 
                 ea.id,
                 ea.fecha_entrenamiento,
@@ -3118,8 +3590,8 @@ async def get_entrenamientos_pendientes(cliente_user_id: int, response: Response
             ORDER BY ea.fecha_entrenamiento ASC
         """, (id_cliente,))
         
-        entrenamientos_data = cursor.fetchall()
-        conn.close()
+        entrenamientos_data = await cursor.fetchall()
+        await conn.close()
         
         # Formatear datos
         entrenamientos = []
@@ -3164,20 +3636,20 @@ async def get_entrenamientos_asignados(cliente_user_id: int, response: Response)
     try:
         print(f"[DEBUG] Obteniendo entrenamientos asignados del cliente {cliente_user_id}...")
 
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
 
         # Obtener id_cliente real desde user_id
-        cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
-        cliente_row = cursor.fetchone()
+        await cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
+        cliente_row = await cursor.fetchone()
         if not cliente_row:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
         id_cliente = cliente_row[0]
 
         # Obtener entrenamientos asignados con información del ejercicio (todos los estados)
-        cursor.execute("""
+        await cursor.execute("""
             SELECT 
                 ea.id,
                 ea.fecha_entrenamiento,
@@ -3195,8 +3667,8 @@ async def get_entrenamientos_asignados(cliente_user_id: int, response: Response)
             ORDER BY ea.fecha_entrenamiento ASC
         """, (id_cliente,))
 
-        entrenamientos_data = cursor.fetchall()
-        conn.close()
+        entrenamientos_data = await cursor.fetchall()
+        await conn.close()
 
         # Formatear datos
         entrenamientos = []
@@ -3242,14 +3714,14 @@ async def registrar_actividad(cliente_user_id: int, actividad_data: dict, respon
         print(f"[DEBUG] Registrando actividad del cliente {cliente_user_id}...")
         print(f"[DEBUG] Datos de actividad: {actividad_data}")
         
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
         
         # Obtener id_cliente real desde user_id
-        cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
-        cliente_row = cursor.fetchone()
+        await cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
+        cliente_row = await cursor.fetchone()
         if not cliente_row:
-            conn.close()
+            await conn.close()
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
         id_cliente = cliente_row[0]
@@ -3270,8 +3742,8 @@ async def registrar_actividad(cliente_user_id: int, actividad_data: dict, respon
         # Si la actividad corresponde a un entrenamiento asignado, preferir la fecha de la asignación
         if id_entrenamiento_asignado:
             try:
-                cursor.execute("SELECT fecha_entrenamiento FROM entrenamientos_asignados WHERE id = %s AND id_cliente = %s", (id_entrenamiento_asignado, id_cliente))
-                fila = cursor.fetchone()
+                await cursor.execute("SELECT fecha_entrenamiento FROM entrenamientos_asignados WHERE id = %s AND id_cliente = %s", (id_entrenamiento_asignado, id_cliente))
+                fila = await cursor.fetchone()
                 if fila and fila[0]:
                     fecha_realizacion = fila[0]
                     print(f"[DEBUG] Usando fecha_entrenamiento from asignado {id_entrenamiento_asignado}: {fecha_realizacion}")
@@ -3287,7 +3759,7 @@ async def registrar_actividad(cliente_user_id: int, actividad_data: dict, respon
         tipo_registro = "planificado" if id_entrenamiento_asignado else "libre"
         
         # Insertar registro de actividad
-        cursor.execute("""
+        await cursor.execute("""
             INSERT INTO entrenamientos_realizados 
             (id_cliente, id_ejercicio, id_entrenamiento_asignado, fecha_realizacion, 
              series_realizadas, repeticiones, peso_kg, tiempo_segundos, distancia_metros, 
@@ -3297,20 +3769,20 @@ async def registrar_actividad(cliente_user_id: int, actividad_data: dict, respon
         """, (id_cliente, id_ejercicio, id_entrenamiento_asignado, fecha_realizacion,
               series_realizadas, repeticiones, peso_kg, tiempo_segundos, distancia_metros,
               notas, valoracion, tipo_registro))
-        actividad_row = cursor.fetchone()
+        actividad_row = await cursor.fetchone()
         actividad_id = actividad_row[0] if actividad_row else None
         
         # Si es un entrenamiento planificado, actualizamos su estado a completado
         if id_entrenamiento_asignado:
-            cursor.execute("""
+            await cursor.execute("""
                 UPDATE entrenamientos_asignados
                 SET estado = 'completado'
                 WHERE id = %s
             """, (id_entrenamiento_asignado,))
             print(f"[DEBUG] Actualizado estado de entrenamiento asignado {id_entrenamiento_asignado} a completado")
         
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
         
         return {
             "success": True,
@@ -3336,34 +3808,34 @@ async def eliminar_entrenamiento_asignado(asignado_id: int, cliente_user_id: int
     response = response or Response()
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     try:
-        conn = get_db_connection()
+        conn = await get_async_db_connection()
         cursor = conn.cursor()
 
         # Si nos pasan cliente_user_id, resolver el id_cliente real
         if cliente_user_id is not None:
-            cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
-            cliente_row = cursor.fetchone()
+            await cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
+            cliente_row = await cursor.fetchone()
             if not cliente_row:
-                conn.close()
+                await conn.close()
                 raise HTTPException(status_code=404, detail="Cliente no encontrado")
             id_cliente = cliente_row[0]
             # Verificar que la asignación pertenece a ese cliente
-            cursor.execute("SELECT id FROM entrenamientos_asignados WHERE id = %s AND id_cliente = %s", (asignado_id, id_cliente))
-            if not cursor.fetchone():
-                conn.close()
+            await cursor.execute("SELECT id FROM entrenamientos_asignados WHERE id = %s AND id_cliente = %s", (asignado_id, id_cliente))
+            if not await cursor.fetchone():
+                await conn.close()
                 raise HTTPException(status_code=404, detail="Asignación no encontrada para este cliente")
         else:
             # Si no se pasó cliente_user_id, verificar que la asignación exista
-            cursor.execute("SELECT id FROM entrenamientos_asignados WHERE id = %s", (asignado_id,))
-            if not cursor.fetchone():
-                conn.close()
+            await cursor.execute("SELECT id FROM entrenamientos_asignados WHERE id = %s", (asignado_id,))
+            if not await cursor.fetchone():
+                await conn.close()
                 raise HTTPException(status_code=404, detail="Asignación no encontrada")
 
         # Borrar la asignación (las filas en entrenamientos_realizados que referencian a esta asignación tienen ON DELETE SET NULL)
-        cursor.execute("DELETE FROM entrenamientos_asignados WHERE id = %s", (asignado_id,))
+        await cursor.execute("DELETE FROM entrenamientos_asignados WHERE id = %s", (asignado_id,))
         filas = cursor.rowcount
-        conn.commit()
-        conn.close()
+        await conn.commit()
+        await conn.close()
 
         if filas > 0:
             return {"success": True, "message": "Asignación descartada correctamente", "id": asignado_id}
@@ -3374,209 +3846,191 @@ async def eliminar_entrenamiento_asignado(asignado_id: int, cliente_user_id: int
         raise
     except Exception as e:
         try:
-            conn.rollback()
+            await conn.rollback()
         except Exception:
             pass
         try:
-            conn.close()
+            await conn.close()
         except Exception:
             pass
         print(f"[ERROR] Error al eliminar asignación: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al eliminar asignación: {str(e)}")
 
 
+CLIENTE_REALIZADOS_MAX_LIMIT = 500
+
+def _rango_fechas_sql(columna: str, desde: date | None, hasta: date | None) -> str:
+    """Condiciones `AND ...` que limitan `columna` a [desde, hasta] (parámetros %(desde)s y %(hasta)s)."""
+    condiciones = ""
+    if desde is not None:
+        condiciones += f" AND {columna} >= %(desde)s"
+    if hasta is not None:
+        condiciones += f" AND {columna} <= %(hasta)s"
+    return condiciones
+
+def _validar_rango_fechas(desde: date | None, hasta: date | None):
+    if desde is not None and hasta is not None and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' no puede ser posterior a 'hasta'")
+
+def _encode_realizados_cursor(order: str, fecha: date, registro_id: int) -> str:
+    raw = json.dumps([order, fecha.isoformat(), registro_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_realizados_cursor(cursor_param: str, order: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor_param + "=" * (-len(cursor_param) % 4))
+        cursor_order, fecha, registro_id = json.loads(raw)
+        fecha = date.fromisoformat(fecha)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginación no válido")
+    if cursor_order != order or not isinstance(registro_id, int):
+        raise HTTPException(status_code=400, detail="El cursor no corresponde a este orden")
+    return fecha, registro_id
+
 @app.get("/cliente/{cliente_user_id}/estadisticas")
-async def get_estadisticas_cliente(cliente_user_id: int, response: Response):
+@querylog.max_queries(4)
+async def get_estadisticas_cliente(
+    cliente_user_id: int,
+    request: Request,
+    response: Response,
+    desde: date | None = None,
+    hasta: date | None = None,
+    summary_only: bool = False,
+):
     """
     Agregación de estadísticas para la pantalla de cliente
     Devuelve métricas generales, estadísticas de clases y de ejercicios basadas en registros en la base de datos.
+
+    Query params:
+    - `desde`, `hasta` (YYYY-MM-DD, ambos incluidos): limitan al rango las
+      agregaciones, los días activos y el detalle. La racha es la que termina
+      hoy, o en `hasta` si es anterior, contando solo días del rango. Con
+      alguno de los dos la respuesta incluye `rango`.
+    - `summary_only`: omite `ejercicios_realizados` (todos los registros del
+      rango, uno por fila); se pueden pedir por páginas en
+      /cliente/{id}/ejercicios-realizados.
     """
     # Anti-cache
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
 
+    _validar_rango_fechas(desde, hasta)
+
     try:
         print(f"[DEBUG] Obteniendo estadísticas del cliente {cliente_user_id}...")
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Obtener id_cliente real desde user_id
-        cursor.execute("SELECT c.id FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %s", (cliente_user_id,))
-        cliente_row = cursor.fetchone()
-        if not cliente_row:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Cliente no encontrado")
-
-        id_cliente = cliente_row[0]
-
-        # 1) Obtener entrenamientos realizados (ejercicios)
-        cursor.execute("""
+        # Todas las consultas filtran por el user_id y se lanzan a la vez
+        # (fanout.py); la del cliente trae también nombre y email para la cabecera.
+        # Las agregaciones salen del resumen diario (migración 0006), así que
+        # cuestan según los días y ejercicios distintos, no según los registros,
+        # y se limitan al rango pidiendo solo esos días.
+        cliente_sql = "(SELECT c.id FROM clientes c WHERE c.id_usuario = %(user_id)s)"
+        params = {"user_id": cliente_user_id, "desde": desde, "hasta": hasta}
+        rango_sql = _rango_fechas_sql("a.fecha", desde, hasta)
+        consultas = {
+            "cliente": fanout.Query(
+                "SELECT c.id, u.name, u.email FROM clientes c JOIN users u ON c.id_usuario = u.id WHERE u.id = %(user_id)s",
+                params, fetch="one",
+            ),
+            # 1) Frecuencia por tipo de clase y por ejercicio, con duración de las
+            # clases y volumen y peso máximo de los ejercicios; más frecuentes primero
+            "actividad": fanout.Query(f"""
+            SELECT 'clase' AS tipo, gc.nombre, SUM(a.asistencias) AS frecuencia,
+                   SUM(a.asistencias * COALESCE(gc.duracion_minutos, 0)) AS total, NULL AS peso_maximo,
+                   MIN(a.fecha) AS primera_fecha
+            FROM actividad_diaria_clases a
+            JOIN gym_clases gc ON gc.id = a.id_clase
+            WHERE a.id_cliente = {cliente_sql}{rango_sql}
+            GROUP BY gc.nombre
+            UNION ALL
+            SELECT 'ejercicio', e.nombre, SUM(a.registros), SUM(a.volumen), MAX(a.peso_maximo), MIN(a.fecha)
+            FROM actividad_diaria_ejercicios a
+            LEFT JOIN ejercicios e ON e.id = a.id_ejercicio
+            WHERE a.id_cliente = {cliente_sql}{rango_sql}
+            GROUP BY e.nombre
+            ORDER BY tipo, frecuencia DESC, primera_fecha, nombre
+        """, params),
+            # 2) Calendario de días con actividad (migración 0007): días activos y
+            # racha actual salen de operaciones de bits (activity_calendar.py)
+            "calendario": fanout.Query(
+                f"SELECT inicio, dias FROM calendario_actividad WHERE id_cliente = {cliente_sql}",
+                params, fetch="one",
+            ),
+        }
+        if not summary_only:
+            # 3) Entrenamientos realizados (ejercicios), ya como registros de la respuesta
+            consultas["realizados"] = fanout.Query(f"""
             SELECT er.fecha_realizacion, er.series_realizadas, er.repeticiones, er.peso_kg,
-                   e.id as ejercicio_id, e.nombre as ejercicio_nombre, e.categoria,
+                   e.id as ejercicio_id, e.nombre as ejercicio_nombre, e.categoria as ejercicio_categoria,
                    er.notas, er.valoracion
             FROM entrenamientos_realizados er
             LEFT JOIN ejercicios e ON er.id_ejercicio = e.id
-            WHERE er.id_cliente = %s
-            ORDER BY er.fecha_realizacion ASC
-        """, (id_cliente,))
-        realizados = cursor.fetchall()
-
-        # 2) Obtener reservas completadas (clases)
-        cursor.execute("""
-            SELECT r.id, cp.fecha, gc.nombre as clase_nombre, gc.duracion_minutos
-            FROM reservas r
-            JOIN clases_programadas cp ON r.id_clase_programada = cp.id
-            JOIN gym_clases gc ON cp.id_clase = gc.id
-            WHERE r.id_cliente = %s AND r.estado = 'completada'
-            ORDER BY cp.fecha ASC
-        """, (id_cliente,))
-        reservas_completadas = cursor.fetchall()
-
-        # Cerrar conexión pronto
-        # Obtener también información del usuario (nombre y email) para la cabecera
-        try:
-            cursor.execute("SELECT u.name, u.email FROM users u JOIN clientes c ON c.id_usuario = u.id WHERE c.id = %s", (id_cliente,))
-            user_row = cursor.fetchone()
-            cliente_info = { 'name': user_row[0], 'email': user_row[1] } if user_row else { 'name': None, 'email': None }
-        except Exception:
-            cliente_info = { 'name': None, 'email': None }
-
-        conn.close()
-
-        # Procesar métricas generales
-        total_entrenamientos_realizados = len(realizados)
-        total_reservas_completadas = len(reservas_completadas)
-        total_actividades = total_entrenamientos_realizados + total_reservas_completadas
-
-        total_clases = total_reservas_completadas
-        total_ejercicios = total_entrenamientos_realizados
-
-        # Duración total de clases
-        duracion_total_clases = sum([row[3] or 0 for row in reservas_completadas])
-
-        # Fechas únicas con actividad (from both realizados.fecha_realizacion and reservas.fecha)
-        fechas_set = set()
-        for row in realizados:
-            fecha = row[0]
-            if fecha:
-                fechas_set.add(str(fecha))
-        for row in reservas_completadas:
-            fecha = row[1]
-            if fecha:
-                fechas_set.add(str(fecha))
-
-        dias_activos = len(fechas_set)
-
-        # Calcular racha actual (días consecutivos hasta hoy)
-        from datetime import datetime, timedelta, date
-
-        fechas_date_set = set()
-        for f in fechas_set:
-            try:
-                fechas_date_set.add(datetime.strptime(f, "%Y-%m-%d").date())
-            except Exception:
-                try:
-                    fechas_date_set.add(datetime.fromisoformat(f).date())
-                except Exception:
-                    pass
+            WHERE er.id_cliente = {cliente_sql}{_rango_fechas_sql("er.fecha_realizacion", desde, hasta)}
+            ORDER BY er.fecha_realizacion ASC, er.id ASC
+        """, params, row_factory=class_row(EjercicioRealizadoRow))
+        resultados = await fanout.run(consultas)
+        cliente_row = resultados["cliente"]
+        if not cliente_row:
+            raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
+        cliente_info = { 'name': cliente_row[1], 'email': cliente_row[2] }
+        calendario = activity_calendar.Calendar.from_row(*(resultados["calendario"] or (None, None)))
         hoy = date.today()
-        racha_actual = 0
-        dia_check = hoy
-        while True:
-            if dia_check in fechas_date_set:
-                racha_actual += 1
-                dia_check = dia_check - timedelta(days=1)
-            else:
-                break
-
-        # Estadísticas de clases (frecuencia y duración por tipo)
-        clases_map = {}
-        for row in reservas_completadas:
-            clase_nombre = row[2] or 'Clase'
-            dur = row[3] or 0
-            if clase_nombre not in clases_map:
-                clases_map[clase_nombre] = { 'count': 0, 'dur_total': 0 }
-            clases_map[clase_nombre]['count'] += 1
-            clases_map[clase_nombre]['dur_total'] += dur
-
+        if desde is None and hasta is None:
+            dias_activos = calendario.total_days()
+            racha_actual = calendario.current_streak(hoy)
+        else:
+            dias_activos = calendario.active_days(desde or date.min, hasta or date.max)
+            fin = min(hoy, hasta) if hasta is not None else hoy
+            racha_actual = calendario.current_streak(fin)
+            if desde is not None:
+                racha_actual = max(0, min(racha_actual, (fin - desde).days + 1))
+
+        # Estadísticas de clases (frecuencia y duración por tipo) y de ejercicios
+        # (frecuencia, peso máximo, volumen total), ya ordenadas por frecuencia
         estadisticas_clases = []
-        for nombre, data in clases_map.items():
-            estadisticas_clases.append({
-                'nombre': nombre,
-                'frecuencia': data['count'],
-                'duracionTotal': data['dur_total'],
-            })
+        estadisticas_ejercicios = []
+        for tipo, nombre, frecuencia, total, peso_maximo, _ in resultados["actividad"]:
+            if tipo == 'clase':
+                estadisticas_clases.append({
+                    'nombre': nombre or 'Clase',
+                    'frecuencia': frecuencia,
+                    'duracionTotal': int(total),
+                })
+            else:
+                estadisticas_ejercicios.append({
+                    'nombre': nombre or 'Ejercicio',
+                    'frecuencia': frecuencia,
+                    'pesoMaximo': float(peso_maximo) if peso_maximo is not None else 0,
+                    'volumenTotal': float(total),
+                })
 
-        # Ordenar por frecuencia descendente
-        estadisticas_clases.sort(key=lambda x: x['frecuencia'], reverse=True)
+        # Métricas generales
+        total_clases = sum(c['frecuencia'] for c in estadisticas_clases)
+        total_ejercicios = sum(e['frecuencia'] for e in estadisticas_ejercicios)
+        total_actividades = total_ejercicios + total_clases
+        duracion_total_clases = sum(c['duracionTotal'] for c in estadisticas_clases)
+        total_entrenamientos_realizados = total_ejercicios
+        total_reservas_completadas = total_clases
 
         # Añadir porcentaje relativo
         for c in estadisticas_clases:
             c['porcentaje'] = (c['frecuencia'] / total_clases * 100) if total_clases > 0 else 0
-
-        # Estadísticas de ejercicios (frecuencia, peso máximo, volumen total)
-        ejercicios_map = {}
-        for row in realizados:
-            # row now includes: fecha_realizacion, series_realizadas, repeticiones, peso_kg,
-            # ejercicio_id, ejercicio_nombre, ejercicio_categoria, notas, valoracion
-            fecha_real, series_realizadas, repeticiones, peso_kg, ej_id, ej_nombre, ej_categoria, notas, valoracion = row
-            nombre = ej_nombre or 'Ejercicio'
-            if nombre not in ejercicios_map:
-                ejercicios_map[nombre] = { 'count': 0, 'pesos': [], 'volumen': 0 }
-            ejercicios_map[nombre]['count'] += 1
-            if peso_kg:
-                try:
-                    ejercicios_map[nombre]['pesos'].append(float(peso_kg))
-                except Exception:
-                    pass
-            # volumen = peso * series * repeticiones
-            try:
-                s = float(series_realizadas) if series_realizadas else 0
-                rps = float(repeticiones) if repeticiones else 1
-                p = float(peso_kg) if peso_kg else 0
-                ejercicios_map[nombre]['volumen'] += p * s * rps
-            except Exception:
-                pass
-
-        estadisticas_ejercicios = []
-        for nombre, data in ejercicios_map.items():
-            estadisticas_ejercicios.append({
-                'nombre': nombre,
-                'frecuencia': data['count'],
-                'pesoMaximo': max(data['pesos']) if data['pesos'] else 0,
-                'volumenTotal': data['volumen']
-            })
-
-        estadisticas_ejercicios.sort(key=lambda x: x['frecuencia'], reverse=True)
-
-        total_ej = total_ejercicios if total_ejercicios > 0 else 0
         for e in estadisticas_ejercicios:
-            e['porcentaje'] = (e['frecuencia'] / total_ej * 100) if total_ej > 0 else 0
-
-        # Lista detallada de ejercicios realizados por el cliente (filas individuales)
-        ejercicios_realizados = []
-        for row in realizados:
-            # row: fecha_realizacion, series_realizadas, repeticiones, peso_kg,
-            # ejercicio_id, ejercicio_nombre, ejercicio_categoria, notas, valoracion
-            ejercicios_realizados.append({
-                'fecha_realizacion': row[0],
-                'series_realizadas': row[1],
-                'repeticiones': row[2],
-                'peso_kg': row[3],
-                'ejercicio_id': row[4],
-                'ejercicio_nombre': row[5],
-                'ejercicio_categoria': row[6],
-                'notas': row[7],
-                'valoracion': row[8]
-            })
+            e['porcentaje'] = (e['frecuencia'] / total_ejercicios * 100) if total_ejercicios > 0 else 0
 
         # Formar el objeto de respuesta
         respuesta = {
             'cliente': cliente_info,
             'success': True,
+        }
+        if desde is not None or hasta is not None:
+            respuesta['rango'] = {
+                'desde': desde.isoformat() if desde else None,
+                'hasta': hasta.isoformat() if hasta else None,
+            }
+        respuesta.update({
             'estadisticas_generales': {
                 'totalActividades': total_actividades,
                 'totalClases': total_clases,
@@ -3587,14 +4041,17 @@ async def get_estadisticas_cliente(cliente_user_id: int, response: Response):
             },
             'estadisticasClases': estadisticas_clases,
             'estadisticasEjercicios': estadisticas_ejercicios,
-            'ejercicios_realizados': ejercicios_realizados,
-            'total_registros': {
-                'entrenamientos_realizados': total_entrenamientos_realizados,
-                'reservas_completadas': total_reservas_completadas
-            }
+        })
+        if not summary_only:
+            # Lista detallada de ejercicios realizados por el cliente (filas individuales):
+            # los propios registros leídos, sin copiarlos a dicts
+            respuesta['ejercicios_realizados'] = resultados["realizados"]
+        respuesta['total_registros'] = {
+            'entrenamientos_realizados': total_entrenamientos_realizados,
+            'reservas_completadas': total_reservas_completadas
         }
 
-        return respuesta
+        return serialization.render(request, respuesta, response)
 
     except HTTPException:
         raise
@@ -3604,16 +4061,177 @@ async def get_estadisticas_cliente(cliente_user_id: int, response: Response):
 
 
 @app.get("/entrenador/estadisticas/{cliente_user_id}")
-async def get_estadisticas_entrenador_cliente(cliente_user_id: int, response: Response):
+async def get_estadisticas_entrenador_cliente(
+    cliente_user_id: int,
+    request: Request,
+    response: Response,
+    desde: date | None = None,
+    hasta: date | None = None,
+    summary_only: bool = False,
+):
     """
     Endpoint alias para que la interfaz de entrenador pueda solicitar
     las mismas estadísticas de un cliente sin conocer la ruta /cliente/...
+    (admite los mismos `desde`, `hasta` y `summary_only`).
     """
     # Reutilizar la lógica existente llamando a la función de cliente
     try:
-        return await get_estadisticas_cliente(cliente_user_id, response)
+        return await get_estadisticas_cliente(cliente_user_id, request, response, desde, hasta, summary_only)
     except HTTPException:
         raise
     except Exception as e:
         print(f"[ERROR] Error en alias /entrenador/estadisticas: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas: {str(e)}")
+
+
+@app.get("/cliente/{cliente_user_id}/ejercicios-realizados")
+@querylog.max_queries(1)
+async def get_ejercicios_realizados_cliente(
+    cliente_user_id: int,
+    request: Request,
+    response: Response,
+    desde: date | None = None,
+    hasta: date | None = None,
+    limit: int = 100,
+    cursor: str | None = None,
+    order: str = "asc",
+):
+    """
+    Detalle de los entrenamientos realizados por un cliente, por páginas.
+
+    Query params:
+    - `desde`, `hasta` (YYYY-MM-DD, ambos incluidos): rango de fechas opcional.
+    - `order`: `asc` (más antiguos primero, como en /estadisticas) o `desc`.
+    - `limit`: tamaño de página (máximo 500). La respuesta incluye
+      `next_cursor` (null en la última página); la siguiente se pide con
+      `cursor=<next_cursor>` y el mismo orden.
+    """
+    # Anti-cache
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
+
+    _validar_rango_fechas(desde, hasta)
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"Dirección de orden no válida: {order}")
+    if not 1 <= limit <= CLIENTE_REALIZADOS_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {CLIENTE_REALIZADOS_MAX_LIMIT}")
+
+    params = {"user_id": cliente_user_id, "desde": desde, "hasta": hasta, "limit": limit + 1}
+    filtros = _rango_fechas_sql("er.fecha_realizacion", desde, hasta)
+    if cursor is not None:
+        params["cursor_fecha"], params["cursor_id"] = _decode_realizados_cursor(cursor, order)
+        filtros += f" AND (er.fecha_realizacion, er.id) {'>' if order == 'asc' else '<'} (%(cursor_fecha)s, %(cursor_id)s)"
+
+    try:
+        print(f"[DEBUG] Obteniendo ejercicios realizados del cliente {cliente_user_id}...")
+
+        conn = await get_async_db_connection()
+        cursor_db = conn.cursor()
+
+        # Una fila por registro (una fila de más para saber si hay página
+        # siguiente); el cliente sin registros en la página devuelve una fila
+        # con el registro a NULL, y el que no existe ninguna.
+        await cursor_db.execute(f"""
+            SELECT c.id, er.id, er.fecha_realizacion, er.series_realizadas, er.repeticiones, er.peso_kg,
+                   er.ejercicio_id, er.ejercicio_nombre, er.ejercicio_categoria, er.notas, er.valoracion
+            FROM clientes c
+            LEFT JOIN LATERAL (
+                SELECT er.id, er.fecha_realizacion, er.series_realizadas, er.repeticiones, er.peso_kg,
+                       e.id as ejercicio_id, e.nombre as ejercicio_nombre, e.categoria as ejercicio_categoria,
+                       er.notas, er.valoracion
+                FROM entrenamientos_realizados er
+                LEFT JOIN ejercicios e ON er.id_ejercicio = e.id
+                WHERE er.id_cliente = c.id{filtros}
+                ORDER BY er.fecha_realizacion {order}, er.id {order}
+                LIMIT %(limit)s
+            ) er ON TRUE
+            WHERE c.id_usuario = %(user_id)s
+            ORDER BY er.fecha_realizacion {order}, er.id {order}
+        """, params)
+        rows = await cursor_db.fetchall()
+        await conn.close()
+
+        if not rows:
+            raise HTTPException(status_code=404, detail="Cliente no encontrado")
+        rows = [row for row in rows if row[1] is not None]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_realizados_cursor(order, rows[-1][2], rows[-1][1])
+
+        respuesta = {
+            "success": True,
+            "ejercicios_realizados": [EjercicioRealizadoRow(*row[2:]) for row in rows],
+            "next_cursor": next_cursor,
+        }
+        return serialization.render(request, respuesta, response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Error al obtener ejercicios realizados del cliente: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al obtener ejercicios realizados del cliente: {str(e)}")
+
+
+@app.get("/cliente/{cliente_user_id}/calendario")
+@querylog.max_queries(1)
+async def get_calendario_cliente(cliente_user_id: int, request: Request, response: Response, anio: int | None = None):
+    """
+    Mapa de calor de actividad de un cliente para un año (por defecto el actual).
+    'dias' tiene un carácter por día desde el 1 de enero ("1" si hubo actividad)
+    y 'primer_dia_semana' es el día de la semana del 1 de enero (0 = lunes).
+    """
+    # Anti-cache
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
+
+    hoy = date.today()
+    if anio is None:
+        anio = hoy.year
+    if not 1 <= anio < 9999:
+        raise HTTPException(status_code=400, detail="Año no válido")
+
+    try:
+        print(f"[DEBUG] Obteniendo calendario de actividad del cliente {cliente_user_id} ({anio})...")
+
+        conn = await get_async_db_connection()
+        cursor = conn.cursor()
+
+        # El calendario (migración 0007) es una fila por cliente: sin fila, no hay actividad
+        await cursor.execute("""
+            SELECT c.id, ca.inicio, ca.dias
+            FROM clientes c
+            LEFT JOIN calendario_actividad ca ON ca.id_cliente = c.id
+            WHERE c.id_usuario = %s
+        """, (cliente_user_id,))
+        cliente_row = await cursor.fetchone()
+        await conn.close()
+
+        if not cliente_row:
+            raise HTTPException(status_code=404, detail="Cliente no encontrado")
+
+        calendario = activity_calendar.Calendar.from_row(cliente_row[1], cliente_row[2])
+        desde = date(anio, 1, 1)
+        hasta = date(anio, 12, 31)
+        respuesta = {
+            "success": True,
+            "anio": anio,
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "primer_dia_semana": desde.weekday(),
+            "dias": calendario.heatmap(anio),
+            "dias_activos": calendario.active_days(desde, hasta),
+            "racha_actual": calendario.current_streak(hoy),
+            "racha_maxima": calendario.longest_streak(),
+            "total_dias_activos": calendario.total_days(),
+        }
+        return serialization.render(request, respuesta, response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Error al obtener calendario del cliente: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al obtener calendario del cliente: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""Métricas Prometheus de la API (``GET /metrics``).
+
+El middleware HTTP de ``main.py`` registra, por plantilla de ruta (``/planes/{plan_id}``,
+no la URL concreta, para no crear una serie por id):
+
+- ``http_request_duration_seconds``: histograma de latencia por método, ruta y
+  código de estado.
+- ``http_requests_total``: peticiones por método, ruta y código de estado.
+- ``http_requests_in_flight``: peticiones en curso por método y ruta.
+- ``http_request_db_queries`` / ``http_request_db_seconds``: histogramas del
+  número de consultas y del tiempo total en BD de cada petición (los cuenta
+  ``db.TimingCursor`` / ``db_async.TimingAsyncCursor``).
+- ``db_slow_queries_total`` / ``db_n_plus_one_total``: consultas lentas y
+  sentencias repetidas (posible N+1) por ruta, según ``querylog.py``.
+- ``catalog_cache_requests_total``: aciertos, fallos e invalidaciones de la
+  caché de catálogo (``catalog_cache.py``).
+
+Con varios workers (``serve.py``) cada proceso escribe sus valores en
+``PROMETHEUS_MULTIPROC_DIR`` y ``/metrics`` devuelve la suma de todos, sea
+cual sea el worker que atienda la petición.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+
+# Etiqueta de las peticiones que no corresponden a ninguna ruta (404).
+UNMATCHED = "unmatched"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "http_requests",
+    "Peticiones HTTP atendidas",
+    ["method", "route", "status"],
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Peticiones HTTP en curso",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Consultas SQL ejecutadas por petición",
+    ["method", "route"],
+    buckets=QUERY_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Tiempo total en BD por petición",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries",
+    "Consultas por encima de DB_SLOW_QUERY_MS",
+    ["method", "route"],
+)
+N_PLUS_ONE = Counter(
+    "db_n_plus_one",
+    "Sentencias repetidas DB_N_PLUS_ONE_MIN veces o más en una petición",
+    ["method", "route"],
+)
+CATALOG_CACHE = Counter(
+    "catalog_cache_requests",
+    "Lecturas e invalidaciones de la caché de catálogo",
+    ["cache", "result"],
+)
+
+
+def route_template(app, scope) -> str:
+    """Plantilla de la ruta que atenderá la petición, o ``UNMATCHED``.
+
+    Se resuelve antes de ejecutar el endpoint (para el gauge de peticiones en
+    curso) con el mismo criterio que el router: la primera coincidencia completa
+    y, si solo coincide la ruta pero no el método (405), esa ruta.
+    """
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED)
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", UNMATCHED)
+    return partial or UNMATCHED
+
+
+def observe(method: str, route: str, status: int, seconds: float, db_stats, repeated=()) -> None:
+    status = str(status)
+    REQUEST_LATENCY.labels(method, route, status).observe(seconds)
+    REQUESTS.labels(method, route, status).inc()
+    DB_QUERIES.labels(method, route).observe(db_stats.count)
+    DB_SECONDS.labels(method, route).observe(db_stats.seconds)
+    if db_stats.slow:
+        DB_SLOW_QUERIES.labels(method, route).inc(db_stats.slow)
+    if repeated:
+        N_PLUS_ONE.labels(method, route).inc(len(repeated))
+
+
+def render() -> tuple[bytes, str]:
+    """Cuerpo y content-type de ``/metrics``."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Descarta los gauges del worker que termina (modo multiproceso)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
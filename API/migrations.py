@@ -0,0 +1,269 @@
+"""Migraciones versionadas del esquema PostgreSQL.
+
+Sustituye a la comprobación de arranque anterior (escaneo de
+``information_schema``, ``COUNT(*)`` de users y posible re-ejecución de
+``ddl_postgres.sql``, que empieza con ``DROP TABLE ... CASCADE``) por:
+
+- Una tabla ``schema_version`` con una fila por migración aplicada.
+- Ficheros ``postgres/migrations/NNNN_nombre.sql`` que se aplican en orden,
+  todos los pendientes en una única transacción.
+- Un advisory lock de transacción (``pg_advisory_xact_lock``): si arrancan
+  varios workers a la vez solo uno migra; el resto espera y al obtener el lock
+  encuentra el esquema ya al día. Al ser de transacción funciona también
+  detrás de PgBouncer en modo ``transaction``.
+- Un camino rápido: si la versión guardada ya es la de la última migración,
+  el arranque solo ejecuta ``SELECT max(version) FROM schema_version``.
+
+Las bases de datos creadas antes de este sistema (todas las tablas presentes
+pero sin ``schema_version``) se adoptan registrando 0001 como aplicada sin
+ejecutarla. En una base de datos vacía se aplica 0001 y después el seed.
+
+Uso desde línea de comandos (desde API/)::
+
+    python migrations.py            # aplica las migraciones pendientes
+    python migrations.py --status   # versión actual y migraciones pendientes
+"""
+
+import hashlib
+import logging
+import re
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import psycopg2
+import psycopg2.errors
+
+logger = logging.getLogger("gym-infosys.migrations")
+
+POSTGRES_DIR = Path(__file__).resolve().parent / "postgres"
+MIGRATIONS_DIR = POSTGRES_DIR / "migrations"
+SEED_SCRIPT_PATH = POSTGRES_DIR / "seed_postgres.sql"
+
+# Tablas que debe tener el esquema 0001; sirven para adoptar bases de datos
+# creadas antes de que existiera schema_version.
+REQUIRED_TABLES = {
+    "users",
+    "email_verifications",
+    "reset_tokens",
+    "planes",
+    "clientes",
+    "gym_clases",
+    "clases_programadas",
+    "reservas",
+    "entrenador_cliente_asignaciones",
+    "ejercicios",
+    "entrenamientos_asignados",
+    "entrenamientos_realizados",
+}
+
+# Clave del advisory lock (cualquier bigint fijo, compartido por todos los procesos).
+LOCK_KEY = 0x67796D5F6D6967  # "gym_mig"
+
+_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INTEGER
+)
+"""
+
+# Resultado del último migrate() del proceso, expuesto en /health/schema.
+last_run: dict = {}
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+    def sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Lista las migraciones del directorio ordenadas por versión."""
+    migrations = {}
+    for path in directory.glob("*.sql"):
+        match = _FILE_RE.match(path.name)
+        if not match:
+            logger.warning("Fichero ignorado en %s (formato NNNN_nombre.sql): %s", directory, path.name)
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Versión de migración duplicada: {version:04d}")
+        migrations[version] = Migration(version, path.stem, path)
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def _read_version(conn) -> int | None:
+    """Versión actual del esquema, o ``None`` si no existe schema_version."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT max(version) FROM schema_version")
+            version = cursor.fetchone()[0]
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return None
+    conn.rollback()  # cerrar la transacción de solo lectura
+    return version or 0
+
+
+def _missing_tables(cursor, required_tables) -> list[str]:
+    cursor.execute(
+        """
+        SELECT table_name
+        FROM information_schema.tables
+        WHERE table_schema = 'public'
+        """
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    return sorted(set(required_tables) - existing)
+
+
+def _migrate_locked(conn, migrations, required_tables, seed_script) -> dict:
+    result = {"fast_path": False, "baseline": False, "seeded": False, "applied": []}
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+
+        # Releer con el lock tomado: otro proceso puede haber migrado mientras esperábamos.
+        cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT version, checksum FROM schema_version")
+            recorded = dict(cursor.fetchall())
+            version = max(recorded, default=0)
+        else:
+            recorded = {}
+            missing = _missing_tables(cursor, required_tables)
+            cursor.execute(SCHEMA_VERSION_DDL)
+            if not missing and migrations:
+                # Esquema creado antes de existir schema_version: se adopta como 0001.
+                first = migrations[0]
+                cursor.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                    (first.version, first.name),
+                )
+                recorded[first.version] = None
+                version = first.version
+                result["baseline"] = True
+                logger.warning("Esquema existente sin schema_version; registrado como %s", first.name)
+            elif len(missing) < len(required_tables):
+                raise MigrationError(
+                    "Esquema incompleto sin schema_version (faltan: %s); revisar la BD a mano"
+                    % ", ".join(missing)
+                )
+            else:
+                version = 0
+
+        for migration in migrations:
+            stored = recorded.get(migration.version)
+            if stored and stored != migration.checksum():
+                logger.warning("La migración %s ha cambiado después de aplicarse", migration.name)
+
+        start_version = version
+        for migration in migrations:
+            if migration.version <= version:
+                continue
+            t0 = time.perf_counter()
+            try:
+                cursor.execute(migration.sql())
+            except psycopg2.Error as exc:
+                raise MigrationError(f"Error al aplicar {migration.name}: {exc}") from exc
+            duration_ms = int((time.perf_counter() - t0) * 1000)
+            cursor.execute(
+                "INSERT INTO schema_version (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+                (migration.version, migration.name, migration.checksum(), duration_ms),
+            )
+            logger.info("Migración aplicada: %s (%s ms)", migration.name, duration_ms)
+            result["applied"].append(migration.name)
+            version = migration.version
+
+        if start_version == 0 and result["applied"] and seed_script and Path(seed_script).exists():
+            logger.warning("Base de datos nueva: cargando %s", Path(seed_script).name)
+            try:
+                cursor.execute(Path(seed_script).read_text(encoding="utf-8"))
+            except psycopg2.Error as exc:
+                raise MigrationError(f"Error al ejecutar el seed: {exc}") from exc
+            result["seeded"] = True
+
+    result["version"] = version
+    return result
+
+
+def migrate(conn, directory: Path = MIGRATIONS_DIR, required_tables=REQUIRED_TABLES,
+            seed_script: Path | None = SEED_SCRIPT_PATH) -> dict:
+    """Deja el esquema en la última versión y devuelve qué se hizo y cuánto tardó."""
+    t0 = time.perf_counter()
+    migrations = discover(directory)
+    latest = migrations[-1].version if migrations else 0
+
+    version = _read_version(conn)
+    if version is not None and version >= latest:
+        result = {"fast_path": True, "baseline": False, "seeded": False, "applied": [], "version": version}
+    else:
+        try:
+            result = _migrate_locked(conn, migrations, required_tables, seed_script)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    result["latest"] = latest
+    result["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    last_run.clear()
+    last_run.update(result)
+    logger.info(
+        "Esquema en versión %s (%s) en %.1f ms",
+        result["version"],
+        "sin cambios" if result["fast_path"] else f"aplicadas: {', '.join(result['applied']) or 'ninguna'}",
+        result["elapsed_ms"],
+    )
+    return result
+
+
+def status(conn, directory: Path = MIGRATIONS_DIR) -> dict:
+    migrations = discover(directory)
+    version = _read_version(conn)
+    return {
+        "version": version,
+        "latest": migrations[-1].version if migrations else 0,
+        "pending": [m.name for m in migrations if version is None or m.version > version],
+    }
+
+
+def main(argv=None) -> int:
+    import argparse
+    import json
+
+    from dotenv import load_dotenv
+
+    import db
+
+    parser = argparse.ArgumentParser(description="Migraciones del esquema PostgreSQL")
+    parser.add_argument("--status", action="store_true", help="Mostrar la versión sin migrar")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env.local")
+    conn = db.connect()
+    try:
+        result = status(conn) if args.status else migrate(conn)
+    finally:
+        conn.close()
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
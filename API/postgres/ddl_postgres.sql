@@ -32,6 +32,9 @@ CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_role ON users(role);
 CREATE INDEX idx_users_email_verified ON users(email_verified);
 CREATE INDEX idx_users_updated_at ON users(updated_at);
+-- Paginación por clave de GET /admin/users (migración 0004)
+CREATE INDEX idx_users_name_id ON users(name, id);
+CREATE INDEX idx_users_created_at_id ON users((COALESCE(created_at, '-infinity'::timestamptz)), id);
 
 CREATE TRIGGER update_users_timestamp
     BEFORE UPDATE ON users
@@ -198,6 +201,8 @@ CREATE TABLE clases_programadas (
     duracion_minutos INTEGER DEFAULT 60,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    -- Reservas en estado 'activa'; lo mantiene el trigger actualizar_reservas_activas
+    reservas_activas INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (id_clase) REFERENCES gym_clases(id) ON DELETE CASCADE,
     FOREIGN KEY (id_instructor) REFERENCES users(id) ON DELETE CASCADE,
     UNIQUE(id_clase, id_instructor, fecha, hora)
@@ -209,8 +214,10 @@ CREATE INDEX idx_clases_programadas_clase ON clases_programadas(id_clase);
 CREATE INDEX idx_clases_programadas_estado ON clases_programadas(estado);
 CREATE INDEX idx_clases_programadas_updated_at ON clases_programadas(updated_at);
 
+-- Solo con cambios en los datos de la clase, no con el contador de reservas
 CREATE TRIGGER update_clases_programadas_timestamp
-    BEFORE UPDATE ON clases_programadas
+    BEFORE UPDATE OF id_clase, id_instructor, fecha, hora, capacidad_maxima, estado, ubicacion, duracion_minutos
+    ON clases_programadas
     FOR EACH ROW
     EXECUTE FUNCTION update_timestamp();
 
@@ -231,7 +238,8 @@ CREATE TABLE reservas (
     UNIQUE(id_cliente, id_clase_programada)
 );
 
-CREATE INDEX idx_reservas_cliente ON reservas(id_cliente);
+-- Asistencia por cliente del panel del entrenador (migración 0010)
+CREATE INDEX idx_reservas_cliente_estado ON reservas(id_cliente, estado, id_clase_programada);
 CREATE INDEX idx_reservas_clase ON reservas(id_clase_programada);
 CREATE INDEX idx_reservas_estado ON reservas(estado);
 CREATE INDEX idx_reservas_updated_at ON reservas(updated_at);
@@ -241,6 +249,37 @@ CREATE TRIGGER update_reservas_timestamp
     FOR EACH ROW
     EXECUTE FUNCTION update_timestamp();
 
+-- Mantiene clases_programadas.reservas_activas (ver API/reconcile.py)
+CREATE OR REPLACE FUNCTION actualizar_reservas_activas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.estado IS NOT DISTINCT FROM NEW.estado
+       AND OLD.id_clase_programada = NEW.id_clase_programada THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.estado = 'activa' THEN
+        UPDATE clases_programadas
+        SET reservas_activas = reservas_activas - 1
+        WHERE id = OLD.id_clase_programada;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.estado = 'activa' THEN
+        UPDATE clases_programadas
+        SET reservas_activas = reservas_activas + 1
+        WHERE id = NEW.id_clase_programada;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_reservas_activas
+    AFTER INSERT OR DELETE OR UPDATE OF estado, id_clase_programada ON reservas
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_reservas_activas();
+
 -- =====================================================
 -- TABLA: ENTRENADOR_CLIENTE_ASIGNACIONES
 -- =====================================================
@@ -316,7 +355,8 @@ CREATE TABLE entrenamientos_asignados (
     UNIQUE(id_entrenador, id_cliente, id_ejercicio, fecha_entrenamiento)
 );
 
-CREATE INDEX idx_entrenamientos_entrenador ON entrenamientos_asignados(id_entrenador);
+-- Recuentos por entrenador y cliente del panel del entrenador (migración 0010)
+CREATE INDEX idx_entrenamientos_entrenador_cliente_estado ON entrenamientos_asignados(id_entrenador, id_cliente, estado, fecha_entrenamiento);
 CREATE INDEX idx_entrenamientos_cliente ON entrenamientos_asignados(id_cliente);
 CREATE INDEX idx_entrenamientos_ejercicio ON entrenamientos_asignados(id_ejercicio);
 CREATE INDEX idx_entrenamientos_fecha ON entrenamientos_asignados(fecha_entrenamiento);
@@ -354,7 +394,8 @@ CREATE TABLE entrenamientos_realizados (
     FOREIGN KEY (id_entrenamiento_asignado) REFERENCES entrenamientos_asignados(id) ON DELETE SET NULL
 );
 
-CREATE INDEX idx_entrenamientos_realizados_cliente ON entrenamientos_realizados(id_cliente);
+-- Detalle por cliente paginado por (fecha, id) (migración 0008)
+CREATE INDEX idx_entrenamientos_realizados_cliente_fecha ON entrenamientos_realizados(id_cliente, fecha_realizacion, id);
 CREATE INDEX idx_entrenamientos_realizados_ejercicio ON entrenamientos_realizados(id_ejercicio);
 CREATE INDEX idx_entrenamientos_realizados_fecha ON entrenamientos_realizados(fecha_realizacion);
 CREATE INDEX idx_entrenamientos_realizados_asignado ON entrenamientos_realizados(id_entrenamiento_asignado);
@@ -385,4 +426,721 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER update_entrenamiento_asignado_completado
     AFTER INSERT ON entrenamientos_realizados
     FOR EACH ROW
-    EXECUTE FUNCTION update_entrenamiento_asignado_completado();
\ No newline at end of file
+    EXECUTE FUNCTION update_entrenamiento_asignado_completado();
+
+-- =====================================================
+-- NOTIFICACIÓN DE CAMBIOS EN EL CATÁLOGO (canal 'gym_cambios')
+-- Invalida la caché de catálogo de cada worker (ver API/change_listener.py)
+-- =====================================================
+CREATE OR REPLACE FUNCTION notificar_cambio()
+RETURNS TRIGGER AS $$
+DECLARE
+    fila_id INTEGER;
+BEGIN
+    IF TG_LEVEL = 'ROW' THEN
+        IF TG_OP = 'DELETE' THEN
+            fila_id := OLD.id;
+        ELSE
+            fila_id := NEW.id;
+        END IF;
+    END IF;
+    PERFORM pg_notify(
+        'gym_cambios',
+        json_build_object('tabla', TG_TABLE_NAME, 'op', TG_OP, 'id', fila_id)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notificar_cambio_planes
+    AFTER INSERT OR UPDATE OR DELETE ON planes
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_planes
+    AFTER TRUNCATE ON planes
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_cambio_gym_clases
+    AFTER INSERT OR UPDATE OR DELETE ON gym_clases
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_gym_clases
+    AFTER TRUNCATE ON gym_clases
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_cambio_ejercicios
+    AFTER INSERT OR UPDATE OR DELETE ON ejercicios
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_ejercicios
+    AFTER TRUNCATE ON ejercicios
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
+
+-- De users solo interesan los entrenadores (listado /entrenadores)
+CREATE TRIGGER notificar_alta_entrenador
+    AFTER INSERT ON users
+    FOR EACH ROW
+    WHEN (NEW.role = 'entrenador')
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_cambio_entrenador
+    AFTER UPDATE ON users
+    FOR EACH ROW
+    WHEN (OLD.role = 'entrenador' OR NEW.role = 'entrenador')
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_baja_entrenador
+    AFTER DELETE ON users
+    FOR EACH ROW
+    WHEN (OLD.role = 'entrenador')
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_users
+    AFTER TRUNCATE ON users
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
+
+-- =====================================================
+-- RESUMEN DEL PANEL DE ADMINISTRACIÓN (migración 0005)
+-- Una fila precalculada para /admin/estadisticas; la refresca
+-- API/dashboard_summary.py con REFRESH ... CONCURRENTLY.
+-- =====================================================
+CREATE MATERIALIZED VIEW resumen_panel_admin AS
+SELECT
+    1 AS id,
+    now() AS actualizado_en,
+    (SELECT COUNT(*) FROM users) AS total_users,
+    (SELECT COUNT(*) FROM clientes WHERE estado = 'activo') AS total_clientes,
+    (SELECT COUNT(*) FROM users WHERE role = 'entrenador') AS total_entrenadores,
+    (SELECT COUNT(*) FROM planes WHERE activo = 1) AS total_planes,
+    (SELECT COUNT(*) FROM reservas WHERE estado = 'activa') AS total_reservas_activas,
+    (SELECT COUNT(*) FROM reservas WHERE estado = 'completada') AS total_reservas_completadas,
+    (SELECT COUNT(*) FROM clases_programadas WHERE estado IN ('activa', 'programada')) AS total_clases_programadas,
+    (SELECT COUNT(*) FROM entrenamientos_realizados) AS total_entrenamientos_realizados,
+    -- Distribución de clientes activos por plan
+    (SELECT COALESCE(json_agg(json_build_object('id', t.id, 'nombre', t.nombre, 'clientes', t.cantidad)
+                              ORDER BY t.cantidad DESC, t.nombre), '[]'::json)
+     FROM (
+        SELECT p.id, p.nombre, COUNT(c.id) AS cantidad
+        FROM planes p
+        LEFT JOIN clientes c ON c.plan_id = p.id AND c.estado = 'activo'
+        GROUP BY p.id, p.nombre
+     ) t) AS planes,
+    -- Top 10 clases por reservas completadas
+    (SELECT COALESCE(json_agg(json_build_object('nombre', t.nombre, 'reservas', t.reservas)
+                              ORDER BY t.reservas DESC, t.nombre), '[]'::json)
+     FROM (
+        SELECT gc.nombre, COUNT(*) AS reservas
+        FROM reservas r
+        JOIN clases_programadas cp ON r.id_clase_programada = cp.id
+        JOIN gym_clases gc ON cp.id_clase = gc.id
+        WHERE r.estado = 'completada'
+        GROUP BY gc.nombre
+        ORDER BY reservas DESC, gc.nombre
+        LIMIT 10
+     ) t) AS top_clases,
+    -- Top 10 ejercicios por frecuencia en entrenamientos_realizados
+    (SELECT COALESCE(json_agg(json_build_object('nombre', t.nombre, 'frecuencia', t.frecuencia)
+                              ORDER BY t.frecuencia DESC, t.nombre), '[]'::json)
+     FROM (
+        SELECT e.nombre, COUNT(*) AS frecuencia
+        FROM entrenamientos_realizados er
+        JOIN ejercicios e ON er.id_ejercicio = e.id
+        WHERE e.nombre IS NOT NULL
+        GROUP BY e.nombre
+        ORDER BY frecuencia DESC, e.nombre
+        LIMIT 10
+     ) t) AS top_ejercicios,
+    -- Altas de clientes de los últimos 12 meses con actividad
+    (SELECT COALESCE(json_agg(json_build_object('mes', t.mes, 'cantidad', t.cantidad)
+                              ORDER BY t.mes DESC), '[]'::json)
+     FROM (
+        SELECT to_char(DATE_TRUNC('month', fecha_inscripcion), 'YYYY-MM') AS mes, COUNT(*) AS cantidad
+        FROM clientes
+        WHERE fecha_inscripcion IS NOT NULL
+        GROUP BY mes
+        ORDER BY mes DESC
+        LIMIT 12
+     ) t) AS nuevos_por_mes
+WITH DATA;
+
+-- Necesario para REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_resumen_panel_admin_id ON resumen_panel_admin(id);
+
+-- =====================================================
+-- ACTIVIDAD DIARIA POR CLIENTE (migración 0006)
+-- Resumen por cliente y día para /cliente/{id}/estadisticas; lo
+-- mantienen los triggers de entrenamientos_realizados, reservas y
+-- clases_programadas (ver API/activity_rollup.py).
+-- =====================================================
+-- Volumen de un registro, con el mismo criterio que las estadísticas
+-- del cliente: sin peso o sin series no suma, sin repeticiones cuenta 1.
+CREATE OR REPLACE FUNCTION volumen_entrenamiento(peso NUMERIC, series INTEGER, repeticiones INTEGER)
+RETURNS NUMERIC AS $$
+    SELECT COALESCE(peso, 0) * COALESCE(series, 0) * COALESCE(NULLIF(repeticiones, 0), 1)
+$$ LANGUAGE sql IMMUTABLE;
+
+DROP TABLE IF EXISTS actividad_diaria_ejercicios CASCADE;
+CREATE TABLE actividad_diaria_ejercicios (
+    id_cliente INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    id_ejercicio INTEGER NOT NULL,
+    registros INTEGER NOT NULL,
+    volumen NUMERIC NOT NULL,
+    -- Sin contar los registros sin peso (NULL si no hay ninguno)
+    peso_maximo NUMERIC(5,2),
+    PRIMARY KEY (id_cliente, fecha, id_ejercicio)
+);
+
+DROP TABLE IF EXISTS actividad_diaria_clases CASCADE;
+CREATE TABLE actividad_diaria_clases (
+    id_cliente INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    id_clase INTEGER NOT NULL,
+    asistencias INTEGER NOT NULL,
+    PRIMARY KEY (id_cliente, fecha, id_clase)
+);
+
+-- Recalcula un día y ejercicio de un cliente a partir de sus registros
+-- (el peso máximo no se puede descontar al borrar o modificar uno).
+CREATE OR REPLACE FUNCTION recalcular_actividad_diaria_ejercicio(cliente INTEGER, dia DATE, ejercicio INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM actividad_diaria_ejercicios
+    WHERE id_cliente = cliente AND fecha = dia AND id_ejercicio = ejercicio;
+
+    INSERT INTO actividad_diaria_ejercicios (id_cliente, fecha, id_ejercicio, registros, volumen, peso_maximo)
+    SELECT cliente, dia, ejercicio, COUNT(*),
+           SUM(volumen_entrenamiento(peso_kg, series_realizadas, repeticiones)), MAX(NULLIF(peso_kg, 0))
+    FROM entrenamientos_realizados
+    WHERE id_cliente = cliente AND fecha_realizacion = dia AND id_ejercicio = ejercicio
+    HAVING COUNT(*) > 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_actividad_diaria_ejercicios()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO actividad_diaria_ejercicios AS a
+            (id_cliente, fecha, id_ejercicio, registros, volumen, peso_maximo)
+        VALUES (
+            NEW.id_cliente, NEW.fecha_realizacion, NEW.id_ejercicio, 1,
+            volumen_entrenamiento(NEW.peso_kg, NEW.series_realizadas, NEW.repeticiones),
+            NULLIF(NEW.peso_kg, 0)
+        )
+        ON CONFLICT (id_cliente, fecha, id_ejercicio) DO UPDATE
+        SET registros = a.registros + 1,
+            volumen = a.volumen + EXCLUDED.volumen,
+            peso_maximo = GREATEST(a.peso_maximo, EXCLUDED.peso_maximo);
+        RETURN NULL;
+    END IF;
+
+    PERFORM recalcular_actividad_diaria_ejercicio(OLD.id_cliente, OLD.fecha_realizacion, OLD.id_ejercicio);
+    IF TG_OP = 'UPDATE'
+       AND (OLD.id_cliente, OLD.fecha_realizacion, OLD.id_ejercicio)
+           IS DISTINCT FROM (NEW.id_cliente, NEW.fecha_realizacion, NEW.id_ejercicio) THEN
+        PERFORM recalcular_actividad_diaria_ejercicio(NEW.id_cliente, NEW.fecha_realizacion, NEW.id_ejercicio);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_diaria_ejercicios
+    AFTER INSERT OR DELETE
+       OR UPDATE OF id_cliente, fecha_realizacion, id_ejercicio, series_realizadas, repeticiones, peso_kg
+    ON entrenamientos_realizados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_diaria_ejercicios();
+
+CREATE OR REPLACE FUNCTION actualizar_actividad_diaria_clases()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.estado IS NOT DISTINCT FROM NEW.estado
+       AND OLD.id_clase_programada = NEW.id_clase_programada
+       AND OLD.id_cliente = NEW.id_cliente THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.estado = 'completada' THEN
+        UPDATE actividad_diaria_clases a
+        SET asistencias = a.asistencias - 1
+        FROM clases_programadas cp
+        WHERE cp.id = OLD.id_clase_programada
+          AND a.id_cliente = OLD.id_cliente AND a.fecha = cp.fecha AND a.id_clase = cp.id_clase;
+
+        DELETE FROM actividad_diaria_clases a
+        USING clases_programadas cp
+        WHERE cp.id = OLD.id_clase_programada
+          AND a.id_cliente = OLD.id_cliente AND a.fecha = cp.fecha AND a.id_clase = cp.id_clase
+          AND a.asistencias <= 0;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.estado = 'completada' THEN
+        INSERT INTO actividad_diaria_clases AS a (id_cliente, fecha, id_clase, asistencias)
+        SELECT NEW.id_cliente, cp.fecha, cp.id_clase, 1
+        FROM clases_programadas cp
+        WHERE cp.id = NEW.id_clase_programada
+        ON CONFLICT (id_cliente, fecha, id_clase) DO UPDATE
+        SET asistencias = a.asistencias + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_diaria_clases
+    AFTER INSERT OR DELETE OR UPDATE OF estado, id_clase_programada, id_cliente ON reservas
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_diaria_clases();
+
+-- Si una clase cambia de fecha o de tipo, sus asistencias pasan al nuevo día y tipo.
+CREATE OR REPLACE FUNCTION mover_actividad_diaria_clases()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.fecha = NEW.fecha AND OLD.id_clase = NEW.id_clase THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE actividad_diaria_clases a
+    SET asistencias = a.asistencias - r.total
+    FROM (
+        SELECT id_cliente, COUNT(*) AS total
+        FROM reservas
+        WHERE id_clase_programada = NEW.id AND estado = 'completada'
+        GROUP BY id_cliente
+    ) r
+    WHERE a.id_cliente = r.id_cliente AND a.fecha = OLD.fecha AND a.id_clase = OLD.id_clase;
+
+    DELETE FROM actividad_diaria_clases
+    WHERE fecha = OLD.fecha AND id_clase = OLD.id_clase AND asistencias <= 0
+      AND id_cliente IN (
+        SELECT id_cliente FROM reservas WHERE id_clase_programada = NEW.id AND estado = 'completada'
+      );
+
+    INSERT INTO actividad_diaria_clases AS a (id_cliente, fecha, id_clase, asistencias)
+    SELECT id_cliente, NEW.fecha, NEW.id_clase, COUNT(*)
+    FROM reservas
+    WHERE id_clase_programada = NEW.id AND estado = 'completada'
+    GROUP BY id_cliente
+    ON CONFLICT (id_cliente, fecha, id_clase) DO UPDATE
+    SET asistencias = a.asistencias + EXCLUDED.asistencias;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER mover_actividad_diaria_clases
+    AFTER UPDATE OF fecha, id_clase ON clases_programadas
+    FOR EACH ROW
+    EXECUTE FUNCTION mover_actividad_diaria_clases();
+
+-- Al borrar una clase, sus asistencias se descuentan antes de que la
+-- cascada borre sus reservas y deje de verse su fecha (migración 0012).
+CREATE OR REPLACE FUNCTION descontar_actividad_diaria_clases()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE actividad_diaria_clases a
+    SET asistencias = a.asistencias - r.total
+    FROM (
+        SELECT id_cliente, COUNT(*) AS total
+        FROM reservas
+        WHERE id_clase_programada = OLD.id AND estado = 'completada'
+        GROUP BY id_cliente
+    ) r
+    WHERE a.id_cliente = r.id_cliente AND a.fecha = OLD.fecha AND a.id_clase = OLD.id_clase;
+
+    DELETE FROM actividad_diaria_clases
+    WHERE fecha = OLD.fecha AND id_clase = OLD.id_clase AND asistencias <= 0
+      AND id_cliente IN (
+        SELECT id_cliente FROM reservas WHERE id_clase_programada = OLD.id AND estado = 'completada'
+      );
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER descontar_actividad_diaria_clases
+    BEFORE DELETE ON clases_programadas
+    FOR EACH ROW
+    EXECUTE FUNCTION descontar_actividad_diaria_clases();
+
+-- =====================================================
+-- CALENDARIO DE ACTIVIDAD POR CLIENTE (migración 0007)
+-- Un bit por día con actividad desde inicio; lo mantienen los
+-- triggers del resumen de actividad diaria (ver
+-- API/activity_calendar.py y API/activity_rollup.py).
+-- =====================================================
+DROP TABLE IF EXISTS calendario_actividad CASCADE;
+CREATE TABLE calendario_actividad (
+    id_cliente INTEGER PRIMARY KEY,
+    inicio DATE NOT NULL,
+    dias BYTEA NOT NULL
+);
+
+-- Reconstruye el calendario de los clientes indicados (todos si es NULL)
+-- a partir del resumen de actividad diaria.
+CREATE OR REPLACE FUNCTION reconstruir_calendario_actividad(clientes INTEGER[] DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM calendario_actividad
+    WHERE clientes IS NULL OR id_cliente = ANY(clientes);
+
+    INSERT INTO calendario_actividad (id_cliente, inicio, dias)
+    WITH dias AS (
+        SELECT id_cliente, fecha FROM actividad_diaria_ejercicios
+        WHERE clientes IS NULL OR id_cliente = ANY(clientes)
+        UNION
+        SELECT id_cliente, fecha FROM actividad_diaria_clases
+        WHERE clientes IS NULL OR id_cliente = ANY(clientes)
+    ), limites AS (
+        SELECT id_cliente, MIN(fecha) AS inicio, MAX(fecha) AS fin
+        FROM dias
+        GROUP BY id_cliente
+    ), bytes AS (
+        SELECT d.id_cliente, (d.fecha - l.inicio) / 8 AS n, bit_or(1 << ((d.fecha - l.inicio) % 8)) AS valor
+        FROM dias d
+        JOIN limites l ON l.id_cliente = d.id_cliente
+        GROUP BY d.id_cliente, n
+    )
+    SELECT l.id_cliente, l.inicio,
+           decode(string_agg(lpad(to_hex(COALESCE(b.valor, 0)), 2, '0'), '' ORDER BY s.n), 'hex')
+    FROM limites l
+    CROSS JOIN LATERAL generate_series(0, (l.fin - l.inicio) / 8) AS s(n)
+    LEFT JOIN bytes b ON b.id_cliente = l.id_cliente AND b.n = s.n
+    GROUP BY l.id_cliente, l.inicio;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Marca (o desmarca) un día en el calendario de un cliente, ampliando el
+-- mapa por delante o por detrás si hace falta.
+CREATE OR REPLACE FUNCTION marcar_dia_actividad(cliente INTEGER, dia DATE, activo BOOLEAN)
+RETURNS VOID AS $$
+DECLARE
+    cal RECORD;
+    idx INTEGER;
+    relleno INTEGER;
+BEGIN
+    IF activo THEN
+        INSERT INTO calendario_actividad (id_cliente, inicio, dias)
+        VALUES (cliente, dia, '\x00'::bytea)
+        ON CONFLICT (id_cliente) DO NOTHING;
+    END IF;
+
+    SELECT inicio, dias INTO cal FROM calendario_actividad WHERE id_cliente = cliente FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    idx := dia - cal.inicio;
+    IF idx < 0 OR idx >= length(cal.dias) * 8 THEN
+        IF NOT activo THEN
+            RETURN;
+        END IF;
+        IF idx < 0 THEN
+            -- Bytes completos por delante: el resto de días no cambia de bit
+            relleno := (7 - idx) / 8;
+            cal.dias := decode(repeat('00', relleno), 'hex') || cal.dias;
+            cal.inicio := cal.inicio - relleno * 8;
+            idx := idx + relleno * 8;
+        ELSE
+            cal.dias := cal.dias || decode(repeat('00', idx / 8 - length(cal.dias) + 1), 'hex');
+        END IF;
+    ELSIF get_bit(cal.dias, idx) = activo::INTEGER THEN
+        RETURN;
+    END IF;
+
+    UPDATE calendario_actividad
+    SET inicio = cal.inicio, dias = set_bit(cal.dias, idx, activo::INTEGER)
+    WHERE id_cliente = cliente;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_calendario_actividad()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- activity_rollup.rebuild() reconstruye el calendario al final de una vez
+    IF current_setting('gym.reconstruyendo_actividad', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        PERFORM marcar_dia_actividad(NEW.id_cliente, NEW.fecha, true);
+    ELSIF NOT EXISTS (
+            SELECT 1 FROM actividad_diaria_ejercicios WHERE id_cliente = OLD.id_cliente AND fecha = OLD.fecha
+          )
+          AND NOT EXISTS (
+            SELECT 1 FROM actividad_diaria_clases WHERE id_cliente = OLD.id_cliente AND fecha = OLD.fecha
+          ) THEN
+        PERFORM marcar_dia_actividad(OLD.id_cliente, OLD.fecha, false);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_calendario_actividad
+    AFTER INSERT OR DELETE ON actividad_diaria_ejercicios
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_calendario_actividad();
+
+CREATE TRIGGER actualizar_calendario_actividad
+    AFTER INSERT OR DELETE ON actividad_diaria_clases
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_calendario_actividad();
+
+-- =====================================================
+-- HISTORIAL DE PLANES DE LOS CLIENTES (migración 0009)
+-- Plan inicial y cambios de plan_id de cada cliente, anotados
+-- por un trigger; los usa el embudo de planes de API/cohorts.py.
+-- =====================================================
+DROP TABLE IF EXISTS historial_planes CASCADE;
+CREATE TABLE historial_planes (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    id_cliente INTEGER NOT NULL,
+    -- NULL en el alta del cliente
+    plan_anterior INTEGER,
+    plan_nuevo INTEGER NOT NULL,
+    fecha TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_cliente) REFERENCES clientes(id) ON DELETE CASCADE,
+    FOREIGN KEY (plan_anterior) REFERENCES planes(id),
+    FOREIGN KEY (plan_nuevo) REFERENCES planes(id)
+);
+
+CREATE INDEX idx_historial_planes_cliente ON historial_planes(id_cliente, fecha);
+
+CREATE OR REPLACE FUNCTION registrar_cambio_plan()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO historial_planes (id_cliente, plan_anterior, plan_nuevo)
+        VALUES (NEW.id, NULL, NEW.plan_id);
+    ELSIF OLD.plan_id IS DISTINCT FROM NEW.plan_id THEN
+        INSERT INTO historial_planes (id_cliente, plan_anterior, plan_nuevo)
+        VALUES (NEW.id, OLD.plan_id, NEW.plan_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER registrar_cambio_plan
+    AFTER INSERT OR UPDATE OF plan_id ON clientes
+    FOR EACH ROW
+    EXECUTE FUNCTION registrar_cambio_plan();
+
+-- =====================================================
+-- ACTIVIDAD SEMANAL POR ENTRENADOR (migración 0011)
+-- Resumen por entrenador, por semana y en total de asignaciones y
+-- entrenamientos realizados para /entrenador/{id}/estadisticas; lo
+-- mantienen los triggers de entrenamientos_asignados y
+-- entrenamientos_realizados (ver API/trainer_rollup.py).
+-- =====================================================
+DROP TABLE IF EXISTS actividad_semanal_entrenador CASCADE;
+CREATE TABLE actividad_semanal_entrenador (
+    id_entrenador INTEGER NOT NULL,
+    semana DATE NOT NULL,
+    asignados INTEGER NOT NULL,
+    completados INTEGER NOT NULL,
+    cancelados INTEGER NOT NULL,
+    series_asignadas INTEGER NOT NULL,
+    realizados INTEGER NOT NULL,
+    series_realizadas INTEGER NOT NULL,
+    volumen NUMERIC NOT NULL,
+    PRIMARY KEY (id_entrenador, semana)
+);
+
+DROP TABLE IF EXISTS actividad_total_entrenador CASCADE;
+CREATE TABLE actividad_total_entrenador (
+    id_entrenador INTEGER PRIMARY KEY,
+    asignados INTEGER NOT NULL,
+    completados INTEGER NOT NULL,
+    cancelados INTEGER NOT NULL,
+    series_asignadas INTEGER NOT NULL,
+    realizados INTEGER NOT NULL,
+    series_realizadas INTEGER NOT NULL,
+    volumen NUMERIC NOT NULL
+);
+
+-- Suma (o resta, con valores negativos) una aportación a la semana de
+-- `dia` y al total del entrenador; borra la semana si se queda vacía.
+CREATE OR REPLACE FUNCTION sumar_actividad_entrenador(
+    entrenador INTEGER, dia DATE,
+    d_asignados INTEGER, d_completados INTEGER, d_cancelados INTEGER, d_series_asignadas INTEGER,
+    d_realizados INTEGER, d_series_realizadas INTEGER, d_volumen NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO actividad_semanal_entrenador AS a
+        (id_entrenador, semana, asignados, completados, cancelados, series_asignadas, realizados, series_realizadas, volumen)
+    VALUES (entrenador, date_trunc('week', dia)::date, d_asignados, d_completados, d_cancelados, d_series_asignadas,
+            d_realizados, d_series_realizadas, d_volumen)
+    ON CONFLICT (id_entrenador, semana) DO UPDATE
+    SET asignados = a.asignados + EXCLUDED.asignados,
+        completados = a.completados + EXCLUDED.completados,
+        cancelados = a.cancelados + EXCLUDED.cancelados,
+        series_asignadas = a.series_asignadas + EXCLUDED.series_asignadas,
+        realizados = a.realizados + EXCLUDED.realizados,
+        series_realizadas = a.series_realizadas + EXCLUDED.series_realizadas,
+        volumen = a.volumen + EXCLUDED.volumen;
+
+    DELETE FROM actividad_semanal_entrenador
+    WHERE id_entrenador = entrenador AND semana = date_trunc('week', dia)::date
+      AND asignados <= 0 AND realizados <= 0;
+
+    INSERT INTO actividad_total_entrenador AS t
+        (id_entrenador, asignados, completados, cancelados, series_asignadas, realizados, series_realizadas, volumen)
+    VALUES (entrenador, d_asignados, d_completados, d_cancelados, d_series_asignadas,
+            d_realizados, d_series_realizadas, d_volumen)
+    ON CONFLICT (id_entrenador) DO UPDATE
+    SET asignados = t.asignados + EXCLUDED.asignados,
+        completados = t.completados + EXCLUDED.completados,
+        cancelados = t.cancelados + EXCLUDED.cancelados,
+        series_asignadas = t.series_asignadas + EXCLUDED.series_asignadas,
+        realizados = t.realizados + EXCLUDED.realizados,
+        series_realizadas = t.series_realizadas + EXCLUDED.series_realizadas,
+        volumen = t.volumen + EXCLUDED.volumen;
+
+    DELETE FROM actividad_total_entrenador
+    WHERE id_entrenador = entrenador AND asignados <= 0 AND realizados <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Aportación de cada asignación a su entrenador y semana. Al borrarla
+-- (BEFORE, mientras sus registros siguen enlazados: después el
+-- ON DELETE SET NULL ya no deja saber de quién eran) o al cambiar de
+-- entrenador, sus registros realizados se descuentan (y se pasan).
+CREATE OR REPLACE FUNCTION actualizar_actividad_entrenador_asignados()
+RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND (OLD.id_entrenador, OLD.fecha_entrenamiento, OLD.series, OLD.estado)
+           IS NOT DISTINCT FROM (NEW.id_entrenador, NEW.fecha_entrenamiento, NEW.series, NEW.estado) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM sumar_actividad_entrenador(
+            OLD.id_entrenador, OLD.fecha_entrenamiento,
+            -1,
+            -(CASE WHEN OLD.estado = 'completado' THEN 1 ELSE 0 END),
+            -(CASE WHEN OLD.estado = 'cancelado' THEN 1 ELSE 0 END),
+            -(CASE WHEN OLD.estado = 'cancelado' THEN 0 ELSE OLD.series END),
+            0, 0, 0
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM sumar_actividad_entrenador(
+            NEW.id_entrenador, NEW.fecha_entrenamiento,
+            1,
+            CASE WHEN NEW.estado = 'completado' THEN 1 ELSE 0 END,
+            CASE WHEN NEW.estado = 'cancelado' THEN 1 ELSE 0 END,
+            CASE WHEN NEW.estado = 'cancelado' THEN 0 ELSE NEW.series END,
+            0, 0, 0
+        );
+    END IF;
+
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.id_entrenador <> NEW.id_entrenador) THEN
+        FOR r IN
+            SELECT fecha_realizacion AS dia, COUNT(*)::integer AS realizados, SUM(series_realizadas)::integer AS series,
+                   SUM(volumen_entrenamiento(peso_kg, series_realizadas, repeticiones)) AS volumen
+            FROM entrenamientos_realizados
+            WHERE id_entrenamiento_asignado = OLD.id
+            GROUP BY fecha_realizacion
+        LOOP
+            PERFORM sumar_actividad_entrenador(OLD.id_entrenador, r.dia, 0, 0, 0, 0, -r.realizados, -r.series, -r.volumen);
+            IF TG_OP = 'UPDATE' THEN
+                PERFORM sumar_actividad_entrenador(NEW.id_entrenador, r.dia, 0, 0, 0, 0, r.realizados, r.series, r.volumen);
+            END IF;
+        END LOOP;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_entrenador
+    AFTER INSERT OR UPDATE OF id_entrenador, fecha_entrenamiento, series, estado
+    ON entrenamientos_asignados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_entrenador_asignados();
+
+CREATE TRIGGER descontar_actividad_entrenador
+    BEFORE DELETE ON entrenamientos_asignados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_entrenador_asignados();
+
+-- Aportación de cada registro enlazado a una asignación al entrenador
+-- de esa asignación, en la semana en que se realizó.
+CREATE OR REPLACE FUNCTION actualizar_actividad_entrenador_realizados()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.id_entrenamiento_asignado IS NOT NULL THEN
+        PERFORM sumar_actividad_entrenador(
+            ea.id_entrenador, OLD.fecha_realizacion, 0, 0, 0, 0,
+            -1, -OLD.series_realizadas, -volumen_entrenamiento(OLD.peso_kg, OLD.series_realizadas, OLD.repeticiones)
+        )
+        FROM entrenamientos_asignados ea
+        WHERE ea.id = OLD.id_entrenamiento_asignado;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.id_entrenamiento_asignado IS NOT NULL THEN
+        PERFORM sumar_actividad_entrenador(
+            ea.id_entrenador, NEW.fecha_realizacion, 0, 0, 0, 0,
+            1, NEW.series_realizadas, volumen_entrenamiento(NEW.peso_kg, NEW.series_realizadas, NEW.repeticiones)
+        )
+        FROM entrenamientos_asignados ea
+        WHERE ea.id = NEW.id_entrenamiento_asignado;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_entrenador
+    AFTER INSERT OR DELETE
+       OR UPDATE OF id_entrenamiento_asignado, fecha_realizacion, series_realizadas, repeticiones, peso_kg
+    ON entrenamientos_realizados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_entrenador_realizados();
+
+-- =====================================================
+-- CONTROL DE VERSIONES DEL ESQUEMA (ver API/migrations.py)
+-- Este script equivale a aplicar todas las migraciones de
+-- postgres/migrations; al añadir una migración, reflejar aquí
+-- también sus cambios y su fila en schema_version.
+-- =====================================================
+DROP TABLE IF EXISTS schema_version CASCADE;
+
+CREATE TABLE schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INTEGER
+);
+
+INSERT INTO schema_version (version, name) VALUES
+    (1, '0001_esquema_inicial'),
+    (2, '0002_contador_reservas_activas'),
+    (3, '0003_notificar_cambios'),
+    (4, '0004_indices_listado_usuarios'),
+    (5, '0005_resumen_panel_admin'),
+    (6, '0006_actividad_diaria_cliente'),
+    (7, '0007_calendario_actividad'),
+    (8, '0008_detalle_entrenamientos_cliente'),
+    (9, '0009_historial_planes'),
+    (10, '0010_panel_entrenador'),
+    (11, '0011_actividad_semanal_entrenador'),
+    (12, '0012_borrado_clases_actividad_diaria');
@@ -0,0 +1,62 @@
+-- =====================================================
+-- MIGRACIÓN 0002: CONTADOR DE RESERVAS ACTIVAS
+-- clases_programadas.reservas_activas guarda el número de reservas en
+-- estado 'activa' de cada clase. Lo mantiene el trigger de reservas
+-- (altas, bajas, cambios de estado o de clase), así que el listado de
+-- clases y la comprobación de aforo leen una columna en lugar de
+-- agregar reservas. API/reconcile.py detecta y corrige desajustes.
+-- =====================================================
+
+ALTER TABLE clases_programadas
+    ADD COLUMN reservas_activas INTEGER NOT NULL DEFAULT 0;
+
+-- updated_at solo cambia al modificar los datos de la clase, no con cada
+-- reserva (así el contador no altera la respuesta de /clases-programadas
+-- y sus UPDATE pueden ser HOT, al no tocar columnas indexadas).
+DROP TRIGGER IF EXISTS update_clases_programadas_timestamp ON clases_programadas;
+
+CREATE TRIGGER update_clases_programadas_timestamp
+    BEFORE UPDATE OF id_clase, id_instructor, fecha, hora, capacidad_maxima, estado, ubicacion, duracion_minutos
+    ON clases_programadas
+    FOR EACH ROW
+    EXECUTE FUNCTION update_timestamp();
+
+UPDATE clases_programadas cp
+SET reservas_activas = r.total
+FROM (
+    SELECT id_clase_programada, COUNT(*) AS total
+    FROM reservas
+    WHERE estado = 'activa'
+    GROUP BY id_clase_programada
+) r
+WHERE cp.id = r.id_clase_programada;
+
+CREATE OR REPLACE FUNCTION actualizar_reservas_activas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.estado IS NOT DISTINCT FROM NEW.estado
+       AND OLD.id_clase_programada = NEW.id_clase_programada THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.estado = 'activa' THEN
+        UPDATE clases_programadas
+        SET reservas_activas = reservas_activas - 1
+        WHERE id = OLD.id_clase_programada;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.estado = 'activa' THEN
+        UPDATE clases_programadas
+        SET reservas_activas = reservas_activas + 1
+        WHERE id = NEW.id_clase_programada;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_reservas_activas
+    AFTER INSERT OR DELETE OR UPDATE OF estado, id_clase_programada ON reservas
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_reservas_activas();
@@ -0,0 +1,82 @@
+-- =====================================================
+-- MIGRACIÓN 0003: NOTIFICACIÓN DE CAMBIOS EN EL CATÁLOGO
+-- Los cambios en las tablas que la API cachea en memoria (planes,
+-- gym_clases, ejercicios y los usuarios entrenadores) se publican en
+-- el canal 'gym_cambios' como JSON {"tabla", "op", "id"}. Cada worker
+-- los escucha (API/change_listener.py) e invalida su caché. Un TRUNCATE
+-- se publica con "id": null.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION notificar_cambio()
+RETURNS TRIGGER AS $$
+DECLARE
+    fila_id INTEGER;
+BEGIN
+    IF TG_LEVEL = 'ROW' THEN
+        IF TG_OP = 'DELETE' THEN
+            fila_id := OLD.id;
+        ELSE
+            fila_id := NEW.id;
+        END IF;
+    END IF;
+    PERFORM pg_notify(
+        'gym_cambios',
+        json_build_object('tabla', TG_TABLE_NAME, 'op', TG_OP, 'id', fila_id)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notificar_cambio_planes
+    AFTER INSERT OR UPDATE OR DELETE ON planes
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_planes
+    AFTER TRUNCATE ON planes
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_cambio_gym_clases
+    AFTER INSERT OR UPDATE OR DELETE ON gym_clases
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_gym_clases
+    AFTER TRUNCATE ON gym_clases
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_cambio_ejercicios
+    AFTER INSERT OR UPDATE OR DELETE ON ejercicios
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_ejercicios
+    AFTER TRUNCATE ON ejercicios
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
+
+-- De users solo interesan los entrenadores (listado /entrenadores)
+CREATE TRIGGER notificar_alta_entrenador
+    AFTER INSERT ON users
+    FOR EACH ROW
+    WHEN (NEW.role = 'entrenador')
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_cambio_entrenador
+    AFTER UPDATE ON users
+    FOR EACH ROW
+    WHEN (OLD.role = 'entrenador' OR NEW.role = 'entrenador')
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_baja_entrenador
+    AFTER DELETE ON users
+    FOR EACH ROW
+    WHEN (OLD.role = 'entrenador')
+    EXECUTE FUNCTION notificar_cambio();
+
+CREATE TRIGGER notificar_truncate_users
+    AFTER TRUNCATE ON users
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_cambio();
@@ -0,0 +1,11 @@
+-- =====================================================
+-- MIGRACIÓN 0004: ÍNDICES DEL LISTADO DE USUARIOS
+-- GET /admin/users pagina por clave (keyset): cada página continúa
+-- tras el último (valor de orden, id) de la anterior. Estos índices
+-- permiten leer cada página directamente en el orden pedido (por
+-- nombre o por fecha de alta) sin ordenar la tabla entera. El orden
+-- por id usa la clave primaria y el orden por email su índice único.
+-- =====================================================
+
+CREATE INDEX idx_users_name_id ON users(name, id);
+CREATE INDEX idx_users_created_at_id ON users((COALESCE(created_at, '-infinity'::timestamptz)), id);
@@ -0,0 +1,72 @@
+-- =====================================================
+-- MIGRACIÓN 0005: RESUMEN PRECALCULADO DEL PANEL DE ADMINISTRACIÓN
+-- resumen_panel_admin guarda en una sola fila (id = 1) los totales,
+-- la distribución de clientes por plan, las clases y ejercicios más
+-- frecuentes y las altas por mes que muestra /admin/estadisticas,
+-- que así lee una fila en lugar de recorrer las tablas en cada
+-- visita. La refresca API/dashboard_summary.py con
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY (sin bloquear las lecturas);
+-- actualizado_en indica cuándo se calculó.
+-- =====================================================
+
+CREATE MATERIALIZED VIEW resumen_panel_admin AS
+SELECT
+    1 AS id,
+    now() AS actualizado_en,
+    (SELECT COUNT(*) FROM users) AS total_users,
+    (SELECT COUNT(*) FROM clientes WHERE estado = 'activo') AS total_clientes,
+    (SELECT COUNT(*) FROM users WHERE role = 'entrenador') AS total_entrenadores,
+    (SELECT COUNT(*) FROM planes WHERE activo = 1) AS total_planes,
+    (SELECT COUNT(*) FROM reservas WHERE estado = 'activa') AS total_reservas_activas,
+    (SELECT COUNT(*) FROM reservas WHERE estado = 'completada') AS total_reservas_completadas,
+    (SELECT COUNT(*) FROM clases_programadas WHERE estado IN ('activa', 'programada')) AS total_clases_programadas,
+    (SELECT COUNT(*) FROM entrenamientos_realizados) AS total_entrenamientos_realizados,
+    -- Distribución de clientes activos por plan
+    (SELECT COALESCE(json_agg(json_build_object('id', t.id, 'nombre', t.nombre, 'clientes', t.cantidad)
+                              ORDER BY t.cantidad DESC, t.nombre), '[]'::json)
+     FROM (
+        SELECT p.id, p.nombre, COUNT(c.id) AS cantidad
+        FROM planes p
+        LEFT JOIN clientes c ON c.plan_id = p.id AND c.estado = 'activo'
+        GROUP BY p.id, p.nombre
+     ) t) AS planes,
+    -- Top 10 clases por reservas completadas
+    (SELECT COALESCE(json_agg(json_build_object('nombre', t.nombre, 'reservas', t.reservas)
+                              ORDER BY t.reservas DESC, t.nombre), '[]'::json)
+     FROM (
+        SELECT gc.nombre, COUNT(*) AS reservas
+        FROM reservas r
+        JOIN clases_programadas cp ON r.id_clase_programada = cp.id
+        JOIN gym_clases gc ON cp.id_clase = gc.id
+        WHERE r.estado = 'completada'
+        GROUP BY gc.nombre
+        ORDER BY reservas DESC, gc.nombre
+        LIMIT 10
+     ) t) AS top_clases,
+    -- Top 10 ejercicios por frecuencia en entrenamientos_realizados
+    (SELECT COALESCE(json_agg(json_build_object('nombre', t.nombre, 'frecuencia', t.frecuencia)
+                              ORDER BY t.frecuencia DESC, t.nombre), '[]'::json)
+     FROM (
+        SELECT e.nombre, COUNT(*) AS frecuencia
+        FROM entrenamientos_realizados er
+        JOIN ejercicios e ON er.id_ejercicio = e.id
+        WHERE e.nombre IS NOT NULL
+        GROUP BY e.nombre
+        ORDER BY frecuencia DESC, e.nombre
+        LIMIT 10
+     ) t) AS top_ejercicios,
+    -- Altas de clientes de los últimos 12 meses con actividad
+    (SELECT COALESCE(json_agg(json_build_object('mes', t.mes, 'cantidad', t.cantidad)
+                              ORDER BY t.mes DESC), '[]'::json)
+     FROM (
+        SELECT to_char(DATE_TRUNC('month', fecha_inscripcion), 'YYYY-MM') AS mes, COUNT(*) AS cantidad
+        FROM clientes
+        WHERE fecha_inscripcion IS NOT NULL
+        GROUP BY mes
+        ORDER BY mes DESC
+        LIMIT 12
+     ) t) AS nuevos_por_mes
+WITH DATA;
+
+-- Necesario para REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_resumen_panel_admin_id ON resumen_panel_admin(id);
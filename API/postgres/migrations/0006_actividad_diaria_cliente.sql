@@ -0,0 +1,189 @@
+-- =====================================================
+-- MIGRACIÓN 0006: ACTIVIDAD DIARIA POR CLIENTE
+-- Resumen por cliente y día de lo que muestra
+-- /cliente/{id}/estadisticas, para que el endpoint agregue días y
+-- ejercicios en lugar de recorrer todo el historial:
+-- - actividad_diaria_ejercicios: registros, volumen
+--   (peso × series × repeticiones) y peso máximo de cada ejercicio.
+-- - actividad_diaria_clases: asistencias (reservas completadas) a
+--   cada tipo de clase, según la fecha de la clase.
+-- Lo mantienen los triggers de entrenamientos_realizados, reservas y
+-- clases_programadas (registrar_actividad y
+-- registrar_asistencia_clase pasan por ellos). Son datos derivados,
+-- sin claves foráneas; API/activity_rollup.py detecta y corrige
+-- desajustes.
+-- =====================================================
+
+-- Volumen de un registro, con el mismo criterio que las estadísticas
+-- del cliente: sin peso o sin series no suma, sin repeticiones cuenta 1.
+CREATE OR REPLACE FUNCTION volumen_entrenamiento(peso NUMERIC, series INTEGER, repeticiones INTEGER)
+RETURNS NUMERIC AS $$
+    SELECT COALESCE(peso, 0) * COALESCE(series, 0) * COALESCE(NULLIF(repeticiones, 0), 1)
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE TABLE actividad_diaria_ejercicios (
+    id_cliente INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    id_ejercicio INTEGER NOT NULL,
+    registros INTEGER NOT NULL,
+    volumen NUMERIC NOT NULL,
+    -- Sin contar los registros sin peso (NULL si no hay ninguno)
+    peso_maximo NUMERIC(5,2),
+    PRIMARY KEY (id_cliente, fecha, id_ejercicio)
+);
+
+CREATE TABLE actividad_diaria_clases (
+    id_cliente INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    id_clase INTEGER NOT NULL,
+    asistencias INTEGER NOT NULL,
+    PRIMARY KEY (id_cliente, fecha, id_clase)
+);
+
+INSERT INTO actividad_diaria_ejercicios (id_cliente, fecha, id_ejercicio, registros, volumen, peso_maximo)
+SELECT id_cliente, fecha_realizacion, id_ejercicio, COUNT(*),
+       SUM(volumen_entrenamiento(peso_kg, series_realizadas, repeticiones)), MAX(NULLIF(peso_kg, 0))
+FROM entrenamientos_realizados
+GROUP BY id_cliente, fecha_realizacion, id_ejercicio;
+
+INSERT INTO actividad_diaria_clases (id_cliente, fecha, id_clase, asistencias)
+SELECT r.id_cliente, cp.fecha, cp.id_clase, COUNT(*)
+FROM reservas r
+JOIN clases_programadas cp ON cp.id = r.id_clase_programada
+WHERE r.estado = 'completada'
+GROUP BY r.id_cliente, cp.fecha, cp.id_clase;
+
+-- Recalcula un día y ejercicio de un cliente a partir de sus registros
+-- (el peso máximo no se puede descontar al borrar o modificar uno).
+CREATE OR REPLACE FUNCTION recalcular_actividad_diaria_ejercicio(cliente INTEGER, dia DATE, ejercicio INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM actividad_diaria_ejercicios
+    WHERE id_cliente = cliente AND fecha = dia AND id_ejercicio = ejercicio;
+
+    INSERT INTO actividad_diaria_ejercicios (id_cliente, fecha, id_ejercicio, registros, volumen, peso_maximo)
+    SELECT cliente, dia, ejercicio, COUNT(*),
+           SUM(volumen_entrenamiento(peso_kg, series_realizadas, repeticiones)), MAX(NULLIF(peso_kg, 0))
+    FROM entrenamientos_realizados
+    WHERE id_cliente = cliente AND fecha_realizacion = dia AND id_ejercicio = ejercicio
+    HAVING COUNT(*) > 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_actividad_diaria_ejercicios()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO actividad_diaria_ejercicios AS a
+            (id_cliente, fecha, id_ejercicio, registros, volumen, peso_maximo)
+        VALUES (
+            NEW.id_cliente, NEW.fecha_realizacion, NEW.id_ejercicio, 1,
+            volumen_entrenamiento(NEW.peso_kg, NEW.series_realizadas, NEW.repeticiones),
+            NULLIF(NEW.peso_kg, 0)
+        )
+        ON CONFLICT (id_cliente, fecha, id_ejercicio) DO UPDATE
+        SET registros = a.registros + 1,
+            volumen = a.volumen + EXCLUDED.volumen,
+            peso_maximo = GREATEST(a.peso_maximo, EXCLUDED.peso_maximo);
+        RETURN NULL;
+    END IF;
+
+    PERFORM recalcular_actividad_diaria_ejercicio(OLD.id_cliente, OLD.fecha_realizacion, OLD.id_ejercicio);
+    IF TG_OP = 'UPDATE'
+       AND (OLD.id_cliente, OLD.fecha_realizacion, OLD.id_ejercicio)
+           IS DISTINCT FROM (NEW.id_cliente, NEW.fecha_realizacion, NEW.id_ejercicio) THEN
+        PERFORM recalcular_actividad_diaria_ejercicio(NEW.id_cliente, NEW.fecha_realizacion, NEW.id_ejercicio);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_diaria_ejercicios
+    AFTER INSERT OR DELETE
+       OR UPDATE OF id_cliente, fecha_realizacion, id_ejercicio, series_realizadas, repeticiones, peso_kg
+    ON entrenamientos_realizados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_diaria_ejercicios();
+
+CREATE OR REPLACE FUNCTION actualizar_actividad_diaria_clases()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.estado IS NOT DISTINCT FROM NEW.estado
+       AND OLD.id_clase_programada = NEW.id_clase_programada
+       AND OLD.id_cliente = NEW.id_cliente THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.estado = 'completada' THEN
+        UPDATE actividad_diaria_clases a
+        SET asistencias = a.asistencias - 1
+        FROM clases_programadas cp
+        WHERE cp.id = OLD.id_clase_programada
+          AND a.id_cliente = OLD.id_cliente AND a.fecha = cp.fecha AND a.id_clase = cp.id_clase;
+
+        DELETE FROM actividad_diaria_clases a
+        USING clases_programadas cp
+        WHERE cp.id = OLD.id_clase_programada
+          AND a.id_cliente = OLD.id_cliente AND a.fecha = cp.fecha AND a.id_clase = cp.id_clase
+          AND a.asistencias <= 0;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.estado = 'completada' THEN
+        INSERT INTO actividad_diaria_clases AS a (id_cliente, fecha, id_clase, asistencias)
+        SELECT NEW.id_cliente, cp.fecha, cp.id_clase, 1
+        FROM clases_programadas cp
+        WHERE cp.id = NEW.id_clase_programada
+        ON CONFLICT (id_cliente, fecha, id_clase) DO UPDATE
+        SET asistencias = a.asistencias + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_diaria_clases
+    AFTER INSERT OR DELETE OR UPDATE OF estado, id_clase_programada, id_cliente ON reservas
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_diaria_clases();
+
+-- Si una clase cambia de fecha o de tipo, sus asistencias pasan al nuevo día y tipo.
+CREATE OR REPLACE FUNCTION mover_actividad_diaria_clases()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.fecha = NEW.fecha AND OLD.id_clase = NEW.id_clase THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE actividad_diaria_clases a
+    SET asistencias = a.asistencias - r.total
+    FROM (
+        SELECT id_cliente, COUNT(*) AS total
+        FROM reservas
+        WHERE id_clase_programada = NEW.id AND estado = 'completada'
+        GROUP BY id_cliente
+    ) r
+    WHERE a.id_cliente = r.id_cliente AND a.fecha = OLD.fecha AND a.id_clase = OLD.id_clase;
+
+    DELETE FROM actividad_diaria_clases
+    WHERE fecha = OLD.fecha AND id_clase = OLD.id_clase AND asistencias <= 0
+      AND id_cliente IN (
+        SELECT id_cliente FROM reservas WHERE id_clase_programada = NEW.id AND estado = 'completada'
+      );
+
+    INSERT INTO actividad_diaria_clases AS a (id_cliente, fecha, id_clase, asistencias)
+    SELECT id_cliente, NEW.fecha, NEW.id_clase, COUNT(*)
+    FROM reservas
+    WHERE id_clase_programada = NEW.id AND estado = 'completada'
+    GROUP BY id_cliente
+    ON CONFLICT (id_cliente, fecha, id_clase) DO UPDATE
+    SET asistencias = a.asistencias + EXCLUDED.asistencias;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER mover_actividad_diaria_clases
+    AFTER UPDATE OF fecha, id_clase ON clases_programadas
+    FOR EACH ROW
+    EXECUTE FUNCTION mover_actividad_diaria_clases();
@@ -0,0 +1,130 @@
+-- =====================================================
+-- MIGRACIÓN 0007: CALENDARIO DE ACTIVIDAD POR CLIENTE
+-- calendario_actividad guarda por cliente un mapa de bits con un bit
+-- por día desde inicio (bit n = día inicio + n, con la numeración de
+-- get_bit/set_bit): 1 si ese día hubo algún entrenamiento realizado o
+-- alguna clase completada. Responde rachas, días activos y el mapa
+-- de calor del año sin recorrer fechas (ver API/activity_calendar.py).
+-- Lo mantienen los triggers del resumen de actividad diaria
+-- (migración 0006): un día se marca al aparecer su primera fila y se
+-- desmarca al desaparecer la última. API/activity_rollup.py lo
+-- reconstruye junto con el resumen.
+-- =====================================================
+
+CREATE TABLE calendario_actividad (
+    id_cliente INTEGER PRIMARY KEY,
+    inicio DATE NOT NULL,
+    dias BYTEA NOT NULL
+);
+
+-- Reconstruye el calendario de los clientes indicados (todos si es NULL)
+-- a partir del resumen de actividad diaria.
+CREATE OR REPLACE FUNCTION reconstruir_calendario_actividad(clientes INTEGER[] DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM calendario_actividad
+    WHERE clientes IS NULL OR id_cliente = ANY(clientes);
+
+    INSERT INTO calendario_actividad (id_cliente, inicio, dias)
+    WITH dias AS (
+        SELECT id_cliente, fecha FROM actividad_diaria_ejercicios
+        WHERE clientes IS NULL OR id_cliente = ANY(clientes)
+        UNION
+        SELECT id_cliente, fecha FROM actividad_diaria_clases
+        WHERE clientes IS NULL OR id_cliente = ANY(clientes)
+    ), limites AS (
+        SELECT id_cliente, MIN(fecha) AS inicio, MAX(fecha) AS fin
+        FROM dias
+        GROUP BY id_cliente
+    ), bytes AS (
+        SELECT d.id_cliente, (d.fecha - l.inicio) / 8 AS n, bit_or(1 << ((d.fecha - l.inicio) % 8)) AS valor
+        FROM dias d
+        JOIN limites l ON l.id_cliente = d.id_cliente
+        GROUP BY d.id_cliente, n
+    )
+    SELECT l.id_cliente, l.inicio,
+           decode(string_agg(lpad(to_hex(COALESCE(b.valor, 0)), 2, '0'), '' ORDER BY s.n), 'hex')
+    FROM limites l
+    CROSS JOIN LATERAL generate_series(0, (l.fin - l.inicio) / 8) AS s(n)
+    LEFT JOIN bytes b ON b.id_cliente = l.id_cliente AND b.n = s.n
+    GROUP BY l.id_cliente, l.inicio;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT reconstruir_calendario_actividad();
+
+-- Marca (o desmarca) un día en el calendario de un cliente, ampliando el
+-- mapa por delante o por detrás si hace falta.
+CREATE OR REPLACE FUNCTION marcar_dia_actividad(cliente INTEGER, dia DATE, activo BOOLEAN)
+RETURNS VOID AS $$
+DECLARE
+    cal RECORD;
+    idx INTEGER;
+    relleno INTEGER;
+BEGIN
+    IF activo THEN
+        INSERT INTO calendario_actividad (id_cliente, inicio, dias)
+        VALUES (cliente, dia, '\x00'::bytea)
+        ON CONFLICT (id_cliente) DO NOTHING;
+    END IF;
+
+    SELECT inicio, dias INTO cal FROM calendario_actividad WHERE id_cliente = cliente FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    idx := dia - cal.inicio;
+    IF idx < 0 OR idx >= length(cal.dias) * 8 THEN
+        IF NOT activo THEN
+            RETURN;
+        END IF;
+        IF idx < 0 THEN
+            -- Bytes completos por delante: el resto de días no cambia de bit
+            relleno := (7 - idx) / 8;
+            cal.dias := decode(repeat('00', relleno), 'hex') || cal.dias;
+            cal.inicio := cal.inicio - relleno * 8;
+            idx := idx + relleno * 8;
+        ELSE
+            cal.dias := cal.dias || decode(repeat('00', idx / 8 - length(cal.dias) + 1), 'hex');
+        END IF;
+    ELSIF get_bit(cal.dias, idx) = activo::INTEGER THEN
+        RETURN;
+    END IF;
+
+    UPDATE calendario_actividad
+    SET inicio = cal.inicio, dias = set_bit(cal.dias, idx, activo::INTEGER)
+    WHERE id_cliente = cliente;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_calendario_actividad()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- activity_rollup.rebuild() reconstruye el calendario al final de una vez
+    IF current_setting('gym.reconstruyendo_actividad', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        PERFORM marcar_dia_actividad(NEW.id_cliente, NEW.fecha, true);
+    ELSIF NOT EXISTS (
+            SELECT 1 FROM actividad_diaria_ejercicios WHERE id_cliente = OLD.id_cliente AND fecha = OLD.fecha
+          )
+          AND NOT EXISTS (
+            SELECT 1 FROM actividad_diaria_clases WHERE id_cliente = OLD.id_cliente AND fecha = OLD.fecha
+          ) THEN
+        PERFORM marcar_dia_actividad(OLD.id_cliente, OLD.fecha, false);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_calendario_actividad
+    AFTER INSERT OR DELETE ON actividad_diaria_ejercicios
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_calendario_actividad();
+
+CREATE TRIGGER actualizar_calendario_actividad
+    AFTER INSERT OR DELETE ON actividad_diaria_clases
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_calendario_actividad();
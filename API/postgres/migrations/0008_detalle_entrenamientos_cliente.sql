@@ -0,0 +1,14 @@
+-- =====================================================
+-- MIGRACIÓN 0008: DETALLE DE ENTRENAMIENTOS POR CLIENTE
+-- GET /cliente/{id}/ejercicios-realizados pagina por clave
+-- (fecha_realizacion, id) dentro de un cliente y, opcionalmente, de un
+-- rango de fechas; /cliente/{id}/estadisticas filtra su detalle por el
+-- mismo rango. Este índice sirve cada página en orden sin ordenar
+-- todo el historial del cliente y sustituye al de solo id_cliente,
+-- que es prefijo suyo.
+-- =====================================================
+
+CREATE INDEX idx_entrenamientos_realizados_cliente_fecha
+    ON entrenamientos_realizados(id_cliente, fecha_realizacion, id);
+
+DROP INDEX idx_entrenamientos_realizados_cliente;
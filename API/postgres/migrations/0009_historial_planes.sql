@@ -0,0 +1,48 @@
+-- =====================================================
+-- MIGRACIÓN 0009: HISTORIAL DE PLANES DE LOS CLIENTES
+-- clientes.plan_id solo guarda el plan actual; para el embudo de
+-- mejoras de plan de la analítica de administración (API/cohorts.py)
+-- hace falta saber con qué plan empezó cada cliente y por cuáles ha
+-- pasado. Un trigger anota el plan al crear el cliente y cada cambio
+-- de plan_id. Los clientes existentes empiezan con su plan actual en
+-- su fecha de inscripción: los cambios anteriores a esta migración no
+-- se conocen.
+-- =====================================================
+
+CREATE TABLE historial_planes (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    id_cliente INTEGER NOT NULL,
+    -- NULL en el alta del cliente
+    plan_anterior INTEGER,
+    plan_nuevo INTEGER NOT NULL,
+    fecha TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_cliente) REFERENCES clientes(id) ON DELETE CASCADE,
+    FOREIGN KEY (plan_anterior) REFERENCES planes(id),
+    FOREIGN KEY (plan_nuevo) REFERENCES planes(id)
+);
+
+CREATE INDEX idx_historial_planes_cliente ON historial_planes(id_cliente, fecha);
+
+INSERT INTO historial_planes (id_cliente, plan_anterior, plan_nuevo, fecha)
+SELECT id, NULL, plan_id, COALESCE(fecha_inscripcion::timestamptz, created_at)
+FROM clientes
+ORDER BY id;
+
+CREATE OR REPLACE FUNCTION registrar_cambio_plan()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO historial_planes (id_cliente, plan_anterior, plan_nuevo)
+        VALUES (NEW.id, NULL, NEW.plan_id);
+    ELSIF OLD.plan_id IS DISTINCT FROM NEW.plan_id THEN
+        INSERT INTO historial_planes (id_cliente, plan_anterior, plan_nuevo)
+        VALUES (NEW.id, OLD.plan_id, NEW.plan_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER registrar_cambio_plan
+    AFTER INSERT OR UPDATE OF plan_id ON clientes
+    FOR EACH ROW
+    EXECUTE FUNCTION registrar_cambio_plan();
@@ -0,0 +1,19 @@
+-- =====================================================
+-- MIGRACIÓN 0010: PANEL DEL ENTRENADOR
+-- GET /entrenador/{id}/clientes calcula en una sola consulta, para
+-- cada cliente asignado, sus entrenamientos asignados pendientes y
+-- completados y su asistencia a clases. Con estos índices ambos
+-- recuentos se leen solo del índice (sin visitar la tabla) para
+-- cada par entrenador-cliente y para cada cliente. Sustituyen a los
+-- de solo id_entrenador y solo id_cliente, que son prefijo suyo.
+-- =====================================================
+
+CREATE INDEX idx_entrenamientos_entrenador_cliente_estado
+    ON entrenamientos_asignados(id_entrenador, id_cliente, estado, fecha_entrenamiento);
+
+DROP INDEX idx_entrenamientos_entrenador;
+
+CREATE INDEX idx_reservas_cliente_estado
+    ON reservas(id_cliente, estado, id_clase_programada);
+
+DROP INDEX idx_reservas_cliente;
@@ -0,0 +1,218 @@
+-- =====================================================
+-- MIGRACIÓN 0011: ACTIVIDAD SEMANAL POR ENTRENADOR
+-- Resumen por entrenador y semana (lunes) de lo que muestra
+-- /entrenador/{id}/estadisticas, para que el endpoint lea unas pocas
+-- filas en lugar de recontar todas las asignaciones:
+-- - asignados, completados, cancelados y series asignadas (sin las
+--   canceladas) de entrenamientos_asignados, según su fecha.
+-- - realizados, series y volumen de los entrenamientos realizados
+--   enlazados a una asignación del entrenador, según su fecha.
+-- actividad_total_entrenador acumula lo mismo sin semana.
+-- Lo mantienen los triggers de entrenamientos_asignados y
+-- entrenamientos_realizados (guardar_plan_entrenamiento y
+-- registrar_actividad pasan por ellos) sumando y restando la
+-- aportación de cada fila. Son datos derivados, sin claves foráneas;
+-- API/trainer_rollup.py detecta y corrige desajustes.
+-- =====================================================
+
+CREATE TABLE actividad_semanal_entrenador (
+    id_entrenador INTEGER NOT NULL,
+    semana DATE NOT NULL,
+    asignados INTEGER NOT NULL,
+    completados INTEGER NOT NULL,
+    cancelados INTEGER NOT NULL,
+    series_asignadas INTEGER NOT NULL,
+    realizados INTEGER NOT NULL,
+    series_realizadas INTEGER NOT NULL,
+    volumen NUMERIC NOT NULL,
+    PRIMARY KEY (id_entrenador, semana)
+);
+
+CREATE TABLE actividad_total_entrenador (
+    id_entrenador INTEGER PRIMARY KEY,
+    asignados INTEGER NOT NULL,
+    completados INTEGER NOT NULL,
+    cancelados INTEGER NOT NULL,
+    series_asignadas INTEGER NOT NULL,
+    realizados INTEGER NOT NULL,
+    series_realizadas INTEGER NOT NULL,
+    volumen NUMERIC NOT NULL
+);
+
+INSERT INTO actividad_semanal_entrenador
+    (id_entrenador, semana, asignados, completados, cancelados, series_asignadas, realizados, series_realizadas, volumen)
+SELECT id_entrenador, semana, SUM(asignados), SUM(completados), SUM(cancelados), SUM(series_asignadas),
+       SUM(realizados), SUM(series_realizadas), SUM(volumen)
+FROM (
+    SELECT id_entrenador, date_trunc('week', fecha_entrenamiento)::date AS semana,
+           COUNT(*) AS asignados,
+           COUNT(*) FILTER (WHERE estado = 'completado') AS completados,
+           COUNT(*) FILTER (WHERE estado = 'cancelado') AS cancelados,
+           COALESCE(SUM(series) FILTER (WHERE estado IS DISTINCT FROM 'cancelado'), 0) AS series_asignadas,
+           0 AS realizados, 0 AS series_realizadas, 0 AS volumen
+    FROM entrenamientos_asignados
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT ea.id_entrenador, date_trunc('week', er.fecha_realizacion)::date,
+           0, 0, 0, 0, COUNT(*), SUM(er.series_realizadas),
+           SUM(volumen_entrenamiento(er.peso_kg, er.series_realizadas, er.repeticiones))
+    FROM entrenamientos_realizados er
+    JOIN entrenamientos_asignados ea ON ea.id = er.id_entrenamiento_asignado
+    GROUP BY 1, 2
+) aportaciones
+GROUP BY id_entrenador, semana;
+
+INSERT INTO actividad_total_entrenador
+    (id_entrenador, asignados, completados, cancelados, series_asignadas, realizados, series_realizadas, volumen)
+SELECT id_entrenador, SUM(asignados), SUM(completados), SUM(cancelados), SUM(series_asignadas),
+       SUM(realizados), SUM(series_realizadas), SUM(volumen)
+FROM actividad_semanal_entrenador
+GROUP BY id_entrenador;
+
+-- Suma (o resta, con valores negativos) una aportación a la semana de
+-- `dia` y al total del entrenador; borra la semana si se queda vacía.
+CREATE OR REPLACE FUNCTION sumar_actividad_entrenador(
+    entrenador INTEGER, dia DATE,
+    d_asignados INTEGER, d_completados INTEGER, d_cancelados INTEGER, d_series_asignadas INTEGER,
+    d_realizados INTEGER, d_series_realizadas INTEGER, d_volumen NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO actividad_semanal_entrenador AS a
+        (id_entrenador, semana, asignados, completados, cancelados, series_asignadas, realizados, series_realizadas, volumen)
+    VALUES (entrenador, date_trunc('week', dia)::date, d_asignados, d_completados, d_cancelados, d_series_asignadas,
+            d_realizados, d_series_realizadas, d_volumen)
+    ON CONFLICT (id_entrenador, semana) DO UPDATE
+    SET asignados = a.asignados + EXCLUDED.asignados,
+        completados = a.completados + EXCLUDED.completados,
+        cancelados = a.cancelados + EXCLUDED.cancelados,
+        series_asignadas = a.series_asignadas + EXCLUDED.series_asignadas,
+        realizados = a.realizados + EXCLUDED.realizados,
+        series_realizadas = a.series_realizadas + EXCLUDED.series_realizadas,
+        volumen = a.volumen + EXCLUDED.volumen;
+
+    DELETE FROM actividad_semanal_entrenador
+    WHERE id_entrenador = entrenador AND semana = date_trunc('week', dia)::date
+      AND asignados <= 0 AND realizados <= 0;
+
+    INSERT INTO actividad_total_entrenador AS t
+        (id_entrenador, asignados, completados, cancelados, series_asignadas, realizados, series_realizadas, volumen)
+    VALUES (entrenador, d_asignados, d_completados, d_cancelados, d_series_asignadas,
+            d_realizados, d_series_realizadas, d_volumen)
+    ON CONFLICT (id_entrenador) DO UPDATE
+    SET asignados = t.asignados + EXCLUDED.asignados,
+        completados = t.completados + EXCLUDED.completados,
+        cancelados = t.cancelados + EXCLUDED.cancelados,
+        series_asignadas = t.series_asignadas + EXCLUDED.series_asignadas,
+        realizados = t.realizados + EXCLUDED.realizados,
+        series_realizadas = t.series_realizadas + EXCLUDED.series_realizadas,
+        volumen = t.volumen + EXCLUDED.volumen;
+
+    DELETE FROM actividad_total_entrenador
+    WHERE id_entrenador = entrenador AND asignados <= 0 AND realizados <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Aportación de cada asignación a su entrenador y semana. Al borrarla
+-- (BEFORE, mientras sus registros siguen enlazados: después el
+-- ON DELETE SET NULL ya no deja saber de quién eran) o al cambiar de
+-- entrenador, sus registros realizados se descuentan (y se pasan).
+CREATE OR REPLACE FUNCTION actualizar_actividad_entrenador_asignados()
+RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND (OLD.id_entrenador, OLD.fecha_entrenamiento, OLD.series, OLD.estado)
+           IS NOT DISTINCT FROM (NEW.id_entrenador, NEW.fecha_entrenamiento, NEW.series, NEW.estado) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM sumar_actividad_entrenador(
+            OLD.id_entrenador, OLD.fecha_entrenamiento,
+            -1,
+            -(CASE WHEN OLD.estado = 'completado' THEN 1 ELSE 0 END),
+            -(CASE WHEN OLD.estado = 'cancelado' THEN 1 ELSE 0 END),
+            -(CASE WHEN OLD.estado = 'cancelado' THEN 0 ELSE OLD.series END),
+            0, 0, 0
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM sumar_actividad_entrenador(
+            NEW.id_entrenador, NEW.fecha_entrenamiento,
+            1,
+            CASE WHEN NEW.estado = 'completado' THEN 1 ELSE 0 END,
+            CASE WHEN NEW.estado = 'cancelado' THEN 1 ELSE 0 END,
+            CASE WHEN NEW.estado = 'cancelado' THEN 0 ELSE NEW.series END,
+            0, 0, 0
+        );
+    END IF;
+
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.id_entrenador <> NEW.id_entrenador) THEN
+        FOR r IN
+            SELECT fecha_realizacion AS dia, COUNT(*)::integer AS realizados, SUM(series_realizadas)::integer AS series,
+                   SUM(volumen_entrenamiento(peso_kg, series_realizadas, repeticiones)) AS volumen
+            FROM entrenamientos_realizados
+            WHERE id_entrenamiento_asignado = OLD.id
+            GROUP BY fecha_realizacion
+        LOOP
+            PERFORM sumar_actividad_entrenador(OLD.id_entrenador, r.dia, 0, 0, 0, 0, -r.realizados, -r.series, -r.volumen);
+            IF TG_OP = 'UPDATE' THEN
+                PERFORM sumar_actividad_entrenador(NEW.id_entrenador, r.dia, 0, 0, 0, 0, r.realizados, r.series, r.volumen);
+            END IF;
+        END LOOP;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_entrenador
+    AFTER INSERT OR UPDATE OF id_entrenador, fecha_entrenamiento, series, estado
+    ON entrenamientos_asignados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_entrenador_asignados();
+
+CREATE TRIGGER descontar_actividad_entrenador
+    BEFORE DELETE ON entrenamientos_asignados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_entrenador_asignados();
+
+-- Aportación de cada registro enlazado a una asignación al entrenador
+-- de esa asignación, en la semana en que se realizó.
+CREATE OR REPLACE FUNCTION actualizar_actividad_entrenador_realizados()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.id_entrenamiento_asignado IS NOT NULL THEN
+        PERFORM sumar_actividad_entrenador(
+            ea.id_entrenador, OLD.fecha_realizacion, 0, 0, 0, 0,
+            -1, -OLD.series_realizadas, -volumen_entrenamiento(OLD.peso_kg, OLD.series_realizadas, OLD.repeticiones)
+        )
+        FROM entrenamientos_asignados ea
+        WHERE ea.id = OLD.id_entrenamiento_asignado;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.id_entrenamiento_asignado IS NOT NULL THEN
+        PERFORM sumar_actividad_entrenador(
+            ea.id_entrenador, NEW.fecha_realizacion, 0, 0, 0, 0,
+            1, NEW.series_realizadas, volumen_entrenamiento(NEW.peso_kg, NEW.series_realizadas, NEW.repeticiones)
+        )
+        FROM entrenamientos_asignados ea
+        WHERE ea.id = NEW.id_entrenamiento_asignado;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER actualizar_actividad_entrenador
+    AFTER INSERT OR DELETE
+       OR UPDATE OF id_entrenamiento_asignado, fecha_realizacion, series_realizadas, repeticiones, peso_kg
+    ON entrenamientos_realizados
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_actividad_entrenador_realizados();
@@ -0,0 +1,39 @@
+-- =====================================================
+-- MIGRACIÓN 0012: BORRADO DE CLASES EN LA ACTIVIDAD DIARIA
+-- Al borrar una clase programada (DELETE /clases-programadas/{id}, o en
+-- cascada desde gym_clases o desde el instructor en users) sus
+-- reservas se borran en cascada, pero cuando se dispara el trigger de
+-- reservas (migración 0006) la clase ya no existe y no sabe de qué día
+-- y tipo descontar las asistencias. Este trigger las descuenta antes
+-- del borrado, mientras fecha e id_clase siguen visibles; el de
+-- reservas ya no encuentra la clase y no hace nada. Igual que
+-- descontar_actividad_entrenador (migración 0011).
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION descontar_actividad_diaria_clases()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE actividad_diaria_clases a
+    SET asistencias = a.asistencias - r.total
+    FROM (
+        SELECT id_cliente, COUNT(*) AS total
+        FROM reservas
+        WHERE id_clase_programada = OLD.id AND estado = 'completada'
+        GROUP BY id_cliente
+    ) r
+    WHERE a.id_cliente = r.id_cliente AND a.fecha = OLD.fecha AND a.id_clase = OLD.id_clase;
+
+    DELETE FROM actividad_diaria_clases
+    WHERE fecha = OLD.fecha AND id_clase = OLD.id_clase AND asistencias <= 0
+      AND id_cliente IN (
+        SELECT id_cliente FROM reservas WHERE id_clase_programada = OLD.id AND estado = 'completada'
+      );
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER descontar_actividad_diaria_clases
+    BEFORE DELETE ON clases_programadas
+    FOR EACH ROW
+    EXECUTE FUNCTION descontar_actividad_diaria_clases();
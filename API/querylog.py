@@ -0,0 +1,272 @@
+"""Registro de las consultas SQL de la API.
+
+Los cursores de ``db.py`` (``TimingCursor``) y ``db_async.py``
+(``TimingAsyncCursor``) son los que usan todas las conexiones, y anotan aquí
+cada sentencia:
+
+- SQL normalizado (literales y parámetros como ``?``, listas ``IN (...)``
+  colapsadas y espacios compactados), que agrupa las consultas que solo
+  difieren en los valores.
+- Forma de los parámetros (``(int,str)``, ``{email:str}``, ``list[3]``...),
+  nunca sus valores.
+- Duración y filas devueltas/afectadas.
+
+Con eso se obtiene:
+
+- Log de consultas lentas (logger ``gym-infosys.sql``, nivel WARNING) a partir
+  de ``DB_SLOW_QUERY_MS`` (200 por defecto; 0 lo desactiva). En nivel DEBUG se
+  registran todas.
+- Detección de N+1: al terminar una petición, las sentencias idénticas
+  (estructuralmente) ejecutadas ``DB_N_PLUS_ONE_MIN`` veces o más (5 por
+  defecto) se registran como sospechosas.
+- Presupuesto de consultas por endpoint: ``@querylog.max_queries(n)`` fija el
+  máximo de consultas de una ruta. Si se supera se registra un aviso y, en
+  modo test (``DB_QUERY_ASSERT=1``), la petición falla con
+  ``QueryBudgetExceeded``, que ``TestClient`` propaga al test.
+- Estadísticas por sentencia del proceso (llamadas, tiempo total y máximo,
+  filas) en ``/health/queries``.
+
+Las sentencias internas de los pools (el ``SELECT 1`` del health check) se
+ejecutan dentro de ``suspended()`` y no cuentan en la petición que pidió la
+conexión.
+"""
+
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger("gym-infosys.sql")
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+SLOW_QUERY_SECONDS = _env_number("DB_SLOW_QUERY_MS", 200) / 1000
+N_PLUS_ONE_MIN = int(_env_number("DB_N_PLUS_ONE_MIN", 5))
+ASSERT_BUDGETS = os.getenv("DB_QUERY_ASSERT") == "1"
+
+# Sentencias distintas que se guardan en las estadísticas del proceso. Salen del
+# código (no de la entrada del usuario), así que en la práctica son unas decenas.
+MAX_STATEMENTS = 500
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Una petición ejecutó más consultas de las permitidas por ``max_queries``."""
+
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_VALUES_RE = re.compile(r"\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+", re.I)
+_SPACE_RE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize(sql: str) -> str:
+    """SQL con los valores sustituidos por ``?`` y el espaciado compactado."""
+    sql = _COMMENT_RE.sub(" ", sql)
+    sql = _STRING_RE.sub("?", sql)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    sql = _VALUES_RE.sub(r"VALUES \1, ...", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def query_text(query, context=None) -> str:
+    """Texto de la consulta tal como la recibe ``execute`` (str, bytes o ``sql.Composed``)."""
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    as_string = getattr(query, "as_string", None)
+    if as_string is not None and context is not None:
+        try:
+            return as_string(context)
+        except Exception:
+            pass
+    return str(query)
+
+
+def _value_shape(value) -> str:
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__ if value is not None else "None"
+
+
+def param_shape(params) -> str:
+    """Tipos de los parámetros, sin sus valores."""
+    if params is None:
+        return "-"
+    if isinstance(params, dict):
+        return "{" + ",".join(f"{k}:{_value_shape(v)}" for k, v in params.items()) + "}"
+    if isinstance(params, (list, tuple)):
+        return "(" + ",".join(_value_shape(v) for v in params) + ")"
+    return _value_shape(params)
+
+
+def many_shape(params_seq) -> str:
+    """Forma de los parámetros de ``executemany``: ``Nx(…)`` con la forma del primero."""
+    try:
+        params_seq = list(params_seq)
+    except TypeError:
+        return "?"
+    first = param_shape(params_seq[0]) if params_seq else "-"
+    return f"{len(params_seq)}x{first}"
+
+
+class QueryStats:
+    """Consultas de una petición: total, tiempo en BD y recuento por sentencia."""
+
+    __slots__ = ("label", "count", "seconds", "slow", "statements")
+
+    def __init__(self, label: str | None = None):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = 0
+        # SQL normalizado -> [ejecuciones, segundos]
+        self.statements: dict[str, list] = {}
+
+    def repeated(self, threshold: int = None) -> list[tuple[str, int, float]]:
+        """Sentencias ejecutadas ``threshold`` veces o más (posible N+1)."""
+        threshold = N_PLUS_ONE_MIN if threshold is None else threshold
+        if threshold <= 0:
+            return []
+        return sorted(
+            ((sql, n, secs) for sql, (n, secs) in self.statements.items() if n >= threshold),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+
+# Consultas de la petición HTTP en curso. Lo rellena el middleware de main.py
+# con ``begin()``; fuera de una petición es None.
+_current: contextvars.ContextVar = contextvars.ContextVar("sql_request_stats", default=None)
+
+_lock = threading.Lock()
+# SQL normalizado -> estadísticas acumuladas en el proceso
+_statements: dict[str, dict] = {}
+
+
+def begin(label: str | None = None) -> QueryStats:
+    """Empieza a registrar las consultas de la petición en curso (síncronas y asíncronas)."""
+    stats = QueryStats(label)
+    _current.set(stats)
+    return stats
+
+
+def current() -> QueryStats | None:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def suspended():
+    """Deja de atribuir consultas a la petición en curso dentro del bloque.
+
+    Las sentencias siguen en las estadísticas del proceso, pero no suman en el
+    presupuesto de ``max_queries`` ni en la detección de N+1 de la petición.
+    """
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def record(sql: str, shape: str, seconds: float, rows: int) -> None:
+    """Anota una sentencia ejecutada; la llaman los cursores de db.py y db_async.py."""
+    normalized = normalize(sql)
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += seconds
+        entry = stats.statements.get(normalized)
+        if entry is None:
+            stats.statements[normalized] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    with _lock:
+        total = _statements.get(normalized)
+        if total is None and len(_statements) < MAX_STATEMENTS:
+            total = _statements[normalized] = {
+                "calls": 0, "total_seconds": 0.0, "max_seconds": 0.0, "rows": 0, "params": shape,
+            }
+        if total is not None:
+            total["calls"] += 1
+            total["total_seconds"] += seconds
+            total["max_seconds"] = max(total["max_seconds"], seconds)
+            total["rows"] += max(rows, 0)
+            total["params"] = shape
+
+    if SLOW_QUERY_SECONDS and seconds >= SLOW_QUERY_SECONDS:
+        if stats is not None:
+            stats.slow += 1
+        logger.warning(
+            "Consulta lenta (%.1f ms, %s filas) en %s: %s | params=%s",
+            seconds * 1000, rows, stats.label if stats else "(fuera de petición)", normalized, shape,
+        )
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%.1f ms, %s filas: %s | params=%s", seconds * 1000, rows, normalized, shape)
+
+
+def max_queries(limit: int):
+    """Decorador de endpoint: máximo de consultas SQL que puede ejecutar la ruta.
+
+    Se aplica debajo de ``@app.get(...)`` y solo anota la función; lo comprueba
+    ``finish()`` al terminar cada petición.
+    """
+    def decorator(endpoint):
+        endpoint.__max_queries__ = limit
+        return endpoint
+    return decorator
+
+
+def finish(stats: QueryStats, endpoint=None) -> list[tuple[str, int, float]]:
+    """Revisa las consultas de una petición terminada.
+
+    Registra las sentencias repetidas (N+1) y las devuelve, y comprueba el
+    presupuesto de ``max_queries`` del endpoint. En modo test
+    (``DB_QUERY_ASSERT=1``) superarlo lanza ``QueryBudgetExceeded``.
+    """
+    repeated = stats.repeated()
+    for sql, n, secs in repeated:
+        logger.warning(
+            "Posible N+1 en %s: %s ejecuciones (%.1f ms) de: %s",
+            stats.label, n, secs * 1000, sql,
+        )
+
+    limit = getattr(endpoint, "__max_queries__", None)
+    if limit is not None and stats.count > limit:
+        message = f"{stats.label} ejecutó {stats.count} consultas (máximo {limit})"
+        if ASSERT_BUDGETS:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    return repeated
+
+
+def statement_stats(limit: int = 20) -> list[dict]:
+    """Sentencias del proceso ordenadas por tiempo total (las más costosas primero)."""
+    with _lock:
+        items = [dict(sql=sql, **data) for sql, data in _statements.items()]
+    items.sort(key=lambda item: item["total_seconds"], reverse=True)
+    for item in items:
+        item["avg_seconds"] = item["total_seconds"] / item["calls"] if item["calls"] else 0.0
+    return items[:limit]
+
+
+def reset() -> None:
+    with _lock:
+        _statements.clear()
@@ -0,0 +1,134 @@
+"""Reconciliación de ``clases_programadas.reservas_activas``.
+
+El contador lo mantiene el trigger ``actualizar_reservas_activas`` (migración
+0002), pero puede desviarse si se cambian las reservas sin pasar por él:
+``TRUNCATE``, ``ALTER TABLE ... DISABLE TRIGGER`` en cargas masivas
+(``bench/generate_data.py``) o restauraciones parciales. Este módulo compara
+el contador con el recuento real de reservas activas y corrige las clases
+que no coinciden.
+
+La corrección es segura con la API en marcha: bloquea las filas de las clases
+desajustadas (igual que ``crear_reserva``) y, ya con el bloqueo, vuelve a
+contar en una sentencia nueva, así que no pisa reservas o cancelaciones
+simultáneas. Requiere el nivel de aislamiento por defecto (READ COMMITTED).
+
+``serve.py`` la ejecuta una vez al arrancar, tras las migraciones. Para
+ejecutarla periódicamente (cron) desde API/::
+
+    python reconcile.py           # detecta y corrige
+    python reconcile.py --check   # solo informa; sale con 1 si hay desajustes
+"""
+
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger("gym-infosys.reconcile")
+
+
+class Drift(NamedTuple):
+    id_clase_programada: int
+    contador: int
+    reservas: int
+
+
+DRIFT_SQL = """
+    SELECT cp.id, cp.reservas_activas, COALESCE(r.total, 0)
+    FROM clases_programadas cp
+    LEFT JOIN (
+        SELECT id_clase_programada, COUNT(*) AS total
+        FROM reservas
+        WHERE estado = 'activa'
+        GROUP BY id_clase_programada
+    ) r ON r.id_clase_programada = cp.id
+    WHERE cp.reservas_activas <> COALESCE(r.total, 0)
+    ORDER BY cp.id
+"""
+
+REPAIR_SQL = """
+    WITH recuento AS (
+        SELECT cp.id, cp.reservas_activas AS contador, COALESCE(r.total, 0) AS reservas
+        FROM clases_programadas cp
+        LEFT JOIN (
+            SELECT id_clase_programada, COUNT(*) AS total
+            FROM reservas
+            WHERE estado = 'activa' AND id_clase_programada = ANY(%(ids)s)
+            GROUP BY id_clase_programada
+        ) r ON r.id_clase_programada = cp.id
+        WHERE cp.id = ANY(%(ids)s)
+    )
+    UPDATE clases_programadas cp
+    SET reservas_activas = recuento.reservas
+    FROM recuento
+    WHERE cp.id = recuento.id AND cp.reservas_activas <> recuento.reservas
+    RETURNING cp.id, recuento.contador, recuento.reservas
+"""
+
+
+def find_drift(cursor) -> list[Drift]:
+    """Clases cuyo contador no coincide con sus reservas activas."""
+    cursor.execute(DRIFT_SQL)
+    return [Drift(*row) for row in cursor.fetchall()]
+
+
+def reconcile(cursor, fix: bool = True) -> list[Drift]:
+    """Detecta (y con ``fix`` corrige) los desajustes en la transacción del cursor.
+
+    Devuelve los desajustes encontrados; con ``fix`` solo los que seguían ahí
+    tras bloquear las clases. No hace commit: lo decide quien llama.
+    """
+    drift = find_drift(cursor)
+    if not drift or not fix:
+        return drift
+    ids = [d.id_clase_programada for d in drift]
+    cursor.execute("SELECT id FROM clases_programadas WHERE id = ANY(%s) ORDER BY id FOR UPDATE", (ids,))
+    cursor.execute(REPAIR_SQL, {"ids": ids})
+    fixed = sorted(Drift(*row) for row in cursor.fetchall())
+    for d in fixed[:20]:
+        logger.warning(
+            "Contador de reservas corregido en la clase %s: %s -> %s",
+            d.id_clase_programada, d.contador, d.reservas,
+        )
+    if len(fixed) > 20:
+        logger.warning("... y %s clases más", len(fixed) - 20)
+    return fixed
+
+
+def run(conn, fix: bool = True) -> list[Drift]:
+    """``reconcile()`` en su propia transacción sobre una conexión psycopg2."""
+    try:
+        with conn.cursor() as cursor:
+            drift = reconcile(cursor, fix=fix)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info("Contadores de reservas: %s desajustes%s", len(drift), " corregidos" if fix and drift else "")
+    return drift
+
+
+def main(argv=None) -> int:
+    import argparse
+    import json
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+
+    import db
+
+    parser = argparse.ArgumentParser(description="Reconciliación del contador de reservas activas")
+    parser.add_argument("--check", action="store_true", help="Solo informar, sin corregir")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env.local")
+    conn = db.connect()
+    try:
+        drift = run(conn, fix=not args.check)
+    finally:
+        conn.close()
+    print(json.dumps([d._asdict() for d in drift], indent=2))
+    return 1 if args.check and drift else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
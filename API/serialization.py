@@ -0,0 +1,87 @@
+"""Serialización rápida de respuestas: orjson y, bajo demanda, MessagePack.
+
+El camino por defecto de FastAPI recorre cada respuesta con
+``jsonable_encoder`` (copia recursiva de dicts y listas, conversión de fechas y
+``Decimal``) y después la vuelca con ``json.dumps``. En los listados grandes
+eso es buena parte de la CPU de la petición. Los endpoints que lo necesitan
+leen las filas directamente como registros tipados (dataclasses con
+``__slots__``, vía ``psycopg.rows.class_row`` o ``rows_as``) y devuelven::
+
+    return serialization.render(request, registros, response)
+
+- JSON con orjson, que serializa dataclasses, fechas y horas sin pasar por
+  dicts intermedios. La salida es idéntica byte a byte a la de FastAPI:
+  mismas claves en el mismo orden, fechas en ISO 8601 y ``Decimal`` como
+  número (entero si no tiene decimales, como ``jsonable_encoder``).
+- MessagePack si el cliente lo pide con ``Accept: application/msgpack`` (o
+  ``application/x-msgpack``), con la misma estructura que el JSON una vez
+  decodificado (las fechas siguen siendo cadenas ISO).
+- Las cabeceras y el código de estado fijados en el ``response`` inyectado
+  (validadores de ``conditional.py``, anti-cache...) se copian a la respuesta,
+  igual que hace FastAPI cuando el endpoint devuelve un dict.
+"""
+
+import dataclasses
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import msgpack
+import orjson
+from fastapi import Request, Response
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+def rows_as(cls, rows) -> list:
+    """Registros ``cls`` a partir de filas en el mismo orden que sus campos (psycopg2)."""
+    return [cls(*row) for row in rows]
+
+
+def _decimal(value: Decimal):
+    # Igual que fastapi.encoders.decimal_encoder
+    return int(value) if value.as_tuple().exponent >= 0 else float(value)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return _decimal(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _msgpack_default(value):
+    if dataclasses.is_dataclass(value):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return _json_default(value)
+
+
+def dumps_json(content) -> bytes:
+    return orjson.dumps(content, default=_json_default)
+
+
+def dumps_msgpack(content) -> bytes:
+    return msgpack.packb(content, default=_msgpack_default, datetime=False)
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in _MSGPACK_TYPES)
+
+
+def render(request: Request, content, response: Response | None = None, status_code: int = 200) -> Response:
+    """Respuesta con ``content`` en JSON o MessagePack según ``Accept``."""
+    if wants_msgpack(request):
+        result = Response(dumps_msgpack(content), status_code=status_code, media_type=MSGPACK_MEDIA_TYPE)
+    else:
+        result = Response(dumps_json(content), status_code=status_code, media_type=JSON_MEDIA_TYPE)
+    if response is not None:
+        if response.status_code:
+            result.status_code = response.status_code
+        result.headers.raw.extend(response.headers.raw)
+    result.headers["Vary"] = "Accept"
+    return result
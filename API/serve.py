@@ -0,0 +1,238 @@
+"""Punto de entrada de producción: uvicorn con varios workers.
+
+``uvicorn main:app`` arranca un único proceso, así que un solo núcleo atiende
+todo el tráfico. Este script:
+
+1. Carga ``.env.local`` y aplica las migraciones del esquema **una sola vez**
+   en el proceso principal, antes de crear los workers (que arrancan con
+   ``DB_MIGRATE_ON_STARTUP=0``).
+2. Elige el número de workers: ``--workers`` / ``WEB_CONCURRENCY`` o, por
+   defecto, los núcleos disponibles para el proceso (afinidad y cuota de
+   cgroup incluidas, para contenedores con ``cpus:`` limitado).
+3. Reparte el presupuesto global de conexiones ``DB_MAX_CONNECTIONS`` entre
+   workers y, dentro de cada uno, entre el pool síncrono (``DB_POOL_MAX``) y el
+   asíncrono (``DB_ASYNC_POOL_MAX``). Lo mismo con los procesos de bcrypt
+   (``HASH_WORKERS``) respecto a los núcleos. Los valores definidos
+   explícitamente en el entorno se respetan.
+4. Drena al parar. Con SIGTERM/SIGINT, durante ``--drain-seconds``
+   (``DRAIN_SECONDS``, 0 por defecto) los workers siguen atendiendo pero
+   ``/health`` responde 503, para que el balanceador deje de enviar tráfico.
+   Después cada worker deja de aceptar conexiones, espera hasta
+   ``--graceful-timeout`` (``GRACEFUL_TIMEOUT``, 30 s) a que terminen las
+   peticiones en curso y cierra sus pools. Las conexiones que sigan en la cola
+   del socket cuando sale el último worker se pierden, de ahí el margen previo.
+5. Prepara ``PROMETHEUS_MULTIPROC_DIR`` (un directorio temporal nuevo si no
+   está definido) para que ``/metrics`` agregue las métricas de todos los
+   workers.
+
+Uso (desde API/)::
+
+    python serve.py --port 8000
+    WEB_CONCURRENCY=4 DB_MAX_CONNECTIONS=60 python serve.py
+"""
+
+import argparse
+import logging
+import math
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import uvicorn
+from dotenv import load_dotenv
+from uvicorn.supervisors import Multiprocess
+
+API_DIR = Path(__file__).resolve().parent
+
+logger = logging.getLogger("gym-infosys.serve")
+
+
+def available_cpus() -> int:
+    """Núcleos utilizables por este proceso (afinidad y cuota de cgroup v2)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows / macOS
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def _env_int(name: str, default: int | None = None) -> int | None:
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float | None = None) -> float | None:
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def plan_resources(workers: int, cpus: int) -> dict:
+    """Calcula (y exporta al entorno de los workers) el tamaño de pools por worker."""
+    budget = _env_int("DB_MAX_CONNECTIONS", 40)
+    per_worker = max(2, budget // workers)
+    plan = {
+        # Los endpoints async usan el pool asíncrono y los def el síncrono:
+        # se reparte a partes iguales, redondeando a favor del síncrono.
+        "DB_POOL_MAX": _env_int("DB_POOL_MAX", math.ceil(per_worker / 2)),
+        "DB_ASYNC_POOL_MAX": _env_int("DB_ASYNC_POOL_MAX", per_worker // 2),
+        "HASH_WORKERS": _env_int("HASH_WORKERS", max(1, cpus // workers)),
+    }
+    plan["DB_POOL_MIN"] = min(_env_int("DB_POOL_MIN", 1), plan["DB_POOL_MAX"])
+    plan["DB_ASYNC_POOL_MIN"] = min(_env_int("DB_ASYNC_POOL_MIN", 1), plan["DB_ASYNC_POOL_MAX"])
+    total = workers * (plan["DB_POOL_MAX"] + plan["DB_ASYNC_POOL_MAX"])
+    if total > budget:
+        logger.warning(
+            "Los pools definidos en el entorno suman %s conexiones, más que DB_MAX_CONNECTIONS=%s",
+            total, budget,
+        )
+    for name, value in plan.items():
+        os.environ[name] = str(value)
+    return plan
+
+
+def run_migrations() -> None:
+    """Aplica las migraciones, reconcilia los contadores y refresca el resumen del panel
+    una vez, antes de arrancar los workers."""
+    import dashboard_summary
+    import db
+    import migrations
+    import reconcile
+
+    try:
+        conn = db.connect()
+    except Exception as e:
+        # Igual que el arranque de main.py: sin BD la API levanta igualmente.
+        logger.error("No se pudo conectar a la BD para migrar: %s", e)
+        return
+    try:
+        migrations.migrate(conn)
+        try:
+            reconcile.run(conn)
+        except Exception as e:
+            # Un desajuste del contador no impide servir; se reintenta con reconcile.py.
+            logger.error("No se pudieron reconciliar los contadores de reservas: %s", e)
+        try:
+            dashboard_summary.refresh_sync(conn)
+        except Exception as e:
+            # Los workers lo reintentan periódicamente (ver dashboard_summary.py).
+            logger.error("No se pudo refrescar el resumen del panel de administración: %s", e)
+    finally:
+        conn.close()
+
+
+def prepare_metrics_dir() -> Path | None:
+    """Directorio compartido por los workers para las métricas Prometheus.
+
+    Devuelve el directorio si lo ha creado este proceso (y por tanto debe
+    borrarlo al salir). Uno definido en el entorno se vacía: los ficheros de
+    una ejecución anterior sumarían valores de procesos que ya no existen.
+    """
+    existing = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if existing:
+        path = Path(existing)
+        path.mkdir(parents=True, exist_ok=True)
+        for stale in path.glob("*.db"):
+            stale.unlink()
+        return None
+    path = Path(tempfile.mkdtemp(prefix="gym-infosys-metrics-"))
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = str(path)
+    return path
+
+
+def announce(host: str, port: int, workers: int) -> None:
+    try:
+        local_ip = socket.gethostbyname(socket.gethostname())
+    except OSError:
+        local_ip = host
+    logger.info("API iniciada con %s worker(s). Accede en: http://%s:%s", workers, local_ip, port)
+
+
+class DrainingMultiprocess(Multiprocess):
+    """Supervisor de uvicorn que marca la API como drenando antes de parar los workers."""
+
+    def __init__(self, *args, drain_seconds: float = 0, drain_file: Path, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.drain_seconds = drain_seconds
+        self.drain_file = drain_file
+
+    def shutdown(self) -> None:
+        if self.drain_seconds > 0:
+            self.drain_file.touch()
+            logger.info("Drenando: /health responde 503 durante %s s antes de parar", self.drain_seconds)
+            time.sleep(self.drain_seconds)
+        try:
+            super().shutdown()
+        finally:
+            self.drain_file.unlink(missing_ok=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor de producción de la API (uvicorn multi-worker)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=_env_int("PORT", 8000))
+    parser.add_argument("--workers", type=int, default=_env_int("WEB_CONCURRENCY"),
+                        help="Procesos worker (por defecto, núcleos disponibles)")
+    parser.add_argument("--graceful-timeout", type=int, default=_env_int("GRACEFUL_TIMEOUT", 30),
+                        help="Segundos para terminar las peticiones en curso al parar")
+    parser.add_argument("--drain-seconds", type=float, default=_env_float("DRAIN_SECONDS", 0),
+                        help="Segundos con /health en 503 antes de parar los workers")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(API_DIR.parent / ".env.local")
+
+    cpus = available_cpus()
+    workers = max(1, args.workers or cpus)
+    plan = plan_resources(workers, cpus)
+    logger.info("Workers=%s (núcleos=%s); por worker: %s", workers, cpus, plan)
+
+    run_migrations()
+    drain_file = Path(tempfile.gettempdir()) / f"gym-infosys-drain-{os.getpid()}"
+    drain_file.unlink(missing_ok=True)
+    os.environ["DB_MIGRATE_ON_STARTUP"] = "0"
+    os.environ["API_SUPERVISED"] = "1"
+    os.environ["API_DRAIN_FILE"] = str(drain_file)
+    metrics_dir = prepare_metrics_dir()
+    announce(args.host, args.port, workers)
+
+    # Equivale a uvicorn.run(..., workers=N), pero con el supervisor que drena.
+    # Se usa también con un solo worker para que la parada sea la misma.
+    if str(API_DIR) not in sys.path:  # lo que uvicorn.run() hace con app_dir
+        sys.path.insert(0, str(API_DIR))
+    config = uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    server = uvicorn.Server(config)
+    sock = config.bind_socket()
+    try:
+        DrainingMultiprocess(
+            config, target=server.run, sockets=[sock],
+            drain_seconds=args.drain_seconds, drain_file=drain_file,
+        ).run()
+    finally:
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
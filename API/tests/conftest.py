@@ -0,0 +1,77 @@
+"""Configuración común de los tests del API.
+
+Se ejecutan desde API/ con ``python -m pytest tests``. Los que necesitan
+PostgreSQL usan la base de datos de ``DATABASE_URL`` o ``DB_*`` (también desde
+``.env.local``, como main.py), con el esquema migrado y datos de prueba
+(``bench/generate_data.py``), y se omiten si no está disponible.
+"""
+
+import sys
+from pathlib import Path
+
+import psycopg2
+import pytest
+from dotenv import load_dotenv
+
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR))
+load_dotenv(API_DIR.parent / ".env.local")
+
+import db  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def pg():
+    """Conexión psycopg2 dedicada a la BD de pruebas."""
+    try:
+        conn = db.connect()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL no disponible: {e}")
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def cursor(pg):
+    """Cursor en una transacción que se deshace al terminar el test."""
+    with pg.cursor() as cur:
+        yield cur
+    pg.rollback()
+
+
+@pytest.fixture
+def client(pg):
+    """``TestClient`` de la API; cada uno arranca (y cierra) sus propios pools."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def first_id(pg, sql: str, params=None):
+    """Primer valor de una consulta, u omite el test si no hay datos."""
+    with pg.cursor() as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    pg.rollback()
+    if row is None:
+        pytest.skip("Sin datos de prueba (ver bench/generate_data.py)")
+    return row[0]
+
+
+def intentar(cursor, sql: str, params=()) -> None:
+    """Ejecuta una mutación; si viola una restricción se descarta solo ella."""
+    cursor.execute("SAVEPOINT mutacion")
+    try:
+        cursor.execute(sql, params)
+    except psycopg2.IntegrityError:
+        cursor.execute("ROLLBACK TO SAVEPOINT mutacion")
+    else:
+        cursor.execute("RELEASE SAVEPOINT mutacion")
+
+
+def ids(cursor, sql: str) -> list[int]:
+    cursor.execute(sql)
+    return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,82 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from activity_calendar import Calendar
+
+
+def _racha_actual(dias: set, hoy: date) -> int:
+    racha = 0
+    while hoy - timedelta(days=racha) in dias:
+        racha += 1
+    return racha
+
+
+def _racha_mas_larga(dias: set) -> int:
+    return max((_racha_actual(dias, dia) for dia in dias), default=0)
+
+
+def _heatmap(dias: set, anio: int) -> str:
+    dia, salida = date(anio, 1, 1), []
+    while dia.year == anio:
+        salida.append("1" if dia in dias else "0")
+        dia += timedelta(days=1)
+    return "".join(salida)
+
+
+def test_calendario_vacio():
+    cal = Calendar.from_row(None, None)
+    assert cal.current_streak(date(2026, 5, 1)) == 0
+    assert cal.longest_streak() == 0
+    assert cal.active_days(date(2026, 1, 1), date(2026, 12, 31)) == 0
+    assert cal.heatmap(2024) == "0" * 366
+    assert Calendar.from_row(date(2026, 1, 1), b"").total_days() == 0
+
+
+@pytest.mark.parametrize("inicio", [date(2023, 11, 20), date(2024, 1, 1), date(2024, 6, 15), date(2024, 12, 31), date(2025, 2, 1)])
+def test_heatmap_con_inicio_antes_dentro_y_despues_del_anio(inicio):
+    dias = {inicio, inicio + timedelta(days=1), inicio + timedelta(days=45), date(2024, 12, 31)}
+    dias = {dia for dia in dias if dia >= inicio}
+    cal = Calendar.from_dates(dias)
+    for anio in (2023, 2024, 2025):
+        assert cal.heatmap(anio) == _heatmap(dias, anio)
+    assert len(cal.heatmap(2024)) == 366
+
+
+def test_rachas_que_cruzan_el_anio_y_fuera_del_rango():
+    dias = {date(2024, 12, 29) + timedelta(days=n) for n in range(5)}
+    cal = Calendar.from_dates(dias)
+    assert cal.current_streak(date(2025, 1, 2)) == 5
+    assert cal.current_streak(date(2025, 1, 1)) == 4
+    assert cal.current_streak(date(2025, 1, 3)) == 0  # hoy sin actividad
+    assert cal.current_streak(date(2024, 12, 1)) == 0  # antes del inicio
+    assert cal.longest_streak() == 5
+    assert cal.active_days(date(2025, 1, 1), date(2025, 12, 31)) == 2
+    assert cal.active_days(date(2020, 1, 1), date(2024, 12, 28)) == 0
+    assert cal.active_days(date(2025, 1, 5), date(2025, 1, 1)) == 0  # rango invertido
+
+
+def test_from_row_es_little_endian_como_get_bit():
+    # Bits 0 y 9: byte 0 = 0b1, byte 1 = 0b10 (set_bit(dias, n) de PostgreSQL)
+    cal = Calendar.from_row(date(2026, 3, 1), bytes([0b00000001, 0b00000010]))
+    assert cal.is_active(date(2026, 3, 1))
+    assert cal.is_active(date(2026, 3, 10))
+    assert cal.total_days() == 2
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_coincide_con_el_calculo_dia_a_dia(semilla):
+    rnd = random.Random(semilla)
+    base = date(2023, 12, 1) + timedelta(days=rnd.randint(0, 60))
+    dias = {base + timedelta(days=rnd.randint(0, 500)) for _ in range(rnd.randint(1, 250))}
+    cal = Calendar.from_dates(dias)
+    assert cal.longest_streak() == _racha_mas_larga(dias)
+    for _ in range(10):
+        hoy = base + timedelta(days=rnd.randint(-5, 520))
+        assert cal.current_streak(hoy) == _racha_actual(dias, hoy)
+        desde = base + timedelta(days=rnd.randint(-30, 520))
+        hasta = desde + timedelta(days=rnd.randint(0, 120))
+        assert cal.active_days(desde, hasta) == sum(desde <= dia <= hasta for dia in dias)
+    for anio in (2023, 2024, 2025):
+        assert cal.heatmap(anio) == _heatmap(dias, anio)
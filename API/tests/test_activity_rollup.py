@@ -0,0 +1,78 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import activity_rollup
+from conftest import ids, intentar
+
+
+def test_sin_desajustes_tras_mutaciones_aleatorias(cursor):
+    # Todo en la transacción del fixture, que se deshace al terminar. Se parte
+    # de un resumen cuadrado (los datos generados sin triggers pueden no estarlo).
+    drift = activity_rollup.find_drift(cursor)
+    if drift:
+        activity_rollup.rebuild(cursor, drift)
+
+    rnd = random.Random(20)
+    clientes = ids(cursor, "SELECT id FROM clientes ORDER BY id LIMIT 6")
+    ejercicios = ids(cursor, "SELECT id FROM ejercicios ORDER BY id LIMIT 4")
+    tipos = ids(cursor, "SELECT id FROM gym_clases ORDER BY id LIMIT 3")
+    clases = ids(cursor, "SELECT id FROM clases_programadas ORDER BY id LIMIT 8")
+    if not (clientes and ejercicios and tipos and clases):
+        pytest.skip("Sin datos de prueba (ver bench/generate_data.py)")
+    hoy = date.today()
+
+    def dia():
+        return hoy + timedelta(days=rnd.randint(-40, 10))
+
+    for _ in range(400):
+        accion = rnd.randrange(9)
+        if accion <= 1:
+            intentar(cursor, """
+                INSERT INTO entrenamientos_realizados
+                    (id_cliente, id_ejercicio, fecha_realizacion, series_realizadas, repeticiones, peso_kg)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (rnd.choice(clientes), rnd.choice(ejercicios), dia(), rnd.randint(1, 5),
+                  rnd.choice([None, 8, 12]), rnd.choice([None, 0, 20, 42.5])))
+        elif accion == 2:
+            columna, valor = rnd.choice([
+                ("fecha_realizacion", dia()), ("peso_kg", rnd.choice([None, 0, 55])),
+                ("id_cliente", rnd.choice(clientes)), ("id_ejercicio", rnd.choice(ejercicios)),
+                ("series_realizadas", rnd.randint(1, 5)),
+            ])
+            intentar(cursor, f"""
+                UPDATE entrenamientos_realizados SET {columna} = %s
+                WHERE id = (SELECT id FROM entrenamientos_realizados WHERE id_cliente = ANY(%s) ORDER BY random() LIMIT 1)
+            """, (valor, clientes))
+        elif accion == 3:
+            intentar(cursor, """
+                DELETE FROM entrenamientos_realizados
+                WHERE id = (SELECT id FROM entrenamientos_realizados WHERE id_cliente = ANY(%s) ORDER BY random() LIMIT 1)
+            """, (clientes,))
+        elif accion == 4:
+            intentar(cursor, "INSERT INTO reservas (id_cliente, id_clase_programada, estado) VALUES (%s, %s, %s)",
+                      (rnd.choice(clientes), rnd.choice(clases), rnd.choice(["activa", "completada", "cancelada"])))
+        elif accion == 5:
+            columna, valor = rnd.choice([
+                ("estado", rnd.choice(["activa", "completada", "cancelada"])),
+                ("id_clase_programada", rnd.choice(clases)), ("id_cliente", rnd.choice(clientes)),
+            ])
+            intentar(cursor, f"""
+                UPDATE reservas SET {columna} = %s
+                WHERE id = (SELECT id FROM reservas WHERE id_clase_programada = ANY(%s) ORDER BY random() LIMIT 1)
+            """, (valor, clases))
+        elif accion == 6:
+            intentar(cursor, """
+                DELETE FROM reservas
+                WHERE id = (SELECT id FROM reservas WHERE id_clase_programada = ANY(%s) ORDER BY random() LIMIT 1)
+            """, (clases,))
+        elif accion == 7:
+            columna, valor = rnd.choice([("fecha", dia()), ("id_clase", rnd.choice(tipos))])
+            intentar(cursor, f"UPDATE clases_programadas SET {columna} = %s WHERE id = %s", (valor, rnd.choice(clases)))
+        elif len(clases) > 2:
+            # Borrar una clase borra sus reservas en cascada (migración 0012)
+            clase = clases.pop(rnd.randrange(len(clases)))
+            intentar(cursor, "DELETE FROM clases_programadas WHERE id = %s", (clase,))
+
+    assert activity_rollup.find_drift(cursor) == []
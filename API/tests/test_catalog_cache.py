@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+import catalog_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia(monkeypatch):
+    monkeypatch.setattr(catalog_cache, "_entries", {})
+    monkeypatch.setattr(catalog_cache, "_locks", {})
+    monkeypatch.setattr(catalog_cache, "TTL", 300.0)
+
+
+class Cargador:
+    def __init__(self, pausa: float = 0.0):
+        self.llamadas = 0
+        self.pausa = pausa
+
+    async def __call__(self):
+        self.llamadas += 1
+        await asyncio.sleep(self.pausa)
+        return [{"id": 1, "version": self.llamadas}]
+
+
+def test_acierto_e_invalidacion():
+    cargar = Cargador()
+
+    async def escenario():
+        primero, etag = await catalog_cache.get_with_etag("planes", cargar)
+        segundo, etag2 = await catalog_cache.get_with_etag("planes", cargar)
+        assert segundo is primero and etag2 == etag and cargar.llamadas == 1
+        catalog_cache.invalidate("planes")
+        tercero, etag3 = await catalog_cache.get_with_etag("planes", cargar)
+        assert cargar.llamadas == 2 and tercero[0]["version"] == 2 and etag3 != etag
+
+    asyncio.run(escenario())
+
+
+def test_una_sola_carga_concurrente():
+    cargar = Cargador(pausa=0.05)
+
+    async def escenario():
+        return await asyncio.gather(*(catalog_cache.get("ejercicios", cargar) for _ in range(10)))
+
+    valores = asyncio.run(escenario())
+    assert cargar.llamadas == 1
+    assert all(valor is valores[0] for valor in valores)
+
+
+def test_invalidar_durante_la_carga_no_la_guarda():
+    cargar = Cargador(pausa=0.05)
+
+    async def escenario():
+        carga = asyncio.create_task(catalog_cache.get("entrenadores", cargar))
+        await asyncio.sleep(0.01)
+        catalog_cache.invalidate("entrenadores")
+        await carga
+        await catalog_cache.get("entrenadores", cargar)
+
+    asyncio.run(escenario())
+    assert cargar.llamadas == 2
+
+
+def test_caducidad_y_ttl_cero(monkeypatch):
+    cargar = Cargador()
+
+    async def escenario():
+        await catalog_cache.get("gym_clases", cargar)
+        await catalog_cache.get("gym_clases", cargar)
+        assert cargar.llamadas == 1
+        # Entrada caducada: se vuelve a cargar
+        valor, etag, _ = catalog_cache._entries["gym_clases"]
+        catalog_cache._entries["gym_clases"] = (valor, etag, catalog_cache.time.monotonic() - 1)
+        await catalog_cache.get("gym_clases", cargar)
+        assert cargar.llamadas == 2
+
+        monkeypatch.setattr(catalog_cache, "TTL", 0.0)
+        catalog_cache.invalidate("gym_clases")
+        await catalog_cache.get("gym_clases", cargar)
+        await catalog_cache.get("gym_clases", cargar)
+        assert cargar.llamadas == 4
+
+    asyncio.run(escenario())
+
+
+def test_catalogo_desconocido():
+    with pytest.raises(KeyError):
+        asyncio.run(catalog_cache.get("socios", Cargador()))
+    with pytest.raises(KeyError):
+        catalog_cache.invalidate("socios")
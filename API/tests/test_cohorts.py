@@ -0,0 +1,77 @@
+import struct
+
+import numpy as np
+import pytest
+
+import cohorts
+
+# Fecha '-infinity' en el COPY binario (int32 mínimo)
+DATE_NEG_INFINITY = -(2 ** 31)
+FIELDS = (("id", ">i4"), ("dia", ">i4"), ("activo", "?"))
+
+
+def _copy_binario(rows) -> bytes:
+    """COPY binario como el de PostgreSQL; ``None`` es NULL (longitud -1, sin datos)."""
+    out = bytearray(cohorts._COPY_SIGNATURE + struct.pack(">ii", 0, 0))
+    for row in rows:
+        out += struct.pack(">h", len(row))
+        for value, (_, kind) in zip(row, FIELDS):
+            if value is None:
+                out += struct.pack(">i", -1)
+            elif kind == "?":
+                out += struct.pack(">i?", 1, value)
+            else:
+                out += struct.pack(">ii", 4, value)
+    return bytes(out + b"\xff\xff")
+
+
+def test_columnas_de_ancho_fijo():
+    columnas = cohorts.parse_binary_copy(_copy_binario([(1, 10, True), (2, DATE_NEG_INFINITY, False)]), FIELDS)
+    assert columnas["id"].tolist() == [1, 2]
+    assert columnas["dia"].tolist() == [10, DATE_NEG_INFINITY]
+    assert columnas["activo"].tolist() == [True, False]
+    assert columnas["id"].dtype == np.dtype("int32")
+
+
+def test_copy_vacio():
+    columnas = cohorts.parse_binary_copy(_copy_binario([]), FIELDS)
+    assert all(len(columna) == 0 for columna in columnas.values())
+
+
+def test_null_rechazado():
+    # Una fila más corta descuadra el tamaño total...
+    with pytest.raises(ValueError, match="tamaño variable"):
+        cohorts.parse_binary_copy(_copy_binario([(1, 10, True), (2, 11, None)]), FIELDS)
+    # ...y si varios NULL lo cuadran por casualidad (23 filas de 23 bytes con
+    # un int4 NULL ocupan lo mismo que 19 completas), lo detectan las longitudes
+    with pytest.raises(ValueError, match="con NULL"):
+        cohorts.parse_binary_copy(_copy_binario([(i, None, True) for i in range(23)]), FIELDS)
+
+
+def test_formato_no_binario_o_incompleto():
+    with pytest.raises(ValueError, match="formato binario"):
+        cohorts.parse_binary_copy(b"1\t2\tt\n", FIELDS)
+    with pytest.raises(ValueError, match="incompleto"):
+        cohorts.parse_binary_copy(_copy_binario([(1, 10, True)])[:-2], FIELDS)
+
+
+def test_copy_de_postgresql_con_null_e_infinity(cursor):
+    sql = "SELECT 1, COALESCE(NULL::date, '-infinity'), COALESCE(NULL = 'activo', false)"
+    columnas = cohorts._copy(cursor, (sql, FIELDS))
+    assert columnas["dia"].tolist() == [DATE_NEG_INFINITY]
+    assert columnas["activo"].tolist() == [False]
+
+    with pytest.raises(ValueError):
+        cohorts._copy(cursor, ("SELECT 1, NULL::date, true", FIELDS))
+
+
+def test_consultas_de_analitica_admiten_null(cursor):
+    # Columnas que el esquema permite NULL (ver cohorts.CLIENTES e HISTORIAL)
+    cursor.execute("UPDATE clientes SET estado = NULL WHERE id = (SELECT MIN(id) FROM clientes)")
+    cursor.execute(f"UPDATE {cohorts.PLAN_HISTORY_TABLE} SET fecha = NULL WHERE id = (SELECT MIN(id) FROM {cohorts.PLAN_HISTORY_TABLE})")
+    if cursor.rowcount == 0:
+        pytest.skip("Sin historial de planes en los datos de prueba")
+    clientes = cohorts._copy(cursor, cohorts.CLIENTES)
+    historial = cohorts._copy(cursor, cohorts.HISTORIAL)
+    assert len(clientes["id"]) > 0
+    assert DATE_NEG_INFINITY in historial["fecha"]
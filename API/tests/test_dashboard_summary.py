@@ -0,0 +1,19 @@
+import dashboard_summary
+
+
+def test_resumen_sin_datos_responde_503_hasta_refrescarlo(client, pg):
+    with pg.cursor() as cur:
+        cur.execute(f"REFRESH MATERIALIZED VIEW {dashboard_summary.VIEW} WITH NO DATA")
+    pg.commit()
+    try:
+        response = client.get("/admin/estadisticas")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+
+        # CONCURRENTLY no admite la vista vacía: el refresco la rellena sin él
+        assert client.post("/admin/estadisticas/refrescar").status_code == 200
+        response = client.get("/admin/estadisticas")
+        assert response.status_code == 200
+        assert response.json()["totales"]["total_users"] >= 0
+    finally:
+        dashboard_summary.refresh_sync(pg)
@@ -0,0 +1,32 @@
+import asyncio
+
+import db_async
+
+
+def test_marca_de_devolucion_por_conexion(pg, monkeypatch):
+    monkeypatch.setenv("DB_ASYNC_POOL_MIN", "1")
+    monkeypatch.setenv("DB_ASYNC_POOL_MAX", "1")
+    monkeypatch.setenv("DB_POOL_CHECK_IDLE", "30")
+
+    async def escenario():
+        await db_async.init_pool()
+        try:
+            conn = await db_async.getconn()
+            raw = conn.raw
+            assert raw not in db_async._returned_at
+            await conn.close()
+            assert raw in db_async._returned_at
+
+            # Recién devuelta: se presta sin ping y la marca se consume
+            conn = await db_async.getconn()
+            assert conn.raw is raw
+            assert raw not in db_async._returned_at
+            await conn.close()
+        finally:
+            await db_async.close_pool()
+        # Sin referencias a la conexión, su entrada desaparece con ella
+        db_async._returned_at[raw] = 0.0
+        del raw, conn
+        return len(db_async._returned_at)
+
+    assert asyncio.run(escenario()) == 0
@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import first_id
+
+
+def _paginas(client, path: str, params: dict) -> list[dict]:
+    registros, cursor = [], None
+    while True:
+        pagina = dict(params)
+        if cursor is not None:
+            pagina["cursor"] = cursor
+        response = client.get(path, params=pagina)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert len(data["ejercicios_realizados"]) <= params["limit"]
+        registros += data["ejercicios_realizados"]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return registros
+
+
+@pytest.fixture
+def cliente_user_id(pg):
+    # Un cliente con bastantes registros y varios el mismo día (el id desempata)
+    return first_id(pg, """
+        SELECT c.id_usuario
+        FROM clientes c
+        JOIN entrenamientos_realizados er ON er.id_cliente = c.id
+        GROUP BY c.id_usuario
+        HAVING COUNT(*) BETWEEN 20 AND 500 AND COUNT(DISTINCT er.fecha_realizacion) < COUNT(*)
+        ORDER BY COUNT(*) DESC
+        LIMIT 1
+    """)
+
+
+def test_paginas_asc_y_desc_devuelven_la_lista_completa(client, cliente_user_id):
+    path = f"/cliente/{cliente_user_id}/ejercicios-realizados"
+    completo = client.get(path, params={"limit": 500}).json()
+    assert completo["next_cursor"] is None
+    completo = completo["ejercicios_realizados"]
+
+    assert _paginas(client, path, {"limit": 7}) == completo
+    assert _paginas(client, path, {"limit": 7, "order": "desc"}) == completo[::-1]
+
+
+def test_paginas_con_rango_de_fechas(client, cliente_user_id):
+    path = f"/cliente/{cliente_user_id}/ejercicios-realizados"
+    completo = client.get(path, params={"limit": 500}).json()["ejercicios_realizados"]
+    fechas = sorted({registro["fecha_realizacion"] for registro in completo})
+    desde, hasta = fechas[len(fechas) // 4], fechas[3 * len(fechas) // 4]
+    esperado = [registro for registro in completo if desde <= registro["fecha_realizacion"] <= hasta]
+
+    params = {"limit": 3, "desde": desde, "hasta": hasta}
+    assert _paginas(client, path, params) == esperado
+    assert _paginas(client, path, dict(params, order="desc")) == esperado[::-1]
+
+
+def test_cursor_de_otro_orden_rechazado(client, cliente_user_id):
+    path = f"/cliente/{cliente_user_id}/ejercicios-realizados"
+    cursor = client.get(path, params={"limit": 1}).json()["next_cursor"]
+    response = client.get(path, params={"limit": 1, "order": "desc", "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import fanout
+import querylog
+from conftest import first_id
+
+
+@pytest.mark.parametrize("mode", fanout.MODES)
+def test_presupuesto_con_pool_en_frio(monkeypatch, pg, mode):
+    # Cada consulta del fan-out presta su propia conexión y cada préstamo puede
+    # comprobarla con un SELECT 1: con el pool recién creado y DB_POOL_CHECK_IDLE=0
+    # las rutas deben seguir dentro de su max_queries.
+    monkeypatch.setenv("DB_POOL_CHECK_IDLE", "0")
+    monkeypatch.setattr(querylog, "ASSERT_BUDGETS", True)
+    monkeypatch.setattr(fanout, "MODE", mode)
+    cliente_user_id = first_id(pg, "SELECT id_usuario FROM clientes ORDER BY id LIMIT 1")
+    entrenador_id = first_id(pg, "SELECT id FROM users WHERE role = 'entrenador' ORDER BY id LIMIT 1")
+
+    import main
+
+    with TestClient(main.app) as client:
+        for path, params in (
+            (f"/cliente/{cliente_user_id}/estadisticas", {}),
+            (f"/cliente/{cliente_user_id}/estadisticas", {"summary_only": "true"}),
+            (f"/entrenador/{entrenador_id}/estadisticas", {}),
+            ("/asignaciones-entrenador", {}),
+        ):
+            response = client.get(path, params=params)
+            assert response.status_code == 200, (path, response.text)
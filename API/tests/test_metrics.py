@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+
+
+def _scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path, "root_path": ""}
+
+
+def test_plantilla_de_ruta():
+    assert metrics.route_template(main.app, _scope("GET", "/planes/7")) == "/planes/{plan_id}"
+    assert metrics.route_template(main.app, _scope("GET", "/no-existe")) == metrics.UNMATCHED
+    # Solo coincide la ruta (405): se etiqueta con ella
+    assert metrics.route_template(main.app, _scope("PATCH", "/planes/7")) == "/planes/{plan_id}"
+
+
+def test_metrics_etiqueta_por_plantilla():
+    # Sin arrancar la app (no hace falta BD): un 404 y la exposición de /metrics
+    client = TestClient(main.app)
+    assert client.get("/no-existe/123").status_code == 404
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert "/no-existe/123" not in body
@@ -0,0 +1,52 @@
+import pytest
+
+import querylog
+from conftest import first_id
+
+
+def test_normalize_agrupa_por_estructura():
+    assert querylog.normalize("SELECT * FROM t WHERE id = %s AND x IN (%s, %s, %s)") == (
+        "SELECT * FROM t WHERE id = ? AND x IN (...)"
+    )
+    assert querylog.normalize("select 1  -- ping\n") == querylog.normalize("select 2")
+
+
+def test_suspended_no_cuenta_en_la_peticion():
+    stats = querylog.begin("GET /prueba")
+    try:
+        querylog.record("SELECT 1", "-", 0.0, 1)
+        with querylog.suspended():
+            assert querylog.current() is None
+            querylog.record("SELECT 1", "-", 0.0, 1)
+        assert querylog.current() is stats
+        assert stats.count == 1
+    finally:
+        querylog._current.set(None)
+
+
+def test_presupuesto_excedido_en_modo_test(monkeypatch):
+    monkeypatch.setattr(querylog, "ASSERT_BUDGETS", True)
+    stats = querylog.QueryStats("GET /prueba")
+    stats.count = 3
+    endpoint = querylog.max_queries(2)(lambda: None)
+    with pytest.raises(querylog.QueryBudgetExceeded):
+        querylog.finish(stats, endpoint)
+
+
+def test_ping_del_pool_no_cuenta_en_el_presupuesto(monkeypatch, pg):
+    # Pools recién creados y comprobando cada conexión al prestarla: si el
+    # SELECT 1 del health check contara, la primera petición se pasaría.
+    monkeypatch.setenv("DB_POOL_CHECK_IDLE", "0")
+    monkeypatch.setattr(querylog, "ASSERT_BUDGETS", True)
+    cliente_user_id = first_id(pg, "SELECT id_usuario FROM clientes ORDER BY id LIMIT 1")
+
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        for _ in range(2):
+            response = client.get(f"/cliente/{cliente_user_id}/estadisticas", params={"summary_only": "true"})
+            assert response.status_code == 200
+            response = client.get("/clases-programadas")
+            assert response.status_code == 200
@@ -0,0 +1,20 @@
+import serve
+
+
+def test_drain_seconds_admite_fracciones(monkeypatch):
+    monkeypatch.setenv("DRAIN_SECONDS", "2.5")
+    assert serve._env_float("DRAIN_SECONDS", 0) == 2.5
+    monkeypatch.setenv("DRAIN_SECONDS", "no")
+    assert serve._env_float("DRAIN_SECONDS", 0) == 0
+    monkeypatch.delenv("DRAIN_SECONDS")
+    assert serve._env_float("DRAIN_SECONDS", 0) == 0
+
+
+def test_pools_repartidos_dentro_del_limite(monkeypatch):
+    # plan_resources() exporta el plan a os.environ: setenv hace que se restaure
+    for name in ("DB_POOL_MAX", "DB_ASYNC_POOL_MAX", "DB_POOL_MIN", "DB_ASYNC_POOL_MIN", "HASH_WORKERS"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "40")
+    plan = serve.plan_resources(workers=4, cpus=8)
+    assert 4 * (plan["DB_POOL_MAX"] + plan["DB_ASYNC_POOL_MAX"]) <= 40
+    assert plan["HASH_WORKERS"] == 2
@@ -0,0 +1,80 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import trainer_rollup
+from conftest import ids, intentar
+
+
+def test_sin_desajustes_tras_mutaciones_aleatorias(cursor):
+    # Todo en la transacción del fixture, que se deshace al terminar
+    drift = trainer_rollup.find_drift(cursor)
+    if drift:
+        trainer_rollup.rebuild(cursor, drift)
+
+    rnd = random.Random(25)
+    entrenadores = ids(cursor, "SELECT id FROM users WHERE role = 'entrenador' ORDER BY id LIMIT 3")
+    clientes = ids(cursor, "SELECT id FROM clientes ORDER BY id LIMIT 5")
+    ejercicios = ids(cursor, "SELECT id FROM ejercicios ORDER BY id LIMIT 4")
+    if not (entrenadores and clientes and ejercicios):
+        pytest.skip("Sin datos de prueba (ver bench/generate_data.py)")
+    hoy = date.today()
+    asignacion_al_azar = """
+        (SELECT id FROM entrenamientos_asignados WHERE id_entrenador = ANY(%s) ORDER BY random() LIMIT 1)
+    """
+
+    def dia():
+        return hoy + timedelta(days=rnd.randint(-30, 20))
+
+    for _ in range(300):
+        accion = rnd.randrange(7)
+        if accion <= 1:
+            intentar(cursor, """
+                INSERT INTO entrenamientos_asignados (id_entrenador, id_cliente, id_ejercicio, fecha_entrenamiento, series, estado)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (rnd.choice(entrenadores), rnd.choice(clientes), rnd.choice(ejercicios), dia(),
+                  rnd.randint(1, 5), rnd.choice(["pendiente", "completado", "cancelado"])))
+        elif accion == 2:
+            columna, valor = rnd.choice([
+                ("estado", rnd.choice(["pendiente", "completado", "cancelado"])),
+                ("id_entrenador", rnd.choice(entrenadores)), ("fecha_entrenamiento", dia()),
+                ("series", rnd.randint(1, 5)),
+            ])
+            intentar(cursor, f"UPDATE entrenamientos_asignados SET {columna} = %s WHERE id = {asignacion_al_azar}",
+                      (valor, entrenadores))
+        elif accion == 3:
+            # Sus registros quedan sin asignación (ON DELETE SET NULL)
+            intentar(cursor, f"DELETE FROM entrenamientos_asignados WHERE id = {asignacion_al_azar}", (entrenadores,))
+        elif accion == 4:
+            intentar(cursor, f"""
+                INSERT INTO entrenamientos_realizados
+                    (id_cliente, id_ejercicio, id_entrenamiento_asignado, fecha_realizacion, series_realizadas, repeticiones, peso_kg)
+                SELECT id_cliente, id_ejercicio, id, %s, %s, %s, %s
+                FROM entrenamientos_asignados WHERE id = {asignacion_al_azar}
+            """, (dia(), rnd.randint(1, 5), rnd.choice([None, 10]), rnd.choice([None, 0, 30]), entrenadores))
+        elif accion == 5:
+            columna, valor = rnd.choice([
+                ("fecha_realizacion", dia()), ("peso_kg", rnd.choice([None, 0, 45])),
+                ("series_realizadas", rnd.randint(1, 5)), ("repeticiones", rnd.choice([None, 6])),
+                ("id_entrenamiento_asignado", None),
+            ])
+            intentar(cursor, f"""
+                UPDATE entrenamientos_realizados SET {columna} = %s
+                WHERE id = (
+                    SELECT er.id FROM entrenamientos_realizados er
+                    JOIN entrenamientos_asignados ea ON ea.id = er.id_entrenamiento_asignado
+                    WHERE ea.id_entrenador = ANY(%s) ORDER BY random() LIMIT 1
+                )
+            """, (valor, entrenadores))
+        else:
+            intentar(cursor, """
+                DELETE FROM entrenamientos_realizados
+                WHERE id = (
+                    SELECT er.id FROM entrenamientos_realizados er
+                    JOIN entrenamientos_asignados ea ON ea.id = er.id_entrenamiento_asignado
+                    WHERE ea.id_entrenador = ANY(%s) ORDER BY random() LIMIT 1
+                )
+            """, (entrenadores,))
+
+    assert trainer_rollup.find_drift(cursor) == []
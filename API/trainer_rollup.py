@@ -0,0 +1,178 @@
+"""Reconciliación del resumen de actividad semanal por entrenador.
+
+``actividad_semanal_entrenador`` y ``actividad_total_entrenador`` (migración
+0011) resumen por entrenador, por semana y en total los entrenamientos que ha
+asignado (asignados, completados, cancelados y series) y los realizados por
+sus clientes enlazados a esas asignaciones (registros, series y volumen), que
+es lo que lee ``/entrenador/{id}/estadisticas``. Las mantienen los triggers
+de ``entrenamientos_asignados`` y ``entrenamientos_realizados`` sumando y
+restando la aportación de cada fila, pero pueden desviarse si se cambian los
+datos sin pasar por ellos: ``TRUNCATE``, triggers desactivados en cargas
+masivas (``bench/generate_data.py``) o restauraciones parciales. Este módulo
+compara el resumen con el que resulta de las tablas de origen y recalcula los
+entrenadores que no coinciden, con el mismo bloqueo que ``activity_rollup.py``.
+
+Desde API/ (cron o tras restaurar datos)::
+
+    python trainer_rollup.py            # detecta y corrige
+    python trainer_rollup.py --check    # solo informa; sale con 1 si hay desajustes
+    python trainer_rollup.py --rebuild  # recalcula el resumen completo
+"""
+
+import logging
+
+logger = logging.getLogger("gym-infosys.reconcile")
+
+WEEKLY_TABLE = "actividad_semanal_entrenador"
+TOTAL_TABLE = "actividad_total_entrenador"
+TABLES = (WEEKLY_TABLE, TOTAL_TABLE)
+
+COLUMNS = "asignados, completados, cancelados, series_asignadas, realizados, series_realizadas, volumen"
+
+# Resumen semanal calculado desde las tablas de origen; {where} filtra por
+# entrenadores (sobre ea.id_entrenador).
+SEMANAL_SQL = f"""
+    SELECT id_entrenador, semana, SUM(asignados) AS asignados, SUM(completados) AS completados,
+           SUM(cancelados) AS cancelados, SUM(series_asignadas) AS series_asignadas,
+           SUM(realizados) AS realizados, SUM(series_realizadas) AS series_realizadas, SUM(volumen) AS volumen
+    FROM (
+        SELECT ea.id_entrenador, date_trunc('week', ea.fecha_entrenamiento)::date AS semana,
+               COUNT(*) AS asignados,
+               COUNT(*) FILTER (WHERE ea.estado = 'completado') AS completados,
+               COUNT(*) FILTER (WHERE ea.estado = 'cancelado') AS cancelados,
+               COALESCE(SUM(ea.series) FILTER (WHERE ea.estado IS DISTINCT FROM 'cancelado'), 0) AS series_asignadas,
+               0 AS realizados, 0 AS series_realizadas, 0 AS volumen
+        FROM entrenamientos_asignados ea
+        WHERE {{where}}
+        GROUP BY 1, 2
+        UNION ALL
+        SELECT ea.id_entrenador, date_trunc('week', er.fecha_realizacion)::date,
+               0, 0, 0, 0, COUNT(*), SUM(er.series_realizadas),
+               SUM(volumen_entrenamiento(er.peso_kg, er.series_realizadas, er.repeticiones))
+        FROM entrenamientos_realizados er
+        JOIN entrenamientos_asignados ea ON ea.id = er.id_entrenamiento_asignado
+        WHERE {{where}}
+        GROUP BY 1, 2
+    ) aportaciones
+    GROUP BY id_entrenador, semana
+"""
+
+DRIFT_SQL = f"""
+    SELECT id_entrenador
+    FROM {WEEKLY_TABLE} a
+    FULL JOIN ({SEMANAL_SQL.format(where="TRUE")}) o USING (id_entrenador, semana)
+    WHERE (a.{COLUMNS.replace(", ", ", a.")}) IS DISTINCT FROM (o.{COLUMNS.replace(", ", ", o.")})
+    UNION
+    SELECT id_entrenador
+    FROM {TOTAL_TABLE} t
+    FULL JOIN (
+        SELECT id_entrenador, {", ".join(f"SUM({c}) AS {c}" for c in COLUMNS.split(", "))}
+        FROM {WEEKLY_TABLE}
+        GROUP BY id_entrenador
+    ) o USING (id_entrenador)
+    WHERE (t.{COLUMNS.replace(", ", ", t.")}) IS DISTINCT FROM (o.{COLUMNS.replace(", ", ", o.")})
+    ORDER BY id_entrenador
+"""
+
+
+def find_drift(cursor) -> list[int]:
+    """Entrenadores cuyo resumen semanal (o su total) no coincide con sus asignaciones y registros."""
+    cursor.execute(DRIFT_SQL)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild(cursor, entrenadores: list[int] | None = None) -> None:
+    """Recalcula el resumen semanal y el total de ``entrenadores`` (de todos si es None).
+
+    Trabaja en la transacción del cursor y no hace commit: lo decide quien llama.
+    """
+    cursor.execute(f"LOCK TABLE {', '.join(TABLES)} IN SHARE ROW EXCLUSIVE MODE")
+    if entrenadores is None:
+        where, params = "TRUE", {}
+    else:
+        where, params = "id_entrenador = ANY(%(ids)s)", {"ids": entrenadores}
+    for table in TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE {where}", params)
+    cursor.execute(
+        f"INSERT INTO {WEEKLY_TABLE} (id_entrenador, semana, {COLUMNS}) "
+        + SEMANAL_SQL.format(where=where.replace("id_entrenador", "ea.id_entrenador")),
+        params,
+    )
+    cursor.execute(
+        f"INSERT INTO {TOTAL_TABLE} (id_entrenador, {COLUMNS}) "
+        f"SELECT id_entrenador, {', '.join(f'SUM({c})' for c in COLUMNS.split(', '))} "
+        f"FROM {WEEKLY_TABLE} WHERE {where} GROUP BY id_entrenador",
+        params,
+    )
+
+
+def reconcile(cursor, fix: bool = True) -> list[int]:
+    """Detecta (y con ``fix`` corrige) los desajustes en la transacción del cursor.
+
+    Devuelve los entrenadores desajustados; con ``fix`` solo los que seguían
+    así tras bloquear el resumen. No hace commit: lo decide quien llama.
+    """
+    drift = find_drift(cursor)
+    if not drift or not fix:
+        return drift
+    cursor.execute(f"LOCK TABLE {', '.join(TABLES)} IN SHARE ROW EXCLUSIVE MODE")
+    drift = find_drift(cursor)
+    if drift:
+        rebuild(cursor, drift)
+    for entrenador in drift[:20]:
+        logger.warning("Resumen de actividad semanal recalculado para el entrenador %s", entrenador)
+    if len(drift) > 20:
+        logger.warning("... y %s entrenadores más", len(drift) - 20)
+    return drift
+
+
+def run(conn, fix: bool = True) -> list[int]:
+    """``reconcile()`` en su propia transacción sobre una conexión psycopg2."""
+    try:
+        with conn.cursor() as cursor:
+            drift = reconcile(cursor, fix=fix)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info("Actividad semanal de entrenadores: %s desajustados%s", len(drift), " corregidos" if fix and drift else "")
+    return drift
+
+
+def main(argv=None) -> int:
+    import argparse
+    import json
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+
+    import db
+
+    parser = argparse.ArgumentParser(description="Reconciliación del resumen de actividad semanal por entrenador")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--check", action="store_true", help="Solo informar, sin corregir")
+    group.add_argument("--rebuild", action="store_true", help="Recalcular el resumen de todos los entrenadores")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env.local")
+    conn = db.connect()
+    try:
+        if args.rebuild:
+            try:
+                with conn.cursor() as cursor:
+                    rebuild(cursor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return 0
+        drift = run(conn, fix=not args.check)
+    finally:
+        conn.close()
+    print(json.dumps(drift))
+    return 1 if args.check and drift else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
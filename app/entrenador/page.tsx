@@ -22,8 +22,16 @@ interface Cliente {
   fecha_asignacion: string
   notas?: string
   asignacion_id: number
-  last_activity: string
+  last_activity: string | null
   total_workouts: number
+  workouts_this_week: number
+  workouts_this_month: number
+  assignments_pending: number
+  assignments_overdue: number
+  assignments_completed: number
+  classes_attended: number
+  classes_booked: number
+  attendance_rate: number | null
   status: "activo" | "inactivo"
   avatar?: string
 }
@@ -32,6 +40,10 @@ interface EstadisticasEntrenador {
   total_clientes: number
   clientes_activos: number
   clientes_inactivos: number
+  entrenamientos_esta_semana?: number
+  entrenamientos_este_mes?: number
+  asignaciones_pendientes?: number
+  asignaciones_completadas?: number
 }
 
 export default function EntrenadorPage() {
@@ -253,6 +265,20 @@ export default function EntrenadorPage() {
                       <p className="text-sm text-muted-foreground">{cliente.email}</p>
                       <div className="flex items-center space-x-4 mt-1">
                         <span className="text-xs text-muted-foreground">Asignado: {cliente.fecha_asignacion}</span>
+                        <span className="text-xs text-muted-foreground">
+                          Última actividad: {cliente.last_activity ?? "sin actividad"}
+                        </span>
+                      </div>
+                      <div className="flex items-center space-x-4 mt-1">
+                        <span className="text-xs text-muted-foreground">
+                          Entrenamientos: {cliente.workouts_this_week} esta semana · {cliente.workouts_this_month} este mes
+                        </span>
+                        <span className="text-xs text-muted-foreground">
+                          Pendientes: {cliente.assignments_pending}
+                        </span>
+                        {cliente.attendance_rate !== null && (
+                          <span className="text-xs text-muted-foreground">Asistencia: {cliente.attendance_rate}%</span>
+                        )}
                       </div>
                     </div>
                   </div>